@@ -16,6 +16,8 @@ from astropy import constants as const
 from scipy.special import cbrt
 from astropy.cosmology import Planck15 as cosmo
 
+from ClusterModel.ClusterTools import cluster_timing
+
 #==================================================
 # Class
 #==================================================
@@ -72,6 +74,7 @@ class ClusterElectronEmission(object):
         
     
     #========== Synchrotron emission
+    @cluster_timing.timed('synchrotron_kernel')
     def synchrotron(self, Ephoton_input, radius_input=None, B=1.0*u.uG):
         """
         Compute the synchrotron emission
@@ -91,6 +94,7 @@ class ClusterElectronEmission(object):
         # Check input photons
         Ephoton = Ephoton_input.to('eV')
         if type(Ephoton) == float: Ephoton = np.array([Ephoton])
+        if Ephoton.isscalar: Ephoton = Ephoton.reshape(1)
 
         # Check electron energy
         Ee = self.Ee                                        # 1D
@@ -106,18 +110,23 @@ class ClusterElectronEmission(object):
             # Get the normalization function (1D: Ephot)
             func = ampli * B / Ephoton
         
-            # Get the critical energy and energy ratio
+            # Get the critical energy
             Ec = (3.0/2)*gamma**2*const.e.value*const.e.unit*B*const.hbar / (const.m_e) # 1D: Eelec
-            EphotEc = Ephoton.to_value('GeV') / np.vstack(Ec.to_value('GeV')) # 2D: photon energy, electron energy
 
-            # Compute integrand
-            dNphot_dEdt = func * self._Gtilde(EphotEc)
+            # Photon energies are independent: process them by chunks within the memory budget
+            dNphot_dEdt = []
+            for sl in cluster_timing.chunk_slices(len(Ephoton), 16*8*len(Ee)):
+                # Get the energy ratio
+                EphotEc = Ephoton[sl].to_value('GeV') / np.vstack(Ec.to_value('GeV')) # 2D: photon energy, electron energy
+
+                # Compute integrand
+                dNphot_dEdt_sl = func[sl] * self._Gtilde(EphotEc)
         
-            # Integrate over electron energy
-            dNphot_dEdt = self._trapz_loglog(np.vstack(Je.value)*Je.unit * dNphot_dEdt, Ee*u.GeV, axis=0)
+                # Integrate over electron energy
+                dNphot_dEdt.append(self._trapz_loglog(np.vstack(Je.value)*Je.unit * dNphot_dEdt_sl, Ee*u.GeV, axis=0))
 
             # Get the output
-            output = dNphot_dEdt.to('GeV-1 s-1')
+            output = np.concatenate(dNphot_dEdt).to('GeV-1 s-1')
 
         #---------- Case of differential quantities: function of radius
         # It might be best trying to compute arrays, avoiding loop, but in 3d...
@@ -134,6 +143,7 @@ class ClusterElectronEmission(object):
             Je = norm * self.Je(radius.to_value('kpc'), Ee)*u.GeV**-1*u.cm**-3 # 1D
                 
             output = np.zeros((len(radius), len(Ephoton))) * u.GeV**-1*u.cm**-3*u.s**-1
+            chunks = cluster_timing.chunk_slices(len(Ephoton), 16*8*len(Ee))
             
             for i in range(len(radius)):
                 if B[i] != 0: # no need to compute for B==0
@@ -143,22 +153,28 @@ class ClusterElectronEmission(object):
                     # Get the normalization function
                     func = ampli * B[i] / Ephoton # 1D: Ephot
             
-                    # Get the critical energy and energy ratio
+                    # Get the critical energy
                     Ec = (3.0/2)*gamma**2*const.e.value*const.e.unit*B[i]*const.hbar / (const.m_e) # 1D: Eelec
-                    EphotEc = Ephoton.to_value('GeV') / np.vstack(Ec.to_value('GeV')) # 2D: photon energy, electron energy
+
+                    # Photon energies are independent: process them by chunks within the memory budget
+                    dNphot_dEdVdt = []
+                    for sl in chunks:
+                        # Get the energy ratio
+                        EphotEc = Ephoton[sl].to_value('GeV') / np.vstack(Ec.to_value('GeV')) # 2D: photon energy, electron energy
                     
-                    # Compute integrand
-                    dNphot_dEdt = func * self._Gtilde(EphotEc) # 3D: radius, photon energy, electron energy
+                        # Compute integrand
+                        dNphot_dEdt = func[sl] * self._Gtilde(EphotEc) # 2D: photon energy, electron energy
                     
-                    # Integrate over electron energy
-                    dNphot_dEdVdt = self._trapz_loglog(np.vstack(Je_i.value)*Je_i.unit * dNphot_dEdt, Ee*u.GeV, axis=0) # 1D:Ephot
+                        # Integrate over electron energy
+                        dNphot_dEdVdt.append(self._trapz_loglog(np.vstack(Je_i.value)*Je_i.unit * dNphot_dEdt, Ee*u.GeV, axis=0)) # 1D:Ephot
                     
                     # Get the output
-                    output[i,:] = dNphot_dEdVdt.to('GeV-1 cm-3 s-1')
+                    output[i,:] = np.concatenate(dNphot_dEdVdt).to('GeV-1 cm-3 s-1')
             
         return output
 
     #========== Inverse Compton loss
+    @cluster_timing.timed('ic_kernel')
     def inverse_compton(self, Egamma_input, radius_input=None, redshift=0.0):
         """
         Compute inverse Compton emission for a Black Body spectrum at Tcmb.
@@ -142,6 +142,106 @@ def dEdt_brem(energy, n_e):
     return dEdt.to('GeV s-1')
 
 
+#===================================================
+#========== Loss rate engine
+#===================================================
+class ElectronLoss(object):
+    """ ElectronLoss class
+    This class precomputes the energy dependent factors of the electron
+    energy losses (synchrotron, inverse Compton, Bremsstrahlung and Coulomb)
+    for a given energy grid and redshift. The losses at any position are then 
+    obtained by broadcasting them with the ambient electron density and 
+    magnetic field. Synchrotron losses scale as B^2, Bremsstrahlung losses 
+    as n_e, and Coulomb losses as n_e times a logarithm that depends on n_e 
+    only through the plasma frequency.
+
+    Attributes
+    ----------
+    - energy (np.ndarray): the electron energy grid in GeV
+    - redshift (float): cluster redshift
+    - _valid (np.ndarray): flag energies above the electron rest mass
+    - _sync (np.ndarray): synchrotron loss per unit B^2, in GeV s-1 G-2
+    - _ic (np.ndarray): inverse Compton loss, in GeV s-1
+    - _brem (np.ndarray): Bremsstrahlung loss per unit n_e, in GeV s-1 cm3
+    - _coul (np.ndarray): Coulomb loss per unit n_e and unit Coulomb logarithm, in GeV s-1 cm3
+    - _coul_log (np.ndarray): energy dependent part of the Coulomb logarithm
+    - _omega_p2 (float): squared plasma frequency per unit n_e, in s-2 cm3
+
+    Methods
+    ----------
+    - dEdt_tot(n_e, B): compute the total losses (GeV/s) as a 2d array (energy, radius)
+    """
+
+    #========== Init
+    def __init__(self, energy, redshift=0.0):
+
+        self.energy = energy.to_value('GeV')
+        self.redshift = redshift
+
+        gamma = (energy/(const.m_e*const.c**2)).to_value('')
+        gamma = np.atleast_1d(gamma).astype(float)
+        w_neg = gamma <= 1
+        gamma[w_neg] = 2 # set negative values to 2, and will set result to 0 there
+        beta = np.sqrt(1.0-1.0/gamma**2)
+        self._valid = ~w_neg
+
+        #----- Synchrotron, for B = 1 G
+        sync = 4.0/3.0 * const.sigma_T * const.c * beta**2 * gamma**2 * (1*u.G)**2/(2*const.mu0)
+        self._sync = sync.to_value('GeV s-1')
+        
+        #----- Inverse Compton
+        Ucmb = 8*np.pi**5 * (const.k_B*cosmo.Tcmb0*(1+redshift))**4 / 15.0 / (const.h*const.c)**3
+        ic = 4.0/3.0*const.sigma_T*const.c * beta**2*gamma**2 * Ucmb
+        self._ic = ic.to_value('GeV s-1')
+        
+        #----- Bremsstrahlung, for n_e = 1 cm-3
+        brem = 1.51e-16*gamma*(np.log(gamma)+0.36)*u.s**-1 * const.m_e*const.c**2
+        self._brem = brem.to_value('GeV s-1')
+
+        #----- Coulomb, for n_e = 1 cm-3, the logarithm being f1-f2+f3+1/2
+        coul = 3.0/4.0*const.sigma_T * u.cm**-3 * const.m_e*const.c**3/beta * 2
+        self._coul = coul.to_value('GeV s-1')
+        f1 = np.log(((const.m_e*const.c**2*beta*np.sqrt(gamma-1))/const.hbar).to_value('s-1'))
+        f2 = np.log(2)*(beta**2/2 + 1/gamma)
+        f3 = ((gamma-1.0)/4.0/gamma)**2
+        self._coul_log = f1 - f2 + f3 + 1.0/2
+        self._omega_p2 = ((const.e.value*const.e.unit)**2 * u.cm**-3 / const.m_e / const.eps0).to_value('s-2')
+
+        #----- Energy cannot be lower than rest mass
+        for loss in [self._sync, self._ic, self._brem, self._coul]:
+            loss[w_neg] = 0
+        
+    #========== Total losses
+    def dEdt_tot(self, n_e=1*u.cm**-3, B=1*u.uG):
+        """
+        Compute loss from brem + Coul + IC + Sync
+
+        Parameters
+        ----------
+        - n_e (quantity): the number density of ambient electrons, as a 1d array
+        - B (quantity): magnetic field strength homogeneous to Gauss, matching n_e
+
+        Outputs
+        --------
+        - Energy loss (np.ndarray): the losses in GeV/s, as a 2d array (energy, radius)
+        """
+
+        n_e = np.atleast_1d(n_e.to_value('cm-3'))
+        B = np.atleast_1d(B.to_value('G'))
+        
+        wbad = (n_e <= 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            log_omega_p = 0.5*np.log(self._omega_p2 * n_e) # Plasma frequency
+
+        dEdt_coul = self._coul[:,np.newaxis] * n_e * (self._coul_log[:,np.newaxis] - log_omega_p)
+        dEdt_coul[:,wbad] = 0
+
+        dEdt = (self._sync[:,np.newaxis] * B**2 + self._ic[:,np.newaxis] +
+                self._brem[:,np.newaxis] * n_e + dEdt_coul)
+        
+        return dEdt
+
+    
 #===================================================
 #========== Total losses
 #===================================================
@@ -168,22 +268,7 @@ def dEdt_tot(energy, radius=None, n_e=1*u.cm**-3, B=1*u.uG, redshift=0.0):
         if len(n_e) != len(radius) or len(B) != len(radius):
             raise ValueError("The shape of n_e and B are not consistent with radius")
 
-    #========== In case energy, n_e, B are just 1D array
-    N_rad = len(radius)
-    N_eng = len(energy)
-
-    e_grid = (np.tile(energy, [N_rad,1])).T
-    n_grid = (np.tile(n_e, [N_eng, 1]))
-    B_grid = (np.tile(B, [N_eng, 1]))
-
     #========== Compute
-    dEdt1 = dEdt_sync(e_grid, B_grid)
-    dEdt2 = dEdt_ic(e_grid, redshift)
-    dEdt3 = dEdt_brem(e_grid, n_grid)
-    dEdt4 = dEdt_coul(e_grid, n_grid)
-
-    dEdt = dEdt1 + dEdt2 + dEdt3 + dEdt4    
-
-    return dEdt.to('GeV s-1')
-
+    dEdt = ElectronLoss(energy, redshift=redshift).dEdt_tot(n_e=n_e, B=B)
 
+    return dEdt * u.GeV / u.s
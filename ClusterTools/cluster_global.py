@@ -7,7 +7,6 @@ import numpy as np
 import astropy.cosmology
 import astropy.constants as cst
 import astropy.units as u
-from scipy.optimize import brentq
 import matplotlib.pyplot as plt
 
 #===================================================
@@ -60,6 +59,33 @@ def Rdelta_to_Mdelta(R_delta, redshift, delta=500, cosmo=astropy.cosmology.Planc
 
     return M_delta
 
+#===================================================
+#========== NFW enclosed mass shape
+#===================================================
+def NFW_enclosed_mass_shape(y):
+    """
+    Compute the NFW enclosed mass function m(y) = ln(1+y) - y/(1+y), 
+    with y = r/r_s, so that M(<r) = 4 pi r_s^3 rho_0 m(r/r_s). A series 
+    expansion is used at small y to avoid numerical cancellation.
+
+    Parameters
+    ----------
+    - y: array of r/r_s
+
+    Outputs
+    --------
+    - m(y): array
+
+    """
+
+    y = np.asarray(y, dtype=float)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m_exact = np.log1p(y) - y/(1+y)
+    m_series = y**2*(1.0/2 - y*(2.0/3 - y*(3.0/4 - y*(4.0/5 - y*5.0/6))))
+
+    return np.where(y < 1e-3, m_series, m_exact)
+
 #===================================================
 #========== get r500 from m500
 #===================================================
@@ -67,9 +93,18 @@ def Mdelta1_to_Mdelta2_NFW(M_delta1, delta1=500, delta2=200, c1=3.0, redshift=0.
     """
     Convert from, e.g., M500 to M200 assuming NFW profile. 
 
+    All inputs can be arrays (broadcast together), so that a full catalog 
+    can be converted at once. In units of the scale radius, y = R_delta2/r_s 
+    is the solution of m(y)/y^3 = delta2/delta1 m(c1)/c1^3, which does not 
+    depend on the mass. The function m(y)/y^3 being monotonic, it is 
+    tabulated once on a log grid and inverted by interpolation, the 
+    solution being then polished with Newton iterations.
+
     Parameters
     ----------
     - Mdelta1 (Msun): array
+    - delta1, delta2: the input and output overdensities (can be arrays)
+    - c1: the concentration with respect to delta1 (can be an array)
 
     Outputs
     --------
@@ -78,26 +113,34 @@ def Mdelta1_to_Mdelta2_NFW(M_delta1, delta1=500, delta2=200, c1=3.0, redshift=0.
     Notes
     --------
     The results do not depend on redshift or cosmology. 
-    They are used internally but should cancel.
+    The parameters are kept for backward compatibility.
 
     """
+
+    M_delta1, delta1, delta2, c1 = np.broadcast_arrays(np.asarray(M_delta1, dtype=float),
+                                                       np.asarray(delta1, dtype=float),
+                                                       np.asarray(delta2, dtype=float),
+                                                       np.asarray(c1, dtype=float))
     
-    c1 = float(c1)
-    
-    R_delta1 = Mdelta_to_Rdelta(M_delta1, redshift, delta=delta1, cosmo=cosmo)   # kpc
-    Rs       = R_delta1 / c1                                                     # kpc
-    rho0     = M_delta1 / (4*np.pi * Rs**3) / (np.log(1 + c1) - c1/(1+c1))       # Msun/kpc^3
-
-    # Difference between M(<R) from NFW and from M(<R) assuming R==R_delta
-    def enclosed_mass_difference(radius):
-        mass_nfw    = (4*np.pi * Rs**3) * rho0 * (np.log(1 + radius/Rs) - radius/(radius+Rs))
-        mass_delta2 =  Rdelta_to_Mdelta(radius, redshift, delta=delta2, cosmo=cosmo)
-        return  mass_nfw - mass_delta2
-
-    # Search R_delta2 as the root of the function
-    R_delta2 = brentq(enclosed_mass_difference, R_delta1*1e-5, R_delta1*1e5)
-    M_delta2 = Rdelta_to_Mdelta(R_delta2, redshift, delta=delta2, cosmo=cosmo)
+    # Target value of ln(m(y)/y^3)
+    target = np.log(delta2/delta1 * NFW_enclosed_mass_shape(c1)/c1**3)
     
+    # Tabulated ln(m(y)/y^3), decreasing with y, inverted by interpolation
+    t_grid = np.linspace(np.log(1e-7), np.log(1e7), 2001)
+    h_grid = np.log(NFW_enclosed_mass_shape(np.exp(t_grid))) - 3*t_grid
+    t = np.interp(-target, -h_grid, t_grid)
+
+    # Newton polish, with d ln(m/y^3) / d ln y = y m'(y) / m(y) - 3 and m'(y) = y/(1+y)^2
+    for i in range(3):
+        y = np.exp(t)
+        m = NFW_enclosed_mass_shape(y)
+        t = t - (np.log(m) - 3*t - target) / (y**2/(1+y)**2/m - 3)
+
+    M_delta2 = M_delta1 * delta2/delta1 * (np.exp(t)/c1)**3
+
+    if M_delta2.ndim == 0:
+        M_delta2 = float(M_delta2)
+        
     return M_delta2
 
 #===================================================
@@ -16,6 +16,7 @@ from astropy import constants as const
 import astropy.units as u
 
 from ClusterModel.ClusterTools import cluster_hadronic_emission_kelner2006
+from ClusterModel.ClusterTools import cluster_timing
 
 #==================================================
 # Class
@@ -40,6 +41,10 @@ class PPmodel(object):
     - Epmin (quantity): minimal proton energy
     - Epmax (quantity): maximum proton energy
     - NptEpPD (int): number of proton energy per decade
+    - _K06 (PPmodel): the Kelner et al. 2006 model used to scale the electron and neutrino
+    spectra, built once with the same proton energy range
+    - _grid_cache (dict): the Tp only terms of the cross section computed on the last 
+    proton energy grid
 
     Methods
     ----------  
@@ -145,7 +150,14 @@ class PPmodel(object):
         self.Ep = np.logspace(np.log10(Epmin), np.log10(Epmax), int(NptEpPd*(np.log10(Epmax/Epmin))))
         self.hiEmodel = hiEmodel
 
+        #----- Kelner model used for electrons and neutrinos, and cache of the grid dependent terms
+        self._K06 = cluster_hadronic_emission_kelner2006.PPmodel(Jp,
+                                                                 Epmin=Epmin*u.GeV, Epmax=Epmax*u.GeV,
+                                                                 NptEpPd=NptEpPd)
+        self._grid_cache = None
+
     #========== Compute the spectrum
+    @cluster_timing.timed('pp_kernel')
     def gamma_spectrum(self, Egamma_input, radius_input=None, nH=1.0*u.cm**-3):
         """
         Compute the gamma ray spectrum.
@@ -194,6 +206,7 @@ class PPmodel(object):
         return spec * u.GeV**(-1) * u.cm**(-3) * u.s**(-1)
 
     #========== Compute the electron spectrum
+    @cluster_timing.timed('pp_kernel')
     def electron_spectrum(self, Ee_input, radius_input=None, nH=1.0*u.cm**-3):
         """
         Compute the electron spectrum.
@@ -212,9 +225,8 @@ class PPmodel(object):
         spec_gamma = self.gamma_spectrum(Ee_input, radius_input=radius_input, nH=nH) # Compute the gamma ray spectrum
 
         # Use Kelner2016 and assume the ratio remain the same
-        K06 = cluster_hadronic_emission_kelner2006.PPmodel(self.Jp,
-                                                           Epmin=self._Epmin*u.GeV, Epmax=self._Epmax*u.GeV,
-                                                           NptEpPd=self._NptEpPd)
+        K06 = self._K06
+        K06.Jp = self.Jp
         
         spec_gamma_kelner = K06.gamma_spectrum(Ee_input, radius_input=radius_input, nH=nH)
         spec_elec_kelner = K06.electron_spectrum(Ee_input, radius_input=radius_input, nH=nH)
@@ -228,6 +240,7 @@ class PPmodel(object):
         return spec
 
     #========== Compute the electron spectrum
+    @cluster_timing.timed('pp_kernel')
     def neutrino_spectrum(self, Enu_input, radius_input=None, nH=1.0*u.cm**-3, flavor='numu'):
         """
         Compute the neutrino spectrum.
@@ -246,9 +259,8 @@ class PPmodel(object):
         spec_gamma = self.gamma_spectrum(Enu_input, radius_input=radius_input, nH=nH) # Compute the gamma ray spectrum
 
         # Use Kelner2016 and assume the ratio remain the same
-        K06 = cluster_hadronic_emission_kelner2006.PPmodel(self.Jp,
-                                                           Epmin=self._Epmin*u.GeV, Epmax=self._Epmax*u.GeV,
-                                                           NptEpPd=self._NptEpPd)
+        K06 = self._K06
+        K06.Jp = self.Jp
         
         spec_gamma_kelner = K06.gamma_spectrum(Enu_input, radius_input=radius_input, nH=nH)
         spec_nu_kelner = K06.neutrino_spectrum(Enu_input, radius_input=radius_input, nH=nH, flavor=flavor)
@@ -445,14 +457,48 @@ class PPmodel(object):
         """
         
         Tp = Ep - self._m_p
+        grid = self._get_grid_cache(Tp)
 
-        diffsigma = self._Amax(Tp) * self._F(Tp, Egamma)
+        diffsigma = grid['Amax'] * self._F(Tp, Egamma)
 
         if self._nuclear_enhancement:
-            diffsigma *= self._nuclear_factor(Tp)
+            diffsigma *= grid['nuclear_factor']
 
         return diffsigma
 
+    #========== Cache of the Tp dependent terms
+    def _get_grid_cache(self, Tp):
+        """
+        Get the terms of the cross section which depend only on the proton
+        energy. They are computed once per proton energy grid and reused for
+        all the gamma ray energies.
+
+        Parameters
+        ----------
+        - Tp (GeV) : the proton kinetic energy
+        
+        Outputs
+        --------    
+        - grid (dict): the cached terms, sigma_inel, Amax, nuclear_factor, kappa and mu,
+        and the segmentation of F in Tp
+        """
+
+        key = Tp.tobytes()
+        if self._grid_cache is not None and self._grid_cache['key'] == key:
+            return self._grid_cache
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grid = {'key'           : key,
+                    'sigma_inel'    : self._sigma_inel(Tp),
+                    'Amax'          : self._Amax(Tp),
+                    'nuclear_factor': self._nuclear_factor(Tp) if self._nuclear_enhancement else None,
+                    'kappa'         : self._kappa(Tp),
+                    'mu'            : self._mu(Tp)}
+            grid['F_segments'] = self._F_segments(Tp, grid['kappa'], grid['mu'])
+        self._grid_cache = grid
+        
+        return grid
+
     #========== Amplitude max
     def _Amax(self, Tp):
         """
@@ -535,7 +581,7 @@ class PPmodel(object):
         
         s = 2 * m_p * (Tp + 2 * m_p)  # center of mass energy
         EpiCM = (s - 4 * m_p ** 2 + m_pi ** 2) / (2 * np.sqrt(s))
-        PpiCM = np.sqrt(EpiCM ** 2 - m_pi ** 2)
+        PpiCM = np.sqrt(np.maximum(EpiCM ** 2 - m_pi ** 2, 0)) # avoid rounding issues at threshold
         gCM = (Tp + 2 * m_p) / np.sqrt(s)
         betaCM = np.sqrt(1 - gCM ** -2)
         EpimaxLAB = gCM * (EpiCM + PpiCM * betaCM)
@@ -602,7 +648,7 @@ class PPmodel(object):
         gamma = np.sqrt(Mres ** 2 * (Mres ** 2 + Gres ** 2)) # Eq 4
         K = (np.sqrt(8) * Mres * Gres * gamma) / (np.pi * np.sqrt(Mres ** 2 + gamma)) # Eq 4
         fBW = m_p * K / (((np.sqrt(s) - m_p) ** 2 - Mres ** 2) ** 2 + Mres ** 2 * Gres ** 2) #Eq 4
-        mu = np.sqrt((s - m_pi ** 2 - 4 * m_p ** 2) ** 2 - 16 * m_pi ** 2 * m_p ** 2) / (2 * m_pi * np.sqrt(s)) # Eq 3
+        mu = np.sqrt(np.maximum((s - m_pi ** 2 - 4 * m_p ** 2) ** 2 - 16 * m_pi ** 2 * m_p ** 2, 0)) / (2 * m_pi * np.sqrt(s)) # Eq 3
         sigma0 = 7.66e-3  # mb
         sigma1pi = sigma0 * mu ** 1.95 * (1 + mu + mu ** 5) * fBW ** 1.86 # Eq 2 (mb)
 
@@ -637,7 +683,8 @@ class PPmodel(object):
         """
         Run the computing of the function F from eq 8, which describe the 
         shape of the spectrum. The function is given in eq 11. The model 
-        parameters depend on energy.
+        parameters depend on energy, through the regimes of Table V, which
+        are computed once per proton energy grid.
 
         Parameters
         ----------
@@ -649,52 +696,68 @@ class PPmodel(object):
         - F
         """
         
+        segments = self._get_grid_cache(Tp)['F_segments']
+
+        # F = 0 below Tth, where no segment is defined
         F = np.zeros_like(Tp)
-        # below Tth
-        F[np.where(Tp < self._Tth)] = 0.0
-
-        #----- Tth <= E <= 1GeV: Experimental data
-        idx = np.where((Tp >= self._Tth) * (Tp <= 1.0))
-        if idx[0].size > 0:
-            kappa = self._kappa(Tp[idx])                                        
-            mpar = self._F_mp["ExpData"]
-            mpar[2] = kappa
-            F[idx] = self._F_func(Tp[idx], Egamma, mpar)
-
-        #----- 1GeV < Tp < 4 GeV: Geant4 model 0
-        idx = np.where((Tp > 1.0) * (Tp <= 4.0))
-        if idx[0].size > 0:
-            mpar = self._F_mp["Geant4_0"]
-            mu = self._mu(Tp[idx])                                              
-            mpar[2] = mu + 2.45
-            mpar[3] = mu + 1.45
-            F[idx] = self._F_func(Tp[idx], Egamma, mpar)
-
-        #----- 4 GeV < Tp < 20 GeV
-        idx = np.where((Tp > 4.0) * (Tp <= 20.0))
-        if idx[0].size > 0:
-            mpar = self._F_mp["Geant4_1"]
-            mu = self._mu(Tp[idx])
-            mpar[2] = 1.5 * mu + 4.95
-            mpar[3] = mu + 1.50
-            F[idx] = self._F_func(Tp[idx], Egamma, mpar)
-
-        #----- 20 GeV < Tp < 100 GeV
-        idx = np.where((Tp > 20.0) * (Tp <= 100.0))
-        if idx[0].size > 0:
-            mpar = self._F_mp["Geant4_2"]
-            F[idx] = self._F_func(Tp[idx], Egamma, mpar)
-
-        #----- Tp > Etrans
-        idx = np.where(Tp > self._Etrans[self.hiEmodel])
-        if idx[0].size > 0:
-            mpar = self._F_mp[self.hiEmodel]
-            F[idx] = self._F_func(Tp[idx], Egamma, mpar)
+        for idx, mpar, Ygmax in segments:
+            F[idx] = self._F_func(Tp[idx], Egamma, mpar, Ygmax=Ygmax)
 
         return F
 
+    #========== Segmentation of F in Tp
+    def _F_segments(self, Tp, kappa, mu):
+        """
+        Split the proton kinetic energy into the regimes of Table V, and 
+        compute the model parameters of eq 11 which depend only on Tp. 
+        Contiguous regimes (i.e. sorted Tp) are indexed with slices.
+
+        Parameters
+        ----------
+        - Tp (GeV) : the proton kinetic energy
+        - kappa : the kappa function (eq 14) computed at Tp
+        - mu : the mu function (eq 15) computed at Tp
+
+        Outputs
+        -------
+        - segments (list): list of (index, model parameters, Ygmax) for each regime
+        """
+
+        Etrans = self._Etrans[self.hiEmodel]
+        
+        regimes = [((Tp >= self._Tth) * (Tp <= 1.0),   'ExpData'),      # Tth <= E <= 1GeV: Experimental data
+                   ((Tp > 1.0) * (Tp <= 4.0),          'Geant4_0'),     # 1GeV < Tp < 4 GeV: Geant4 model 0
+                   ((Tp > 4.0) * (Tp <= 20.0),         'Geant4_1'),     # 4 GeV < Tp < 20 GeV
+                   ((Tp > 20.0) * (Tp <= Etrans),      'Geant4_2'),     # 20 GeV < Tp < Etrans
+                   ((Tp > Etrans),                     self.hiEmodel)]  # Tp > Etrans
+
+        segments = []
+        for cond, name in regimes:
+            idx = np.where(cond)[0]
+            if idx.size == 0:
+                continue
+            if idx[-1] - idx[0] + 1 == idx.size:
+                idx = slice(idx[0], idx[-1] + 1)
+
+            lamb, alpha, beta, gamma = self._F_mp[name]
+            if name == 'ExpData':
+                beta = kappa[idx]
+            elif name == 'Geant4_0':
+                beta  = mu[idx] + 2.45
+                gamma = mu[idx] + 1.45
+            elif name == 'Geant4_1':
+                beta  = 1.5 * mu[idx] + 4.95
+                gamma = mu[idx] + 1.50
+
+            Egmax = self._calc_Egmax(Tp[idx])
+            Ygmax = Egmax + self._m_pi ** 2 / (4 * Egmax)
+
+            segments.append((idx, (lamb, alpha, beta, gamma), Ygmax))
+
+        return segments
+    
     #========= F function model
-    def _F_func(self, Tp, Egamma, modelparams):
+    def _F_func(self, Tp, Egamma, modelparams, Ygmax=None):
         """
         Compute the function F from eq 22.
 
@@ -703,6 +766,7 @@ class PPmodel(object):
         - Tp (GeV) : the proton kinetic energy
         - Egamma (GeV) : the gamma energy
         - modelparams: sub-function parameters which depend on energy range
+        - Ygmax : the Ygmax term of eq 9, computed from Tp if not given
 
         Outputs
         -------
@@ -712,13 +776,14 @@ class PPmodel(object):
         m_pi = self._m_pi
 
         #----- Eq 9
-        Egmax = self._calc_Egmax(Tp)
+        if Ygmax is None:
+            Egmax = self._calc_Egmax(Tp)
+            Ygmax = Egmax + m_pi ** 2 / (4 * Egmax)
         Yg = Egamma + m_pi ** 2 / (4 * Egamma)
-        Ygmax = Egmax + m_pi ** 2 / (4 * Egmax)
         Xg = (Yg - m_pi) / (Ygmax - m_pi)
         
         #----- zero out invalid fields (Egamma > Egmax -> Xg > 1)
-        Xg[np.where(Xg > 1)] = 1.0
+        Xg = np.minimum(Xg, 1.0)
 
         #----- Eq 11
         C = lamb * m_pi / Ygmax
@@ -17,6 +17,8 @@ import astropy.units as u
 from scipy.integrate import quad
 import scipy.integrate as integrate
 
+from ClusterModel.ClusterTools import cluster_timing
+
 #==================================================
 # Class
 #==================================================
@@ -40,6 +42,10 @@ class PPmodel(object):
     - _Etrans (float): the transition energy between delta approximation and Kelner 
     scaling (in GeV)
     - _norm (float): the normalization of the spectrum
+    - _Nmax_chunk (int): maximum number of elements of the (radius, energy, proton energy)
+    integrand computed at once
+    - _Jp_grid (tuple): the proton distribution evaluated on the shared proton energy grid,
+    together with the radius it was computed for
     Methods
     ----------  
     - gamma_spectrum(self, Egamma_input, limit='mixed'): compute the gamma ray spectrum
@@ -60,6 +66,8 @@ class PPmodel(object):
         self._Kpi = 0.17
         self._Etrans = 100.0
         self._norm = 1.0
+        self._Nmax_chunk = 4000000
+        self._Jp_grid = None
 
         self.Jp = Jp
         if Epmin is None:
@@ -243,132 +251,247 @@ class PPmodel(object):
 
         return F # unitless
     
-    #========== High energy gamma integrand of function
-    def _highE_integrand(self, x, Energy, case, radius=None):
+    #========== Shared proton energy grid
+    def _get_Ep_grid(self):
         """
-        Defines the integrand of eq 72 from Kelner et al. (2006).
+        Define the proton energy grid shared by all output energies. It covers
+        the range used by the Kelner scaling, [Epmin, Epmax], and that of the 
+        delta approximation, up to m_p + Epmax/Kpi. Epmax is part of the grid 
+        so that the high energy integrals are truncated exactly.
         
         Parameters
         ----------
-        - x = E_{gamma,electron,neutrino} / E_proton (unitless)
-        - Energy = Energy of the gamma ray or electron, or neutrino (GeV)
-        - case: which spectrum, 'gamma', 'electron', 'numu' or 'nue'
         
         Outputs
         --------
-        - The integrand in units of cm-1 Gev^-1
+        - Ep (array): the proton energy grid in GeV
         """
+
+        Epmax_delta = self._m_p + self._Epmax/self._Kpi
+        Npt = int(self._NptEpPd*(np.log10(Epmax_delta/self._Epmin)))
+        Ep = np.logspace(np.log10(self._Epmin), np.log10(Epmax_delta), Npt)
+        Ep = np.unique(np.append(Ep, self._Epmax))
         
-        try:
-            if case == 'gamma':
-                Ffunc =  self._Fgamma(x, Energy/x)
-            elif case == 'electron':
-                Ffunc =  self._Fe(x, Energy/x)
-            elif case == 'nue':
-                Ffunc = self._Fe(x, Energy/x)
-            elif case == 'numu':
-                Ffunc = self._Fnumu1(x, Energy/x) + self._Fe(x, Energy/x)
-            else:
-                raise ValueError("Only 'gamma', 'electron', 'numu' or 'nue' are available")
+        return Ep
 
+    #========== Proton distribution on the shared grid
+    def _get_Jp_grid(self, Ep, radius=None):
+        """
+        Evaluate the proton distribution on the shared proton energy grid. 
+        The result is kept so that the successive spectra computed with the 
+        same model and radius call Jp only once.
+        
+        Parameters
+        ----------
+        - Ep (array): the proton energy grid in GeV
+        - radius (array): the radius in kpc in case Jp is a 2d function
+        
+        Outputs
+        --------
+        - Jp (array): Jp[j_energy] or Jp[i_radius, j_energy] in GeV-1 cm-3
+        """
+
+        if radius is None:
+            key = (self.Jp, Ep.tobytes(), None)
+        else:
+            key = (self.Jp, Ep.tobytes(), radius.tobytes())
+
+        if self._Jp_grid is None or self._Jp_grid[0] != key:
             if radius is None:
-                Jpfunc = self.Jp(Energy/x)
+                Jp = self.Jp(Ep)
             else:
-                Jpfunc = self.Jp(radius, Energy/x)
-            
-            return (self._sigma_inel(Energy/x)* Jpfunc * Ffunc/x)
+                Jp = self.Jp(radius, Ep)
+            self._Jp_grid = (key, np.asarray(Jp, dtype=float))
             
-        except ZeroDivisionError:
-            return np.nan
-
-    #========== Compute the gamma spectrum for high E limit
-    def _calc_specpp_hiE(self, Energy, case, radius=None):
+        return self._Jp_grid[1]
+    
+    #========== High energy kernel
+    def _highE_kernel(self, Energy, Ep, case):
         """
-        Compute the spectrum folowing Kelner 2006, i.e. in the high energy regime.
+        Defines the kernel of eq 72 from Kelner et al. (2006), written as an 
+        integral over the proton energy, sigma(Ep) F(E/Ep, Ep) / Ep, for all 
+        the output energies at once.
         
         Parameters
         ----------
-        - Energy = the gamma ray or electron energy vector in GeV
+        - Energy = Energy of the gamma ray or electron, or neutrino (GeV)
+        - Ep = the proton energy grid (GeV)
         - case: which spectrum, 'gamma', 'electron', 'numu' or 'nue'
+        
         Outputs
         --------
-        - The normalized photon count in unit of GeV-1 cm-1
+        - The kernel[i_energy, j_proton] in units of cm2 GeV-1
         """
 
-        #specpp = quad(self._highE_integrand, 0.0, 1.0, args=(Energy, case), epsrel=1e-3,epsabs=0)[0]
+        if case not in ['gamma', 'electron', 'numu', 'nue']:
+            raise ValueError("Only 'gamma', 'electron', 'numu' or 'nue' are available")
 
-        xmin = Energy/self._Epmax
-        xmax = np.amin([Energy/self._Epmin, 1.0-1e-10])
+        x = Energy[:,np.newaxis] / Ep[np.newaxis,:]
+        valid = (x < 1.0-1e-10) * (Ep[np.newaxis,:] >= self._Epmin) * (Ep[np.newaxis,:] <= self._Epmax)
 
-        if xmin < xmax:
-            x = np.logspace(np.log10(xmin), np.log10(xmax), int(self._NptEpPd*(np.log10(xmax/xmin))))
-        
-            if radius is None:
-                specpp = self._trapz_loglog(self._highE_integrand(x, Energy, case), x)
-            else:
-                specpp = self._trapz_loglog(self._highE_integrand(x, Energy, case, radius), x, axis=1)
-        else:
-            if radius is None:
-                specpp = 0
-            else:
-                specpp = radius*0
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            if case == 'gamma':
+                Ffunc = self._Fgamma(x, Ep)
+            elif case == 'electron':
+                Ffunc = self._Fe(x, Ep)
+            elif case == 'nue':
+                Ffunc = self._Fe(x, Ep)
+            elif case == 'numu':
+                Ffunc = self._Fnumu1(x, Ep) + self._Fe(x, Ep)
+                
+            kernel = np.where(valid, self._sigma_inel(Ep) * Ffunc / Ep, 0.0)
 
-        return specpp
+        return kernel
     
-    #========== Integrand for low E limit
-    def _delta_integrand(self, Epi, radius=None):
+    #========== Compute the spectrum for high E limit
+    def _calc_specpp_hiE(self, Energy, case, Ep, Jp):
         """
-        Defines the integrand of eq 78 from Kelner et al. (2006) in the 
-        low energy limit following the delta approximation.
+        Compute the spectrum folowing Kelner 2006, i.e. in the high energy regime.
+        All energies are computed at once from the proton distribution sampled 
+        on the shared grid.
         
         Parameters
         ----------
-        - Epi = energy of pions (GeV)
-        
+        - Energy = the gamma ray or electron energy vector in GeV
+        - case: which spectrum, 'gamma', 'electron', 'numu' or 'nue'
+        - Ep = the proton energy grid (GeV)
+        - Jp = the proton distribution on the grid, as Jp[j_energy] or Jp[i_radius, j_energy]
+
         Outputs
         --------
-        - The integrand in units of Gev^-2 cm^-1
+        - The normalized photon count in unit of GeV-1 cm-1, as [i_energy] or [i_radius, i_energy]
         """
-        
-        Ep0 = self._m_p + Epi / self._Kpi
-        if radius is None:
-            func = self._sigma_inel(Ep0)* self.Jp(Ep0) / np.sqrt(Epi**2 - self._m_pi**2)
+
+        kernel = self._highE_kernel(Energy, Ep, case)
+
+        if Jp.ndim == 1:
+            specpp = self._trapz_loglog(kernel * Jp, Ep)
         else:
-            func = self._sigma_inel(Ep0)* self.Jp(radius, Ep0) / np.sqrt(Epi**2 - self._m_pi**2)
+            # Split the energies to bound the size of the (radius, energy, Ep) integrand
+            Nchunk = int(np.amax([1, self._Nmax_chunk // (Jp.shape[0]*len(Ep))]))
+            specpp = np.zeros((Jp.shape[0], len(Energy)))
+            for i in range(0, len(Energy), Nchunk):
+                integrand = Jp[:,np.newaxis,:] * kernel[np.newaxis,i:i+Nchunk,:]
+                specpp[:,i:i+Nchunk] = self._trapz_loglog(integrand, Ep, axis=-1)
 
-        return func
+        return specpp
         
     #========== Compute the spectrum with delta approximation
-    def _calc_specpp_loE(self, Energy, radius=None, ntilde=1):
+    def _calc_specpp_loE(self, Energy, Ep, Jp, ntilde=1):
         """
         Compute the spectrum in the low energy regime. The normalization
         here is not important because it is rescaled to the high energy
-        at E_lim afterwards.
+        at E_lim afterwards. The integral of eq 78 from Kelner et al. (2006)
+        is written over the proton energy, Ep = m_p + E_pi/Kpi, and computed
+        as a reverse cumulative integral on the shared grid. The fraction of 
+        the first bin above the lower bound is integrated as a local power law.
         
         Parameters
         ----------
         - Energy = the gamma ray or electron energy vector in GeV
-        - ntilde = a scaling normalization cose to one
+        - Ep = the proton energy grid (GeV)
+        - Jp = the proton distribution on the grid, as Jp[j_energy] or Jp[i_radius, j_energy]
+        - ntilde = a scaling normalization cose to one, or an array matching radius
         
         Outputs
         --------    
-        - The normalized photon count in GeV-1 cm-1
+        - The normalized photon count in GeV-1 cm-1, as [i_energy] or [i_radius, i_energy]
+        """
+        
+        #----- Integrand over the proton energy
+        Epi = self._Kpi * (Ep - self._m_p)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(Epi > self._m_pi,
+                              self._Kpi * self._sigma_inel(Ep) / np.sqrt(Epi**2 - self._m_pi**2), 0.0)
+        integrand = Jp * weight
+
+        #----- Reverse cumulative integral: cumul[...,k] = int_Ep[k]^Ep[-1]
+        intervals = self._trapz_loglog(integrand, Ep, axis=-1, intervals=True)
+        cumul = np.zeros(integrand.shape)
+        cumul[...,:-1] = np.cumsum(intervals[...,::-1], axis=-1)[...,::-1]
+
+        #----- Lower bound of each integral and first grid point above it
+        Epimin = Energy + self._m_pi**2 / (4 * Energy)
+        Eplow = self._m_p + Epimin / self._Kpi
+        k = np.searchsorted(Ep, Eplow)
+        kin = np.clip(k, 1, len(Ep)-1)
+
+        #----- Fraction of the bin [Eplow, Ep[k]], using the local slope of the bin, or the next one
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            slope = np.diff(np.log(integrand), axis=-1) / np.diff(np.log(Ep))
+            b = np.where(np.isfinite(slope[...,kin-1]), slope[...,kin-1], slope[...,np.clip(kin, 0, len(Ep)-2)])
+            ratio = Eplow / Ep[kin]
+            partial = integrand[...,kin] * Ep[kin] * np.where(np.abs(b + 1.0) > 1e-10,
+                                                              (1.0 - ratio**(b+1)) / (b + 1),
+                                                              -np.log(ratio))
+        partial[~np.isfinite(partial)] = 0.0
+        partial[...,(k == 0)] = 0.0
+        
+        result = cumul[...,np.clip(k, 0, len(Ep)-1)] + partial
+        result[...,(k >= len(Ep))] = 0.0
+
+        #----- Normalization
+        ntilde = np.asarray(ntilde)
+        if ntilde.ndim == 1:
+            ntilde = ntilde[:,np.newaxis]
+            
+        return 2*(ntilde/self._Kpi) * result # s-1 GeV-1
+
+    #========== Compute the spectrum on all energies at once
+    def _calc_specpp(self, Energy, case, radius=None, limit='mixed'):
         """
+        Compute the spectrum merging the low energy (delta approximation) and
+        the high energy (Kelner scaling) regimes. The proton distribution is 
+        evaluated only once, on the shared proton energy grid.
         
-        #Epimin = Energy + self._m_pi**2 / (4 * Energy)
-        #result = 2*(ntilde/self._Kpi) * quad(self._delta_integrand, Epimin, np.inf, epsrel=1e-3, epsabs=0)[0]
-        
-        Emin = Energy + self._m_pi**2 / (4 * Energy)
-        Emax = self._Epmax
-        NptPd = self._NptEpPd
-        E_arr = np.logspace(np.log10(Emin), np.log10(Emax), int(NptPd*(np.log10(Emax/Emin))))
+        Parameters
+        ----------
+        - Energy = the gamma ray, electron or neutrino energy vector in GeV
+        - case: which spectrum, 'gamma', 'electron', 'numu' or 'nue'
+        - radius = the radius in kpc in case Jp is a 2d function
+        - limit (str): use this keyword to chose only high energy or low energy limits
+        The keywords are: 'mixed', 'lowE', 'highE'
+
+        Outputs
+        --------    
+        - The normalized photon count in GeV-1 cm-1, as [i_energy] or [i_radius, i_energy]
+        """
         
+        if limit not in ['mixed', 'highE', 'lowE']:
+            raise ValueError("Only 'mixed', 'highE', or 'lowE' are available")
+
+        Ep = self._get_Ep_grid()
+        Jp = self._get_Jp_grid(Ep, radius=radius)
+
+        #----- Rescaling of the delta approximation at the transition energy
+        Etrans = np.array([self._Etrans])
+        full = self._calc_specpp_hiE(Etrans, case, Ep, Jp)[...,0]
+        delta = self._calc_specpp_loE(Etrans, Ep, Jp, ntilde=1.0)[...,0]
         if radius is None:
-            result = 2*(ntilde/self._Kpi) * self._trapz_loglog(self._delta_integrand(E_arr), E_arr)
+            if full != 0 and delta != 0:
+                nhat = (full / delta)
+            else:
+                nhat = 0.0
         else:
-            result = 2*(ntilde/self._Kpi) * self._trapz_loglog(self._delta_integrand(E_arr, radius), E_arr, axis=1)
-        
-        return result # s-1 GeV-1
+            w0 = (full == 0)*(delta == 0) # Search location of 0 density
+            delta[w0] = 1.0 # Avoid dividing by 0
+            nhat = (full / delta)
+
+        #----- Select the regime of each energy
+        if limit == 'mixed':
+            whiE = (Energy >= self._Etrans)
+        elif limit == 'highE':
+            whiE = np.ones(len(Energy), dtype=bool)
+        elif limit == 'lowE':
+            whiE = np.zeros(len(Energy), dtype=bool)
+
+        spec0 = np.zeros(Jp.shape[:-1]+(len(Energy),))
+        if np.sum(whiE) > 0:
+            spec0[...,whiE] = self._calc_specpp_hiE(Energy[whiE], case, Ep, Jp)
+        if np.sum(~whiE) > 0:
+            spec0[...,~whiE] = self._calc_specpp_loE(Energy[~whiE], Ep, Jp, ntilde=nhat)
+
+        return spec0
 
     #========== Compute integral in loglog
     def _trapz_loglog(self, y, x, axis=-1, intervals=False):
@@ -473,6 +596,7 @@ class PPmodel(object):
         return spec
 
     #========== Compute the spectrum
+    @cluster_timing.timed('pp_kernel')
     def gamma_spectrum(self, Egamma_input, radius_input=None, nH=1.0*u.cm**-3, limit='mixed'):
         """
         Compute the gamma ray spectrum merging low energy and high energy
@@ -493,37 +617,8 @@ class PPmodel(object):
 
         #---------- Case of no radius
         if radius_input is None:
-            full = self._calc_specpp_hiE(self._Etrans, 'gamma')
-            delta = self._calc_specpp_loE(self._Etrans, ntilde=1.0)
-            if full != 0 and delta != 0:
-                nhat = (full / delta)
-            else:
-                nhat = 0.0
-        
-            spec = np.zeros(len(Egamma))
             norm = const.c.to_value('cm/s') * nH.to_value('cm-3') * self._norm
-
-            #----- Standard case: mixed highE + lowE
-            if limit == 'mixed':
-                for i in range(len(Egamma)): 
-                    if Egamma[i] >= self._Etrans:
-                        spec[i] = norm*self._calc_specpp_hiE(Egamma[i], 'gamma')
-                    else:
-                        spec[i] = norm*self._calc_specpp_loE(Egamma[i], ntilde=nhat)
-
-            #----- highE only
-            elif limit == 'highE':
-                for i in range(len(Egamma)):
-                    spec[i] = norm*self._calc_specpp_hiE(Egamma[i], 'gamma')
-
-            #----- lowE only
-            elif limit == 'lowE':
-                for i in range(len(Egamma)):
-                    spec[i] = norm*self._calc_specpp_loE(Egamma[i], ntilde=nhat)
-
-            #----- Error otherwise
-            else:
-                raise ValueError("Only 'mixed', 'highE', or 'lowE' are available")
+            spec = norm*self._calc_specpp(Egamma, 'gamma', limit=limit)
 
         #---------- Case of radius
         else:
@@ -531,43 +626,15 @@ class PPmodel(object):
                 raise ValueError('nH should have the same size as radius_input')
             
             radius = radius_input.to_value('kpc')
-
-            full = self._calc_specpp_hiE(self._Etrans, 'gamma', radius=radius)
-            delta = self._calc_specpp_loE(self._Etrans, radius=radius, ntilde=1.0)
-            w0 = (full == 0)*(delta == 0) # Search location of 0 density
-            delta[w0] = 1.0 # Avoid dividing by 0
-            nhat = (full / delta)
-        
-            spec0 = np.zeros((len(radius), len(Egamma)))
-
-            #----- Standard case: mixed highE + lowE
-            if limit == 'mixed':
-                for i in range(len(Egamma)):
-                    if Egamma[i] >= self._Etrans:
-                        spec0[:,i] = self._calc_specpp_hiE(Egamma[i], 'gamma', radius=radius)
-                    else:
-                        spec0[:,i] = self._calc_specpp_loE(Egamma[i], radius=radius, ntilde=nhat)
-
-            #----- highE only
-            elif limit == 'highE':
-                for i in range(len(Egamma)):
-                    spec0[:,i] = self._calc_specpp_hiE(Egamma[i], 'gamma', radius=radius)
-
-            #----- lowE only
-            elif limit == 'lowE':
-                for i in range(len(Egamma)):
-                    spec0[:,i] = self._calc_specpp_loE(Egamma[i], radius=radius, ntilde=nhat)
-
-            #----- Error otherwise
-            else:
-                raise ValueError("Only 'mixed', 'highE', or 'lowE' are available")
-        
+            spec0 = self._calc_specpp(Egamma, 'gamma', radius=radius, limit=limit)
+            
             #----- Normalization
             spec = self._apply_normalization(Egamma, spec0, nH)
         
         return spec * u.GeV**(-1) * u.cm**(-3) * u.s**(-1)
     
     #========== Compute the spectrum
+    @cluster_timing.timed('pp_kernel')
     def electron_spectrum(self, Ee_input, radius_input=None, nH=1.0*u.cm**-3, limit='mixed'):
         """
         Compute the electron spectrum merging low energy and high energy
@@ -587,42 +654,15 @@ class PPmodel(object):
         if type(Ee) == float: Ee = np.array([Ee])
 
         Emin_elec = (const.m_e*const.c**2).to_value('GeV')
+        wok = (Ee >= Emin_elec)
         
         #---------- Case of no radius
         if radius_input is None:
-            full = self._calc_specpp_hiE(self._Etrans, 'electron')
-            delta = self._calc_specpp_loE(self._Etrans, ntilde=1.0)
-            if full != 0 and delta != 0:
-                nhat = (full / delta)
-            else:
-                nhat = 0.0
-                
-            spec = np.zeros(len(Ee))
             norm = const.c.to_value('cm/s') * nH.to_value('cm-3') * self._norm
-
-            #----- Standard case: mixed highE + lowE
-            if limit == 'mixed':
-                for i in range(len(Ee)):
-                    if Ee[i] >= Emin_elec:
-                        if Ee[i] >= self._Etrans:
-                            spec[i] = norm*self._calc_specpp_hiE(Ee[i], 'electron')
-                        else:
-                            spec[i] = norm*self._calc_specpp_loE(Ee[i], ntilde=nhat)
-
-            #----- highE only
-            elif limit == 'highE':
-                for i in range(len(Ee)):
-                    if Ee[i] >= Emin_elec:
-                        spec[i] = norm*self._calc_specpp_hiE(Ee[i], 'electron')
-
-            #----- lowE only
-            elif limit == 'lowE':
-                for i in range(len(Ee)):
-                    if Ee[i] >= Emin_elec:
-                        spec[i] = norm*self._calc_specpp_loE(Ee[i], ntilde=nhat)
-
-            #----- Error otherwise
-            else:
+            spec = np.zeros(len(Ee))
+            if np.sum(wok) > 0:
+                spec[wok] = norm*self._calc_specpp(Ee[wok], 'electron', limit=limit)
+            elif limit not in ['mixed', 'highE', 'lowE']:
                 raise ValueError("Only 'mixed', 'highE', or 'lowE' are available")
 
         #---------- Case of radius
@@ -631,38 +671,10 @@ class PPmodel(object):
                 raise ValueError('nH should have the same size as radius_input')
             
             radius = radius_input.to_value('kpc')
-
-            full = self._calc_specpp_hiE(self._Etrans, 'electron', radius=radius)
-            delta = self._calc_specpp_loE(self._Etrans, radius=radius, ntilde=1.0)
-            w0 = (full == 0)*(delta == 0) # Search location of 0 density
-            delta[w0] = 1.0 # Avoid dividing by 0
-            nhat = (full / delta)
-            
             spec0 = np.zeros((len(radius), len(Ee)))
-
-            #----- Standard case: mixed highE + lowE
-            if limit == 'mixed':
-                for i in range(len(Ee)):
-                    if Ee[i] >= Emin_elec:
-                        if Ee[i] >= self._Etrans:
-                            spec0[:,i] = self._calc_specpp_hiE(Ee[i], 'electron', radius=radius)
-                        else:
-                            spec0[:,i] = self._calc_specpp_loE(Ee[i], radius=radius, ntilde=nhat)
-
-            #----- highE only
-            elif limit == 'highE':
-                for i in range(len(Ee)):
-                    if Ee[i] >= Emin_elec:
-                        spec0[:,i] = self._calc_specpp_hiE(Ee[i], 'electron', radius=radius)
-
-            #----- lowE only
-            elif limit == 'lowE':
-                for i in range(len(Ee)):
-                    if Ee[i] >= Emin_elec:
-                        spec0[:,i] = self._calc_specpp_loE(Ee[i], radius=radius, ntilde=nhat)
-
-            #----- Error otherwise
-            else:
+            if np.sum(wok) > 0:
+                spec0[:,wok] = self._calc_specpp(Ee[wok], 'electron', radius=radius, limit=limit)
+            elif limit not in ['mixed', 'highE', 'lowE']:
                 raise ValueError("Only 'mixed', 'highE', or 'lowE' are available")
         
             #----- Normalization
@@ -672,6 +684,7 @@ class PPmodel(object):
 
 
     #========== Compute the spectrum
+    @cluster_timing.timed('pp_kernel')
     def neutrino_spectrum(self, Enu_input, radius_input=None, nH=1.0*u.cm**-3, limit='mixed', flavor='numu'):
         """
         Compute the neutrino spectrum merging low energy and high energy
@@ -693,37 +706,8 @@ class PPmodel(object):
                 
         #---------- Case of no radius
         if radius_input is None:
-            full = self._calc_specpp_hiE(self._Etrans, flavor)
-            delta = self._calc_specpp_loE(self._Etrans, ntilde=1.0)
-            if full != 0 and delta != 0:
-                nhat = (full / delta)
-            else:
-                nhat = 0.0
-                
-            spec = np.zeros(len(Enu))
             norm = const.c.to_value('cm/s') * nH.to_value('cm-3') * self._norm
-
-            #----- Standard case: mixed highE + lowE
-            if limit == 'mixed':
-                for i in range(len(Enu)):
-                    if Enu[i] >= self._Etrans:
-                        spec[i] = norm*self._calc_specpp_hiE(Enu[i], flavor)
-                    else:
-                        spec[i] = norm*self._calc_specpp_loE(Enu[i], ntilde=nhat)
-
-            #----- highE only
-            elif limit == 'highE':
-                for i in range(len(Enu)):
-                    spec[i] = norm*self._calc_specpp_hiE(Enu[i], flavor)
-
-            #----- lowE only
-            elif limit == 'lowE':
-                for i in range(len(Enu)):
-                    spec[i] = norm*self._calc_specpp_loE(Enu[i], ntilde=nhat)
-
-            #----- Error otherwise
-            else:
-                raise ValueError("Only 'mixed', 'highE', or 'lowE' are available")
+            spec = norm*self._calc_specpp(Enu, flavor, limit=limit)
 
         #---------- Case of radius
         else:
@@ -731,36 +715,7 @@ class PPmodel(object):
                 raise ValueError('nH should have the same size as radius_input')
             
             radius = radius_input.to_value('kpc')
-
-            full = self._calc_specpp_hiE(self._Etrans, flavor, radius=radius)
-            delta = self._calc_specpp_loE(self._Etrans, radius=radius, ntilde=1.0)
-            w0 = (full == 0)*(delta == 0) # Search location of 0 density
-            delta[w0] = 1.0 # Avoid dividing by 0
-            nhat = (full / delta)
-            
-            spec0 = np.zeros((len(radius), len(Enu)))
-
-            #----- Standard case: mixed highE + lowE
-            if limit == 'mixed':
-                for i in range(len(Enu)):
-                    if Enu[i] >= self._Etrans:
-                        spec0[:,i] = self._calc_specpp_hiE(Enu[i], flavor, radius=radius)
-                    else:
-                        spec0[:,i] = self._calc_specpp_loE(Enu[i], radius=radius, ntilde=nhat)
-
-            #----- highE only
-            elif limit == 'highE':
-                for i in range(len(Enu)):
-                    spec0[:,i] = self._calc_specpp_hiE(Enu[i], flavor, radius=radius)
-
-            #----- lowE only
-            elif limit == 'lowE':
-                for i in range(len(Enu)):
-                    spec0[:,i] = self._calc_specpp_loE(Enu[i], radius=radius, ntilde=nhat)
-
-            #----- Error otherwise
-            else:
-                raise ValueError("Only 'mixed', 'highE', or 'lowE' are available")
+            spec0 = self._calc_specpp(Enu, flavor, radius=radius, limit=limit)
         
             #----- Normalization
             spec = self._apply_normalization(Enu, spec0, nH)
@@ -0,0 +1,338 @@
+"""
+This script contains the serialization of the parameters of the model.
+The parameters are written as a versioned JSON record, the large arrays
+(e.g. tabulated User profiles) being stored in a companion .npz file.
+Quantities, sky coordinates, cosmologies and FITS headers are encoded
+with explicit types, so that the files do not depend on the pickle
+format of the installed astropy version. The parameters can be decoded
+partially, in which case only the requested ones are rebuilt (and only
+the arrays they need are read).
+The same record, i.e. the JSON text and the dictionary of arrays, can be
+used to transfer the parameters to workers in parallel runs.
+
+Example
+-------
+from ClusterModel.ClusterTools import cluster_param
+cluster_param.save('/path/parameters', par)
+par = cluster_param.load('/path/parameters.json', keys=['redshift', 'M500'])
+
+"""
+
+import os
+import json
+import numpy as np
+import astropy.units as u
+import astropy.cosmology
+from astropy.cosmology import units as cu
+from astropy.coordinates import SkyCoord
+from astropy.io import fits
+
+FORMAT  = 'ClusterModel parameters'
+VERSION = 1
+
+# Decoded cosmologies, which are immutable and usually shared by all the clusters of a catalog
+_cosmologies = {}
+
+# Migrations of the records: version -> function converting the encoded parameters of this
+# version to the next one (e.g. renamed parameters). Parameters added in a new version need
+# no migration: they are missing from older records and keep their default value when loaded.
+_MIGRATIONS = {}
+
+#==================================================
+# Encode
+#==================================================
+
+def encode(par, Nmax_inline=16):
+    """
+    Encode the parameters as a JSON text and a dictionary of arrays.
+
+    Parameters
+    ----------
+    - par (dict): the parameters, name -> value
+    - Nmax_inline (int): arrays with more elements than this are stored in
+    the dictionary of arrays instead of the JSON text
+
+    Outputs
+    ----------
+    - text (str): the JSON record
+    - arrays (dict): the large arrays, referenced in the record by their key
+    """
+
+    arrays = {}
+    record = {'format': FORMAT, 'version': VERSION,
+              'param': {key: _encode_value(value, key, arrays, Nmax_inline) for key, value in par.items()}}
+
+    return json.dumps(record, indent=1), arrays
+
+
+def _encode_value(value, path, arrays, Nmax_inline):
+    """
+    Encode a value as JSON compatible objects.
+
+    Parameters
+    ----------
+    - value: the value
+    - path (str): the location of the value in the parameters, used as key
+    of the large arrays
+    - arrays (dict): the large arrays, filled here
+    - Nmax_inline (int): the maximum number of elements of inline arrays
+
+    Outputs
+    ----------
+    - encoded: the encoded value
+    """
+
+    #---------- Basic types
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value)
+
+    #---------- Containers
+    if isinstance(value, dict):
+        if not all([isinstance(k, str) for k in value.keys()]):
+            raise TypeError('Only dictionaries with string keys can be saved ('+path+').')
+        return {'__type__': 'dict',
+                'items': {k: _encode_value(v, path+'.'+k, arrays, Nmax_inline) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'__type__': type(value).__name__,
+                'items': [_encode_value(v, path+'.'+str(i), arrays, Nmax_inline) for i, v in enumerate(value)]}
+
+    #---------- Astropy objects
+    if isinstance(value, SkyCoord):
+        sph = value.spherical
+        return {'__type__': 'skycoord', 'frame': value.frame.name,
+                'lon': _encode_value(sph.lon.to('deg'), path+'.lon', arrays, Nmax_inline),
+                'lat': _encode_value(sph.lat.to('deg'), path+'.lat', arrays, Nmax_inline)}
+    if isinstance(value, astropy.cosmology.Cosmology):
+        mapping = value.to_format('mapping', cosmology_as_str=True)
+        return {'__type__': 'cosmology',
+                'mapping': _encode_value(dict(mapping), path, arrays, Nmax_inline)}
+    if isinstance(value, fits.Header):
+        return {'__type__': 'header', 'value': value.tostring()}
+    if isinstance(value, u.Quantity):
+        encoded = _encode_array(value.value, path, arrays, Nmax_inline)
+        encoded['__type__'] = 'quantity'
+        encoded['unit'] = value.unit.to_string()
+        return encoded
+    if isinstance(value, np.ndarray):
+        return _encode_array(value, path, arrays, Nmax_inline)
+    if isinstance(value, np.dtype):
+        return {'__type__': 'dtype', 'value': value.str}
+
+    raise TypeError('The parameter '+path+' of type '+str(type(value))+' cannot be saved.')
+
+
+def _encode_array(value, path, arrays, Nmax_inline):
+    """
+    Encode an array, inline or as a reference to the dictionary of arrays.
+
+    Parameters
+    ----------
+    - value (np.ndarray): the array
+    - path (str): the key of the array if it is large
+    - arrays (dict): the large arrays, filled here
+    - Nmax_inline (int): the maximum number of elements of inline arrays
+
+    Outputs
+    ----------
+    - encoded (dict): the encoded array
+    """
+
+    value = np.asarray(value)
+    if value.size > Nmax_inline:
+        arrays[path] = value
+        return {'__type__': 'array', 'ref': path}
+
+    return {'__type__': 'array', 'dtype': value.dtype.str, 'value': value.tolist()}
+
+
+#==================================================
+# Decode
+#==================================================
+
+def decode(text, arrays=None, keys=None):
+    """
+    Decode the parameters from the JSON text and the dictionary of arrays.
+
+    Parameters
+    ----------
+    - text (str or dict): the JSON record, as text or already parsed
+    - arrays (dict like): the large arrays (e.g. a numpy NpzFile), read only
+    when needed
+    - keys (list): the name of the parameters to decode (default is all)
+
+    Outputs
+    ----------
+    - par (dict): the parameters, name -> value
+    """
+
+    record = json.loads(text) if isinstance(text, str) else text
+
+    if record.get('format') != FORMAT:
+        raise ValueError('The record is not a ClusterModel parameter record.')
+    param = _migrate(record['param'], record.get('version', 0))
+
+    if keys is None:
+        keys = list(param.keys())
+    missing = [key for key in keys if key not in param]
+    if len(missing) > 0:
+        raise ValueError('The parameters '+str(missing)+' are not in the record.')
+
+    with u.add_enabled_units(cu):
+        return {key: _decode_value(param[key], arrays) for key in keys}
+
+
+def _migrate(param, version):
+    """
+    Convert the encoded parameters of a record to the current version.
+
+    Parameters
+    ----------
+    - param (dict): the encoded parameters
+    - version (int): the version of the record
+
+    Outputs
+    ----------
+    - param (dict): the encoded parameters, in the current version
+    """
+
+    if version > VERSION:
+        raise ValueError('The parameter record version '+str(version)+
+                         ' is more recent than the supported one ('+str(VERSION)+').')
+
+    while version < VERSION:
+        if version not in _MIGRATIONS:
+            raise ValueError('The parameter record version '+str(version)+' cannot be converted.')
+        param = _MIGRATIONS[version](dict(param))
+        version += 1
+
+    return param
+
+
+def _decode_value(value, arrays):
+    """
+    Decode a value encoded by _encode_value.
+
+    Parameters
+    ----------
+    - value: the encoded value
+    - arrays (dict like): the large arrays
+
+    Outputs
+    ----------
+    - decoded: the value
+    """
+
+    if not isinstance(value, dict):
+        return value
+
+    kind = value['__type__']
+    if kind == 'dict':
+        return {k: _decode_value(v, arrays) for k, v in value['items'].items()}
+    if kind == 'list':
+        return [_decode_value(v, arrays) for v in value['items']]
+    if kind == 'tuple':
+        return tuple([_decode_value(v, arrays) for v in value['items']])
+    if kind == 'skycoord':
+        return SkyCoord(_decode_value(value['lon'], arrays), _decode_value(value['lat'], arrays),
+                        frame=value['frame'])
+    if kind == 'cosmology':
+        key = json.dumps(value['mapping'], sort_keys=True)
+        if key not in _cosmologies:
+            mapping = _decode_value(value['mapping'], arrays)
+            _cosmologies[key] = astropy.cosmology.Cosmology.from_format(mapping, format='mapping')
+        return _cosmologies[key]
+    if kind == 'header':
+        return fits.Header.fromstring(value['value'])
+    if kind == 'dtype':
+        return np.dtype(value['value'])
+    if kind == 'array':
+        return _decode_array(value, arrays)
+    if kind == 'quantity':
+        return _decode_array(value, arrays) * u.Unit(value['unit'])
+
+    raise ValueError('Unknown parameter type '+str(kind)+'.')
+
+
+def _decode_array(value, arrays):
+    """
+    Decode an array encoded by _encode_array.
+
+    Parameters
+    ----------
+    - value (dict): the encoded array
+    - arrays (dict like): the large arrays
+
+    Outputs
+    ----------
+    - array (np.ndarray): the array
+    """
+
+    if 'ref' in value:
+        if arrays is None:
+            raise ValueError('The array '+value['ref']+' is not available.')
+        return np.array(arrays[value['ref']])
+
+    return np.array(value['value'], dtype=value['dtype'])
+
+
+#==================================================
+# Files
+#==================================================
+
+def save(filename, par, Nmax_inline=16):
+    """
+    Save the parameters in filename.json, and the large arrays, if any,
+    in filename.npz.
+
+    Parameters
+    ----------
+    - filename (str): the full path to the files, without extension
+    - par (dict): the parameters, name -> value
+    - Nmax_inline (int): the maximum number of elements of arrays saved
+    in the JSON file
+
+    Outputs
+    ----------
+    Files are saved
+    """
+
+    text, arrays = encode(par, Nmax_inline=Nmax_inline)
+
+    with open(filename+'.json', 'w') as jfile:
+        jfile.write(text)
+
+    if len(arrays) > 0:
+        np.savez_compressed(filename+'.npz', **arrays)
+    elif os.path.exists(filename+'.npz'):
+        os.remove(filename+'.npz')
+
+
+def load(filename, keys=None):
+    """
+    Load the parameters saved with save.
+
+    Parameters
+    ----------
+    - filename (str): the full path to the JSON file
+    - keys (list): the name of the parameters to load (default is all)
+
+    Outputs
+    ----------
+    - par (dict): the parameters, name -> value
+    """
+
+    with open(filename, 'r') as jfile:
+        record = json.load(jfile)
+
+    npzfile = os.path.splitext(filename)[0]+'.npz'
+    if not os.path.exists(npzfile):
+        return decode(record, keys=keys)
+
+    with np.load(npzfile, allow_pickle=False) as arrays:
+        return decode(record, arrays=arrays, keys=keys)
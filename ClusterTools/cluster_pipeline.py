@@ -0,0 +1,360 @@
+"""
+This script contains the tools used to compute many products of the
+model in a single pass (e.g. all the profiles, spectra and maps). The
+products are the nodes of a dependency graph, each computed once, and
+the independent ones can run concurrently. During the run, the
+intermediate grids needed by several products (e.g. the CRe steady
+state used by the IC, the synchrotron and the CRe density) are kept
+in a shared store so that they are computed only once.
+
+Example
+-------
+from ClusterModel.ClusterTools import cluster_pipeline
+graph = cluster_pipeline.ProductGraph()
+graph.add('engine', build_engine)
+graph.add('spectrum', lambda engine: engine.spectrum(energy), deps=['engine'])
+results = graph.run(['spectrum'], Nthread=4)
+
+"""
+
+import threading
+import functools
+import contextlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+#==================================================
+# Shared intermediate grids
+#==================================================
+
+class SharedGrids(object):
+    """
+    Store of the intermediate grids computed during a product run. Each
+    grid is computed once per key, even if several threads request it at
+    the same time: the other threads wait for the result. The grids are
+    returned as read-only arrays, since they are shared.
+
+    Attributes
+    ----------
+    - hits (int): the number of requests served from the store
+    - misses (int): the number of grids computed
+
+    """
+
+    def __init__(self):
+        self._store   = {}   # key -> grid
+        self._pending = {}   # key -> event set when the grid is available
+        self._locks   = {}   # name -> lock on a shared resource
+        self._lock    = threading.Lock()
+        self.hits     = 0
+        self.misses   = 0
+
+    def get(self, key, compute):
+        """
+        Get a grid from the store, computing it if needed.
+
+        Parameters
+        ----------
+        - key (hashable): the key of the grid, which should include all what
+        the grid depends on (e.g. the energy and radius grids as bytes)
+        - compute (function): function without arguments returning the grid
+
+        Outputs
+        ----------
+        - grid: the grid
+        """
+
+        with self._lock:
+            if key in self._store:
+                self.hits += 1
+                return self._store[key]
+            event = self._pending.get(key)
+            owner = event is None
+            if owner:
+                event = threading.Event()
+                self._pending[key] = event
+                self.misses += 1
+
+        # Another thread is computing it: wait and retry (e.g. if it failed)
+        if not owner:
+            event.wait()
+            return self.get(key, compute)
+
+        try:
+            grid = compute()
+            _set_readonly(grid)
+            with self._lock:
+                self._store[key] = grid
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+        return grid
+
+    def lock(self, name):
+        """
+        Get the lock protecting a resource whose state is modified when
+        used (e.g. the pp interaction model), so that it is used by a
+        single thread at a time.
+
+        Parameters
+        ----------
+        - name (str): the name of the resource
+
+        Outputs
+        ----------
+        - lock (threading.RLock): the lock
+        """
+
+        with self._lock:
+            return self._locks.setdefault(name, threading.RLock())
+
+    def clear(self):
+        """
+        Remove all the grids from the store.
+
+        Parameters
+        ----------
+
+        Outputs
+        ----------
+        None
+        """
+
+        with self._lock:
+            self._store.clear()
+
+
+def _set_readonly(grid):
+    """
+    Set an array, or the arrays of a tuple/list, read-only.
+
+    Parameters
+    ----------
+    - grid: array, quantity, or tuple/list of them
+
+    Outputs
+    ----------
+    None
+    """
+
+    if isinstance(grid, (tuple, list)):
+        for g in grid:
+            _set_readonly(g)
+    elif hasattr(grid, 'flags'):
+        grid.flags.writeable = False
+
+
+def _grid_key(name, args, kwargs):
+    """
+    Build the key of a grid from the arguments of the function computing it.
+    Arrays and quantities enter via their unit, shape and bytes.
+
+    Parameters
+    ----------
+    - name (str): the name of the grid
+    - args (tuple): the positional arguments
+    - kwargs (dict): the keyword arguments
+
+    Outputs
+    ----------
+    - key (tuple): the key, or None if an argument cannot be used in a key
+    """
+
+    key = [name]
+    items = [(None, value) for value in args] + [(k, kwargs[k]) for k in sorted(kwargs.keys())]
+    for keyword, value in items:
+        if isinstance(value, np.ndarray):
+            value = (str(getattr(value, 'unit', '')), value.dtype.str, value.shape, np.asarray(value).tobytes())
+        else:
+            try:
+                hash(value)
+            except TypeError:
+                return None
+        key.append((keyword, value))
+
+    return tuple(key)
+
+
+def shared(name):
+    """
+    Method decorator used for the intermediate grids of the model (e.g.
+    the CRe steady state). Within a product run, i.e. when the object holds
+    a SharedGrids store in its _shared_grids attribute, the grid is computed
+    once per set of arguments and then taken from the store. Otherwise, the
+    method is simply called.
+
+    Parameters
+    ----------
+    - name (str): the name of the grid in the store
+
+    Outputs
+    ----------
+    - decorator (function): the decorator
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            store = getattr(self, '_shared_grids', None)
+            if store is None:
+                return func(self, *args, **kwargs)
+            key = _grid_key(name, args, kwargs)
+            if key is None:
+                return func(self, *args, **kwargs)
+            return store.get(key, lambda: func(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def shared_lock(obj, name):
+    """
+    Get the lock of a resource of an object (e.g. the pp interaction model
+    of a cluster) for the current product run, or a context doing nothing
+    outside a run.
+
+    Parameters
+    ----------
+    - obj: the object holding the store of the run in its _shared_grids attribute
+    - name (str): the name of the resource
+
+    Outputs
+    ----------
+    - lock: context manager
+    """
+
+    store = getattr(obj, '_shared_grids', None)
+    if store is None:
+        return contextlib.nullcontext()
+
+    return store.lock(name)
+
+
+#==================================================
+# Product graph
+#==================================================
+
+class ProductGraph(object):
+    """
+    Dependency graph (DAG) of products. Each node is a function whose
+    arguments are the results of the nodes it depends on.
+
+    Methods
+    ----------
+    - add(name, func, deps=[]): add a node
+    - run(targets=None, Nthread=1): compute the targets and their dependencies
+
+    """
+
+    def __init__(self):
+        self._nodes = {}   # name -> (func, deps)
+
+    def add(self, name, func, deps=[]):
+        """
+        Add a node to the graph.
+
+        Parameters
+        ----------
+        - name (str): the name of the node
+        - func (function): the function computing the node, called with the
+        results of the dependencies as arguments, in the same order
+        - deps (list): the name of the nodes it depends on
+
+        Outputs
+        ----------
+        None
+        """
+
+        if name in self._nodes:
+            raise ValueError('The node '+name+' is already defined.')
+        self._nodes[name] = (func, list(deps))
+
+    def __contains__(self, name):
+        return name in self._nodes
+
+    def order(self, targets=None):
+        """
+        Get the nodes needed to compute the targets, sorted such that each
+        node comes after its dependencies.
+
+        Parameters
+        ----------
+        - targets (list): the name of the nodes to compute (default is all)
+
+        Outputs
+        ----------
+        - order (list): the sorted name of the nodes
+        """
+
+        if targets is None:
+            targets = list(self._nodes.keys())
+
+        order = []
+        state = {}   # name -> 'visiting' or 'done'
+
+        def visit(name, parent):
+            if name not in self._nodes:
+                raise ValueError('The node '+name+(' required by '+parent if parent else '')+' is not defined.')
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError('The product graph has a cycle through '+name+'.')
+            state[name] = 'visiting'
+            for dep in self._nodes[name][1]:
+                visit(dep, name)
+            state[name] = 'done'
+            order.append(name)
+
+        for name in targets:
+            visit(name, None)
+
+        return order
+
+    def run(self, targets=None, Nthread=1):
+        """
+        Compute the targets and their dependencies. Each node is computed
+        once. With several threads, each node starts as soon as its
+        dependencies are available.
+
+        Parameters
+        ----------
+        - targets (list): the name of the nodes to compute (default is all)
+        - Nthread (int): the number of threads
+
+        Outputs
+        ----------
+        - results (dict): node name -> result, for the targets and their
+        dependencies
+        """
+
+        order = self.order(targets)
+        results = {}
+
+        #---------- Serial
+        if Nthread <= 1:
+            for name in order:
+                func, deps = self._nodes[name]
+                results[name] = func(*[results[d] for d in deps])
+            return results
+
+        #---------- Concurrent
+        remaining = list(order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=Nthread) as pool:
+            while len(remaining) > 0 or len(running) > 0:
+                # Start the nodes which are ready
+                for name in list(remaining):
+                    func, deps = self._nodes[name]
+                    if all([d in results for d in deps]):
+                        running[pool.submit(func, *[results[d] for d in deps])] = name
+                        remaining.remove(name)
+
+                # Collect the nodes done
+                done, not_done = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        return results
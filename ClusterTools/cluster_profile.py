@@ -3,14 +3,21 @@ This script gather several functions which are related to the profile
 of galaxy clusters.
 """
 
+import os
+import tempfile
+import itertools
 import numpy as np
+import astropy.units as u
 from scipy.special import gamma
+from scipy.special import hyp2f1
 import scipy.integrate as integrate
 import scipy.interpolate as interpolate
 import matplotlib.pyplot as plt
 
 from ClusterModel.ClusterTools import map_tools
 
+_table_cache_dir = None  # directory of the disk cache of the tabulated projections, None for no disk cache
+
 #===================================================
 #========== Beta model
 #===================================================
@@ -340,6 +347,75 @@ def get_volume_beta_model(Rmax_kpc, n0, r_c, beta):
     
     return output
     
+#===================================================
+#========== Analytic volume integral of beta model
+#===================================================
+def get_volume_beta_model_analytic(Rmin_kpc, Rmax_kpc, n0, r_c, beta):
+    """
+    Compute the volume integrated beta model between Rmin and Rmax,
+    using the hypergeometric function:
+    \int_0^R 4pi r^2 n(r) dr = 4pi n0 R^3/3 2F1(3beta/2, 3/2; 5/2; -(R/r_c)^2)
+
+    Parameters
+    ----------
+    - Rmin_kpc (kpc): radius at which to start integration
+    - Rmax_kpc (kpc): radius at which to stop integration
+    - n0  : normalization
+    - r_c : core radius parameter
+    - beta : slope of the profile
+
+    Outputs
+    --------
+    - The integrated profile in units of kpc^3 times the original profile
+
+    """
+
+    def primitive(R):
+        return R**3/3.0 * hyp2f1(3.0*beta/2.0, 1.5, 2.5, -(R/r_c)**2)
+
+    output = 4.0*np.pi * n0 * (primitive(Rmax_kpc) - primitive(Rmin_kpc))
+    
+    return output
+
+#===================================================
+#========== Analytic volume integral of gNFW model
+#===================================================
+def get_volume_gNFW_model_analytic(Rmin_kpc, Rmax_kpc, P0, r_p, slope_a=1.33, slope_b=4.13, slope_c=0.31):
+    """
+    Compute the volume integrated gNFW model between Rmin and Rmax,
+    using the hypergeometric function, with x = R/r_p and m = 3-c:
+    \int_0^R 4pi r^2 P(r) dr = 4pi P0 r_p^3 x^m/m 2F1((b-c)/a, m/a; 1+m/a; -x^a)
+    This requires c < 3.
+
+    Parameters
+    ----------
+    - Rmin_kpc (kpc): radius at which to start integration
+    - Rmax_kpc (kpc): radius at which to stop integration
+    - P0 : normalization
+    - r_p (kpc): characteristic radius parameter
+    - sope_a : intermediate slope parameter
+    - sope_b : outer slope parameter
+    - sope_c : inner slope parameter
+
+    Outputs
+    --------
+    - The integrated profile in units of kpc^3 times the original profile
+
+    """
+
+    if slope_c >= 3:
+        raise ValueError("The volume integral of the gNFW model diverges at r=0 for slope_c >= 3")
+    
+    m = 3.0 - slope_c
+    
+    def primitive(R):
+        x = R / r_p
+        return x**m/m * hyp2f1((slope_b-slope_c)/slope_a, m/slope_a, 1+m/slope_a, -x**slope_a)
+
+    output = 4.0*np.pi * P0 * r_p**3 * (primitive(Rmax_kpc) - primitive(Rmin_kpc))
+    
+    return output
+    
 #===================================================
 #========== Volume any profile
 #===================================================
@@ -490,6 +566,147 @@ def define_safe_radius_array(r_in, Rmin=1.0, Rmax=None, Nptmin=1000):
     
     return r_out
 
+#===================================================
+#========== Power law integral of sampled intervals
+#===================================================
+def loglog_segments(x1, x2, y1, y2):
+    """
+    Integrate y(x) on the intervals [x1, x2] assuming a power law between
+    the end points, as in the log-log trapezoidal rule. Intervals where y
+    vanishes at one end are set to 0.
+
+    Parameters
+    ----------
+    - x1, x2 (np.ndarray): the interval bounds, broadcastable with y
+    - y1, y2 (np.ndarray): the function at x1 and x2
+
+    Outputs
+    --------
+    - seg (np.ndarray): the integral on each interval
+    """
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        b = np.log(y2/y1) / np.log(x2/x1)
+        seg = np.where(np.abs(b + 1.0) > 1e-10,
+                       y1 * (x2 * (x2/x1)**b - x1) / (b + 1),
+                       x1 * y1 * np.log(x2/x1))
+    seg = np.where((y1 == 0) + (y2 == 0), 0.0, seg)
+
+    return seg
+
+#===================================================
+#========== Adaptive integration in log-log space
+#===================================================
+def adaptive_loglog_integral(func, xmin, xmax, rtol=1e-4, breakpoints=None,
+                             NptPd=4, Nmax=2048, axis=0, xout=None):
+    """
+    Integrate a function between xmin and xmax with the log-log trapezoidal
+    rule, refining the grid only where the local power law approximation
+    fails. Each interval is split in two (in log) and kept if the two
+    estimates agree within its share, in log width, of the requested
+    relative tolerance on the total. The intervals with a zero end point 
+    (e.g. at a threshold or a truncation), on which the log-log rule vanishes, 
+    are checked with the linear rule and share the tolerance, so that they 
+    shrink around the break. All the new points of an iteration are evaluated 
+    in a single call of func, which is meant to be vectorized. This is 
+    efficient close to breaks (e.g. truncation radius, pion threshold, 
+    cutoffs), where fixed grids need dense sampling everywhere.
+
+    Parameters
+    ----------
+    - func (function): the function to integrate, called as func(x) with x a 1d 
+    array, and returning an array whose axis 'axis' matches x
+    - xmin, xmax (float): the integration bounds (> 0)
+    - rtol (float): the requested relative tolerance, for each element of the output
+    - breakpoints (list): points where the function may break, included in the grid
+    - NptPd (int): the number of points per decade of the starting grid
+    - Nmax (int): the maximum number of points, above which refinement stops
+    - axis (int): the axis of the function output which corresponds to x
+    - xout (np.ndarray): if given, the integrals from xmin to each xout (in 
+    [xmin, xmax]) are returned, the tolerance being relative to each of them
+
+    Outputs
+    --------
+    - integral (np.ndarray): the integral, with the axis 'axis' removed, or 
+    replaced by xout if given
+    - x (np.ndarray): the final grid
+    """
+
+    def evaluate(x):
+        return np.moveaxis(np.asarray(func(x), dtype=float), axis, 0)
+
+    def expand(v, ndim):
+        return v.reshape((len(v),) + (1,)*(ndim-1))
+
+    def segments(x, y):
+        return loglog_segments(expand(x[:-1], y.ndim), expand(x[1:], y.ndim), y[:-1], y[1:])
+
+    # Starting grid, including the breakpoints
+    x = np.logspace(np.log10(xmin), np.log10(xmax), np.amax([int(NptPd*np.log10(xmax/xmin)), 1]) + 1)
+    if breakpoints is not None:
+        brk = np.array(breakpoints, dtype=float).flatten()
+        x = np.unique(np.append(x, brk[(brk > xmin) * (brk < xmax)]))
+    y = evaluate(x)
+    active = np.ones(len(x)-1, dtype=bool)
+    Ltot = np.log(xmax/xmin)
+
+    # Refine the intervals which do not pass the tolerance
+    while np.sum(active) > 0:
+        if len(x) + np.sum(active) > Nmax:
+            print('!!! WARNING: the adaptive integration reached Nmax = '+str(Nmax)+
+                  ' points before the tolerance rtol = '+str(rtol))
+            break
+        
+        idx = np.where(active)[0]
+        x1, x2 = expand(x[idx], y.ndim), expand(x[idx+1], y.ndim)
+        xm = np.sqrt(x[idx]*x[idx+1])
+        ym = evaluate(xm)
+
+        coarse = loglog_segments(x1, x2, y[idx], y[idx+1])
+        fine = (loglog_segments(x1, expand(xm, y.ndim), y[idx], ym) +
+                loglog_segments(expand(xm, y.ndim), x2, ym, y[idx+1]))
+        diff = np.abs(fine - coarse)
+        zero = (y[idx] == 0) != (y[idx+1] == 0)
+        diff = np.where(zero, np.maximum(diff, np.abs(y[idx] + y[idx+1]) * (x2 - x1) / 2.0), diff)
+        
+        x = np.insert(x, idx+1, xm)
+        y = np.insert(y, idx+1, ym, axis=0)
+        seg = segments(x, y)
+        pos = idx + np.arange(len(idx)) # position of the first half of each tested interval
+
+        # Error budget of each interval, proportional to its log width, and shared by the zero end point intervals
+        if xout is None:
+            scale = rtol * np.abs(np.sum(seg, axis=0))
+        else:
+            scale = rtol * np.abs(np.cumsum(seg, axis=0)[pos+1])
+        budget = scale * expand(np.log(x2.flatten()/x1.flatten()) / Ltot, y.ndim)
+        Nzero = np.amax([np.sum((y[:-1] == 0) != (y[1:] == 0), axis=0), np.ones(y.shape[1:])], axis=0)
+        budget = np.where(zero, scale / Nzero, budget)
+        failed = diff > budget
+        if y.ndim > 1:
+            failed = np.any(failed.reshape(len(idx), -1), axis=1)
+
+        # The two halves of the failed intervals are tested at the next iteration
+        active = np.zeros(len(x)-1, dtype=bool)
+        active[pos[failed]] = True
+        active[pos[failed]+1] = True
+
+    seg = segments(x, y)
+    if xout is None:
+        return np.sum(seg, axis=0), x
+
+    # Cumulative integral at xout, the last interval being integrated with its power law
+    cumul = np.concatenate([np.zeros((1,)+y.shape[1:]), np.cumsum(seg, axis=0)])
+    xout = np.array(xout, dtype=float).flatten()
+    k = np.clip(np.searchsorted(x, xout, side='right') - 1, 0, len(x)-2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        b = np.log(y[k+1]/y[k]) / expand(np.log(x[k+1]/x[k]), y.ndim)
+        yout = y[k] * expand(xout/x[k], y.ndim)**b
+    yout = np.where((y[k] == 0) + (y[k+1] == 0), 0.0, yout)
+    integral = cumul[k] + loglog_segments(expand(x[k], y.ndim), expand(xout, y.ndim), y[k], yout)
+
+    return np.moveaxis(integral, 0, axis), x
+
 #===================================================
 #========== Main function
 #===================================================
@@ -553,3 +770,631 @@ if __name__ == "__main__":
 
     plt.show()
 
+
+#===================================================
+#========== Log-log tabulated function
+#===================================================
+class LogLogSpline(object):
+    """ LogLogSpline class
+    This class interpolates a tabulated positive function in log-log space 
+    using a monotone (PCHIP) cubic spline, so that no spurious oscillation 
+    appears between the tabulated points. Outside the tabulated range, the 
+    function is extrapolated as a power law using the slope of the first 
+    (last) two points. The cumulative integral int x^power f(x) dx is 
+    computed once on a refined grid, each sub-interval being integrated 
+    exactly as a power law, so that integrals are obtained by a lookup.
+
+    Attributes
+    ----------
+    - x (np.ndarray): the tabulated abscissa, strictly increasing and > 0
+    - y (np.ndarray): the tabulated function, > 0
+    - power (float): the power of x in the cumulative integral
+    - _spline (PchipInterpolator): the spline of ln y versus ln x
+    - _dspline (PPoly): the derivative of the spline, i.e. the logarithmic slope
+    - _slope_lo, _slope_hi (float): the power law slopes used for extrapolation
+    - _t, _g, _k, _cumul (np.ndarray): the refined grid in ln x, the integrand 
+    x^(power+1) f(x) on it, its logarithmic slope and the cumulative integral
+
+    Methods
+    ----------
+    - __call__(x): interpolate the function
+    - logslope(x): logarithmic slope dln f / dln x
+    - integral(x1, x2): compute int_x1^x2 x^power f(x) dx
+    """
+
+    __slots__ = ('x', 'y', 'power', '_spline', '_dspline', '_slope_lo', '_slope_hi',
+                 '_t', '_g', '_k', '_cumul')
+    
+    #========== Init
+    def __init__(self, x, y, power=0.0, Nsub=16):
+
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.power = power
+
+        if self.x.ndim != 1 or len(self.x) < 2 or self.x.shape != self.y.shape:
+            raise ValueError("The tabulated function should be given as two 1d arrays of same length (>= 2)")
+        if np.any(self.x <= 0) or np.any(np.diff(self.x) <= 0):
+            raise ValueError("The tabulated abscissa should be strictly increasing and > 0")
+        if np.any(self.y <= 0):
+            raise ValueError("The tabulated function should be > 0")
+
+        lx = np.log(self.x)
+        ly = np.log(self.y)
+        self._spline = interpolate.PchipInterpolator(lx, ly, extrapolate=False)
+        self._dspline = self._spline.derivative()
+        self._slope_lo = (ly[1]-ly[0]) / (lx[1]-lx[0])
+        self._slope_hi = (ly[-1]-ly[-2]) / (lx[-1]-lx[-2])
+
+        #---------- Cumulative integral, as piecewise power laws on a refined grid
+        t = np.concatenate([np.linspace(lx[i], lx[i+1], Nsub+1)[:-1] for i in range(len(lx)-1)] + [lx[-1:]])
+        lg = (power+1)*t + self._spline(t)
+        k = np.diff(lg) / np.diff(t)
+        g = np.exp(lg)
+        seg = self._segment(g[:-1], k, np.diff(t))
+
+        self._t = t
+        self._g = g
+        self._k = np.append(k, self._slope_hi + power + 1)
+        self._cumul = np.append(0.0, np.cumsum(seg))
+
+    #========== Power law integral over a segment
+    @staticmethod
+    def _segment(g0, k, dt):
+        """
+        Integral of g0 exp(k (t-t0)) from t0 to t0+dt
+
+        """
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            seg = g0 * np.expm1(k*dt) / k
+        return np.where(np.abs(k*dt) < 1e-10, g0*dt, seg)
+    
+    #========== Interpolation
+    def __call__(self, x):
+        """
+        Interpolate the function.
+
+        Parameters
+        ----------
+        - x (np.ndarray): abscissa
+
+        Outputs
+        --------
+        - f (np.ndarray): the function at x
+        """
+
+        lx = np.log(x)
+        ly = self._spline(lx)
+        ly = np.where(lx < self._t[0], np.log(self.y[0]) + self._slope_lo*(lx-self._t[0]), ly)
+        ly = np.where(lx > self._t[-1], np.log(self.y[-1]) + self._slope_hi*(lx-self._t[-1]), ly)
+
+        return np.exp(ly)
+
+    #========== Logarithmic slope
+    def logslope(self, x):
+        """
+        Compute the logarithmic slope of the function.
+
+        Parameters
+        ----------
+        - x (np.ndarray): abscissa
+
+        Outputs
+        --------
+        - s (np.ndarray): dln f / dln x at x
+        """
+
+        lx = np.log(x)
+        slope = self._dspline(lx)
+        slope = np.where(lx < self._t[0], self._slope_lo, slope)
+        slope = np.where(lx > self._t[-1], self._slope_hi, slope)
+
+        return slope
+
+    #========== Cumulative integral
+    def _cumulative(self, x):
+        """
+        Compute int_x0^x t^power f(t) dt, with x0 the first tabulated point
+
+        """
+
+        lx = np.log(x)
+        idx = np.clip(np.searchsorted(self._t, lx, side='right') - 1, 0, len(self._t)-1)
+        k = np.where(lx < self._t[0], self._slope_lo + self.power + 1, self._k[idx])
+
+        return self._cumul[idx] + self._segment(self._g[idx], k, lx - self._t[idx])
+
+    def integral(self, x1, x2):
+        """
+        Compute the integral int_x1^x2 x^power f(x) dx.
+
+        Parameters
+        ----------
+        - x1, x2 (float or np.ndarray): the integration bounds
+
+        Outputs
+        --------
+        - I (float or np.ndarray): the integral
+        """
+
+        return self._cumulative(x2) - self._cumulative(x1)
+
+
+#===================================================
+#========== Model dictionary with a version
+#===================================================
+_model_versions = itertools.count()
+
+class ModelDict(dict):
+    """ ModelDict class
+    Dictionary of model parameters (e.g. the gas pressure model of the 
+    Cluster class) holding a version, which changes at each modification, 
+    including in place (e.g. model['P_0'] *= 2, which assigns the entry). 
+    A compiled model can thus check that it is up to date by comparing the 
+    versions. The versions are unique within a session, so that a new 
+    dictionary never takes the version of an old one. Modifying an entry 
+    value without assigning it (e.g. p = model['P_0']; p *= 2) is not tracked.
+
+    Attributes
+    ----------
+    - version (int): the version of the dictionary
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.version = next(_model_versions)
+
+    def __reduce__(self):
+        # A copied or unpickled dictionary gets a new version
+        return (self.__class__, (dict(self),))
+
+    def _modified(self):
+        self.version = next(_model_versions)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._modified()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._modified()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._modified()
+
+    def setdefault(self, key, default=None):
+        value = dict.setdefault(self, key, default)
+        self._modified()
+        return value
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        self._modified()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self._modified()
+        return item
+
+    def clear(self):
+        dict.clear(self)
+        self._modified()
+
+    def copy(self):
+        return self.__class__(self)
+
+
+#===================================================
+#========== Compiled profile model
+#===================================================
+class ProfileModel(object):
+    """ ProfileModel class
+    This class compiles a profile model dictionary (e.g. the gas pressure 
+    model of the Cluster class) into a lightweight callable. The parameters 
+    are converted once to floats (kpc for the radii) so that the evaluation 
+    only involves numpy operations. The object keeps the version of the 
+    model dictionary (see ModelDict) it was compiled from. The derivative is obtained together with 
+    the value, as the value times the logarithmic slope of the profile, so 
+    that the power laws are computed only once. Tabulated models ('User') are 
+    interpolated with a log-log monotone spline, built once here.
+
+    Attributes
+    ----------
+    - name (str): the name of the model, in ['GNFW', 'SVM', 'beta', 'doublebeta', 'User']
+    - unit (astropy.unit): the unit of the profile
+    - dunit (astropy.unit): the unit of the derivative, unit/kpc
+    - _version (int): the version of the model dictionary when compiled, None 
+    if it is not a ModelDict
+    - _terms (list): list of (kind, parameters) of the components, summed
+
+    Methods
+    ----------
+    - __call__(r3d_kpc): same as value
+    - value(r3d_kpc): compute the profile (unitless, in unit of self.unit)
+    - derivative(r3d_kpc): compute the derivative of the profile (in unit of self.unit/kpc)
+    - value_and_derivative(r3d_kpc): compute both the profile and its derivative
+    - volume(Rmin_kpc, Rmax_kpc): volume integral of a tabulated profile
+    - matches(model): check that the object is still up to date with the model dictionary
+    """
+
+    __slots__ = ('name', 'unit', 'dunit', '_version', '_terms')
+    
+    model_list = ['GNFW', 'SVM', 'beta', 'doublebeta', 'User']
+
+    #========== Init
+    def __init__(self, model):
+
+        if not model['name'] in self.model_list:
+            raise ValueError("The requested model has not been implemented")
+
+        self.name = model['name']
+        self._version = getattr(model, 'version', None)
+
+        #---------- Case of GNFW profile
+        if self.name == 'GNFW':
+            self.unit = model["P_0"].unit
+            self._terms = [('GNFW', (model["P_0"].to_value(self.unit), model["r_p"].to_value('kpc'),
+                                     model["a"], model["b"], model["c"]))]
+            
+        #---------- Case of SVM model
+        elif self.name == 'SVM':
+            self.unit = model["n_0"].unit
+            self._terms = [('SVM', (model["n_0"].to_value(self.unit), model["r_c"].to_value('kpc'),
+                                    model["beta"], model["r_s"].to_value('kpc'),
+                                    model["gamma"], model["epsilon"], model["alpha"]))]
+            
+        #---------- beta model
+        elif self.name == 'beta':
+            self.unit = model["n_0"].unit
+            self._terms = [('beta', (model["n_0"].to_value(self.unit), model["r_c"].to_value('kpc'),
+                                     model["beta"]))]
+
+        #---------- double beta model, both terms expressed in the unit of the first one
+        elif self.name == 'doublebeta':
+            self.unit = model["n_01"].unit
+            self._terms = [('beta', (model["n_01"].to_value(self.unit), model["r_c1"].to_value('kpc'),
+                                     model["beta1"])),
+                           ('beta', (model["n_02"].to_value(self.unit), model["r_c2"].to_value('kpc'),
+                                     model["beta2"]))]
+
+        #---------- tabulated model, volume integral computed along the spline
+        elif self.name == 'User':
+            self.unit = model["profile"].unit
+            self._terms = [('User', (LogLogSpline(model["radius"].to_value('kpc'),
+                                                  model["profile"].to_value(self.unit), power=2.0),))]
+
+        self.dunit = self.unit/u.kpc
+
+    #========== Check the compiled model is up to date
+    def matches(self, model):
+        """
+        Check that the object was compiled from this version of the model 
+        dictionary. A plain dictionary, which has no version, never matches.
+
+        Parameters
+        ----------
+        - model (ModelDict): the model dictionary
+
+        Outputs
+        --------
+        - match (bool): True if the compiled model can be used for this dictionary
+        """
+
+        return self._version is not None and getattr(model, 'version', None) == self._version
+
+    #========== Profile
+    def value(self, r3d_kpc):
+        """
+        Compute the profile.
+
+        Parameters
+        ----------
+        - r3d_kpc (np.ndarray): array of radius in kpc
+
+        Outputs
+        --------
+        - prof (np.ndarray): the profile in unit of self.unit
+        """
+
+        prof = 0
+        for kind, par in self._terms:
+            if kind == 'GNFW':
+                prof = prof + gNFW_model(r3d_kpc, par[0], par[1], slope_a=par[2], slope_b=par[3], slope_c=par[4])
+            elif kind == 'SVM':
+                prof = prof + svm_model(r3d_kpc, *par)
+            elif kind == 'User':
+                prof = prof + par[0](r3d_kpc)
+            else:
+                prof = prof + beta_model(r3d_kpc, *par)
+                
+        return prof
+
+    __call__ = value
+    
+    #========== Profile and derivative
+    def value_and_derivative(self, r3d_kpc):
+        """
+        Compute the profile and its derivative, the latter being the profile 
+        times its logarithmic slope.
+
+        Parameters
+        ----------
+        - r3d_kpc (np.ndarray): array of radius in kpc
+
+        Outputs
+        --------
+        - prof (np.ndarray): the profile in unit of self.unit
+        - dprof (np.ndarray): the derivative in unit of self.unit/kpc
+        """
+
+        prof = 0
+        dprof = 0
+        for kind, par in self._terms:
+            if kind == 'GNFW':
+                P0, r_p, a, b, c = par
+                xa = (r3d_kpc / r_p)**a
+                p = P0 * (r3d_kpc / r_p)**(-c) * (1 + xa)**((c-b)/a)
+                dp = -p * (b*xa + c) / (r3d_kpc * (1 + xa))
+            elif kind == 'SVM':
+                n0, r_c, beta, r_s, gamma, epsilon, alpha = par
+                y = r_c**2 + r3d_kpc**2
+                xg = (r3d_kpc / r_s)**gamma
+                p = n0 * (y/r_c**2)**(-3.0*beta/2.0) * (r3d_kpc / r_c)**(-alpha/2.0) * (1 + xg)**(-epsilon/2.0/gamma)
+                dp = p * (-3.0*beta*r3d_kpc/y - alpha/2.0/r3d_kpc - epsilon/2.0*xg/(r3d_kpc*(1 + xg)))
+            elif kind == 'User':
+                p = par[0](r3d_kpc)
+                dp = p * par[0].logslope(r3d_kpc) / r3d_kpc
+            else:
+                n0, r_c, beta = par
+                y = r_c**2 + r3d_kpc**2
+                p = n0 * (y/r_c**2)**(-3.0*beta/2.0)
+                dp = -3.0*beta * r3d_kpc / y * p
+            prof = prof + p
+            dprof = dprof + dp
+
+        return prof, dprof
+    
+    #========== Derivative
+    def derivative(self, r3d_kpc):
+        """
+        Compute the derivative of the profile.
+
+        Parameters
+        ----------
+        - r3d_kpc (np.ndarray): array of radius in kpc
+
+        Outputs
+        --------
+        - dprof (np.ndarray): the derivative in unit of self.unit/kpc
+        """
+
+        return self.value_and_derivative(r3d_kpc)[1]
+
+    #========== Volume
+    def volume(self, Rmin_kpc, Rmax_kpc):
+        """
+        Compute the volume integral of a tabulated profile, 
+        int_Rmin^Rmax 4 pi r^2 p(r) dr, from its cumulative integral.
+
+        Parameters
+        ----------
+        - Rmin_kpc, Rmax_kpc (float or np.ndarray): the integration bounds in kpc
+
+        Outputs
+        --------
+        - volume (float or np.ndarray): the volume integral in unit of self.unit kpc^3
+        """
+
+        if self.name != 'User':
+            raise ValueError("The volume is only tabulated for the 'User' model")
+
+        return 4*np.pi*self._terms[0][1][0].integral(Rmin_kpc, Rmax_kpc)
+
+
+#===================================================
+#========== Disk cache of the tabulated projections
+#===================================================
+def set_table_cache_dir(cache_dir):
+    """
+    Set the directory where the tabulated projections (gNFWProjectionTable)
+    are cached on disk, so that they are computed once for all the runs.
+    There is no disk cache by default.
+
+    Parameters
+    ----------
+    - cache_dir (str): the directory, or None for no disk cache
+
+    Outputs
+    --------
+    None
+    """
+
+    global _table_cache_dir
+    _table_cache_dir = cache_dir
+
+
+def get_table_cache_dir():
+    """
+    Get the directory where the tabulated projections are cached on disk.
+
+    Parameters
+    ----------
+
+    Outputs
+    --------
+    - cache_dir (str): the directory, or None if there is no disk cache
+    """
+
+    return _table_cache_dir
+
+
+#===================================================
+#========== Projected gNFW table
+#===================================================
+class gNFWProjectionTable(object):
+    """ gNFWProjectionTable class
+    This class tabulates the dimensionless line-of-sight integral of the 
+    gNFW model, for given slopes (a, b, c),
+    G(x, l) = int_0^l p(sqrt(x^2 + s^2)) ds, with p(u) = u^-c (1+u^a)^((c-b)/a), 
+    x = R/r_p the projected radius and l the line-of-sight distance in units 
+    of r_p. The projection of P0 p(r/r_p) between l1 and l2 (in kpc) is then 
+    P0 r_p [G(R/r_p, l2/r_p) - G(R/r_p, l1/r_p)], whatever P0, r_p and the 
+    truncation. The table is computed on a log grid, integrating each sub-interval 
+    as a power law, and interpolated with a bicubic spline in log-log space. 
+    If a cache directory is given (or set with set_table_cache_dir), the table 
+    is also cached on disk, one file per set of slopes, written atomically so 
+    that concurrent runs can share the directory.
+
+    Attributes
+    ----------
+    - slopes (tuple): the (a, b, c) slopes of the gNFW model
+    - x_range (tuple): the range of x covered by the table
+    - l_range (tuple): the range of l covered by the table
+    - _spline (RectBivariateSpline): ln G as a function of (ln x, ln l)
+
+    Methods
+    ----------
+    - __call__(x, l): interpolate G(x, l)
+    - project(x, l1, l2): compute G(x, l2) - G(x, l1)
+    - covers(x, l): check that the table covers the requested values
+    """
+
+    __slots__ = ('slopes', 'x_range', 'l_range', '_spline')
+    
+    #========== Init
+    def __init__(self, slope_a=1.33, slope_b=4.13, slope_c=0.31, cache_dir=None,
+                 x_range=(1e-5, 1e4), l_range=(1e-6, 1e5), Npt_per_decade=20, Nsub=40):
+
+        self.slopes = (float(slope_a), float(slope_b), float(slope_c))
+        self.x_range = x_range
+        self.l_range = l_range
+
+        if cache_dir is None:
+            cache_dir = _table_cache_dir
+
+        #---------- No disk cache
+        if cache_dir is None:
+            lx, ll, lG = self._compute(Npt_per_decade, Nsub)
+            self._spline = interpolate.RectBivariateSpline(lx, ll, lG, kx=3, ky=3)
+            return
+
+        filename = os.path.join(cache_dir, 'gNFW_projection_a{:.12e}_b{:.12e}_c{:.12e}_x{:.3e}_{:.3e}_l{:.3e}_{:.3e}_N{:d}_{:d}.npz'.format(
+            *(self.slopes + tuple(x_range) + tuple(l_range) + (Npt_per_decade, Nsub))))
+
+        #---------- Read the table if available, or compute it
+        try:
+            with np.load(filename) as table:
+                lx, ll, lG = table['lx'], table['ll'], table['lG']
+        except (IOError, OSError, KeyError, ValueError):
+            lx, ll, lG = self._compute(Npt_per_decade, Nsub)
+            self._save(filename, lx, ll, lG)
+                
+        self._spline = interpolate.RectBivariateSpline(lx, ll, lG, kx=3, ky=3)
+
+    #========== Save the table
+    @staticmethod
+    def _save(filename, lx, ll, lG):
+        """
+        Save the table, writing a temporary file renamed at the end, so that 
+        the file is never read partially written by another run.
+
+        """
+
+        cache_dir = os.path.dirname(filename)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmpname = tempfile.mkstemp(suffix='.npz', dir=cache_dir)
+        except (IOError, OSError):
+            return # no disk cache, the table is only kept in memory
+
+        try:
+            with os.fdopen(fd, 'wb') as tmpfile:
+                np.savez(tmpfile, lx=lx, ll=ll, lG=lG)
+            os.replace(tmpname, filename)
+        except (IOError, OSError):
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    #========== Compute the table
+    def _compute(self, Npt_per_decade, Nsub):
+        """
+        Compute ln G on the (ln x, ln l) grid
+
+        """
+        
+        a, b, c = self.slopes
+        Nx = int(Npt_per_decade*np.log10(self.x_range[1]/self.x_range[0])) + 1
+        Nl = int(Npt_per_decade*np.log10(self.l_range[1]/self.l_range[0])) + 1
+        lx = np.linspace(np.log(self.x_range[0]), np.log(self.x_range[1]), Nx)
+        ll = np.linspace(np.log(self.l_range[0]), np.log(self.l_range[1]), Nl)
+        ll_fine = np.linspace(ll[0], ll[-1], (Nl-1)*Nsub + 1)
+        
+        # Integrand in ln s, i.e. s p(sqrt(x^2 + s^2)), on the fine grid
+        u2 = np.exp(2*lx)[:,np.newaxis] + np.exp(2*ll_fine)[np.newaxis,:]
+        lg = ll_fine[np.newaxis,:] - c/2.0*np.log(u2) + (c-b)/a*np.log1p(u2**(a/2.0))
+
+        # Power law integration of each sub-interval, starting with the p(x) s integral below l_range[0]
+        k = np.diff(lg, axis=1) / np.diff(ll_fine)
+        seg = LogLogSpline._segment(np.exp(lg[:,:-1]), k, np.diff(ll_fine))
+        G = np.exp(lg[:,0])[:,np.newaxis] + np.append(np.zeros((Nx, 1)), np.cumsum(seg, axis=1), axis=1)
+        
+        return lx, ll, np.log(G[:,::Nsub])
+    
+    #========== Interpolation
+    def __call__(self, x, l):
+        """
+        Interpolate the table.
+
+        Parameters
+        ----------
+        - x (np.ndarray): projected radius in units of r_p
+        - l (np.ndarray): line-of-sight distance in units of r_p
+
+        Outputs
+        --------
+        - G (np.ndarray): the line-of-sight integral from 0 to l
+        """
+
+        return np.exp(self._spline.ev(np.log(x), np.log(l)))
+
+    def covers(self, x, l):
+        """
+        Check that the table covers the requested values
+
+        Parameters
+        ----------
+        - x (np.ndarray): projected radius in units of r_p
+        - l (np.ndarray): line-of-sight distance in units of r_p
+
+        Outputs
+        --------
+        - ok (bool): True if all the values are within the table
+        """
+
+        return (np.amin(x) >= self.x_range[0] and np.amax(x) <= self.x_range[1] and
+                np.amin(l) >= self.l_range[0] and np.amax(l) <= self.l_range[1])
+
+    def project(self, x, l1, l2):
+        """
+        Compute the line-of-sight integral between l1 and l2 (0 if l2 <= l1).
+
+        Parameters
+        ----------
+        - x (np.ndarray): projected radius in units of r_p
+        - l1, l2 (np.ndarray): line-of-sight boundaries in units of r_p
+
+        Outputs
+        --------
+        - G (np.ndarray): the line-of-sight integral from l1 to l2
+        """
+
+        l2 = np.maximum(l2, l1)
+        
+        return self(x, l2) - self(x, l1)
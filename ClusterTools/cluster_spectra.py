@@ -7,6 +7,7 @@ paper by Kelner et al. (2006).
 import numpy as np
 import scipy.integrate as integrate
 import scipy.interpolate as interpolate
+import scipy.special as special
 from astropy import constants as const
 import matplotlib.pyplot as plt
 from ebltable.tau_from_model import OptDepth
@@ -112,6 +113,104 @@ def get_integral_powerlaw_model(Emin, Emax, k0, index, E0=1.0):
     return output
 
 
+#===================================================
+#========== Integral power law times energy
+#===================================================
+def get_integral_energy_powerlaw_model(Emin, Emax, k0, index, E0=1.0):
+    """
+    Compute the enery integral :
+    \int_Emin^Emax E f(E) dE
+    for f(E) a power law
+
+    Parameters
+    ----------
+    - Emin (GeV): the lower bound
+    - Emax (GeV): the upper bound
+    - k0 : normalization
+    - E0 : pivot energy (GeV)
+    - index : spectral index
+
+    Outputs
+    --------
+    - The integrated function
+    
+    """
+
+    if Emin > Emax:
+        raise TypeError("Emin is larger than Emax")
+
+    if index == 2:
+        output = k0 * E0**2 * np.log(Emax/Emin)
+    else:
+        output = k0 * E0**2 / (2-index) * ( (Emax/E0)**(2-index) - (Emin/E0)**(2-index))
+    
+    return output
+
+
+#===================================================
+#========== Upper incomplete gamma function
+#===================================================
+def upper_incomplete_gamma(s, x):
+    """
+    Compute the upper incomplete gamma function:
+    \Gamma(s, x) = \int_x^\infty t^(s-1) exp(-t) dt
+    for any real s, using the recurrence 
+    \Gamma(s, x) = (\Gamma(s+1, x) - x^s exp(-x)) / s
+    for s < 0.
+
+    Parameters
+    ----------
+    - s (float): the parameter
+    - x (float): the lower bound, > 0
+
+    Outputs
+    --------
+    - The upper incomplete gamma function
+    
+    """
+
+    if s > 0:
+        return special.gammaincc(s, x) * special.gamma(s)
+    
+    if s == 0:
+        return special.exp1(x)
+
+    return (upper_incomplete_gamma(s+1, x) - x**s * np.exp(-x)) / s
+
+
+#===================================================
+#========== Integral cutoff power law times energy
+#===================================================
+def get_integral_energy_exponentialcutoffpowerlaw_model(Emin, Emax, k0, index, Ecut, E0=1.0):
+    """
+    Compute the enery integral :
+    \int_Emin^Emax E f(E) dE
+    for f(E) an exponential cutoff power law
+
+    Parameters
+    ----------
+    - Emin (GeV): the lower bound
+    - Emax (GeV): the upper bound
+    - k0 : normalization
+    - E0 : pivot energy (GeV)
+    - index : spectral index
+    - Ecut : cutoff energy (GeV)
+
+    Outputs
+    --------
+    - The integrated function
+    
+    """
+
+    if Emin > Emax:
+        raise TypeError("Emin is larger than Emax")
+
+    s = 2.0 - index
+    output = k0 * E0**index * Ecut**s * (upper_incomplete_gamma(s, Emin/Ecut) - upper_incomplete_gamma(s, Emax/Ecut))
+    
+    return output
+
+
 #===================================================
 #========== Integrate a model
 #===================================================
@@ -153,6 +252,115 @@ def get_integral_any_model(energy, f, Emin, Emax, Npt=1000):
     return output
 
 
+#===================================================
+#========== Compiled spectrum model
+#===================================================
+class SpectrumModel(object):
+    """ SpectrumModel class
+    This class compiles a spectrum model dictionary (e.g. the CRp spectrum 
+    model of the Cluster class) into a lightweight callable, with unit free 
+    parameters (GeV for energies). Tabulated models ('User') are interpolated 
+    with a log-log monotone spline, built once here, which also provides 
+    the energy integral. The object keeps the version of the model dictionary
+    (see cluster_profile.ModelDict) it was compiled from.
+
+    Attributes
+    ----------
+    - name (str): the name of the model, in ['PowerLaw', 'ExponentialCutoffPowerLaw', 'User']
+    - _version (int): the version of the model dictionary when compiled, None 
+    if it is not a ModelDict
+    - _par (tuple): the parameters of the model
+
+    Methods
+    ----------
+    - __call__(energy_gev): same as value
+    - value(energy_gev): compute the spectrum (normalized to 1 at 1 GeV for parametric models)
+    - energy_integral(Emin, Emax): compute int_Emin^Emax E f(E) dE for tabulated spectra
+    - matches(model): check that the object is still up to date with the model dictionary
+    """
+
+    __slots__ = ('name', '_version', '_par')
+    
+    model_list = ['PowerLaw', 'ExponentialCutoffPowerLaw', 'User']
+
+    #========== Init
+    def __init__(self, model):
+
+        if not model['name'] in self.model_list:
+            raise ValueError("The requested model has not been implemented")
+
+        self.name = model['name']
+        self._version = getattr(model, 'version', None)
+
+        if self.name == 'PowerLaw':
+            self._par = (model["Index"],)
+        elif self.name == 'ExponentialCutoffPowerLaw':
+            self._par = (model["Index"], model["CutoffEnergy"].to_value('GeV'))
+        elif self.name == 'User':
+            self._par = (cluster_profile.LogLogSpline(model["energy"].to_value('GeV'),
+                                                      np.asarray(model["spectrum"], dtype=float), power=1.0),)
+
+    #========== Check the compiled model is up to date
+    def matches(self, model):
+        """
+        Check that the object was compiled from this version of the model 
+        dictionary. A plain dictionary, which has no version, never matches.
+
+        Parameters
+        ----------
+        - model (cluster_profile.ModelDict): the model dictionary
+
+        Outputs
+        --------
+        - match (bool): True if the compiled model can be used for this dictionary
+        """
+
+        return self._version is not None and getattr(model, 'version', None) == self._version
+
+    #========== Spectrum
+    def value(self, energy_gev):
+        """
+        Compute the spectrum.
+
+        Parameters
+        ----------
+        - energy_gev (np.ndarray): the energy in GeV
+
+        Outputs
+        --------
+        - S_E (np.ndarray): the spectrum
+        """
+
+        if self.name == 'PowerLaw':
+            return powerlaw_model(energy_gev, 1.0, self._par[0])
+        elif self.name == 'ExponentialCutoffPowerLaw':
+            return exponentialcutoffpowerlaw_model(energy_gev, 1.0, self._par[0], self._par[1])
+        else:
+            return self._par[0](energy_gev)
+
+    __call__ = value
+
+    #========== Energy integral
+    def energy_integral(self, Emin, Emax):
+        """
+        Compute the energy integral of a tabulated spectrum, 
+        int_Emin^Emax E f(E) dE, from its cumulative integral.
+
+        Parameters
+        ----------
+        - Emin, Emax (float or np.ndarray): the integration bounds in GeV
+
+        Outputs
+        --------
+        - integral (float or np.ndarray): the integral in GeV^2
+        """
+
+        if self.name != 'User':
+            raise ValueError("The energy integral is only tabulated for the 'User' model")
+
+        return self._par[0].integral(Emin, Emax)
+
+    
 #===================================================
 #========== Heaviside function
 #===================================================
@@ -0,0 +1,286 @@
+"""
+This script contains the binary store of the model products. A store is
+a single file holding the profiles, spectra, maps and cubes of one or
+several clusters (e.g. a catalog), with their units and the parameters
+of the model. The file is a zip archive of .npy arrays, which can also
+be read with numpy.load, with one member per product:
+    <entry>/<group>/<product>.npy
+    <entry>/meta.json
+where the entry is the name of the cluster. The arrays are compressed,
+unless compress=False in which case they can be memory-mapped when read.
+Entries can be appended to an existing store without rewriting it, and
+each product is read only when requested.
+
+Example
+-------
+from ClusterModel.ClusterTools import cluster_store
+with cluster_store.ProductStore('catalog.npz', mode='a') as store:
+    store.write(clust.name, products, meta={'param': ...})
+with cluster_store.ProductStore('catalog.npz') as store:
+    for entry in store.entries():
+        ymap = store.read(entry, 'map', 'sz', mmap=True)
+
+"""
+
+import os
+import json
+import zipfile
+import numpy as np
+import astropy.units as u
+from astropy.io import fits
+
+#==================================================
+# Product store
+#==================================================
+
+class ProductStore(object):
+    """
+    Single file store of the products of one or several clusters.
+
+    Parameters
+    ----------
+    - filename (str): the full path to the file
+    - mode (str): 'r' to read, 'w' to create (an existing file is overwritten),
+    'a' to append entries to an existing file (created if needed)
+    - compress (bool): compress the arrays written. Uncompressed arrays
+    are larger but can be memory-mapped.
+
+    Methods
+    ----------
+    - entries(): the names of the entries in the store
+    - products(entry): the products of an entry, per group
+    - write(entry, products, meta=None): write the products of an entry
+    - read(entry, group, name, mmap=False): read a product
+    - read_meta(entry): read the metadata of an entry
+    - close(): close the file
+
+    """
+
+    def __init__(self, filename, mode='r', compress=True):
+        if mode not in ['r', 'w', 'a']:
+            raise ValueError("The mode should be 'r', 'w' or 'a'.")
+        if mode == 'a' and not os.path.exists(filename):
+            mode = 'w'
+
+        self.filename = filename
+        self.mode = mode
+        self._compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self._zip = zipfile.ZipFile(filename, mode=mode, allowZip64=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        """
+        Close the file.
+
+        Parameters
+        ----------
+
+        Outputs
+        ----------
+        None
+        """
+
+        self._zip.close()
+
+    #==================================================
+    # Content
+    #==================================================
+
+    def entries(self):
+        """
+        Get the names of the entries in the store, in the order they
+        were written.
+
+        Parameters
+        ----------
+
+        Outputs
+        ----------
+        - entries (list): the names of the entries
+        """
+
+        return [name[:-len('/meta.json')] for name in self._zip.namelist() if name.endswith('/meta.json')]
+
+    def products(self, entry):
+        """
+        Get the products of an entry.
+
+        Parameters
+        ----------
+        - entry (str): the name of the entry
+
+        Outputs
+        ----------
+        - products (dict): group -> list of product names
+        """
+
+        products = {}
+        for name in self._zip.namelist():
+            path = name.split('/')
+            if len(path) == 3 and path[0] == entry and path[2].endswith('.npy'):
+                products.setdefault(path[1], []).append(path[2][:-len('.npy')])
+
+        return products
+
+    #==================================================
+    # Write
+    #==================================================
+
+    def write(self, entry, products, meta=None):
+        """
+        Write the products of an entry, e.g. a cluster, as given by
+        Cluster.get_products. The units of the quantities and the map
+        headers are saved in the metadata of the entry.
+
+        Parameters
+        ----------
+        - entry (str): the name of the entry
+        - products (dict): group -> dictionary of products (quantities,
+        arrays, scalars or FITS headers)
+        - meta (dict): additional metadata, which should be JSON serializable
+        (e.g. the parameters of the model)
+
+        Outputs
+        ----------
+        None
+        """
+
+        if self.mode == 'r':
+            raise ValueError('The store is opened in read mode.')
+        if entry == '' or '/' in entry:
+            raise ValueError('The entry name should not be empty or contain "/".')
+        if entry in self.entries():
+            raise ValueError('The entry '+entry+' is already in the store.')
+
+        units = {}
+        headers = {}
+        for group, content in products.items():
+            for name, value in content.items():
+                key = group+'/'+name
+                if isinstance(value, fits.Header):
+                    headers[key] = value.tostring()
+                    continue
+                if isinstance(value, u.Quantity):
+                    units[key] = value.unit.to_string()
+                    value = value.value
+                self._write_array(entry+'/'+key+'.npy', np.asarray(value))
+
+        info = {'units': units, 'headers': headers}
+        if meta is not None:
+            info.update(meta)
+        self._zip.writestr(entry+'/meta.json', json.dumps(info, indent=1), compress_type=zipfile.ZIP_DEFLATED)
+
+    def _write_array(self, member, array):
+        """
+        Write an array as a .npy member of the archive.
+
+        Parameters
+        ----------
+        - member (str): the name of the member
+        - array (np.ndarray): the array
+
+        Outputs
+        ----------
+        None
+        """
+
+        info = zipfile.ZipInfo(member, date_time=(1980, 1, 1, 0, 0, 0))
+        info.compress_type = self._compression
+        info.external_attr = 0o644 << 16
+        with self._zip.open(info, mode='w', force_zip64=True) as f:
+            np.lib.format.write_array(f, array, allow_pickle=False)
+
+    #==================================================
+    # Read
+    #==================================================
+
+    def read_meta(self, entry):
+        """
+        Read the metadata of an entry: units, map headers and the
+        additional metadata given when writing.
+
+        Parameters
+        ----------
+        - entry (str): the name of the entry
+
+        Outputs
+        ----------
+        - meta (dict): the metadata
+        """
+
+        return json.loads(self._zip.read(entry+'/meta.json').decode())
+
+    def read(self, entry, group, name, mmap=False):
+        """
+        Read a product. Only this product is read from the file.
+
+        Parameters
+        ----------
+        - entry (str): the name of the entry
+        - group (str): the group of the product, e.g. 'profile', 'spectra', 'map', 'cube'
+        - name (str): the name of the product, e.g. 'p_e', 'gamma', 'header'
+        - mmap (bool): memory-map the array instead of loading it, which is
+        possible if it was written without compression. The array is then
+        read-only.
+
+        Outputs
+        ----------
+        - product (quantity, np.ndarray or fits.Header): the product
+        """
+
+        key = group+'/'+name
+        meta = self.read_meta(entry)
+        if key in meta['headers']:
+            return fits.Header.fromstring(meta['headers'][key])
+
+        member = self._zip.getinfo(entry+'/'+key+'.npy')
+        if mmap and member.compress_type == zipfile.ZIP_STORED:
+            array = self._memmap_array(member)
+        else:
+            with self._zip.open(member) as f:
+                array = np.lib.format.read_array(f, allow_pickle=False)
+
+        if key in meta['units']:
+            return u.Quantity(array, unit=meta['units'][key], copy=False)
+        return array
+
+    def _memmap_array(self, member):
+        """
+        Memory-map an uncompressed .npy member of the archive.
+
+        Parameters
+        ----------
+        - member (zipfile.ZipInfo): the member
+
+        Outputs
+        ----------
+        - array (np.memmap): the array, read-only
+        """
+
+        with open(self.filename, 'rb') as f:
+            # Skip the local file header: 30 bytes, then the name and the extra field
+            f.seek(member.header_offset)
+            local = f.read(30)
+            Nname = int.from_bytes(local[26:28], 'little')
+            Nextra = int.from_bytes(local[28:30], 'little')
+            f.seek(member.header_offset + 30 + Nname + Nextra)
+
+            # Read the .npy header
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+
+        if np.prod(shape) == 0:
+            return np.zeros(shape, dtype=dtype)
+
+        return np.memmap(self.filename, dtype=dtype, mode='r', shape=shape,
+                         order='F' if fortran_order else 'C', offset=offset)
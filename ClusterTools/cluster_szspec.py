@@ -7,6 +7,8 @@ import astropy.units as u
 from astropy import constants as const
 from astropy.cosmology import Planck15 as cosmo
 
+from ClusterModel.ClusterTools import cluster_timing
+
 
 #===================================================
 #========== CMB intensity
@@ -51,6 +53,7 @@ def tsz_spec(frequency):
 #===================================================
 #========== Relativistic tSZ spectrum
 #===================================================
+@cluster_timing.timed('sz_kernel')
 def tsz_spec_relativistic(frequency, kBT):
     """
     Compute the relativistic SZ spectrum, f(nu, T)
@@ -71,7 +74,32 @@ def tsz_spec_relativistic(frequency, kBT):
         frequency = np.array([frequency.to_value()]) * frequency.unit
     if type(kBT.to_value()) == float:
         kBT = np.array([kBT.to_value()]) * kBT.unit
+    if frequency.isscalar: frequency = frequency.reshape(1)
+    if kBT.isscalar: kBT = kBT.reshape(1)
+
+    #========== Temperatures are independent: process them by chunks within the memory budget
+    # (the fitting function for x > 1.2 needs about 8 arrays of 13 x 13 x Nfreq per temperature)
+    f_nu = [_tsz_spec_relativistic_grid(frequency, kBT[sl])
+            for sl in cluster_timing.chunk_slices(len(kBT), 8*8*13*13*len(frequency))]
+    
+    return np.concatenate(f_nu, axis=1)
+
 
+def _tsz_spec_relativistic_grid(frequency, kBT):
+    """
+    Compute the relativistic SZ spectrum on the frequency x temperature grid,
+    see tsz_spec_relativistic.
+
+    Parameters
+    ----------
+    - frequency (quantity): frequency array homogeneous to GHz
+    - kBT (quantity): temperature array homogeneous to keV
+    
+    Outputs
+    --------
+    - SZ spectrum: f(nu, T), as Nfreq x Ntemp
+    """
+    
     #========== Replicate to work with grids
     f_grid = (np.tile(frequency, [len(kBT),1])).T
     t_grid = (np.tile(kBT, [len(frequency),1]))
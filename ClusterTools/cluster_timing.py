@@ -0,0 +1,507 @@
+"""
+This script contains timing tools, used to instrument the computation
+stages of the model (e.g. CRp normalization, pp kernel, CRe steady state,
+projection, map rendering, XSPEC). For each stage, the wall time, the
+number of calls, the size of the computed grids and the memory are
+recorded. The instrumentation is disabled by default and then only costs
+a flag check per call. The stages can be recorded from several threads
+(e.g. products computed concurrently), each thread having its own stack.
+
+It also holds the global memory budget: the engines building large grids
+(l.o.s. projection, synchrotron, relativistic tSZ) process them by chunks
+along an independent axis so that their temporary arrays stay below it.
+
+Example
+-------
+from ClusterModel.ClusterTools import cluster_timing
+with cluster_timing.profiling():
+    clust.save_map()
+print(cluster_timing.report_table())
+cluster_timing.save_report(clust.output_dir+'/timing.json')
+
+"""
+
+import time
+import json
+import threading
+import functools
+import inspect
+import tracemalloc
+import numpy as np
+
+#==================================================
+# Global state of the instrumentation
+#==================================================
+
+_enabled = False   # switch used by all the timed functions
+_memory  = False   # also trace the allocated memory (slow)
+_records = {}      # stage name -> statistics
+_lock    = threading.Lock()   # protects the records
+_local   = threading.local()  # per thread: stack of the stages being run and active calls per stage
+_memory_budget = None  # maximum size of the temporary grids, in bytes
+
+
+#==================================================
+# Enable / disable the instrumentation
+#==================================================
+
+def enable(reset=True, memory=False):
+    """
+    Enable the instrumentation.
+
+    Parameters
+    ----------
+    - reset (bool): reset the previous records
+    - memory (bool): also record the peak memory allocated in each stage
+    using tracemalloc. This slows down the code significantly.
+
+    Outputs
+    ----------
+    None
+    """
+
+    global _enabled, _memory
+
+    if reset:
+        reset_records()
+
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _memory = memory
+    _enabled = True
+
+
+def disable():
+    """
+    Disable the instrumentation. The records are kept.
+
+    Parameters
+    ----------
+
+    Outputs
+    ----------
+    None
+    """
+
+    global _enabled, _memory
+
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _memory = False
+    _enabled = False
+
+
+def is_enabled():
+    """
+    Tell if the instrumentation is enabled.
+
+    Parameters
+    ----------
+
+    Outputs
+    ----------
+    - enabled (bool): True if enabled
+    """
+
+    return _enabled
+
+
+def reset_records():
+    """
+    Remove all the records. The stacks of the stages being run are
+    per thread and are left as they are: a stage still open in any thread
+    (e.g. if the instrumentation is reset while products are computed
+    concurrently) is recorded when it ends, in the new records. Enabling,
+    disabling and resetting are not meant to be called concurrently from
+    several threads.
+
+    Parameters
+    ----------
+
+    Outputs
+    ----------
+    None
+    """
+
+    with _lock:
+        _records.clear()
+
+
+class profiling(object):
+    """
+    Context manager which enables the instrumentation in a block and
+    restores the previous state at the end, e.g.
+    with profiling(): clust.save_map()
+
+    Parameters
+    ----------
+    - reset (bool): reset the previous records
+    - memory (bool): also record the peak memory allocated in each stage
+
+    """
+
+    def __init__(self, reset=True, memory=False):
+        self._reset = reset
+        self._memory = memory
+
+    def __enter__(self):
+        self._previous = (_enabled, _memory)
+        enable(reset=self._reset, memory=self._memory)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        disable()
+        if self._previous[0]:
+            enable(reset=False, memory=self._previous[1])
+        return False
+
+
+#==================================================
+# Stages
+#==================================================
+
+def _thread_state():
+    """
+    Get the stack of the stages being run and the number of active calls
+    per stage (recursion) of the current thread.
+
+    Parameters
+    ----------
+
+    Outputs
+    ----------
+    - stack (list): frames of the stages being run
+    - depth (dict): stage name -> number of active calls
+    """
+
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+        _local.depth = {}
+
+    return _local.stack, _local.depth
+
+
+def _output_size(output):
+    """
+    Compute the number of elements and bytes of the arrays returned by
+    a stage.
+
+    Parameters
+    ----------
+    - output: the output of a function (array, quantity, tuple or list)
+
+    Outputs
+    ----------
+    - npt (int): the number of elements of the largest array
+    - nbytes (int): the total number of bytes
+    """
+
+    if isinstance(output, (tuple, list)):
+        sizes = [_output_size(out) for out in output]
+        if len(sizes) == 0:
+            return 0, 0
+        return max([s[0] for s in sizes]), sum([s[1] for s in sizes])
+
+    if isinstance(output, np.ndarray):
+        return output.size, output.nbytes
+
+    return 0, 0
+
+
+class stage(object):
+    """
+    Context manager that records a computation stage, e.g.
+    with stage('projection') as st:
+        ...
+        st.add_output(image)
+    Nested stages are allowed: the self time excludes the time spent in
+    sub-stages, and recursive calls of the same stage are counted once
+    in the total time.
+
+    Parameters
+    ----------
+    - name (str): the name of the stage
+
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.npt = 0
+        self.nbytes = 0
+
+    def add_output(self, output):
+        """
+        Register the output of the stage, to record grid sizes and bytes.
+
+        Parameters
+        ----------
+        - output: array, quantity, or tuple/list of them
+
+        """
+
+        if _enabled:
+            npt, nbytes = _output_size(output)
+            self.npt = max(self.npt, npt)
+            self.nbytes += nbytes
+
+    def __enter__(self):
+        if not _enabled:
+            self._on = False
+            return self
+
+        self._on = True
+        stack, depth = _thread_state()
+        self.npt = 0
+        self.nbytes = 0
+        self._child = 0.0
+        if _memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if len(stack) > 0:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self._mem0 = current
+            self._peak = current
+        depth[self.name] = depth.get(self.name, 0) + 1
+        stack.append(self)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._on:
+            return False
+
+        dt = time.perf_counter() - self._t0
+        stack, depth = _thread_state()
+        stack.pop()
+        depth[self.name] -= 1
+        if len(stack) > 0:
+            stack[-1]._child += dt
+
+        with _lock:
+            rec = _records.setdefault(self.name, {'calls':0, 'time':0.0, 'self_time':0.0,
+                                                  'npt':0, 'npt_max':0, 'nbytes':0, 'mem_peak':0})
+            rec['calls'] += 1
+            rec['self_time'] += dt - self._child
+            if depth[self.name] == 0:
+                rec['time'] += dt
+            rec['npt'] += self.npt
+            rec['npt_max'] = max(rec['npt_max'], self.npt)
+            rec['nbytes'] += self.nbytes
+
+            if _memory and tracemalloc.is_tracing():
+                peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+                rec['mem_peak'] = max(rec['mem_peak'], peak - self._mem0)
+                if len(stack) > 0:
+                    stack[-1]._peak = max(stack[-1]._peak, peak)
+
+        return False
+
+
+def timed(name=None):
+    """
+    Decorator that records each call of a function as a stage. The grid
+    size and bytes are taken from the arrays it returns.
+
+    Parameters
+    ----------
+    - name (str): the name of the stage. By default, the qualified name of
+    the function.
+
+    Outputs
+    ----------
+    - decorator (function): the decorator
+    """
+
+    def decorator(func):
+        stage_name = func.__qualname__ if name is None else name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with stage(stage_name) as st:
+                output = func(*args, **kwargs)
+                st.add_output(output)
+            return output
+
+        wrapper._timed_stage = stage_name
+        return wrapper
+
+    return decorator
+
+
+def timed_methods(cls):
+    """
+    Class decorator that times all the public methods of a class (e.g.
+    Physics, Observables), the stage being named Class.method. Methods
+    already decorated with timed keep their own stage name.
+
+    Parameters
+    ----------
+    - cls (class): the class to instrument
+
+    Outputs
+    ----------
+    - cls (class): the same class, instrumented
+    """
+
+    for key, value in list(cls.__dict__.items()):
+        if key.startswith('_') or not inspect.isfunction(value):
+            continue
+        if hasattr(value, '_timed_stage'):
+            continue
+        setattr(cls, key, timed(cls.__name__+'.'+key)(value))
+
+    return cls
+
+
+#==================================================
+# Memory budget
+#==================================================
+
+def set_memory_budget(max_bytes):
+    """
+    Set the global memory budget used by the chunked engines.
+
+    Parameters
+    ----------
+    - max_bytes (float): the maximum size of the temporary grids in bytes,
+    or None for no limit (default)
+
+    Outputs
+    ----------
+    None
+    """
+
+    global _memory_budget
+
+    if max_bytes is not None and max_bytes <= 0:
+        raise ValueError('The memory budget should be a positive number of bytes or None.')
+    _memory_budget = max_bytes
+
+
+def get_memory_budget():
+    """
+    Get the global memory budget.
+
+    Parameters
+    ----------
+
+    Outputs
+    ----------
+    - max_bytes (float): the maximum size of the temporary grids in bytes, or None
+    """
+
+    return _memory_budget
+
+
+def chunk_slices(Nitem, item_bytes):
+    """
+    Split an axis in chunks so that the temporary arrays of each chunk
+    stay below the memory budget. At least two items are processed per 
+    chunk: numpy reductions over another axis switch to pairwise summation
+    for a single item, which would break the bit-identity with the unchunked
+    computation.
+
+    Parameters
+    ----------
+    - Nitem (int): the number of elements along the chunked axis
+    - item_bytes (float): the memory needed for one element of the axis
+
+    Outputs
+    ----------
+    - slices (list): list of slices covering the axis
+    """
+
+    if _memory_budget is None or Nitem*item_bytes <= _memory_budget:
+        return [slice(0, Nitem)]
+
+    Nchunk = int(np.amax([np.floor(_memory_budget / item_bytes), 2]))
+    edges = list(range(0, Nitem, Nchunk)) + [Nitem]
+    if len(edges) > 2 and edges[-1] - edges[-2] == 1:
+        del edges[-2] # merge a last single item with the previous chunk
+
+    return [slice(edges[i], edges[i+1]) for i in range(len(edges)-1)]
+
+
+#==================================================
+# Reports
+#==================================================
+
+def get_report():
+    """
+    Get the records of all the stages.
+
+    Parameters
+    ----------
+
+    Outputs
+    ----------
+    - report (dict): for each stage, the number of calls, the total (time)
+    and self (self_time) wall time in s, the summed (npt) and maximum
+    (npt_max) output grid sizes, the output bytes (nbytes), and the peak
+    allocated memory in bytes (mem_peak, if traced)
+    """
+
+    with _lock:
+        return {key: dict(value) for key, value in _records.items()}
+
+
+def report_table(sort='self_time', Nmax=None):
+    """
+    Format the records as a table.
+
+    Parameters
+    ----------
+    - sort (str): the column used to sort the stages
+    (time, self_time, calls, npt, nbytes, mem_peak)
+    - Nmax (int): the maximum number of stages to show
+
+    Outputs
+    ----------
+    - table (str): the formatted table
+    """
+
+    records = get_report()
+    stages = sorted(records.keys(), key=lambda k: records[k][sort], reverse=True)
+    if Nmax is not None:
+        stages = stages[0:Nmax]
+
+    width = np.amax([len(s) for s in stages]+[5])
+    line = '{:<'+str(width)+'} {:>8} {:>12} {:>12} {:>12} {:>12} {:>12} {:>12}'
+    table = line.format('stage', 'calls', 'total (s)', 'self (s)', 'npt', 'npt_max', 'out (MB)', 'peak (MB)')+'\n'
+    table += '-'*(width+8+6*12+7)+'\n'
+    for s in stages:
+        rec = records[s]
+        table += line.format(s, rec['calls'],
+                             '{:.4f}'.format(rec['time']),
+                             '{:.4f}'.format(rec['self_time']),
+                             rec['npt'], rec['npt_max'],
+                             '{:.3f}'.format(rec['nbytes']/1e6),
+                             '{:.3f}'.format(rec['mem_peak']/1e6))+'\n'
+
+    return table
+
+
+def save_report(filename, sort='self_time'):
+    """
+    Save the records, in JSON if the file name ends with .json, or as
+    a text table otherwise.
+
+    Parameters
+    ----------
+    - filename (str): the full path to the file
+    - sort (str): the column used to sort the table
+
+    Outputs
+    ----------
+    The file is saved
+    """
+
+    if filename.endswith('.json'):
+        with open(filename, 'w') as f:
+            json.dump(get_report(), f, indent=4, sort_keys=True)
+    else:
+        with open(filename, 'w') as f:
+            f.write(report_table(sort=sort))
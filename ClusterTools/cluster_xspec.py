@@ -10,6 +10,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from ClusterModel.ClusterTools import map_tools
+from ClusterModel.ClusterTools import cluster_timing
 
 
 #==================================================
@@ -192,6 +193,7 @@ def make_xspec_file(nH, Tgas, ab, redshift, emin, emax,
 # Create model
 #==================================================
 
+@cluster_timing.timed('xspec')
 def run_xspec(nH, Tgas, ab, redshift, emin, emax,
               file_ana='./xspec_analysis.txt', file_out='./xspec_analysis_output.txt',
               model='APEC', resp_file=None, data_file=None, app_nH_model=False,
@@ -306,6 +308,7 @@ def xray_spectrum(nH, Tgas, ab, redshift,
 # Compute X-ray spectrum
 #==================================================
 
+@cluster_timing.timed('xspec')
 def make_xspec_table(output_file, nH, ab, redshift, emin, emax,
                      Tmin=0.1, Tmax=50, nbin=100,
                      file_ana='./xspec_analysis.txt', file_out='./xspec_analysis_output.txt',
@@ -363,7 +366,7 @@ def make_xspec_table(output_file, nH, ab, redshift, emin, emax,
         dNdt[i]   = rate
 
     # saving
-    sfile = open(output_file, 'wb')
+    sfile = open(output_file, 'w')
     sfile.writelines(['#nH = '+str(nH)+' 10^22 cm^2 ; abundance = '+str(ab)+
                       ' Zsun ; redshift = '+str(redshift)+
                       ' ; energy=['+str(emin)+','+str(emax)+']'+
@@ -7,6 +7,8 @@ from astropy.coordinates import SkyCoord
 import matplotlib.pyplot as plt
 import healpy
 
+from ClusterModel.ClusterTools import cluster_timing
+
 #===================================================
 #========== EXTRACT AND REWRITE FITS MAP
 #===================================================
@@ -162,7 +164,7 @@ def define_std_header(ra_center, dec_center, FoV_x, FoV_y, reso) :
 #===================================================
 #========== CREATE R.A. and Dec. maps from wcs
 #===================================================
-def get_radec_map(header):
+def get_radec_map(header, dtype=np.float64):
     """
     Extract a RA and Dec map from a map header and a reference coordinate
 
@@ -170,6 +172,8 @@ def get_radec_map(header):
     ----------
     - image: grid containing the original data
     - header: header associated to the map
+    - dtype (numpy dtype): the precision of the output maps. The coordinates 
+    are always computed in float64.
 
     Outputs
     --------
@@ -192,8 +196,8 @@ def get_radec_map(header):
     coord_y, coord_x = np.meshgrid(axis1, axis2, indexing='ij')
     world = w.wcs_pix2world(coord_x, coord_y, 0)
     
-    ra_map = world[0]
-    dec_map = world[1]
+    ra_map = world[0].astype(dtype, copy=False)
+    dec_map = world[1].astype(dtype, copy=False)
     
     return ra_map, dec_map
 
@@ -232,6 +236,7 @@ def greatcircle(lon, lat, lon_ref, lat_ref):
 #===================================================
 #========== Interpolate profile onto map
 #===================================================
+@cluster_timing.timed('map_rendering')
 def profile2map(profile_y, profile_r, map_r):
     """
     Interpolated a profile onto a map
@@ -248,13 +253,155 @@ def profile2map(profile_y, profile_r, map_r):
 
     """
 
-    map_r_flat = np.reshape(map_r, map_r.shape[0]*map_r.shape[1])
-    itpl = interpolate.interp1d(profile_r, profile_y, kind='cubic', fill_value='extrapolate')
-    map_y_flat = itpl(map_r_flat)
-    map_y = np.reshape(map_y_flat, (map_r.shape[0],map_r.shape[1]))
-    
+    renderer = ProfileMapRenderer(profile_r, map_r, symmetric=False)
+    map_y = renderer.render(profile_y)
+
     return map_y
 
+#===================================================
+#========== Radial profile renderer
+#===================================================
+class ProfileMapRenderer(object):
+    """
+    Interpolate radial profiles onto a fixed distance map. The mapping
+    between the pixels and the profile grid (interval index and offset)
+    is computed once, so that rendering a profile only requires building
+    the cubic spline coefficients (not-a-knot, with extrapolation, as
+    interp1d(kind='cubic')) and evaluating them on the pixels.
+
+    Attributes
+    ----------
+    - profile_r (deg): radius grid of the profiles
+    - map_r (deg): radius map in 2d
+    - symmetric (bool): if True, pixels at the same distance from the
+    center (e.g. the octants of a map centered on the cluster) are
+    evaluated only once and mirrored onto the map.
+    - rtol (float): relative precision used to identify equal distances
+    - dtype (numpy dtype): the precision of the rendered maps. In float32, the
+    spline coefficients are computed in float64, normalized to the profile 
+    maximum, and evaluated on the pixels in float32.
+
+    Methods
+    ----------
+    - match(profile_r, map_r): check if the renderer applies to the given grids
+    - render(profile_y): interpolate a profile, or a set of profiles, onto the map
+
+    """
+
+    #========== Init
+    def __init__(self, profile_r, map_r, symmetric=True, rtol=1e-10, dtype=np.float64):
+
+        self.profile_r = np.array(profile_r, dtype=np.float64)
+        self.map_r     = map_r
+        self.map_shape = map_r.shape
+        self.dtype     = np.dtype(dtype)
+
+        map_r_flat = np.ravel(map_r)
+
+        #----- Pixels with the same distance are computed once
+        if symmetric:
+            quantum = rtol*np.amax(np.abs(map_r_flat))
+            if quantum <= 0: quantum = rtol
+            key = np.round(map_r_flat/quantum).astype(np.int64)
+            key_u, index_u, self._inverse = np.unique(key, return_index=True, return_inverse=True)
+            r_eval = map_r_flat[index_u]
+        else:
+            self._inverse = None
+            r_eval = map_r_flat
+
+        #----- Pixel to profile mapping: interval index and offset
+        Nr = len(self.profile_r)
+        idx = np.searchsorted(self.profile_r, r_eval, side='right') - 1
+        idx[idx < 0] = 0
+        idx[idx > Nr-2] = Nr-2
+        self._r_eval = r_eval
+        self._index = idx
+        self._dx = (r_eval - self.profile_r[idx]).astype(self.dtype, copy=False)
+
+    #========== Check the grids
+    def match(self, profile_r, map_r):
+        """
+        Check that the renderer was built for the given grids
+
+        Parameters
+        ----------
+        - profile_r (deg): radius corresponding to profile_y
+        - map_r (deg): radius map in 2d
+
+        Outputs
+        --------
+        - match (bool): True if the renderer can be used
+
+        """
+
+        if map_r is not self.map_r:
+            if map_r.shape != self.map_shape:
+                return False
+            if not np.array_equal(map_r, self.map_r):
+                return False
+
+        if len(profile_r) != len(self.profile_r):
+            return False
+
+        return np.array_equal(profile_r, self.profile_r)
+
+    #========== Render a profile
+    @cluster_timing.timed('map_rendering')
+    def render(self, profile_y):
+        """
+        Interpolate a profile onto the map
+
+        Parameters
+        ----------
+        - profile_y: amplitude value of the profile at profile_r. It can
+        be a 2d array (Nplane x Nr), in which case a cube is returned.
+
+        Outputs
+        --------
+        - map_y (in units of profile_y): interpolated map (Ny x Nx) or
+        cube (Nplane x Ny x Nx)
+
+        """
+
+        profile_y = np.asarray(profile_y)
+
+        # Non finite values cannot be handled by the spline coefficients
+        if not np.all(np.isfinite(profile_y)):
+            itpl = interpolate.interp1d(self.profile_r, profile_y, axis=-1, kind='cubic', fill_value='extrapolate')
+            map_y_flat = itpl(self._r_eval).T.astype(self.dtype, copy=False)
+            
+        else:
+            # Spline coefficients, as c[k, i] for x in [x_i, x_i+1]
+            spline = interpolate.CubicSpline(self.profile_r, profile_y, axis=-1,
+                                             bc_type='not-a-knot', extrapolate=True)
+            c = spline.c
+
+            # In reduced precision, normalize the coefficients to avoid over/underflows
+            if self.dtype != np.float64:
+                norm = np.amax(np.abs(profile_y), axis=-1)
+                norm = np.where(norm > 0, norm, 1.0)
+                c = (c / norm).astype(self.dtype)
+            
+            # Evaluation on the pixels, with the plane axis last if any
+            idx = self._index
+            dx = self._dx
+            if profile_y.ndim == 2:
+                dx = dx[:,np.newaxis]
+            map_y_flat = ((c[0][idx]*dx + c[1][idx])*dx + c[2][idx])*dx + c[3][idx]
+            if self.dtype != np.float64:
+                map_y_flat *= norm.astype(self.dtype)
+
+        # Mirror onto the full map
+        if self._inverse is not None:
+            map_y_flat = map_y_flat[self._inverse]
+
+        if profile_y.ndim == 2:
+            map_y = np.reshape(map_y_flat.T, (profile_y.shape[0],)+self.map_shape)
+        else:
+            map_y = np.reshape(map_y_flat, self.map_shape)
+
+        return map_y
+
 #===================================================
 #========== Extract ROI from Healpix maps
 #===================================================
@@ -375,3 +522,36 @@ def get_healpix_dec_mask(dec_lim, nside):
     mask[wmask] = 1
 
     return mask
+
+#===================================================
+#========== Healpix pixels within a disc
+#===================================================
+def get_healpix_disc(nside, lon, lat, radius, nest=False):
+    """
+    Get the Healpix pixels within a disc and their angular distance
+    to the center of the disc
+
+    Parameters
+    ----------
+    - nside : Healpix Nside argument
+    - lon (deg): the longitude of the disc center
+    - lat (deg): the latitude of the disc center
+    - radius (deg): the radius of the disc
+    - nest (bool): Healpix NESTED ordering if True, RING otherwise
+
+    Outputs
+    --------
+    - ipix (int array): the pixel indices
+    - dist (deg): the distance between the pixel centers and the disc center
+    
+    """
+
+    vec0 = healpy.ang2vec(lon, lat, lonlat=True)
+    ipix = healpy.query_disc(nside, vec0, radius*np.pi/180.0, inclusive=False, nest=nest)
+
+    # Chord length based distance, accurate at small separation
+    vec = np.array(healpy.pix2vec(nside, ipix, nest=nest))
+    chord = np.sqrt(np.sum((vec - vec0[:,np.newaxis])**2, axis=0))
+    dist = 2*np.arcsin(np.clip(chord/2.0, 0, 1)) * 180.0/np.pi
+
+    return ipix, dist
@@ -0,0 +1,362 @@
+"""
+This file contains a benchmark suite of the main computational paths of the
+Cluster class: physical rates, line-of-sight projections, maps and outputs.
+Each benchmark is run over a grid of array sizes and integration sampling
+(Npt_per_decade_integ), and the results are saved in a JSON file that can be
+compared to the one obtained at another commit.
+
+X-ray products need the XSPEC tables. When XSPEC is not available (or when
+requested), run_xspec is replaced by a stub which returns approximate
+bremsstrahlung-like fluxes, so that the X-ray paths can be timed offline.
+The stub values are not physical and only serve benchmarking purposes.
+
+Usage:
+    python -m ClusterModel.benchmark --output bench.json
+    python -m ClusterModel.benchmark --quick --xspec-stub --output new.json --compare bench.json
+    python -m ClusterModel.benchmark --quick --bench get_gamma_map --stages --output stages.json
+
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+import contextlib
+import numpy as np
+import scipy
+import scipy.special as special
+import astropy
+import astropy.units as u
+
+from ClusterModel              import model
+from ClusterModel              import model_tools
+from ClusterModel.ClusterTools import cluster_xspec
+from ClusterModel.ClusterTools import cluster_timing
+
+
+#==================================================
+# XSPEC stub
+#==================================================
+
+def stub_run_xspec(nH, Tgas, ab, redshift, emin, emax, **kwargs):
+    """
+    Replace cluster_xspec.run_xspec with a bremsstrahlung-like
+    approximation, dN/dE ~ T^-1/2 exp(-E/T) / E. The values are
+    not physical and are only meant to run the X-ray code offline.
+
+    Parameters
+    ----------
+    - nH (float): hydrogen column density (10^22 cm-2), not used
+    - Tgas (float): plasma temperature (keV)
+    - ab (float): abundances (in unit of Z0), not used
+    - redshift (float) cluster redshift
+    - emin (float): minimal band energy (keV)
+    - emax (float): maximal band energy (keV)
+
+    Outputs
+    ----------
+    - flux (float): the X-ray flux in erg/cm^2/s
+    - Counts (float): the X-ray counts/cm^2/s
+    - rate (float): the X-ray rate in ph/s for a 100 cm^2 effective area
+
+    """
+
+    T = Tgas / (1.0 + redshift)
+    counts = 1e-14 * T**-0.5 * (special.exp1(emin/T) - special.exp1(emax/T))
+    flux   = 1e-14 * T**0.5 * (np.exp(-emin/T) - np.exp(-emax/T)) * (1*u.keV).to_value('erg')
+    rate   = 100.0 * counts
+
+    return flux, counts, rate
+
+
+@contextlib.contextmanager
+def xspec_stub():
+    """
+    Context manager in which XSPEC calls are replaced by stub_run_xspec.
+
+    """
+
+    run_xspec = cluster_xspec.run_xspec
+    cluster_xspec.run_xspec = stub_run_xspec
+    try:
+        yield
+    finally:
+        cluster_xspec.run_xspec = run_xspec
+
+
+#==================================================
+# Benchmark definitions
+#==================================================
+
+def _bench_rate(method, energy_range, energy_unit):
+    """
+    Build a benchmark of a production rate method f(energy, radius), with
+    size points in energy and radius.
+
+    """
+
+    def bench(cluster, size):
+        energy = np.logspace(energy_range[0], energy_range[1], size)*u.Unit(energy_unit)
+        radius = np.logspace(0, 4, size)*u.kpc
+        return lambda: getattr(cluster, method)(energy, radius)
+    return bench
+
+
+def _bench_los_1d(cluster, size):
+    r3d = model_tools.sampling_array(0.9*u.kpc, 1.2e4*u.kpc, NptPd=cluster.Npt_per_decade_integ, unit=True)
+    los = model_tools.sampling_array(1*u.kpc, 5e3*u.kpc, NptPd=cluster.Npt_per_decade_integ, unit=True)
+    r2d = np.logspace(0, 4, size)*u.kpc
+    f_r = cluster.get_pressure_gas_profile(r3d)[1]
+    return lambda: model_tools.los_integration_1dfunc(f_r, r3d, r2d, los)
+
+
+def _bench_los_2d(cluster, size):
+    r3d = model_tools.sampling_array(0.9*u.kpc, 1.2e4*u.kpc, NptPd=cluster.Npt_per_decade_integ, unit=True)
+    los = model_tools.sampling_array(1*u.kpc, 5e3*u.kpc, NptPd=cluster.Npt_per_decade_integ, unit=True)
+    r2d = np.logspace(0, 4, size)*u.kpc
+    eng = np.logspace(-1, 5, size)*u.GeV
+    f_E_r = cluster.get_rate_gamma(eng, r3d)
+    return lambda: model_tools.los_integration_2dfunc(f_E_r, eng, r3d, r2d, los)
+
+
+def _bench_map(method, **kwargs):
+    """
+    Build a benchmark of a map method, with size x size pixels.
+
+    """
+
+    def bench(cluster, size):
+        cluster.map_fov = [3.0, 3.0]*u.deg
+        cluster.map_reso = 3.0/size*u.deg
+        return lambda: getattr(cluster, method)(**kwargs)
+    return bench
+
+
+def _bench_save_map(cluster, size):
+    cluster.map_fov = [3.0, 3.0]*u.deg
+    cluster.map_reso = 3.0/size*u.deg
+    return lambda: cluster.save_map()
+
+
+def _bench_save_spectra(cluster, size):
+    energy = np.logspace(-2, 7, size)*u.GeV
+    energyX = np.linspace(0.1, 20, size)*u.keV
+    frequency = np.logspace(-2, 3, size)*u.GHz
+    return lambda: cluster.save_spectra(energy=energy, energyX=energyX, frequency=frequency)
+
+
+# name: (setup function, needs the XSPEC table)
+BENCHMARKS = {'get_rate_gamma'        : (_bench_rate('get_rate_gamma', (-2, 7), 'GeV'), False),
+              'get_rate_cre'          : (_bench_rate('get_rate_cre', (-2, 7), 'GeV'), False),
+              'get_cre_2d'            : (_bench_rate('get_cre_2d', (-2, 7), 'GeV'), False),
+              'get_rate_synchrotron'  : (_bench_rate('get_rate_synchrotron', (-9, -2), 'eV'), False),
+              'get_rate_ic'           : (_bench_rate('get_rate_ic', (-2, 7), 'GeV'), False),
+              'get_rate_sz'           : (_bench_rate('get_rate_sz', (1, 3), 'GHz'), False),
+              'los_integration_1dfunc': (_bench_los_1d, False),
+              'los_integration_2dfunc': (_bench_los_2d, False),
+              'get_gamma_map'         : (_bench_map('get_gamma_map'), False),
+              'get_neutrino_map'      : (_bench_map('get_neutrino_map'), False),
+              'get_ic_map'            : (_bench_map('get_ic_map'), False),
+              'get_synchrotron_map'   : (_bench_map('get_synchrotron_map'), False),
+              'get_sz_map'            : (_bench_map('get_sz_map', Compton_only=True), False),
+              'get_xray_map'          : (_bench_map('get_xray_map'), True),
+              'save_map'              : (_bench_save_map, True),
+              'save_spectra'          : (_bench_save_spectra, True)}
+
+
+#==================================================
+# Run the benchmarks
+#==================================================
+
+def get_metadata():
+    """
+    Collect information on the environment in which the benchmark is run.
+
+    Outputs
+    ----------
+    - meta (dict): the metadata
+
+    """
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {'date'    : time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit'  : commit,
+            'python'  : platform.python_version(),
+            'numpy'   : np.__version__,
+            'scipy'   : scipy.__version__,
+            'astropy' : astropy.__version__,
+            'platform': platform.platform()}
+
+
+def run_benchmarks(names=None, sizes=(30, 100), Npt_per_decade=(10, 30), repeat=3,
+                   use_xspec_stub=None, stages=False, silent=False):
+    """
+    Run the benchmarks over the grid of sizes and integration sampling.
+    A new cluster (default model) is used for each configuration, and the
+    first call, which fills the internal caches, is timed separately.
+
+    Parameters
+    ----------
+    - names (list): the benchmarks to run, default all (see BENCHMARKS)
+    - sizes (list): the array sizes (energy/radius points, or map pixels per side)
+    - Npt_per_decade (list): the values of Npt_per_decade_integ
+    - repeat (int): the number of timed calls after the first one
+    - use_xspec_stub (bool): replace XSPEC by a stub. By default, the stub
+    is used if XSPEC is not found
+    - stages (bool): run one more call with the stage instrumentation 
+    (see cluster_timing) and store its report
+    - silent (bool): do not print the results while running
+
+    Outputs
+    ----------
+    - results (dict): the metadata and the list of results
+
+    """
+
+    if names is None:
+        names = list(BENCHMARKS.keys())
+    if use_xspec_stub is None:
+        use_xspec_stub = shutil.which('xspec') is None
+
+    output_dir = tempfile.mkdtemp(prefix='ClusterModel_benchmark_')
+    results = []
+
+    try:
+        with (xspec_stub() if use_xspec_stub else contextlib.ExitStack()):
+            for Npt in Npt_per_decade:
+                # The XSPEC table is shared by all the benchmarks of a given sampling
+                cluster = model.Cluster(silent=True, output_dir=output_dir)
+                cluster.Npt_per_decade_integ = Npt
+                if any([BENCHMARKS[name][1] for name in names]):
+                    cluster.make_xspec_table(nbin=30)
+
+                for name in names:
+                    setup, need_xspec = BENCHMARKS[name]
+                    for size in sizes:
+                        cluster = model.Cluster(silent=True, output_dir=output_dir)
+                        cluster.Npt_per_decade_integ = Npt
+                        func = setup(cluster, size)
+
+                        t0 = time.perf_counter()
+                        func()
+                        first = time.perf_counter() - t0
+                        times = []
+                        for i in range(repeat):
+                            t0 = time.perf_counter()
+                            func()
+                            times.append(time.perf_counter() - t0)
+
+                        res = {'name'  : name,
+                               'params': {'size': size, 'Npt_per_decade_integ': Npt},
+                               'first' : first,
+                               'times' : times,
+                               'min'   : float(np.amin(times)) if repeat > 0 else first,
+                               'median': float(np.median(times)) if repeat > 0 else first}
+                        if stages:
+                            with cluster_timing.profiling():
+                                func()
+                            res['stages'] = cluster_timing.get_report()
+                        results.append(res)
+                        if not silent:
+                            print('{:25s} size={:<5d} Npt={:<4d} first={:9.4f}s  min={:9.4f}s'.format(
+                                name, size, Npt, res['first'], res['min']))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    meta = get_metadata()
+    meta['xspec_stub'] = use_xspec_stub
+    meta['repeat'] = repeat
+
+    return {'meta': meta, 'results': results}
+
+
+#==================================================
+# Compare two benchmark files
+#==================================================
+
+def compare_benchmarks(new, reference, threshold=1.2):
+    """
+    Compare two sets of benchmark results, matching them by name and parameters.
+
+    Parameters
+    ----------
+    - new (dict): the benchmark results to test
+    - reference (dict): the reference benchmark results
+    - threshold (float): ratio of the minimal times above which a regression is flagged
+
+    Outputs
+    ----------
+    - comparison (list): list of (name, params, t_ref, t_new, ratio, regression)
+
+    """
+
+    def key(res):
+        return (res['name'], tuple(sorted(res['params'].items())))
+
+    ref = {key(res): res for res in reference['results']}
+    comparison = []
+    for res in new['results']:
+        if key(res) not in ref:
+            continue
+        t_ref = ref[key(res)]['min']
+        ratio = res['min'] / t_ref if t_ref > 0 else np.inf
+        comparison.append((res['name'], res['params'], t_ref, res['min'], ratio, ratio > threshold))
+
+    return comparison
+
+
+#==================================================
+# Main
+#==================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the ClusterModel hot paths.')
+    parser.add_argument('--output', default='benchmark.json', help='output JSON file')
+    parser.add_argument('--compare', default=None, help='reference JSON file to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2, help='regression threshold on time ratio')
+    parser.add_argument('--bench', nargs='*', default=None, choices=list(BENCHMARKS.keys()),
+                        help='benchmarks to run (default all)')
+    parser.add_argument('--sizes', nargs='*', type=int, default=[30, 100], help='array sizes')
+    parser.add_argument('--npt', nargs='*', type=int, default=[10, 30], help='Npt_per_decade_integ values')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed calls')
+    parser.add_argument('--quick', action='store_true', help='single small configuration')
+    parser.add_argument('--xspec-stub', action='store_true', default=None, help='replace XSPEC by a stub')
+    parser.add_argument('--stages', action='store_true', help='store the time spent in each computation stage')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.sizes, args.npt, args.repeat = [30], [10], 1
+
+    results = run_benchmarks(names=args.bench, sizes=args.sizes, Npt_per_decade=args.npt,
+                             repeat=args.repeat, use_xspec_stub=args.xspec_stub, stages=args.stages)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            reference = json.load(f)
+        comparison = compare_benchmarks(results, reference, threshold=args.threshold)
+        print('')
+        print('{:25s} {:>6s} {:>5s} {:>10s} {:>10s} {:>7s}'.format('name', 'size', 'Npt', 'ref (s)', 'new (s)', 'ratio'))
+        for name, params, t_ref, t_new, ratio, regression in comparison:
+            print('{:25s} {:6d} {:5d} {:10.4f} {:10.4f} {:7.2f} {:s}'.format(
+                name, params['size'], params['Npt_per_decade_integ'], t_ref, t_new, ratio,
+                '<-- regression' if regression else ''))
+        if any([c[5] for c in comparison]):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
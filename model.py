@@ -26,6 +26,7 @@ from ClusterModel.model_obs    import Observables
 from ClusterModel.model_plots  import Plots
 from ClusterModel.ClusterTools import cluster_global 
 from ClusterModel.ClusterTools import cluster_spectra 
+from ClusterModel.ClusterTools import cluster_profile
 
 
 #==================================================
@@ -91,6 +92,9 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
     - spectrum_crp_model (dict): the definition of the cosmic ray proton energy shape
 
     - Npt_per_decade_integ (int): the number of point per decade used in integrations
+    - sampling_profile (dict): the number of point per decade used for given products and 
+    sampling axes, as {product: {axis: Npt}}, e.g. obtained with tune_sampling_profile. 
+    Npt_per_decade_integ is used otherwise.
     - map_coord (SkyCoord object): the map center coordinates.
     - map_reso (quantity): the map pixel size, homogeneous to degrees.
     - map_fov (list of quantity):  the map field of view as [FoV_x, FoV_y], homogeneous to deg.
@@ -98,6 +102,9 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
     In this case, the map coordinates, field of view and resolution will be extracted 
     from the header and the projection can be arbitrary. If the header is not provided,
     then the projection will be standard RA-DEC tan projection.
+    - map_dtype (str): the floating point precision of the map geometry and rendering,
+    'float64' (default) or 'float32' to halve the memory of maps and cubes. Physical 
+    quantities (profiles, spectra, fluxes) are always computed in float64.
 
     Methods
     ----------  
@@ -191,6 +198,8 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         self._density_gas_model  = 1
         self._density_crp_model  = 1
         self._magfield_model     = 1
+        self._profile_models     = {}
+        self._spectrum_models    = {}
         # Set default model using UPP + isoThermal + isobaric
         self.set_pressure_gas_gNFW_param(pressure_model='P13UPP')
         self.set_density_gas_isoT_param(10.0*u.keV)
@@ -198,16 +207,24 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         self.set_magfield_isobaric_scal_param(Bnorm=10*u.uG, scal=0.5)
 
         # Cosmic ray protons
-        self._spectrum_crp_model = {'name'       : 'PowerLaw',
-                                    'PivotEnergy': 1.0*u.TeV,
-                                    'Index'      : 2.5}
+        self._spectrum_crp_model = cluster_profile.ModelDict({'name'       : 'PowerLaw',
+                                                              'PivotEnergy': 1.0*u.TeV,
+                                                              'Index'      : 2.5})
         
         #---------- Sampling
         self._Npt_per_decade_integ = 30
+        self._sampling_profile = {}
         self._map_coord  = SkyCoord(RA, Dec, frame="icrs")
         self._map_reso   = 0.02*u.deg
         self._map_fov    = [5.0, 5.0]*u.deg
         self._map_header = None
+        self._map_dtype  = 'float64'
+        self._map_geometry = None
+        self._map_renderer = None
+        self._pp_engine = None
+        self._electron_loss = None
+        self._sz_projection = None
+        self._shared_grids = None
         
     #==================================================
     # Get the hidden variable
@@ -366,6 +383,11 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         if not self._silent: print("Getting the number of point per decade used in integration")
         return self._Npt_per_decade_integ
 
+    @property
+    def sampling_profile(self):
+        if not self._silent: print("Getting the sampling profile")
+        return self._sampling_profile
+
     @property
     def map_coord(self):
         if not self._silent: print("Getting the map coord value")
@@ -386,6 +408,11 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         if not self._silent: print("Getting the map header value")
         return self._map_header
 
+    @property
+    def map_dtype(self):
+        if not self._silent: print("Getting the map dtype value")
+        return self._map_dtype
+
     #==================================================
     # Defines how the user can pass arguments and interconnections
     #==================================================
@@ -468,6 +495,10 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         else:
             raise TypeError("The coordinates can be a coord object, a {'RA','Dec'} dictionary, or a {'Glon', 'Glat'} dictionary.")
 
+        # The cached map geometry is no longer valid
+        self._map_geometry = None
+        self._map_renderer = None
+
         # Information
         if not self._silent: print("Setting coord value")
 
@@ -638,6 +669,7 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
 
         # Set parameters
         self._helium_mass_fraction = value
+        self._pp_engine = None
         
         # Information
         if not self._silent: print("Setting helium mass fraction value")
@@ -654,6 +686,7 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
 
         # Set parameters
         self._metallicity_sol = value
+        self._pp_engine = None
         
         # Information
         if not self._silent: print("Setting metallicity value")
@@ -670,6 +703,7 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
 
         # Set parameters
         self._abundance = value
+        self._pp_engine = None
         
         # Information
         if not self._silent: print("Setting abundance value")
@@ -751,6 +785,7 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         
         # Setting parameters
         self._Epmin = value
+        self._pp_engine = None
         
         # Information
         if not self._silent: print("Setting Epmin value")
@@ -769,6 +804,7 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         
         # Setting parameters
         self._Epmax = value
+        self._pp_engine = None
         
         # Information
         if not self._silent: print("Setting Epmax value")
@@ -788,6 +824,7 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         
         # Setting parameters
         self._pp_interaction_model = value
+        self._pp_engine = None
         
         # Information
         if not self._silent: print("Setting pp_interaction_model value")
@@ -795,12 +832,13 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
     @pressure_gas_model.setter
     def pressure_gas_model(self, value):
         # check type
-        if type(value) != dict :
+        if not isinstance(value, dict) :
             raise TypeError("The pressure gas model should be a dictionary containing the name key and relevant parameters")
         
         # Check the input parameters and use it
         Ppar = self._validate_profile_model_parameters(value, 'keV cm-3')
         self._pressure_gas_model = Ppar
+        self._compile_profile_model(self._pressure_gas_model)
         
         # Information
         if not self._silent: print("Setting pressure_gas_model value")
@@ -809,12 +847,13 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
     @density_gas_model.setter
     def density_gas_model(self, value):
         # check type
-        if type(value) != dict :
+        if not isinstance(value, dict) :
             raise TypeError("The density gas model should be a dictionary containing the name key and relevant parameters")
         
         # Continue if ok
         Ppar = self._validate_profile_model_parameters(value, 'cm-3')
         self._density_gas_model = Ppar
+        self._compile_profile_model(self._density_gas_model)
         
         # Information
         if not self._silent: print("Setting density_gas_model value")
@@ -823,12 +862,13 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
     @density_crp_model.setter
     def density_crp_model(self, value):
         # check type
-        if type(value) != dict :
+        if not isinstance(value, dict) :
             raise TypeError("The density CRp model should be a dictionary containing the name key and relevant parameters")
         
         # Continue if ok
         Ppar = self._validate_profile_model_parameters(value, '')
         self._density_crp_model = Ppar
+        self._compile_profile_model(self._density_crp_model)
         
         # Information
         if not self._silent: print("Setting density_crp_model value")
@@ -837,13 +877,14 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
     @magfield_model.setter
     def magfield_model(self, value):
         # check type
-        if type(value) != dict :
+        if not isinstance(value, dict) :
             raise TypeError("The magnetic field model should be a dictionary containing the name key and relevant parameters")
         
         # Continue if ok
         if not self._silent: print(value)
         Ppar = self._validate_profile_model_parameters(value, 'uG')
         self._magfield_model = Ppar
+        self._compile_profile_model(self._magfield_model)
         
         # Information
         if not self._silent: print("Setting magfield_model value")
@@ -852,12 +893,13 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
     @spectrum_crp_model.setter
     def spectrum_crp_model(self, value):
         # check type
-        if type(value) != dict :
+        if not isinstance(value, dict) :
             raise TypeError("The spectrum CRp model should be a dictionary containing the name key and relevant parameters")
 
         # Continue if ok
         Spar = self._validate_spectrum_model_parameters(value, '')
         self._spectrum_crp_model = Spar
+        self._compile_spectrum_model(self._spectrum_crp_model)
 
         # Information
         if not self._silent: print("Setting spectrum_crp_model value")
@@ -875,10 +917,19 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
 
         # Set parameters
         self._Npt_per_decade_integ = value
+        self._pp_engine = None
         
         # Information
         if not self._silent: print("Setting number of point per decade (for integration) value")
         
+    @sampling_profile.setter
+    def sampling_profile(self, value):
+        # Check and set parameters
+        self._sampling_profile = self._validate_sampling_profile(value)
+        
+        # Information
+        if not self._silent: print("Setting the sampling profile value")
+        
     @map_coord.setter
     def map_coord(self, value):
         err_msg = ("The coordinates can be a coord object, "
@@ -917,6 +968,8 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
 
         # Header to None
         self._map_header = None
+        self._map_geometry = None
+        self._map_renderer = None
 
         # Information
         if not self._silent: print("Setting the map coordinates")
@@ -937,6 +990,8 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         # Set parameters
         self._map_reso = value
         self._map_header = None
+        self._map_geometry = None
+        self._map_renderer = None
         
         # Information
         if not self._silent: print("Setting the map resolution value")
@@ -968,6 +1023,8 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
 
         # Set extra parameters
         self._map_header = None
+        self._map_geometry = None
+        self._map_renderer = None
 
         # Information
         if not self._silent: print("Setting the map field of view")
@@ -990,7 +1047,27 @@ class Cluster(Admin, Modpar, Physics, Observables, Plots):
         self._map_coord  = None
         self._map_reso   = None
         self._map_fov    = None
+        self._map_geometry = None
+        self._map_renderer = None
 
         # Information
         if not self._silent: print("Setting the map header")
         if not self._silent: print("Setting: map_coord, map_reso, map_fov to None, as the header will be used")
+
+    @map_dtype.setter
+    def map_dtype(self, value):
+        # Check the value
+        try:
+            dtype = np.dtype(value).name
+        except TypeError:
+            raise TypeError("The map dtype should be 'float64' or 'float32'")
+        if dtype not in ['float64', 'float32']:
+            raise ValueError("The map dtype should be 'float64' or 'float32'")
+
+        # Set parameters
+        self._map_dtype = dtype
+        self._map_geometry = None
+        self._map_renderer = None
+
+        # Information
+        if not self._silent: print("Setting the map dtype value")
@@ -3,20 +3,37 @@ This file deals with 'administrative' issues regarding the Cluster Class (e.g. s
 """
 
 import os
+import time
+import json
 import pprint
 import numpy as np
 import astropy.units as u
 from astropy import constants as const
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 from astropy.table import Table, Column
 from astropy.io import fits
 
 from ClusterModel.ClusterTools import map_tools
+from ClusterModel.ClusterTools import cluster_timing
+from ClusterModel.ClusterTools import cluster_pipeline
+from ClusterModel.ClusterTools import cluster_store
+from ClusterModel.ClusterTools import cluster_param
+from ClusterModel.ClusterTools import cluster_profile
+
+# Attributes used as caches, which are not parameters of the model
+CACHE_ATTRIBUTES = ['_profile_models', '_spectrum_models', '_map_geometry', '_map_renderer',
+                    '_pp_engine', '_electron_loss', '_sz_projection', '_shared_grids']
+
+# Model dictionaries, stored as versioned dictionaries for their compiled versions
+MODEL_ATTRIBUTES = ['_pressure_gas_model', '_density_gas_model', '_density_crp_model',
+                    '_magfield_model', '_spectrum_crp_model']
 
 #==================================================
 # Admin class
 #==================================================
 
+@cluster_timing.timed_methods
 class Admin(object):
     """ Admin class
     This class searves as a parser to the main Cluster class, to 
@@ -30,20 +47,41 @@ class Admin(object):
     ----------  
     - print_param(self): print the parameters.
     - save_param(self): save the current parameters describing the cluster object.
-    - load_param(self, param_file): load a given pre-saved parameter file. The parameter
-    file should contain the right parameters to avoid issues latter on.
+    - load_param(self, param_file, keys=None): load a given pre-saved parameter file, 
+    possibly only some of the parameters. The parameter file should contain the right 
+    parameters to avoid issues latter on.
+    - get_param_record(self): return the parameters as a JSON record and arrays, e.g. to 
+    transfer them to workers.
+    - set_param_record(self, record, keys=None): set the parameters from a record.
+    - tune_sampling_profile(self, prod_list=['all'], tolerance=1e-2, Npt_list=[5,...,40], 
+    Npt_reference=None, apply=True): calibrate the sampling of each product against a high 
+    resolution reference, and set the sampling profile.
 
+    - get_products(self, prod_list=['all'], radius=..., energy=..., energyX=..., frequency=..., ..., 
+    Normalize=False, Nthread=1): compute the profiles, spectra and maps in a single pass, sharing the 
+    intermediate grids, possibly with several threads. The products can then be saved and plotted.
     - save_profile(self, radius=np.logspace(0,4,1000)*u.kpc, prod_list=['all'], NR500max=5.0, 
     Npt_los=100, Energy_density=False, Epmin=None, Epmax=None, Egmin=10.0*u.MeV, Egmax=1.0*u.PeV):
     Save the profiles as fits and txt files.
     - save_spectra(self, energy=np.logspace(-2,6,1000)*u.GeV, prod_list=['all'], Rmax=None,
     NR500max=5.0, Npt_los=100): save the spectra as fits and txt files
     - save_map(self, prod_list=['all'], NR500max=5.0, Npt_los=100): save the maps as fits files
+    - save_map_cube(self, energy_edges=np.logspace(-1,5,31)*u.GeV, Energy_density=False): save 
+    the gamma ray, neutrino and IC energy binned map cubes as fits files
+    - save_sz_map_cube(self, frequency=[30,...,857]*u.GHz, Normalize=False): save the multi-frequency 
+    SZ map cube as a fits file
+    - save_products(self, products=None, prod_list=['all'], filename=None, mode='w', compress=True, 
+    entry=None): save the products and the parameters in a single binary file, possibly appending 
+    to a catalog of clusters
     
     - _save_txt_file(self, filename, col1, col2, col1_name, col2_name, ndec=20): internal method 
     dedicated to save data in special format
+    - _save_txt_files(self, files, Nthread=1): save several files with _save_txt_file, possibly 
+    with several threads
 
     - get_map_header(self) : return the map header.
+    - _get_map_geometry(self) : return the map header, R.A.-Dec. maps and cluster distance 
+    map, cached as long as the map and the cluster coordinates do not change.
 
     """
     
@@ -66,12 +104,11 @@ class Admin(object):
         pp = pprint.PrettyPrinter(indent=4)
         
         par = self.__dict__
-        keys = par.keys()
         
-        for k in range(len(keys)):
-            print('--- '+(keys[k])[1:])
-            print('    '+str(par[keys[k]]))
-            print('    '+str(type(par[keys[k]]))+'')
+        for key in par.keys():
+            print('--- '+key[1:])
+            print('    '+str(par[key]))
+            print('    '+str(type(par[key]))+'')
 
             
     #==================================================
@@ -80,7 +117,9 @@ class Admin(object):
     
     def save_param(self):
         """
-        Save the current parameters.
+        Save the current parameters, in parameters.json (and parameters.npz
+        for the large arrays, e.g. tabulated User profiles). The caches are
+        not saved.
         
         Parameters
         ----------
@@ -95,65 +134,369 @@ class Admin(object):
         if not os.path.exists(self._output_dir): os.mkdir(self._output_dir)
 
         # Save
-        with open(self._output_dir+'/parameters.pkl', 'wb') as pfile:
-            pickle.dump(self.__dict__, pfile, pickle.HIGHEST_PROTOCOL)
+        cluster_param.save(self._output_dir+'/parameters', self._get_param())
 
         # Text file for user
         par = self.__dict__
-        keys = par.keys()
         with open(self._output_dir+'/parameters.txt', 'w') as txtfile:
-            for k in range(len(keys)):
-                txtfile.write('--- '+(keys[k])[1:]+'\n')
-                txtfile.write('    '+str(par[keys[k]])+'\n')
-                txtfile.write('    '+str(type(par[keys[k]]))+'\n')
+            for key in par.keys():
+                txtfile.write('--- '+key[1:]+'\n')
+                txtfile.write('    '+str(par[key])+'\n')
+                txtfile.write('    '+str(type(par[key]))+'\n')
 
                 
     #==================================================
     # Print parameters
     #==================================================
     
-    def load_param(self, param_file):
+    def load_param(self, param_file, keys=None):
         """
         Read the a given parameter file to re-initialize the cluster object.
+        Only some parameters can be read, e.g. those needed for a given product, 
+        in which case the other ones are kept. Otherwise, the parameters missing
+        from the file (e.g. saved by a previous version) take their default value.
+        The parameters are set as saved: the derived ones (e.g. D_ang, R500, 
+        theta500 for the redshift) are not recomputed and should be in the list. 
+        Parameter files saved as pickle (.pkl) by previous versions can also be read.
+        
+        Parameters
+        ----------
+        param_file (str): the parameter file to be read (.json, or .pkl)
+        keys (list): the name of the parameters to read (default is all)
+            
+        Outputs
+        ----------
+            
+        """
+
+        if os.path.splitext(param_file)[1] == '.pkl':
+            with open(param_file, 'rb') as pfile:
+                par = pickle.load(pfile)
+            par = {key[1:]: value for key, value in par.items() if key not in CACHE_ATTRIBUTES}
+            if keys is not None:
+                par = {key: par[key] for key in keys}
+        else:
+            par = cluster_param.load(param_file, keys=keys)
+
+        self._set_param(par, replace=keys is None)
+
+
+    #==================================================
+    # Parameters as a record
+    #==================================================
+    
+    def get_param_record(self):
+        """
+        Get the parameters as a record, i.e. the JSON text and the large 
+        arrays as saved by save_param. The record does not depend on the 
+        installed version of the code, e.g. to send the parameters to 
+        workers in parallel runs.
         
         Parameters
         ----------
-        param_file (str): the parameter file to be read
             
         Outputs
         ----------
+        - record (tuple): the JSON text (str) and the arrays (dict)
             
         """
 
-        with open(param_file, 'rb') as pfile:
-            par = pickle.load(pfile)
+        return cluster_param.encode(self._get_param())
+
+
+    def set_param_record(self, record, keys=None):
+        """
+        Set the parameters from a record given by get_param_record, 
+        possibly only some of them (see load_param).
+        
+        Parameters
+        ----------
+        - record (tuple): the JSON text (str) and the arrays (dict)
+        - keys (list): the name of the parameters to set (default is all)
+            
+        Outputs
+        ----------
             
-        self.__dict__ = par
+        """
+
+        text, arrays = record
+        self._set_param(cluster_param.decode(text, arrays=arrays, keys=keys), replace=keys is None)
+
+
+    def _get_param(self):
+        """
+        Get the parameters describing the cluster, without the caches.
+        
+        Parameters
+        ----------
+            
+        Outputs
+        ----------
+        - par (dict): the parameters, name (without underscore) -> value
+            
+        """
+
+        return {key[1:]: value for key, value in self.__dict__.items() if key not in CACHE_ATTRIBUTES}
+
+
+    def _set_param(self, par, replace=False):
+        """
+        Set the parameters describing the cluster, and reset the caches.
+        
+        Parameters
+        ----------
+        - par (dict): the parameters, name (without underscore) -> value
+        - replace (bool): first reset all the parameters to their default
+        values, so that the ones missing from par (e.g. added after the
+        parameters were saved) are defined
+            
+        Outputs
+        ----------
+            
+        """
+
+        if replace:
+            self.__init__(silent=True)
+        for key, value in par.items():
+            setattr(self, '_'+key, value)
+        for key in MODEL_ATTRIBUTES:
+            if isinstance(getattr(self, key), dict):
+                setattr(self, key, cluster_profile.ModelDict(getattr(self, key)))
+
+        self._profile_models = {}
+        self._spectrum_models = {}
+        for key in CACHE_ATTRIBUTES:
+            if key not in ['_profile_models', '_spectrum_models']:
+                setattr(self, key, None)
 
         
     #==================================================
-    # Save profile
+    # Tune the sampling profile
     #==================================================
     
-    def save_profile(self, radius=np.logspace(0,4,100)*u.kpc,
+    def tune_sampling_profile(self, prod_list=['all'], tolerance=1e-2,
+                              Npt_list=[5, 10, 15, 20, 30, 40],
+                              Npt_reference=None, apply=True):
+        """
+        Calibrate the number of points per decade used for each product and each 
+        sampling axis, i.e. the sampling profile. Test spectra and profiles are 
+        computed with all axes, and Npt_per_decade_integ (which sets the CRp and 
+        CRe energy grids), sampled at Npt_reference. Each axis is then 
+        decreased in turn, along Npt_list, and the smallest value for which the 
+        test quantities remain within tolerance/Naxis of the reference is kept. 
+        The combined sampling, used with the current Npt_per_decade_integ, is 
+        finally checked against the reference, and all the axes are increased to 
+        the next value of Npt_list until the tolerance is met. Otherwise, all 
+        the axes are set to Npt_per_decade_integ, and if the tolerance is still 
+        not met the product is not tuned (Npt_per_decade_integ should be increased).
+        The relative error is computed as |x-x_ref| / (|x_ref| + 1e-3 max|x_ref|), 
+        so that zero crossings (e.g. SZ spectrum) do not dominate. Non finite 
+        reference values are ignored.
+        
+        Parameters
+        ----------
+        - prod_list (list): the products to calibrate, 'gamma', 'neutrino', 'ic', 
+        'synchrotron', 'sz', 'xray' (needs the XSPEC table) or 'all'
+        - tolerance (float): the maximum relative error allowed
+        - Npt_list (list): the number of points per decade tested, in increasing order
+        - Npt_reference (int): the number of points per decade of the reference 
+        (default is 2 x Npt_per_decade_integ)
+        - apply (bool): set the sampling_profile of the cluster with the result. 
+        Otherwise, the sampling profile is left unchanged.
+
+        Outputs
+        ----------
+        - profile (dict): the sampling profile, as {product: {axis: Npt}}
+        - report (dict): for each product, the sampling, the relative error, and 
+        the computing time of the test quantities for the tuned and reference sampling
+
+        """
+
+        if Npt_reference is None:
+            Npt_reference = 2*self._Npt_per_decade_integ
+        candidates = [Npt for Npt in sorted(Npt_list) if Npt < Npt_reference]
+
+        # Test quantities of each product, and axes on which they depend
+        radius = np.logspace(1, 3.5, 20)*u.kpc
+        energy = np.logspace(-1, 5, 20)*u.GeV
+        Rmax = self._R500
+        
+        def test_gamma():
+            return [self.get_gamma_spectrum(energy, Rmax=Rmax, type_integral='cylindrical')[1],
+                    self.get_gamma_profile(radius)[1]]
+        def test_neutrino():
+            return [self.get_neutrino_spectrum(energy, Rmax=Rmax, type_integral='cylindrical')[1],
+                    self.get_neutrino_profile(radius)[1]]
+        def test_ic():
+            return [self.get_ic_spectrum(energy, Rmax=Rmax, type_integral='cylindrical')[1],
+                    self.get_ic_profile(radius)[1]]
+        def test_synchrotron():
+            return [self.get_synchrotron_spectrum(np.logspace(-2, 2, 20)*u.GHz, Rmax=Rmax, type_integral='cylindrical')[1],
+                    self.get_synchrotron_profile(radius)[1]]
+        def test_sz():
+            return [self.get_sz_spectrum(np.logspace(1, 3, 20)*u.GHz, Rmax=Rmax, type_integral='cylindrical')[1],
+                    self.get_sz_profile(radius)[1]]
+        def test_xray():
+            return [self.get_xray_spectrum(np.linspace(0.5, 10, 20)*u.keV, Rmax=Rmax, type_integral='cylindrical')[1],
+                    self.get_xray_profile(radius)[1]]
+
+        tests = {'gamma':       (test_gamma,       ['radius', 'los', 'energy']),
+                 'neutrino':    (test_neutrino,    ['radius', 'los', 'energy']),
+                 'ic':          (test_ic,          ['radius', 'los', 'energy', 'electron']),
+                 'synchrotron': (test_synchrotron, ['radius', 'los', 'electron']),
+                 'sz':          (test_sz,          ['radius', 'los']),
+                 'xray':        (test_xray,        ['radius', 'los'])}
+
+        if prod_list == ['all']:
+            prod_list = list(tests.keys())
+            if not os.path.exists(self._output_dir+'/XSPEC_table.txt'):
+                prod_list.remove('xray')
+        for product in prod_list:
+            if product not in tests.keys():
+                raise ValueError("The product should be one of "+str(list(tests.keys())))
+
+        def evaluate(product, sampling, Npt_integ):
+            self._Npt_per_decade_integ = Npt_integ
+            self._sampling_profile[product] = sampling
+            t0 = time.time()
+            res = [q.value for q in tests[product][0]()]
+            return res, time.time() - t0
+
+        def error(res, ref):
+            err = 0.0
+            for x, x0 in zip(res, ref):
+                w = np.isfinite(x0)
+                if np.sum(w) > 0:
+                    x, x0 = x[w], x0[w]
+                    err = np.amax([err, np.amax(np.abs(x-x0) / (np.abs(x0) + 1e-3*np.amax(np.abs(x0))))])
+            return err
+
+        def next_candidate(Npt):
+            larger = [c for c in candidates if c > Npt]
+            return larger[0] if len(larger) > 0 else Npt_reference
+
+        # Calibrate
+        old_profile = {product: dict(val) for product, val in self._sampling_profile.items()}
+        Npt_integ = self._Npt_per_decade_integ
+        profile = {}
+        report  = {}
+        try:
+            for product in prod_list:
+                axes = tests[product][1]
+                reference = {axis: Npt_reference for axis in axes}
+                ref, t_ref = evaluate(product, reference, Npt_reference)
+                if not np.any([np.any(np.isfinite(x0)) for x0 in ref]):
+                    print('!!! WARNING: the '+product+' reference is not finite, its sampling is not tuned')
+                    continue
+
+                # Sampling of each axis, the other ones being at the reference
+                tuned = {}
+                for axis in axes:
+                    tuned[axis] = Npt_reference
+                    for Npt in candidates:
+                        sampling = dict(reference)
+                        sampling[axis] = Npt
+                        res, t = evaluate(product, sampling, Npt_reference)
+                        if error(res, ref) <= tolerance/len(axes):
+                            tuned[axis] = Npt
+                            break
+
+                # Check the combined sampling, as it will be used, against the reference
+                while True:
+                    res, t = evaluate(product, dict(tuned), Npt_integ)
+                    err = error(res, ref)
+                    if err <= tolerance or all([tuned[axis] == Npt_reference for axis in axes]):
+                        break
+                    tuned = {axis: next_candidate(tuned[axis]) for axis in axes}
+
+                # The errors of the axes and of the energy grids can compensate when they 
+                # share the same sampling, so fall back to Npt_per_decade_integ on all axes
+                if err > tolerance:
+                    default = {axis: Npt_integ for axis in axes}
+                    res, t_default = evaluate(product, default, Npt_integ)
+                    err_default = error(res, ref)
+                    if err_default < err:
+                        tuned, err, t = default, err_default, t_default
+
+                report[product] = {'sampling': tuned, 'error': err, 'time': t, 'reference_time': t_ref}
+                if err <= tolerance:
+                    profile[product] = tuned
+                else:
+                    print('!!! WARNING: the '+product+' tolerance is not reached with Npt_per_decade_integ = '+
+                          str(Npt_integ)+' (error = '+str(err)+'), its sampling is not tuned')
+                if not self._silent:
+                    print('----- '+product+': '+str(tuned)+', error = '+str(err)+
+                          ', time = '+str(t)+' s (reference: '+str(t_ref)+' s)')
+        finally:
+            self._sampling_profile = old_profile
+            self._Npt_per_decade_integ = Npt_integ
+
+        if apply:
+            for product in profile.keys():
+                self._sampling_profile[product] = dict(profile[product])
+
+        return profile, report
+
+        
+    #==================================================
+    # Compute the products
+    #==================================================
+    
+    def get_products(self, prod_list=['all'],
+                     radius=np.logspace(0,4,100)*u.kpc,
+                     energy=np.logspace(-2,7,100)*u.GeV,
+                     energyX=np.linspace(0.1,20,100)*u.keV,
+                     frequency=np.logspace(-2,3,100)*u.GHz,
                      Epmin=None, Epmax=None,
                      Eemin=None, Eemax=None,
                      freq0=1*u.GHz,
-                     Egmin=None, Egmax=None):
-        
+                     Rmax=None,
+                     Egmin=None, Egmax=None,
+                     Normalize=False,
+                     energy_edges=np.logspace(-1,5,31)*u.GeV,
+                     frequency_cube=np.array([30.0, 44.0, 70.0, 100.0, 143.0, 217.0, 353.0, 545.0, 857.0])*u.GHz,
+                     Nthread=1):
         """
-        Save the profiles in a file
+        Compute the profiles, spectra and maps in a single pass. The products
+        are the nodes of a dependency graph: what is shared by several 
+        products (the CRp normalization, the pp spectra, the CRe steady state,
+        the map geometry) is computed only once, and the independent products
+        can be computed by several threads. The results can then be saved
+        and plotted without computing them again, see save_profile, 
+        save_spectra, save_map and plot.
         
         Parameters
         ----------
-        - radius (quantity): the 3d radius in unit of kpc
+        - prod_list (list): the products to compute: 'profile', 'spectra', 'map', 'cube' or 'all'.
+        'all' stands for the profiles, spectra and maps: the map cubes, which are much longer
+        to compute, should be requested explicitly.
+        - radius (quantity): the 3d radius of the profiles in unit of kpc
+        - energy (quantity) : the physical energy for CR related spectra
+        - energyX (quantity) : the physical energy for Xray spectra
+        - frequency (quantity) : the frequency of synchrotron and SZ spectra
         - Epmin (quantity): the lower bound for energy proton integration
         - Epmax (quantity): the upper bound for energy proton integration
         - Eemin (quantity): the lower bound for energy electron integration
         - Eemax (quantity): the upper bound for energy electron integration
         - freq0 (quantity): the frequency used to compute synchrotron emission
+        - Rmax (quantity): the radius within with the spectra are computed 
+        (default is R500)
         - Egmin (quantity): the lower bound for energy gamma integration
         - Egmax (quantity): the upper bound for energy gamma integration
+        - Normalize (bool): to normalize the maps to the total flux
+        - energy_edges (quantity): the edges of the energy bins of the gamma ray, neutrino and 
+        IC map cubes
+        - frequency_cube (quantity): the frequencies of the SZ map cube planes
+        - Nthread (int): the number of threads used to compute independent products
+
+        Outputs
+        ----------
+        - products (dict): the requested groups, 'profile' (with the radius), 
+        'spectra' (with the energy, frequency and energyX, and energyX_center,
+        the center of the energy bins of the Xray spectrum), 'map' (with the
+        header) and 'cube' (with the header, energy_edges and frequency), each 
+        being a dictionary of quantities, and 'param' giving the integration 
+        bounds used
 
         """
         
@@ -166,186 +509,238 @@ class Admin(object):
             Eemin = (const.m_e*const.c**2).to('GeV')
         if Eemax is None:
             Eemax = self._Epmax
+        if Rmax is None:
+            Rmax = self._R500
         if Egmin is None:
             Egmin = self._Epmin/10.0
         if Egmax is None:
             Egmax = self._Epmax
 
+        xspec = os.path.exists(self._output_dir+'/XSPEC_table.txt')
+
+        #========== List the products: (group, name, function, dependencies)
+        CR = ['crp_normalization']
+        leaves = []
+        
+        #---------- Profiles
+        if 'all' in prod_list or 'profile' in prod_list:
+            leaves += [
+                ('profile', 'p_e', lambda: self.get_pressure_gas_profile(radius)[1], []),
+                ('profile', 'n_e', lambda: self.get_density_gas_profile(radius)[1], []),
+                ('profile', 't_gas', lambda: self.get_temperature_gas_profile(radius)[1], []),
+                ('profile', 'k_gas', lambda: self.get_entropy_gas_profile(radius)[1], []),
+                ('profile', 'm_hse', lambda: self.get_hse_mass_profile(radius)[1], []),
+                ('profile', 'overdensity', lambda: self.get_overdensity_contrast_profile(radius)[1], []),
+                ('profile', 'm_gas', lambda: self.get_gas_mass_profile(radius)[1], []),
+                ('profile', 'f_gas', lambda: self.get_fgas_profile(radius)[1], []),
+                ('profile', 'u_th', lambda: self.get_thermal_energy_profile(radius)[1], []),
+                ('profile', 'B', lambda: self.get_magfield_profile(radius)[1], []),
+                ('profile', 'n_crp', lambda: self.get_density_crp_profile(radius, Emin=Epmin, Emax=Epmax,
+                                                                          Energy_density=False)[1], CR),
+                ('profile', 'x_crp', lambda: self.get_crp_to_thermal_energy_profile(radius, Emin=Epmin, Emax=Epmax)[1], CR),
+                ('profile', 'n_cre', lambda: self.get_density_cre_profile(radius, Emin=Eemin, Emax=Eemax,
+                                                                          Energy_density=False)[1], CR),
+                ('profile', 'Sg', lambda: self.get_gamma_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False)[1], CR),
+                ('profile', 'Fg', lambda: self.get_gamma_flux(Rmax=radius, Emin=Egmin, Emax=Egmax, Energy_density=False,
+                                                              type_integral='spherical'), CR),
+                ('profile', 'Snu', lambda: self.get_neutrino_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False,
+                                                                     flavor='all')[1], CR),
+                ('profile', 'Fnu', lambda: self.get_neutrino_flux(Rmax=radius, Emin=Egmin, Emax=Egmax, Energy_density=False,
+                                                                  type_integral='spherical', flavor='all'), CR),
+                ('profile', 'Sic', lambda: self.get_ic_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False)[1], CR),
+                ('profile', 'Fic', lambda: self.get_ic_flux(Rmax=radius, Emin=Egmin, Emax=Egmax, Energy_density=False,
+                                                            type_integral='spherical'), CR),
+                ('profile', 'Ssynch', lambda: self.get_synchrotron_profile(radius, freq0=freq0)[1], CR),
+                ('profile', 'Fsynch', lambda: self.get_synchrotron_flux(Rmax=radius, freq0=freq0, type_integral='spherical'), CR),
+                ('profile', 'Ssz', lambda: self.get_sz_profile(radius, Compton_only=True)[1], []),
+                ('profile', 'Fsz', lambda: self.get_sz_flux(Rmax=radius, Compton_only=True, type_integral='spherical'), [])]
+            if xspec:
+                leaves += [
+                    ('profile', 'Sx', lambda: self.get_xray_profile(radius, output_type='C')[1], []),
+                    ('profile', 'Fx', lambda: self.get_xray_flux(Rmax=radius, output_type='C', type_integral='spherical'), [])]
+
+        #---------- Spectra
+        if 'all' in prod_list or 'spectra' in prod_list:
+            leaves += [
+                ('spectra', 'CRp', lambda: self.get_crp_spectrum(energy, Rmax=Rmax)[1], CR),
+                ('spectra', 'CRe', lambda: self.get_cre_spectrum(energy, Rmax=Rmax)[1], CR),
+                ('spectra', 'gamma', lambda: self.get_gamma_spectrum(energy, Rmax=Rmax, type_integral='spherical')[1], CR),
+                ('spectra', 'gammaF', lambda: self.get_gamma_flux(Emin=energy, Emax=Egmax, Rmax=Rmax, Energy_density=False,
+                                                                  type_integral='spherical'), CR),
+                ('spectra', 'nu', lambda: self.get_neutrino_spectrum(energy, Rmax=Rmax, type_integral='spherical',
+                                                                     flavor='all')[1], CR),
+                ('spectra', 'nuF', lambda: self.get_neutrino_flux(Emin=energy, Emax=Egmax, Rmax=Rmax, Energy_density=False,
+                                                                  type_integral='spherical', flavor='all'), CR),
+                ('spectra', 'IC', lambda: self.get_ic_spectrum(energy, Rmax=Rmax, type_integral='spherical')[1], CR),
+                ('spectra', 'ICF', lambda: self.get_ic_flux(Emin=energy, Emax=Egmax, Rmax=Rmax, Energy_density=False,
+                                                            type_integral='spherical'), CR),
+                ('spectra', 'synch', lambda: self.get_synchrotron_spectrum(frequency, Rmax=Rmax, type_integral='spherical')[1], CR),
+                ('spectra', 'SZ', lambda: self.get_sz_spectrum(frequency, Rmax=Rmax, type_integral='spherical',
+                                                               Compton_only=False)[1], [])]
+            if xspec:
+                leaves += [
+                    ('spectra', 'Xray', lambda: self.get_xray_spectrum(energyX, Rmax=Rmax, type_integral='spherical',
+                                                                       output_type='C'), [])]
+
+        #---------- Maps
+        if 'all' in prod_list or 'map' in prod_list:
+            MAP = ['map_geometry']
+            leaves += [
+                ('map', 'gamma', lambda: self.get_gamma_map(Emin=Egmin, Emax=Egmax, Energy_density=False,
+                                                            Normalize=Normalize), CR+MAP),
+                ('map', 'neutrino', lambda: self.get_neutrino_map(Emin=Egmin, Emax=Egmax, Energy_density=False,
+                                                                  Normalize=Normalize, flavor='all'), CR+MAP),
+                ('map', 'ic', lambda: self.get_ic_map(Emin=Egmin, Emax=Egmax, Energy_density=False,
+                                                      Normalize=Normalize), CR+MAP),
+                ('map', 'synchrotron', lambda: self.get_synchrotron_map(freq0=freq0, Normalize=Normalize), CR+MAP),
+                ('map', 'sz', lambda: self.get_sz_map(Compton_only=True, Normalize=Normalize), MAP)]
+            if xspec:
+                leaves += [
+                    ('map', 'xray', lambda: self.get_xray_map(output_type='C', Normalize=Normalize), MAP)]
+
+        #---------- Map cubes
+        if 'cube' in prod_list:
+            MAP = ['map_geometry']
+            leaves += [
+                ('cube', 'gamma', lambda: self.get_gamma_map_cube(energy_edges=energy_edges, Energy_density=False), CR+MAP),
+                ('cube', 'neutrino', lambda: self.get_neutrino_map_cube(energy_edges=energy_edges, Energy_density=False,
+                                                                        flavor='all'), CR+MAP),
+                ('cube', 'ic', lambda: self.get_ic_map_cube(energy_edges=energy_edges, Energy_density=False), CR+MAP),
+                ('cube', 'sz', lambda: self.get_sz_map_cube(frequency=frequency_cube, Normalize=Normalize), MAP)]
+
+        #========== Build the graph: the shared quantities are kept in the store of the run,
+        # the graph makes sure they are computed before the products which need them
+        graph = cluster_pipeline.ProductGraph()
+        graph.add('crp_normalization', self._get_crp_normalization)
+        graph.add('map_geometry', self._get_map_geometry)
+        for group, name, func, deps in leaves:
+            graph.add(group+'/'+name, lambda *shared, func=func: func(), deps=deps)
+
+        #========== Compute
+        previous = self._shared_grids
+        self._shared_grids = cluster_pipeline.SharedGrids()
+        try:
+            results = graph.run([group+'/'+name for group, name, func, deps in leaves], Nthread=Nthread)
+        finally:
+            self._shared_grids = previous
+
+        #========== Gather the products
+        products = {'param': {'Epmin':Epmin, 'Epmax':Epmax, 'Eemin':Eemin, 'Eemax':Eemax,
+                              'Egmin':Egmin, 'Egmax':Egmax, 'freq0':freq0, 'Rmax':Rmax, 'Normalize':Normalize}}
+        if 'all' in prod_list or 'profile' in prod_list:
+            products['profile'] = {'radius': radius}
+        if 'all' in prod_list or 'spectra' in prod_list:
+            products['spectra'] = {'energy': energy, 'frequency': frequency, 'energyX': energyX}
+        if 'all' in prod_list or 'map' in prod_list:
+            products['map'] = {'header': self.get_map_header()}
+        if 'cube' in prod_list:
+            products['cube'] = {'header': self.get_map_header(), 'energy_edges': energy_edges, 'frequency': frequency_cube}
+        for group, name, func, deps in leaves:
+            products[group][name] = results[group+'/'+name]
+
+        # The Xray spectrum is given at the center of the energy bins
+        if 'spectra' in products and 'Xray' in products['spectra']:
+            products['spectra']['energyX_center'], products['spectra']['Xray'] = products['spectra']['Xray']
+            
+        return products
+
+    
+    #==================================================
+    # Save profile
+    #==================================================
+    
+    def save_profile(self, radius=np.logspace(0,4,100)*u.kpc,
+                     Epmin=None, Epmax=None,
+                     Eemin=None, Eemax=None,
+                     freq0=1*u.GHz,
+                     Egmin=None, Egmax=None,
+                     products=None,
+                     Nthread=1):
+        
+        """
+        Save the profiles in a file
+        
+        Parameters
+        ----------
+        - radius (quantity): the 3d radius in unit of kpc
+        - Epmin (quantity): the lower bound for energy proton integration
+        - Epmax (quantity): the upper bound for energy proton integration
+        - Eemin (quantity): the lower bound for energy electron integration
+        - Eemax (quantity): the upper bound for energy electron integration
+        - freq0 (quantity): the frequency used to compute synchrotron emission
+        - Egmin (quantity): the lower bound for energy gamma integration
+        - Egmax (quantity): the upper bound for energy gamma integration
+        - products (dict): the products computed with get_products, to save them
+        without computing them again. The other parameters are then not used.
+        - Nthread (int): the number of threads used to write the text files
+
+        """
+        
+        #========== Compute the profiles
+        if products is None or 'profile' not in products:
+            products = self.get_products(['profile'], radius=radius, Epmin=Epmin, Epmax=Epmax,
+                                         Eemin=Eemin, Eemax=Eemax, freq0=freq0, Egmin=Egmin, Egmax=Egmax)
+        prof  = products['profile']
+        param = products['param']
+        radius = prof['radius']
+
         #========== Create the output directory if needed
         if not os.path.exists(self._output_dir): os.mkdir(self._output_dir)
         
         #========== Create a dataframe to store all spectra in a single fits table
         tab  = Table()
         tab['Radius'] = Column(radius.to_value('kpc'), unit='kpc', description='Radius')
-        
-        #---------- pressure
-        rad, prof = self.get_pressure_gas_profile(radius)
-        tab['p_e'] = Column(prof.to_value('keV cm-3'), unit='keV cm-3', description='Thermal electron pressure')
-        self._save_txt_file(self._output_dir+'/PROF_gas_pressure.txt',
-                            radius.to_value('kpc'), prof.to_value('keV cm-3'), 'radius (kpc)', 'pressure (keV cm-3)')
-
-        #---------- density
-        rad, prof = self.get_density_gas_profile(radius)
-        tab['n_e'] = Column(prof.to_value('cm-3'), unit='cm-3', description='Thermal electron density')
-        self._save_txt_file(self._output_dir+'/PROF_gas_density.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-3'), 'radius (kpc)', 'density (cm-3)')
-
-        #---------- temperature
-        rad, prof = self.get_temperature_gas_profile(radius)
-        tab['t_gas'] = Column(prof.to_value('keV'), unit='keV', description='Thermal gas temperature')
-        self._save_txt_file(self._output_dir+'/PROF_gas_temperature.txt',
-                            radius.to_value('kpc'), prof.to_value('keV'), 'radius (kpc)', 'temperature (keV)')
-            
-        #---------- Entropy
-        rad, prof = self.get_entropy_gas_profile(radius)
-        tab['k_gas'] = Column(prof.to_value('keV cm2'), unit='keV cm2', description='Thermal gas entropy')
-        self._save_txt_file(self._output_dir+'/PROF_gas_entropy.txt',
-                            radius.to_value('kpc'), prof.to_value('keV cm2'), 'radius (kpc)', 'entropy (keV cm2)')
-
-        #---------- Masse HSE
-        rad, prof = self.get_hse_mass_profile(radius)
-        tab['m_hse'] = Column(prof.to_value('Msun'), unit='Msun', description='Enclosed hydrostatic mass')
-        self._save_txt_file(self._output_dir+'/PROF_hse_mass.txt',
-                            radius.to_value('kpc'), prof.to_value('Msun'), 'radius (kpc)', 'mass HSE (Msun)')
-
-        #---------- Overdensity
-        rad, prof = self.get_overdensity_contrast_profile(radius)
-        tab['overdensity'] = Column(prof.to_value('adu'), unit='adu', description='Enclosed overdensity wrt critical density')
-        self._save_txt_file(self._output_dir+'/PROF_overdensity.txt',
-                            radius.to_value('kpc'), prof.to_value('adu'), 'radius (kpc)', 'overdensity')
-        
-        #---------- Gas mass
-        rad, prof = self.get_gas_mass_profile(radius)
-        tab['m_gas'] = Column(prof.to_value('Msun'), unit='Msun', description='Enclosed gas mass')
-        self._save_txt_file(self._output_dir+'/PROF_gas_mass.txt',
-                            radius.to_value('kpc'), prof.to_value('Msun'), 'radius (kpc)', 'mass gas (Msun)')
-
-        #---------- fgas profile
-        rad, prof = self.get_fgas_profile(radius)
-        tab['f_gas'] = Column(prof.to_value('adu'), unit='adu', description='Enclosed gas fraction')
-        self._save_txt_file(self._output_dir+'/PROF_gas_fraction.txt',
-                            radius.to_value('kpc'), prof.to_value('adu'), 'radius (kpc)', 'fraction gas')
-
-        #---------- Thermal energy
-        rad, prof = self.get_thermal_energy_profile(radius)
-        tab['u_th'] = Column(prof.to_value('erg'), unit='erg', description='Enclosed gas thermal energy')
-        self._save_txt_file(self._output_dir+'/PROF_gas_thermal_energy.txt',
-                            radius.to_value('kpc'), prof.to_value('erg'), 'radius (kpc)', 'thermal energy (erg)')
-
-        #---------- magfield
-        rad, prof = self.get_magfield_profile(radius)
-        tab['B'] = Column(prof.to_value('uG'), unit='uG', description='Magnetic field')
-        self._save_txt_file(self._output_dir+'/PROF_magnetic_field.txt',
-                            radius.to_value('kpc'), prof.to_value('uG'), 'radius (kpc)', 'B field (uG)')
-            
-        #---------- Cosmic ray proton
-        rad, prof = self.get_density_crp_profile(radius, Emin=Epmin, Emax=Epmax, Energy_density=False)
-        tab['n_crp'] = Column(prof.to_value('cm-3'), unit='cm-3', description='Cosmic ray proton density')
-        self._save_txt_file(self._output_dir+'/PROF_crp_density.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-3'), 'radius (kpc)', 'density (cm-3)')
-
-        #---------- Cosmic ray to thermal energy
-        rad, prof = self.get_crp_to_thermal_energy_profile(radius, Emin=Epmin, Emax=Epmax)
-        tab['x_crp'] = Column(prof.to_value('adu'), unit='adu', description='Enclosed cosmic ray to thermal energy')
-        self._save_txt_file(self._output_dir+'/PROF_fraction_energy_cosmic_to_thermal.txt',
-                            radius.to_value('kpc'), prof.to_value('adu'),
-                            'radius (kpc)', 'x')
-
-        #---------- Cosmic ray electron
-        rad, prof = self.get_density_cre_profile(radius, Emin=Eemin, Emax=Eemax, Energy_density=False)
-        tab['n_cre'] = Column(prof.to_value('cm-3'), unit='cm-3', description='Cosmic ray electron density')
-        self._save_txt_file(self._output_dir+'/PROF_cre_density.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-3'), 'radius (kpc)', 'density (cm-3)')
-
-        #---------- Gamma surface brightness
-        rad, prof = self.get_gamma_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False)
-        tab['Sg'] = Column(prof.to_value('cm-2 s-1 sr-1'), unit='cm-2 s-1 sr-1', description='Gamma surface brightness')
-        self._save_txt_file(self._output_dir+'/PROF_gamma_surface_brightness.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-2 s-1 sr-1'), 'radius (kpc)',
-                            'gamma SB (cm-2 s-1 sr-1)')
-        
-        #---------- Gamma integrated flux
-        prof = self.get_gamma_flux(Rmax=radius, Emin=Egmin, Emax=Egmax, Energy_density=False, type_integral='spherical')
-        tab['Fg'] = Column(prof.to_value('cm-2 s-1'), unit='cm-2 s-1', description='Gamma flux')
-        self._save_txt_file(self._output_dir+'/PROF_gamma_flux.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-2 s-1'), 'radius (kpc)', 'gamma flux (cm-2 s-1)')
-
-        #---------- Neutrinos surface brightness
-        rad, prof = self.get_neutrino_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False, flavor='all')
-        tab['Snu'] = Column(prof.to_value('cm-2 s-1 sr-1'), unit='cm-2 s-1 sr-1', description='Neutrino surface brightness')
-        self._save_txt_file(self._output_dir+'/PROF_neutrino_surface_brightness.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-2 s-1 sr-1'), 'radius (kpc)',
-                            'neutrino SB (cm-2 s-1 sr-1)')
-        
-        #---------- Neutrinos integrated flux
-        prof = self.get_neutrino_flux(Rmax=radius, Emin=Egmin, Emax=Egmax, Energy_density=False, type_integral='spherical',
-                                      flavor='all')
-        tab['Fnu'] = Column(prof.to_value('cm-2 s-1'), unit='cm-2 s-1', description='Neutrino flux')
-        self._save_txt_file(self._output_dir+'/PROF_neutrino_flux.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-2 s-1'), 'radius (kpc)', 'neutrino flux (cm-2 s-1)')
-
-        #---------- IC surface brightness
-        rad, prof = self.get_ic_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False)
-        tab['Sic'] = Column(prof.to_value('cm-2 s-1 sr-1'), unit='cm-2 s-1 sr-1', description='IC surface brightness')
-        self._save_txt_file(self._output_dir+'/PROF_ic_surface_brightness.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-2 s-1 sr-1'), 'radius (kpc)',
-                            'IC SB (cm-2 s-1 sr-1)')
-        
-        #---------- IC integrated flux
-        prof = self.get_ic_flux(Rmax=radius, Emin=Egmin, Emax=Egmax, Energy_density=False, type_integral='spherical')
-        tab['Fic'] = Column(prof.to_value('cm-2 s-1'), unit='cm-2 s-1', description='IC flux')
-        self._save_txt_file(self._output_dir+'/PROF_ic_flux.txt',
-                            radius.to_value('kpc'), prof.to_value('cm-2 s-1'), 'radius (kpc)', 'IC flux (cm-2 s-1)')
-        
-        #---------- Synchrotron surface brightness
-        rad, prof = self.get_synchrotron_profile(radius, freq0=freq0)
-        tab['Ssynch'] = Column(prof.to_value('Jy sr-1'), unit='Jy sr-1', description='Synchrotron surface brightness')
-        self._save_txt_file(self._output_dir+'/PROF_synchrotron_surface_brightness.txt',
-                            radius.to_value('kpc'), prof.to_value('Jy sr-1'), 'radius (kpc)', 'Synch SB (Jy sr-1)')
-        
-        #---------- Synchrotron integrated flux
-        prof = self.get_synchrotron_flux(Rmax=radius, freq0=freq0, type_integral='spherical')
-        tab['Fsynch'] = Column(prof.to_value('Jy'), unit='Jy', description='Synchrotron flux')
-        self._save_txt_file(self._output_dir+'/PROF_synchrotron_flux.txt',
-                            radius.to_value('kpc'), prof.to_value('Jy'), 'radius (kpc)', 'Synch flux (Jy)')
-        
-        #---------- Compton parameter profile
-        rad, prof = self.get_sz_profile(radius, Compton_only=True)
-        tab['Ssz'] = Column(prof.to_value('adu'), unit='adu', description='Compton parameter')
-        self._save_txt_file(self._output_dir+'/PROF_sz_compton.txt',
-                            radius.to_value('kpc'), prof.to_value('adu'), 'radius (kpc)', 'SZ Compton (adu)')
-        
-        #---------- Synchrotron integrated flux
-        prof = self.get_sz_flux(Rmax=radius, Compton_only=True, type_integral='spherical')
-        tab['Fsz'] = Column(prof.to_value('kpc2'), unit='kpc2', description='SZ flux')
-        self._save_txt_file(self._output_dir+'/PROF_sz_flux.txt',
-                            radius.to_value('kpc'), prof.to_value('kpc2'), 'radius (kpc)', 'SZ flux (kpc2)')
-        
+
+        #========== Save each profile: (name, unit, description, file, label)
+        outputs = [('p_e', 'keV cm-3', 'Thermal electron pressure', 'PROF_gas_pressure.txt', 'pressure (keV cm-3)'),
+                   ('n_e', 'cm-3', 'Thermal electron density', 'PROF_gas_density.txt', 'density (cm-3)'),
+                   ('t_gas', 'keV', 'Thermal gas temperature', 'PROF_gas_temperature.txt', 'temperature (keV)'),
+                   ('k_gas', 'keV cm2', 'Thermal gas entropy', 'PROF_gas_entropy.txt', 'entropy (keV cm2)'),
+                   ('m_hse', 'Msun', 'Enclosed hydrostatic mass', 'PROF_hse_mass.txt', 'mass HSE (Msun)'),
+                   ('overdensity', 'adu', 'Enclosed overdensity wrt critical density', 'PROF_overdensity.txt', 'overdensity'),
+                   ('m_gas', 'Msun', 'Enclosed gas mass', 'PROF_gas_mass.txt', 'mass gas (Msun)'),
+                   ('f_gas', 'adu', 'Enclosed gas fraction', 'PROF_gas_fraction.txt', 'fraction gas'),
+                   ('u_th', 'erg', 'Enclosed gas thermal energy', 'PROF_gas_thermal_energy.txt', 'thermal energy (erg)'),
+                   ('B', 'uG', 'Magnetic field', 'PROF_magnetic_field.txt', 'B field (uG)'),
+                   ('n_crp', 'cm-3', 'Cosmic ray proton density', 'PROF_crp_density.txt', 'density (cm-3)'),
+                   ('x_crp', 'adu', 'Enclosed cosmic ray to thermal energy', 'PROF_fraction_energy_cosmic_to_thermal.txt', 'x'),
+                   ('n_cre', 'cm-3', 'Cosmic ray electron density', 'PROF_cre_density.txt', 'density (cm-3)'),
+                   ('Sg', 'cm-2 s-1 sr-1', 'Gamma surface brightness', 'PROF_gamma_surface_brightness.txt', 'gamma SB (cm-2 s-1 sr-1)'),
+                   ('Fg', 'cm-2 s-1', 'Gamma flux', 'PROF_gamma_flux.txt', 'gamma flux (cm-2 s-1)'),
+                   ('Snu', 'cm-2 s-1 sr-1', 'Neutrino surface brightness', 'PROF_neutrino_surface_brightness.txt',
+                    'neutrino SB (cm-2 s-1 sr-1)'),
+                   ('Fnu', 'cm-2 s-1', 'Neutrino flux', 'PROF_neutrino_flux.txt', 'neutrino flux (cm-2 s-1)'),
+                   ('Sic', 'cm-2 s-1 sr-1', 'IC surface brightness', 'PROF_ic_surface_brightness.txt', 'IC SB (cm-2 s-1 sr-1)'),
+                   ('Fic', 'cm-2 s-1', 'IC flux', 'PROF_ic_flux.txt', 'IC flux (cm-2 s-1)'),
+                   ('Ssynch', 'Jy sr-1', 'Synchrotron surface brightness', 'PROF_synchrotron_surface_brightness.txt',
+                    'Synch SB (Jy sr-1)'),
+                   ('Fsynch', 'Jy', 'Synchrotron flux', 'PROF_synchrotron_flux.txt', 'Synch flux (Jy)'),
+                   ('Ssz', 'adu', 'Compton parameter', 'PROF_sz_compton.txt', 'SZ Compton (adu)'),
+                   ('Fsz', 'kpc2', 'SZ flux', 'PROF_sz_flux.txt', 'SZ flux (kpc2)'),
+                   ('Sx', 's-1 cm-2 sr-1', 'Xray surface brightness', 'PROF_x_surface_brightness.txt', 'X SB (s-1 cm-2 sr-1)'),
+                   ('Fx', 's-1 cm-2', 'X flux', 'PROF_x_flux.txt', 'X flux (s-1 cm-2)')]
+
+        txt_files = []
+        for name, unit, description, filename, label in outputs:
+            if name not in prof:
+                continue
+            tab[name] = Column(prof[name].to_value(unit), unit=unit, description=description)
+            txt_files.append((self._output_dir+'/'+filename,
+                              radius.to_value('kpc'), prof[name].to_value(unit), 'radius (kpc)', label))
+        self._save_txt_files(txt_files, Nthread=Nthread)
+
         #++++++++++ X-ray needs tabulated XSPEC
-        if os.path.exists(self._output_dir+'/XSPEC_table.txt'):
-            #---------- Xray profile
-            rad, prof = self.get_xray_profile(radius, output_type='C')
-            tab['Sx'] = Column(prof.to_value('s-1 cm-2 sr-1'), unit='s-1 cm-2 sr-1', description='Xray surface brightness')
-            self._save_txt_file(self._output_dir+'/PROF_x_surface_brightness.txt',
-                                radius.to_value('kpc'), prof.to_value('s-1 cm-2 sr-1'), 'radius (kpc)', 'X SB (s-1 cm-2 sr-1)')
-            
-            #---------- Xray integrated flux
-            prof = self.get_xray_flux(Rmax=radius, output_type='C', type_integral='spherical')
-            tab['Fx'] = Column(prof.to_value('s-1 cm-2'), unit='s-1 cm-2', description='X flux')
-            self._save_txt_file(self._output_dir+'/PROF_x_flux.txt',
-                                radius.to_value('kpc'), prof.to_value('s-1 cm-2'), 'radius (kpc)', 'X flux (s-1 cm-2)')
-        else:
+        if 'Sx' not in prof:
             if not self._silent:
                 print('!!! WARNING: XSPEC_table.txt not generated, skip Xray observables')
 
-
         #========== Save the data frame in a single file as well
-        tab.meta['comments'] = ['Proton spectra are integrated within '+str(Epmin)+' and '+str(Epmax)+'.',
-                                'Electron spectra are integrated within '+str(Eemin)+' and '+str(Eemax)+'.',
-                                'Gamma ray spectra are integrated within '+str(Egmin)+' and '+str(Egmax)+'.',
-                                'Neutrino ray spectra are integrated within '+str(Egmin)+' and '+str(Egmax)+'.',
-                                'Inverse Compton spectra are integrated within '+str(Egmin)+' and '+str(Egmax)+'.',
-                                'Synchrotron emission is computed at '+str(freq0)+'.']
+        tab.meta['comments'] = ['Proton spectra are integrated within '+str(param['Epmin'])+' and '+str(param['Epmax'])+'.',
+                                'Electron spectra are integrated within '+str(param['Eemin'])+' and '+str(param['Eemax'])+'.',
+                                'Gamma ray spectra are integrated within '+str(param['Egmin'])+' and '+str(param['Egmax'])+'.',
+                                'Neutrino ray spectra are integrated within '+str(param['Egmin'])+' and '+str(param['Egmax'])+'.',
+                                'Inverse Compton spectra are integrated within '+str(param['Egmin'])+' and '+str(param['Egmax'])+'.',
+                                'Synchrotron emission is computed at '+str(param['freq0'])+'.']
 
         tab.write(self._output_dir+'/PROFILE.fits', overwrite=True)
         
@@ -358,7 +753,9 @@ class Admin(object):
                      energyX=np.linspace(0.1,20,100)*u.keV,
                      frequency=np.logspace(-2,3,100)*u.GHz,
                      Egmax=None,
-                     Rmax=None):
+                     Rmax=None,
+                     products=None,
+                     Nthread=1):
         """
         Save the spectra
         
@@ -370,6 +767,9 @@ class Admin(object):
         - Rmax (quantity): the radius within with the spectrum is computed 
         (default is R500)
         - Egmax (quantity): the upper bound for energy gamma integration
+        - products (dict): the products computed with get_products, to save them
+        without computing them again. The other parameters are then not used.
+        - Nthread (int): the number of threads used to write the text files
 
         Outputs
         ----------
@@ -377,92 +777,55 @@ class Admin(object):
 
         """
 
-        if Rmax == None:
-            Rmax = self._R500
-        if Egmax is None:
-            Egmax = self._Epmax
+        #========== Compute the spectra
+        if products is None or 'spectra' not in products:
+            products = self.get_products(['spectra'], energy=energy, energyX=energyX, frequency=frequency,
+                                         Egmax=Egmax, Rmax=Rmax)
+        spec  = products['spectra']
+        Rmax  = products['param']['Rmax']
 
         # Create the output directory if needed
         if not os.path.exists(self._output_dir): os.mkdir(self._output_dir)
 
         # Create a dataframe to store all spectra in a single fits table
         tab1  = Table()
-        tab1['Energy'] = Column(energy.to_value('MeV'), unit='MeV', description='Energy')
+        tab1['Energy'] = Column(spec['energy'].to_value('MeV'), unit='MeV', description='Energy')
 
         tab2  = Table()
-        tab2['Frequency'] = Column(frequency.to_value('GHz'), unit='GHz', description='Frequency')
+        tab2['Frequency'] = Column(spec['frequency'].to_value('GHz'), unit='GHz', description='Frequency')
 
         tab3  = Table()
-        tab3['Energy'] = Column(energyX.to_value('keV'), unit='keV', description='Xray energy')
-        
-        #---------- proton spectrum
-        eng, spec = self.get_crp_spectrum(energy, Rmax=Rmax)
-        tab1['CRp'] = Column(spec.to_value('MeV-1'), unit='MeV-1', description='Cosmic ray proton spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_cosmic_ray_proton.txt',
-                            eng.to_value('MeV'), spec.to_value('MeV-1'), 'energy (MeV)', 'spectrum (MeV-1)')
-        
-        #---------- electron spectrum
-        eng, spec = self.get_cre_spectrum(energy, Rmax=Rmax)
-        tab1['CRe'] = Column(spec.to_value('MeV-1'), unit='MeV-1', description='Cosmic ray electron spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_cosmic_ray_electron.txt',
-                            eng.to_value('MeV'), spec.to_value('MeV-1'), 'energy (MeV)', 'spectrum (MeV-1)')
-        
-        #---------- gamma spectrum
-        eng, spec = self.get_gamma_spectrum(energy, Rmax=Rmax, type_integral='spherical')
-        tab1['gamma'] = Column(spec.to_value('MeV-1 cm-2 s-1'), unit='MeV-1 cm-2 s-1', description='Gamma ray spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_gamma.txt',
-                            eng.to_value('MeV'), spec.to_value('MeV-1 cm-2 s-1'), 'energy (MeV)', 'spectrum (MeV-1 cm-2 s-1)')
-        
-        #---------- gamma flux spectrum
-        spec = self.get_gamma_flux(Emin=energy, Emax=Egmax, Rmax=Rmax, Energy_density=False, type_integral='spherical')
-        tab1['gammaF'] = Column(spec.to_value('cm-2 s-1'), unit='cm-2 s-1', description='Integrated gamma ray spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_gammaF.txt',
-                            eng.to_value('MeV'), spec.to_value('cm-2 s-1'), 'energy (MeV)', 'spectrum (cm-2 s-1)')
-        
-        #---------- neutrino spectrum
-        eng, spec = self.get_neutrino_spectrum(energy, Rmax=Rmax, type_integral='spherical', flavor='all')
-        tab1['nu'] = Column(spec.to_value('MeV-1 cm-2 s-1'), unit='MeV-1 cm-2 s-1', description='Neutrino spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_neutrino.txt',
-                            eng.to_value('MeV'), spec.to_value('MeV-1 cm-2 s-1'), 'energy (MeV)', 'spectrum (MeV-1 cm-2 s-1)')
-        
-        #---------- neutrino flux spectrum
-        spec = self.get_neutrino_flux(Emin=energy,Emax=Egmax,Rmax=Rmax,Energy_density=False,type_integral='spherical',flavor='all')
-        tab1['nuF'] = Column(spec.to_value('cm-2 s-1'), unit='cm-2 s-1', description='Integrated neutrino spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_neutrinoF.txt',
-                            eng.to_value('MeV'), spec.to_value('cm-2 s-1'), 'energy (MeV)', 'spectrum (cm-2 s-1)')
-        
-        #---------- IC spectrum
-        eng, spec = self.get_ic_spectrum(energy, Rmax=Rmax, type_integral='spherical')
-        tab1['IC'] = Column(spec.to_value('MeV-1 cm-2 s-1'), unit='MeV-1 cm-2 s-1', description='IC spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_IC.txt',
-                            eng.to_value('MeV'), spec.to_value('MeV-1 cm-2 s-1'), 'energy (MeV)', 'spectrum (MeV-1 cm-2 s-1)')
-        
-        #---------- IC flux spectrum
-        spec = self.get_ic_flux(Emin=energy, Emax=Egmax, Rmax=Rmax, Energy_density=False, type_integral='spherical')
-        tab1['ICF'] = Column(spec.to_value('cm-2 s-1'), unit='cm-2 s-1', description='Integrated IC spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_ICF.txt',
-                            eng.to_value('MeV'), spec.to_value('cm-2 s-1'), 'energy (MeV)', 'spectrum (cm-2 s-1)')
-        
-        #---------- Synchrotron spectrum
-        freq, spec = self.get_synchrotron_spectrum(frequency, Rmax=Rmax, type_integral='spherical')
-        tab2['synch'] = Column(spec.to_value('Jy'), unit='Jy', description='Synch spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_Synch.txt',
-                            freq.to_value('GHz'), spec.to_value('Jy'), 'frequency (GHz)', 'spectrum (Jy)')
-        
-        #---------- SZ spectrum
-        freq, spec = self.get_sz_spectrum(frequency, Rmax=Rmax, type_integral='spherical', Compton_only=False)
-        tab2['SZ'] = Column(spec.to_value('Jy'), unit='Jy', description='SZ spectrum')
-        self._save_txt_file(self._output_dir+'/SPECTRA_SZ.txt',
-                            freq.to_value('GHz'), spec.to_value('Jy'), 'frequency (GHz)', 'spectrum (Jy)')
+        tab3['Energy'] = Column(spec['energyX'].to_value('keV'), unit='keV', description='Xray energy')
 
-        #---------- Xray spectrum
-        if os.path.exists(self._output_dir+'/XSPEC_table.txt'):
+        #========== Save each spectrum: (table, name, unit, description, file, label)
+        outputs = [(tab1, 'CRp', 'MeV-1', 'Cosmic ray proton spectrum', 'SPECTRA_cosmic_ray_proton.txt', 'spectrum (MeV-1)'),
+                   (tab1, 'CRe', 'MeV-1', 'Cosmic ray electron spectrum', 'SPECTRA_cosmic_ray_electron.txt', 'spectrum (MeV-1)'),
+                   (tab1, 'gamma', 'MeV-1 cm-2 s-1', 'Gamma ray spectrum', 'SPECTRA_gamma.txt', 'spectrum (MeV-1 cm-2 s-1)'),
+                   (tab1, 'gammaF', 'cm-2 s-1', 'Integrated gamma ray spectrum', 'SPECTRA_gammaF.txt', 'spectrum (cm-2 s-1)'),
+                   (tab1, 'nu', 'MeV-1 cm-2 s-1', 'Neutrino spectrum', 'SPECTRA_neutrino.txt', 'spectrum (MeV-1 cm-2 s-1)'),
+                   (tab1, 'nuF', 'cm-2 s-1', 'Integrated neutrino spectrum', 'SPECTRA_neutrinoF.txt', 'spectrum (cm-2 s-1)'),
+                   (tab1, 'IC', 'MeV-1 cm-2 s-1', 'IC spectrum', 'SPECTRA_IC.txt', 'spectrum (MeV-1 cm-2 s-1)'),
+                   (tab1, 'ICF', 'cm-2 s-1', 'Integrated IC spectrum', 'SPECTRA_ICF.txt', 'spectrum (cm-2 s-1)'),
+                   (tab2, 'synch', 'Jy', 'Synch spectrum', 'SPECTRA_Synch.txt', 'spectrum (Jy)'),
+                   (tab2, 'SZ', 'Jy', 'SZ spectrum', 'SPECTRA_SZ.txt', 'spectrum (Jy)'),
+                   (tab3, 'Xray', 's-1 cm-2 keV-1', 'Xray spectrum', 'SPECTRA_Xray.txt', 'spectrum (s-1 cm-2 keV-1)')]
 
-            engX, spec = self.get_xray_spectrum(energyX, Rmax=Rmax, type_integral='spherical', output_type='C')
-            tab3['Xray'] = Column(spec.to_value('s-1 cm-2 keV-1'), unit='s-1 cm-2 keV-1', description='Xray spectrum')
-            self._save_txt_file(self._output_dir+'/SPECTRA_Xray.txt',
-                                engX.to_value('keV'), spec.to_value('s-1 cm-2 keV-1'), 'energy (keV)', 'spectrum (s-1 cm-2 keV-1)')
-        else:
+        txt_files = []
+        for tab, name, unit, description, filename, label in outputs:
+            if name not in spec:
+                continue
+            if tab is tab1:
+                x, xlabel = spec['energy'].to_value('MeV'), 'energy (MeV)'
+            elif tab is tab2:
+                x, xlabel = spec['frequency'].to_value('GHz'), 'frequency (GHz)'
+            else:
+                x, xlabel = spec['energyX_center'].to_value('keV'), 'energy (keV)'
+            tab[name] = Column(spec[name].to_value(unit), unit=unit, description=description)
+            txt_files.append((self._output_dir+'/'+filename, x, spec[name].to_value(unit), xlabel, label))
+        self._save_txt_files(txt_files, Nthread=Nthread)
+
+        #---------- Xray spectrum
+        if 'Xray' not in spec:
             print('!!! WARNING: XSPEC_table.txt not generated, skip Xray observables')
             
         #========== Save the data frame in a single file as well
@@ -492,7 +855,8 @@ class Admin(object):
     
     def save_map(self, Normalize=False,
                  freq0=1*u.GHz,
-                 Egmin=None, Egmax=None):
+                 Egmin=None, Egmax=None,
+                 products=None):
         """
         Save the maps in a file
         
@@ -502,6 +866,8 @@ class Admin(object):
         - freq0 (quantity): the frequency used to compute synchrotron emission
         - Egmin (quantity): the lower bound for energy gamma integration
         - Egmax (quantity): the upper bound for energy gamma integration
+        - products (dict): the products computed with get_products, to save them
+        without computing them again. The other parameters are then not used.
 
         Outputs
         ----------
@@ -509,11 +875,63 @@ class Admin(object):
 
         """
         
-        #========== Default keyword
-        if Egmin is None:
-            Egmin = self._Epmin/10.0
-        if Egmax is None:
-            Egmax = self._Epmax
+        #========== Compute the maps
+        if products is None or 'map' not in products:
+            products = self.get_products(['map'], Normalize=Normalize, freq0=freq0, Egmin=Egmin, Egmax=Egmax)
+        maps = products['map']
+
+        #========== Create the output directory if needed
+        if not os.path.exists(self._output_dir): os.mkdir(self._output_dir)
+
+        #========== Get the header of the maps
+        header = maps['header']
+
+        #========== Save each map: (name, comment, file)
+        outputs = [('gamma', 'Gamma map', 'MAP_gamma.fits'),
+                   ('neutrino', 'Neutrino map', 'MAP_neutrino.fits'),
+                   ('ic', 'Inverse Compton map', 'MAP_ic.fits'),
+                   ('synchrotron', 'Synchrotron map', 'MAP_synchrotron.fits'),
+                   ('sz', 'SZ Compton map', 'MAP_sz.fits'),
+                   ('xray', 'Xray map', 'MAP_xray.fits')]
+
+        for name, comment, filename in outputs:
+            if name not in maps:
+                continue
+            image = maps[name]
+            hdu = fits.PrimaryHDU(header=header)
+            hdu.data = image.value
+            hdu.header.add_comment(comment)
+            hdu.header.add_comment('Unit = '+str(image.unit))
+            hdu.writeto(self._output_dir+'/'+filename, overwrite=True)
+
+        #---------- Xray
+        if 'xray' not in maps:
+            if not self._silent:
+                print('!!! WARNING: XSPEC_table.txt not generated, skip Xray observables')
+
+
+    #==================================================
+    # Save the energy binned map cubes
+    #==================================================
+
+    def save_map_cube(self, energy_edges=np.logspace(-1,5,31)*u.GeV,
+                      Energy_density=False):
+        """
+        Save the gamma ray, neutrino and inverse Compton map cubes in files.
+        The cubes are stored in the primary HDU and the energy bins in an
+        ENERGIES extension.
+
+        Parameters
+        ----------
+        - energy_edges (quantity): the edges of the energy bins
+        - Energy_density (bool): if True, then the energy density is computed. Otherwise,
+        the number density is computed.
+
+        Outputs
+        ----------
+        Files are saved
+
+        """
 
         #========== Create the output directory if needed
         if not os.path.exists(self._output_dir): os.mkdir(self._output_dir)
@@ -521,60 +939,127 @@ class Admin(object):
         #========== Get the header of the maps
         header = self.get_map_header()
 
-        #---------- gamma    
-        image = self.get_gamma_map(Emin=Egmin, Emax=Egmax, Energy_density=False, Normalize=Normalize)
-        hdu = fits.PrimaryHDU(header=header)
-        hdu.data = image.value
-        hdu.header.add_comment('Gamma map')
-        hdu.header.add_comment('Unit = '+str(image.unit))
-        hdu.writeto(self._output_dir+'/MAP_gamma.fits', overwrite=True)
+        #========== Energy bin extension
+        Ebin_min = energy_edges[:-1].to_value('GeV')
+        Ebin_max = energy_edges[1:].to_value('GeV')
+        cols = [fits.Column(name='Energy', format='D', unit='GeV', array=np.sqrt(Ebin_min*Ebin_max)),
+                fits.Column(name='E_MIN', format='D', unit='GeV', array=Ebin_min),
+                fits.Column(name='E_MAX', format='D', unit='GeV', array=Ebin_max)]
 
-        #---------- neutrino    
-        image = self.get_neutrino_map(Emin=Egmin, Emax=Egmax, Energy_density=False, Normalize=Normalize, flavor='all')
-        hdu = fits.PrimaryHDU(header=header)
-        hdu.data = image.value
-        hdu.header.add_comment('Neutrino map')
-        hdu.header.add_comment('Unit = '+str(image.unit))
-        hdu.writeto(self._output_dir+'/MAP_neutrino.fits', overwrite=True)
+        #========== Compute and save each cube
+        cubes = [(self.get_gamma_map_cube, 'Gamma map cube', 'MAP_gamma_cube.fits'),
+                 (self.get_neutrino_map_cube, 'Neutrino map cube', 'MAP_neutrino_cube.fits'),
+                 (self.get_ic_map_cube, 'Inverse Compton map cube', 'MAP_ic_cube.fits')]
 
-        #---------- IC    
-        image = self.get_ic_map(Emin=Egmin, Emax=Egmax, Energy_density=False, Normalize=Normalize)
-        hdu = fits.PrimaryHDU(header=header)
-        hdu.data = image.value
-        hdu.header.add_comment('Inverse Compton map')
-        hdu.header.add_comment('Unit = '+str(image.unit))
-        hdu.writeto(self._output_dir+'/MAP_sz.fits', overwrite=True)
+        for get_cube, comment, filename in cubes:
+            cube = get_cube(energy_edges=energy_edges, Energy_density=Energy_density)
+            hdu = fits.PrimaryHDU(header=header)
+            hdu.data = cube.value
+            hdu.header.add_comment(comment+', planes ordered as the ENERGIES extension')
+            hdu.header.add_comment('Unit = '+str(cube.unit))
+            hdu_eng = fits.BinTableHDU.from_columns(cols, name='ENERGIES')
+            hdul = fits.HDUList([hdu, hdu_eng])
+            hdul.writeto(self._output_dir+'/'+filename, overwrite=True)
 
-        #---------- Synchrotron
-        image = self.get_synchrotron_map(freq0=freq0, Normalize=Normalize)
-        hdu = fits.PrimaryHDU(header=header)
-        hdu.data = image.value
-        hdu.header.add_comment('Synchrotron map')
-        hdu.header.add_comment('Unit = '+str(image.unit))
-        hdu.writeto(self._output_dir+'/MAP_synchrotron.fits', overwrite=True)
 
-        #---------- SZ ymap
-        image = self.get_sz_map(Compton_only=True, Normalize=Normalize)
+    #==================================================
+    # Save the SZ map cube
+    #==================================================
+
+    def save_sz_map_cube(self, frequency=np.array([30.0, 44.0, 70.0, 100.0, 143.0, 217.0, 353.0, 545.0, 857.0])*u.GHz,
+                         Normalize=False):
+        """
+        Save the multi-frequency SZ map cube in a file. The cube is stored
+        in the primary HDU and the frequencies in a FREQUENCIES extension.
+
+        Parameters
+        ----------
+        - frequency (quantity): the frequencies of the planes
+        - Normalize (bool): to normalize each plane to the total flux
+
+        Outputs
+        ----------
+        Files are saved
+
+        """
+
+        #========== Create the output directory if needed
+        if not os.path.exists(self._output_dir): os.mkdir(self._output_dir)
+
+        #========== Get the header of the maps
+        header = self.get_map_header()
+
+        #========== Compute the cube
+        cube = self.get_sz_map_cube(frequency=frequency, Normalize=Normalize)
+
+        #========== Save
         hdu = fits.PrimaryHDU(header=header)
-        hdu.data = image.value
-        hdu.header.add_comment('SZ Compton map')
-        hdu.header.add_comment('Unit = '+str(image.unit))
-        hdu.writeto(self._output_dir+'/MAP_sz.fits', overwrite=True)
+        hdu.data = cube.value
+        hdu.header.add_comment('SZ map cube, planes ordered as the FREQUENCIES extension')
+        hdu.header.add_comment('Unit = '+str(cube.unit))
+
+        col = fits.Column(name='Frequency', format='D', unit='GHz', array=frequency.to_value('GHz'))
+        hdu_freq = fits.BinTableHDU.from_columns([col], name='FREQUENCIES')
+
+        hdul = fits.HDUList([hdu, hdu_freq])
+        hdul.writeto(self._output_dir+'/MAP_sz_cube.fits', overwrite=True)
+
+
+    #==================================================
+    # Save the products in a single binary store
+    #==================================================
+
+    def save_products(self, products=None, prod_list=['all'], filename=None,
+                      mode='w', compress=True, entry=None):
+        """
+        Save the profiles, spectra, maps and cubes, together with the
+        parameters of the model, in a single binary file (see
+        ClusterTools/cluster_store.py). With mode='a', the products are added
+        to an existing file, e.g. to build a catalog of clusters. The 
+        parameters are saved as their record (see get_param_record): the JSON 
+        record in the 'param' metadata of the entry, and its large arrays as 
+        the 'param_arrays' group. They can be decoded with cluster_param.decode.
+
+        Parameters
+        ----------
+        - products (dict): the products as given by get_products. If None,
+        they are computed with the default grids.
+        - prod_list (list): the product groups to compute if products is None,
+        see get_products
+        - filename (str): the full path to the file. Default is PRODUCTS.npz in
+        the output directory.
+        - mode (str): 'w' to create the file, 'a' to append to it
+        - compress (bool): compress the arrays. Uncompressed arrays can be
+        memory-mapped when read.
+        - entry (str): the name of the entry in the file, default is the
+        cluster name
+
+        Outputs
+        ----------
+        Files are saved
+
+        """
+
+        #========== Create the output directory if needed
+        if not os.path.exists(self._output_dir): os.mkdir(self._output_dir)
+
+        if products is None:
+            products = self.get_products(prod_list=prod_list)
+        if filename is None:
+            filename = self._output_dir+'/PRODUCTS.npz'
+        if entry is None:
+            entry = self._name
+
+        #========== Metadata, with the parameters record
+        text, arrays = self.get_param_record()
+        meta = {'format': 'ClusterModel products', 'version': 1,
+                'param': json.loads(text)}
+
+        #========== Save
+        with cluster_store.ProductStore(filename, mode=mode, compress=compress) as store:
+            store.write(entry, dict(products, param_arrays=arrays), meta=meta)
 
-        #---------- Xray
-        if os.path.exists(self._output_dir+'/XSPEC_table.txt'):
-            image = self.get_xray_map(output_type='C', Normalize=Normalize)
-            hdu = fits.PrimaryHDU(header=header)
-            hdu.data = image.value
-            hdu.header.add_comment('Xray map')
-            hdu.header.add_comment('Unit = '+str(image.unit))
-            hdu.writeto(self._output_dir+'/MAP_xray.fits', overwrite=True)
 
-        else:
-            if not self._silent:
-                print('!!! WARNING: XSPEC_table.txt not generated, skip Xray observables')
-    
-    
     #==================================================
     # Saving txt file utility function
     #==================================================
@@ -608,14 +1093,45 @@ class Admin(object):
         col1_name = ('{:>'+str(ncar-1)+'}').format(col1_name)
         col2_name = ('{:>'+str(ncar)+'}').format(col2_name)
 
+        # Row format, applied to all the rows at once
+        row = '%.'+str(ndec)+'e'+' '*ncar+'%.'+str(ndec)+'e\n'
+        data = np.column_stack([np.asarray(col1, dtype=float), np.asarray(col2, dtype=float)])
+
         # saving
-        sfile = open(filename, 'wb')
-        sfile.writelines(['#'+col1_name, ('{:>'+str(ncar)+'}').format(''), col2_name+'\n'])
-        for il in range(len(col1)):
-            sfile.writelines([('{:.'+str(ndec)+'e}').format(col1[il]),
-                              ('{:>'+str(ncar)+'}').format(''),
-                              ('{:.'+str(ndec)+'e}').format(col2[il])+'\n'])
-        sfile.close()
+        with open(filename, 'w') as sfile:
+            sfile.write('#'+col1_name+' '*ncar+col2_name+'\n')
+            sfile.write((row*data.shape[0]) % tuple(data.ravel()))
+
+
+    #==================================================
+    # Saving several txt files
+    #==================================================
+    
+    def _save_txt_files(self, files, Nthread=1):
+        """
+        Save several txt files with the format of _save_txt_file, possibly
+        with several threads.
+        
+        Parameters
+        ----------
+        - files (list): the arguments of _save_txt_file for each file, as
+        (filename, col1, col2, col1_name, col2_name)
+        - Nthread (int): the number of threads
+        
+        Outputs
+        ----------
+        Files are saved
+
+        """
+
+        if Nthread <= 1 or len(files) <= 1:
+            for args in files:
+                self._save_txt_file(*args)
+            return
+
+        with ThreadPoolExecutor(max_workers=Nthread) as pool:
+            for future in [pool.submit(self._save_txt_file, *args) for args in files]:
+                future.result()
         
         
     #==================================================
@@ -654,3 +1170,55 @@ class Admin(object):
         return header        
     
     
+    #==================================================
+    # Extract the map geometry
+    #==================================================
+    
+    def _get_map_geometry(self):
+        """
+        Get the map header, the R.A.-Dec. maps and the distance from the
+        cluster map. They are cached as read-only arrays and computed
+        again only if the map definition or the cluster coordinates
+        change.
+        
+        Parameters
+        ----------
+
+        Outputs
+        ----------
+        - header (astropy object): the header associated to the map
+        - ra_map (np.ndarray): map of R.A. values (deg)
+        - dec_map (np.ndarray): map of Dec. values (deg)
+        - dist_map (np.ndarray): map of the distance to the cluster (deg)
+
+        """
+
+        # Key of the geometry: map definition and cluster coordinates
+        ra_cl  = self._coord.icrs.ra.to_value('deg')
+        dec_cl = self._coord.icrs.dec.to_value('deg')
+        if self._map_header is not None:
+            map_key = self._map_header.tostring()
+        else:
+            map_key = (self._map_coord.icrs.ra.to_value('deg'), self._map_coord.icrs.dec.to_value('deg'),
+                       self._map_reso.to_value('deg'), tuple(self._map_fov.to_value('deg')))
+        key = (ra_cl, dec_cl, map_key)
+
+        # Return the cached geometry if it is still valid
+        geometry = self._map_geometry
+        if geometry is not None and geometry['key'] == key:
+            return geometry['header'], geometry['ra_map'], geometry['dec_map'], geometry['dist_map']
+
+        # Otherwise compute it, in float64 for the precision of the distance near the center,
+        # and store it with the map precision
+        header = self.get_map_header()
+        ra_map, dec_map = map_tools.get_radec_map(header)
+        dist_map = map_tools.greatcircle(ra_map, dec_map, ra_cl, dec_cl).astype(self._map_dtype, copy=False)
+        ra_map = ra_map.astype(self._map_dtype, copy=False)
+        dec_map = dec_map.astype(self._map_dtype, copy=False)
+
+        for arr in [ra_map, dec_map, dist_map]:
+            arr.flags.writeable = False
+
+        self._map_geometry = {'key':key, 'header':header, 'ra_map':ra_map, 'dec_map':dec_map, 'dist_map':dist_map}
+        
+        return header, ra_map, dec_map, dist_map
@@ -18,8 +18,10 @@ class Modpar(object):
     include the subclass Modpar in this other file. All the definitions of the 
     model parameters should be here.
 
-    Profile models are now:  ['GNFW', 'SVM', 'beta', 'doublebeta']
-    Spectral models are now: ['PowerLaw', 'ExponentialCutoffPowerLaw']
+    Profile models are now:  ['GNFW', 'SVM', 'beta', 'doublebeta', 'User']
+    Spectral models are now: ['PowerLaw', 'ExponentialCutoffPowerLaw', 'User']
+    The 'User' models are tabulated (e.g. from simulations or deprojected data) 
+    and interpolated in log-log scale.
 
     Attributes
     ----------  
@@ -31,6 +33,8 @@ class Modpar(object):
     of profile models
     - _validate_spectrum_model_parameters(self, inpar, unit): dedicated to check and validate the parameters 
     of spectral models
+    - _validate_sampling_profile(self, inpar): dedicated to check and validate the per product sampling
+    - _get_npt_per_decade(self, product, axis): get the number of points per decade for a product and axis
 
     - set_pressure_gas_gNFW_param(self, pressure_model='P13UPP'): set the gas pressure profile parameters to the 
     universal value from different results
@@ -41,9 +45,22 @@ class Modpar(object):
     - set_magfield_isobaric_scal_param(self, Bnorm, scal=0.5): set mag field profile parameters to have isobaric scaling
     - set_magfield_isodens_scal_param(self, Bnorm, scal=0.5): set mag field profile parameters to have isodensity scaling
     
+    - _compile_profile_model(self, model): compile a profile model dictionary into a callable object
+    - _get_compiled_profile_model(self, model): get the compiled profile model, compiling it if needed
+    - _compile_spectrum_model(self, model): compile a spectrum model dictionary into a callable object
+    - _get_compiled_spectrum_model(self, model): get the compiled spectrum model, compiling it if needed
     - _get_generic_profile(self, radius, model, derivative=False): get any profile base on model type
+    - _get_generic_spectrum(self, energy, model): get any spectrum base on model type
+    - _get_generic_profile_volume(self, Rmin, Rmax, model): volume integral of a profile, in closed 
+    form when available for the model
+    - _get_generic_spectrum_energy_integral(self, Emin, Emax, model): energy integral of a spectrum times 
+    energy, in closed form when available for the model
 
     """
+
+    # Products and axes which can be sampled independently (see sampling_profile)
+    _sampling_products = ['gamma', 'neutrino', 'ic', 'synchrotron', 'sz', 'xray']
+    _sampling_axes     = ['radius', 'los', 'energy', 'electron']
     
     #==================================================
     # Validate profile model parameters
@@ -65,7 +82,7 @@ class Modpar(object):
         """
 
         # List of available authorized models
-        model_list = ['GNFW', 'SVM', 'beta', 'doublebeta']
+        model_list = ['GNFW', 'SVM', 'beta', 'doublebeta', 'User']
         
         # Deal with unit
         if unit == '' or unit == None:
@@ -74,7 +91,7 @@ class Modpar(object):
             hasunit = True
 
         # Check that the input is a dictionary
-        if type(inpar) != dict :
+        if not isinstance(inpar, dict) :
             raise TypeError("The model should be a dictionary containing the name key and relevant parameters")
         
         # Check that input contains a name
@@ -274,7 +291,44 @@ class Modpar(object):
                       "r_c2"  : inpar['r_c2'].to('kpc'),
                       "beta2" : inpar['beta2']}
 
-        return outpar
+        #---------- Deal with the case of tabulated profile
+        if inpar['name'] == 'User':
+            # Check the content of the dictionary
+            cond1 = 'radius' in inpar.keys() and 'profile' in inpar.keys()
+            if not cond1:
+                raise ValueError("The User model should contain: {'radius','profile'}.")
+
+            # Check units
+            if hasunit:
+                try:
+                    test = inpar['profile'].to(unit)
+                except:
+                    raise TypeError("profile should be homogeneous to "+unit)
+            try:
+                test = inpar['radius'].to('kpc')
+            except:
+                raise TypeError("radius should be homogeneous to kpc")
+
+            # Check values
+            rad = np.atleast_1d(inpar['radius'].to_value('kpc'))
+            if np.ndim(inpar['profile']) != 1 or len(inpar['profile']) != len(rad) or len(rad) < 2:
+                raise ValueError("radius and profile should be 1d arrays of same length (>= 2)")
+            if np.any(rad <= 0) or np.any(np.diff(rad) <= 0):
+                raise ValueError("radius should be strictly increasing and larger than 0")
+            if np.any(np.asarray(inpar['profile'] <= 0)):
+                raise ValueError("profile should be larger than 0")
+
+            if hasunit:
+                prof = inpar['profile'].to(unit)
+            else:
+                prof = inpar['profile']*u.adu
+                
+            # All good at this stage, setting parameters
+            outpar = {"name"   : 'User',
+                      "radius" : rad*u.kpc,
+                      "profile": prof}
+
+        return cluster_profile.ModelDict(outpar)
 
 
     #==================================================
@@ -297,7 +351,7 @@ class Modpar(object):
         """
         
         # List of available authorized models
-        model_list = ['PowerLaw', 'ExponentialCutoffPowerLaw']
+        model_list = ['PowerLaw', 'ExponentialCutoffPowerLaw', 'User']
         
         # Deal with unit
         if unit == '' or unit == None:
@@ -306,7 +360,7 @@ class Modpar(object):
             hasunit = True
 
         # Check that the input is a dictionary
-        if type(inpar) != dict :
+        if not isinstance(inpar, dict) :
             raise TypeError("The model should be a dictionary containing the name key and relevant parameters")
         
         # Check that input contains a name
@@ -351,9 +405,116 @@ class Modpar(object):
             outpar = {"name"        : 'ExponentialCutoffPowerLaw',
                       "Index"       : inpar['Index'],
                       "CutoffEnergy": inpar['CutoffEnergy'].to('TeV')}
+
+        #---------- Deal with the case of tabulated spectrum
+        if inpar['name'] == 'User':
+            # Check the content of the dictionary
+            cond1 = 'energy' in inpar.keys() and 'spectrum' in inpar.keys()
+            if not cond1:
+                raise ValueError("The User model should contain: {'energy', 'spectrum'}.")
+
+            # Check units
+            try:
+                test = inpar['energy'].to('GeV')
+            except:
+                raise TypeError("energy should be homogeneous to GeV")
+
+            # Check values
+            eng = np.atleast_1d(inpar['energy'].to_value('GeV'))
+            spec = np.atleast_1d(np.asarray(inpar['spectrum'], dtype=float))
+            if spec.ndim != 1 or len(spec) != len(eng) or len(eng) < 2:
+                raise ValueError("energy and spectrum should be 1d arrays of same length (>= 2)")
+            if np.any(eng <= 0) or np.any(np.diff(eng) <= 0):
+                raise ValueError("energy should be strictly increasing and larger than 0")
+            if np.any(spec <= 0):
+                raise ValueError("spectrum should be larger than 0")
+            
+            # All good at this stage, setting parameters
+            outpar = {"name"    : 'User',
+                      "energy"  : eng*u.GeV,
+                      "spectrum": spec}
                     
+        return cluster_profile.ModelDict(outpar)
+
+
+    #==================================================
+    # Validate the sampling profile
+    #==================================================
+    
+    def _validate_sampling_profile(self, inpar):
+        """
+        Check the sampling profile, i.e. the number of points per decade used 
+        for each product and each sampling axis. The products are 'gamma', 
+        'neutrino', 'ic', 'synchrotron', 'sz' and 'xray'. The axes are 'radius' 
+        (3d and projected radius), 'los' (line of sight), 'energy' (observed 
+        energy integration) and 'electron' (CRe energy integration of the 
+        synchrotron and IC emission). The axes which are not given use 
+        Npt_per_decade_integ.
+        
+        Parameters
+        ----------
+        - inpar (dict): a dictionary as {product: {axis: Npt_per_decade}}
+        
+        Outputs
+        ----------
+        - outpar (dict): a dictionary with output parameters
+
+        """
+
+        # Check that the input is a dictionary
+        if type(inpar) != dict :
+            raise TypeError("The sampling profile should be a dictionary as {product: {axis: Npt_per_decade}}")
+
+        outpar = {}
+        for product in inpar.keys():
+            if product not in self._sampling_products:
+                print('The sampling profile products can be:')
+                print(self._sampling_products)
+                raise ValueError("The requested product is not available")
+            if type(inpar[product]) != dict :
+                raise TypeError("The sampling of each product should be a dictionary as {axis: Npt_per_decade}")
+            
+            outpar[product] = {}
+            for axis in inpar[product].keys():
+                if axis not in self._sampling_axes:
+                    print('The sampling profile axes can be:')
+                    print(self._sampling_axes)
+                    raise ValueError("The requested axis is not available")
+                if type(inpar[product][axis]) != int:
+                    raise TypeError("The number of point per decade should be a int")
+                if inpar[product][axis] < 1:
+                    raise ValueError("The number of point per decade should be >= 1")
+                outpar[product][axis] = inpar[product][axis]
+
         return outpar
 
+    
+    #==================================================
+    # Get the sampling of a given product
+    #==================================================
+    
+    def _get_npt_per_decade(self, product, axis):
+        """
+        Get the number of points per decade used for a given product along a 
+        given sampling axis. It is taken from the sampling profile when defined, 
+        and from Npt_per_decade_integ otherwise.
+        
+        Parameters
+        ----------
+        - product (str): the product, e.g. 'gamma' (None for the global value)
+        - axis (str): the sampling axis, 'radius', 'los', 'energy' or 'electron'
+        
+        Outputs
+        ----------
+        - Npt (int): the number of points per decade
+
+        """
+
+        try:
+            return self._sampling_profile[product][axis]
+        except KeyError:
+            return self._Npt_per_decade_integ
+
         
     #==================================================
     # Set a given pressure UPP profile
@@ -401,13 +562,14 @@ class Modpar(object):
         Pnorm = cluster_global.gNFW_normalization(self._redshift, self._M500.to_value('Msun'), cosmo=self._cosmo)
         
         # Set the parameters accordingly
-        self._pressure_gas_model = {"name": 'GNFW',
-                                    "P_0" : pppar[0]*Pnorm*u.Unit('keV cm-3'),
-                                    "c500": pppar[1],
-                                    "r_p" : self._R500/pppar[1],
-                                    "a":pppar[3],
-                                    "b":pppar[4],
-                                    "c":pppar[2]}
+        self._pressure_gas_model = cluster_profile.ModelDict({"name": 'GNFW',
+                                                              "P_0" : pppar[0]*Pnorm*u.Unit('keV cm-3'),
+                                                              "c500": pppar[1],
+                                                              "r_p" : self._R500/pppar[1],
+                                                              "a":pppar[3],
+                                                              "b":pppar[4],
+                                                              "c":pppar[2]})
+        self._compile_profile_model(self._pressure_gas_model)
 
 
     #==================================================
@@ -448,10 +610,14 @@ class Modpar(object):
             Ppar['n_01'] = (Ppar['n_01'] * kBT).to('keV cm-3')
             Ppar['n_02'] = (Ppar['n_02'] * kBT).to('keV cm-3')
 
+        elif self._density_gas_model['name'] == 'User':
+            Ppar['profile'] = (Ppar['profile'] * kBT).to('keV cm-3')
+
         else:
             raise ValueError('Problem with density model list.')
 
         self._pressure_gas_model = Ppar
+        self._compile_profile_model(self._pressure_gas_model)
 
 
     #==================================================
@@ -492,10 +658,14 @@ class Modpar(object):
             Ppar['n_01'] = (Ppar['n_01'] / kBT).to('cm-3')
             Ppar['n_02'] = (Ppar['n_02'] / kBT).to('cm-3')
 
+        elif self._pressure_gas_model['name'] == 'User':
+            Ppar['profile'] = (Ppar['profile'] / kBT).to('cm-3')
+
         else:
             raise ValueError('Problem with density model list.')
 
         self._density_gas_model = Ppar
+        self._compile_profile_model(self._density_gas_model)
 
         
     #==================================================
@@ -541,10 +711,16 @@ class Modpar(object):
             if scal != 1.0:
                 # In this case we have p = p1+p2 -> (p1+p2)^scal, so scal cannot be applied to individual profile
                 raise ValueError('Transformation not available with doublebeta model for scal != 1.')
+
+        elif self._pressure_gas_model['name'] == 'User':
+            prof = Ppar['profile'].to_value('keV cm-3')
+            Ppar['profile'] = (prof / np.amax(prof))**scal * u.adu
+            
         else:
             raise ValueError('Problem with density model list.')
 
         self._density_crp_model = Ppar
+        self._compile_profile_model(self._density_crp_model)
 
 
     #==================================================
@@ -590,10 +766,16 @@ class Modpar(object):
             if scal != 1.0:
                 # In this case we have p = p1+p2 -> (p1+p2)^scal, so scal cannot be applied to individual profile
                 raise ValueError('Transformation not available with doublebeta model for scal != 1.')
+
+        elif self._density_gas_model['name'] == 'User':
+            prof = Ppar['profile'].to_value('cm-3')
+            Ppar['profile'] = (prof / np.amax(prof))**scal * u.adu
+            
         else:
             raise ValueError('Problem with density model list.')
 
         self._density_crp_model = Ppar
+        self._compile_profile_model(self._density_crp_model)
 
 
     #==================================================
@@ -642,10 +824,16 @@ class Modpar(object):
             if scal != 1.0:
                 # In this case we have p = p1+p2 -> (p1+p2)^scal, so scal cannot be applied to individual profile
                 raise ValueError('Transformation not available with doublebeta model for scal != 1.')
+
+        elif self._pressure_gas_model['name'] == 'User':
+            prof = Ppar['profile'].to_value('keV cm-3')
+            Ppar['profile'] = (prof / np.amax(prof))**scal * Bnorm
+            
         else:
             raise ValueError('Problem with density model list.')
 
         self._magfield_model = Ppar
+        self._compile_profile_model(self._magfield_model)
 
 
     #==================================================
@@ -693,12 +881,135 @@ class Modpar(object):
             if scal != 1.0:
                 # In this case we have p = p1+p2 -> (p1+p2)^scal, so scal cannot be applied to individual profile
                 raise ValueError('Transformation not available with doublebeta model for scal != 1.')
+
+        elif self._density_gas_model['name'] == 'User':
+            prof = Ppar['profile'].to_value('cm-3')
+            Ppar['profile'] = (prof / np.amax(prof))**scal * Bnorm
+            
         else:
             raise ValueError('Problem with density model list.')
 
         self._magfield_model = Ppar
+        self._compile_profile_model(self._magfield_model)
+        
+        
+    #==================================================
+    # Compile a profile model
+    #==================================================
+
+    def _compile_profile_model(self, model):
+        """
+        Compile a profile model dictionary into a callable object, which is 
+        stored so that profiles evaluations do not have to parse the dictionary.
+        Only the compiled versions of the models currently used by the cluster 
+        are kept.
+        
+        Parameters
+        ----------
+        - model (dict): dictionary containing the model parameters
+        
+        Outputs
+        ----------
+        - compiled (ProfileModel): the compiled profile model
+
+        """
+
+        if not model['name'] in cluster_profile.ProfileModel.model_list:
+            print('The profile model can :')
+            print(cluster_profile.ProfileModel.model_list)
+            raise ValueError("The requested model has not been implemented")
+
+        compiled = cluster_profile.ProfileModel(model)
+
+        # Remove the models which are not in use anymore
+        in_use = [id(self._pressure_gas_model), id(self._density_gas_model),
+                  id(self._density_crp_model), id(self._magfield_model)]
+        self._profile_models = {key: val for key, val in self._profile_models.items() if key in in_use}
+        self._profile_models[id(model)] = compiled
+
+        return compiled
+
+    
+    def _get_compiled_profile_model(self, model):
+        """
+        Get the compiled version of a profile model dictionary, compiling 
+        it if needed, i.e. if the dictionary was modified since then (its 
+        version changed, see cluster_profile.ModelDict).
+        
+        Parameters
+        ----------
+        - model (dict): dictionary containing the model parameters
         
+        Outputs
+        ----------
+        - compiled (ProfileModel): the compiled profile model
+
+        """
+
+        compiled = self._profile_models.get(id(model))
+        if compiled is None or not compiled.matches(model):
+            compiled = self._compile_profile_model(model)
+
+        return compiled
+    
+    
+    #==================================================
+    # Compile a spectrum model
+    #==================================================
+
+    def _compile_spectrum_model(self, model):
+        """
+        Compile a spectrum model dictionary into a callable object, which is 
+        stored so that spectra evaluations do not have to parse the dictionary.
         
+        Parameters
+        ----------
+        - model (dict): dictionary containing the model parameters
+        
+        Outputs
+        ----------
+        - compiled (SpectrumModel): the compiled spectrum model
+
+        """
+
+        if not model['name'] in cluster_spectra.SpectrumModel.model_list:
+            print('The spectral model can :')
+            print(cluster_spectra.SpectrumModel.model_list)
+            raise ValueError("The requested model has not been implemented")
+
+        compiled = cluster_spectra.SpectrumModel(model)
+
+        # Remove the models which are not in use anymore
+        in_use = [id(self._spectrum_crp_model)]
+        self._spectrum_models = {key: val for key, val in self._spectrum_models.items() if key in in_use}
+        self._spectrum_models[id(model)] = compiled
+
+        return compiled
+
+    
+    def _get_compiled_spectrum_model(self, model):
+        """
+        Get the compiled version of a spectrum model dictionary, compiling 
+        it if needed, i.e. if the dictionary was modified since then (its 
+        version changed, see cluster_profile.ModelDict).
+        
+        Parameters
+        ----------
+        - model (dict): dictionary containing the model parameters
+        
+        Outputs
+        ----------
+        - compiled (SpectrumModel): the compiled spectrum model
+
+        """
+
+        compiled = self._spectrum_models.get(id(model))
+        if compiled is None or not compiled.matches(model):
+            compiled = self._compile_spectrum_model(model)
+
+        return compiled
+    
+    
     #==================================================
     # Get the generic model profile
     #==================================================
@@ -720,86 +1031,14 @@ class Modpar(object):
 
         """
 
-        model_list = ['GNFW', 'SVM', 'beta', 'doublebeta']
-
-        if not model['name'] in model_list:
-            print('The profile model can :')
-            print(model_list)
-            raise ValueError("The requested model has not been implemented")
+        compiled = self._get_compiled_profile_model(model)
 
         r3d_kpc = radius.to_value('kpc')
 
-        #---------- Case of GNFW profile
-        if model['name'] == 'GNFW':
-            unit = model["P_0"].unit
-            
-            P0 = model["P_0"].to_value(unit)
-            rp = model["r_p"].to_value('kpc')
-            a  = model["a"]
-            b  = model["b"]
-            c  = model["c"]
-
-            if derivative:
-                prof_r = cluster_profile.gNFW_model_derivative(r3d_kpc, P0, rp,
-                                                               slope_a=a, slope_b=b, slope_c=c) * unit*u.Unit('kpc-1')
-            else:
-                prof_r = cluster_profile.gNFW_model(r3d_kpc, P0, rp, slope_a=a, slope_b=b, slope_c=c)*unit
-
-        #---------- Case of SVM model
-        elif model['name'] == 'SVM':
-            unit = model["n_0"].unit
-            
-            n0      = model["n_0"].to_value(unit)
-            rc      = model["r_c"].to_value('kpc')
-            rs      = model["r_s"].to_value('kpc')
-            alpha   = model["alpha"]
-            beta    = model["beta"]
-            gamma   = model["gamma"]
-            epsilon = model["epsilon"]
-
-            if derivative:
-                prof_r = cluster_profile.svm_model_derivative(r3d_kpc, n0, rc, beta,
-                                                              rs, gamma, epsilon, alpha) * unit*u.Unit('kpc-1')
-            else:
-                prof_r = cluster_profile.svm_model(r3d_kpc, n0, rc, beta, rs, gamma, epsilon, alpha)*unit
-
-        #---------- beta model
-        elif model['name'] == 'beta':
-            unit = model["n_0"].unit
-
-            n0      = model["n_0"].to_value(unit)
-            rc      = model["r_c"].to_value('kpc')
-            beta    = model["beta"]
-
-            if derivative:
-                prof_r = cluster_profile.beta_model_derivative(r3d_kpc, n0, rc, beta) * unit*u.Unit('kpc-1')
-            else:
-                prof_r = cluster_profile.beta_model(r3d_kpc, n0, rc, beta)*unit
-            
-        #---------- double beta model
-        elif model['name'] == 'doublebeta':
-            unit1 = model["n_01"].unit
-            unit2 = model["n_02"].unit
-
-            n01      = model["n_01"].to_value(unit1)
-            rc1      = model["r_c1"].to_value('kpc')
-            beta1    = model["beta1"]
-            n02      = model["n_02"].to_value(unit2)
-            rc2      = model["r_c2"].to_value('kpc')
-            beta2    = model["beta2"]
-
-            if derivative:
-                prof_r1 = cluster_profile.beta_model_derivative(r3d_kpc, n01, rc1, beta1) * unit1*u.Unit('kpc-1')
-                prof_r2 = cluster_profile.beta_model_derivative(r3d_kpc, n02, rc2, beta2) * unit2*u.Unit('kpc-1')
-                prof_r = prof_r1 + prof_r2
-            else:
-                prof_r1 = cluster_profile.beta_model(r3d_kpc, n01, rc1, beta1)*unit1
-                prof_r2 = cluster_profile.beta_model(r3d_kpc, n02, rc2, beta2)*unit2
-                prof_r = prof_r1 + prof_r2
-            
-        #---------- Otherwise nothing is done
-        else :
-            if not self._silent: print('The requested model has not been implemented.')
+        if derivative:
+            prof_r = compiled.derivative(r3d_kpc) * compiled.dunit
+        else:
+            prof_r = compiled.value(r3d_kpc) * compiled.unit
 
         return prof_r
 
@@ -824,28 +1063,132 @@ class Modpar(object):
 
         """
 
-        model_list = ['PowerLaw', 'ExponentialCutoffPowerLaw']
+        compiled = self._get_compiled_spectrum_model(model)
 
-        if not model['name'] in model_list:
-            print('The spectral model can :')
-            print(model_list)
-            raise ValueError("The requested model has not been implemented")
+        S_E = compiled.value(energy.to_value('GeV'))
+
+        return S_E
 
-        eng_GeV = energy.to_value('GeV')
 
-        #---------- Case of GNFW profile
-        if model['name'] == 'PowerLaw':
-            index   = model["Index"]
-            S_E = cluster_spectra.powerlaw_model(eng_GeV, 1.0, index)
+    #==================================================
+    # Get the volume integral of the generic model profile
+    #==================================================
 
-        #---------- Case of SVM model
-        elif model['name'] == 'ExponentialCutoffPowerLaw':
-            index   = model["Index"]
-            Ecut   = model["CutoffEnergy"].to_value('GeV')
-            S_E = cluster_spectra.exponentialcutoffpowerlaw_model(eng_GeV, 1.0, index, Ecut)
+    def _get_generic_profile_volume(self, Rmin, Rmax, model):
+        """
+        Get the volume integral of the generic profile, \int_Rmin^Rmax 4 pi r^2 p(r) dr,
+        in closed form. The closed forms available are given in a registry 
+        per model. When the model is not in the registry, or if the closed 
+        form cannot be evaluated, None is returned and the integral should 
+        be computed numerically.
+        
+        Parameters
+        ----------
+        - Rmin (quantity) : the minimal radius in units homogeneous to kpc
+        - Rmax (quantity) : the maximal radius in units homogeneous to kpc
+        - model (dict): dictionary containing the model parameters
+        
+        Outputs
+        ----------
+        - volume (quantity): the volume integrated profile, or None
 
-        #---------- Otherwise nothing is done
-        else :
-            if not self._silent: print('The requested model has not been implemented.')
+        """
 
-        return S_E
+        r1 = Rmin.to_value('kpc')
+        r2 = Rmax.to_value('kpc')
+        
+        def volume_gNFW(m):
+            unit = m["P_0"].unit
+            if m["c"] >= 3:
+                return np.nan*unit
+            return cluster_profile.get_volume_gNFW_model_analytic(r1, r2, m["P_0"].to_value(unit),
+                                                                  m["r_p"].to_value('kpc'),
+                                                                  slope_a=m["a"], slope_b=m["b"], slope_c=m["c"])*unit
+        def volume_beta(m):
+            unit = m["n_0"].unit
+            return cluster_profile.get_volume_beta_model_analytic(r1, r2, m["n_0"].to_value(unit),
+                                                                  m["r_c"].to_value('kpc'), m["beta"])*unit
+        def volume_doublebeta(m):
+            unit = m["n_01"].unit
+            V1 = cluster_profile.get_volume_beta_model_analytic(r1, r2, m["n_01"].to_value(unit),
+                                                                m["r_c1"].to_value('kpc'), m["beta1"])
+            V2 = cluster_profile.get_volume_beta_model_analytic(r1, r2, m["n_02"].to_value(unit),
+                                                                m["r_c2"].to_value('kpc'), m["beta2"])
+            return (V1 + V2)*unit
+        def volume_user(m):
+            compiled = self._get_compiled_profile_model(m)
+            return compiled.volume(r1, r2)*compiled.unit
+
+        registry = {'GNFW'      : volume_gNFW,
+                    'beta'      : volume_beta,
+                    'doublebeta': volume_doublebeta,
+                    'User'      : volume_user}
+
+        if not model['name'] in registry:
+            return None
+
+        if r2 <= r1:
+            return 0*u.kpc**3 * registry[model['name']](model).unit
+        
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            volume = registry[model['name']](model)
+
+        if not np.isfinite(volume.value):
+            return None
+
+        return volume*u.kpc**3
+    
+
+    #==================================================
+    # Get the energy integral of the generic model spectrum
+    #==================================================
+
+    def _get_generic_spectrum_energy_integral(self, Emin, Emax, model):
+        """
+        Get the integral of the generic spectrum times energy, \int_Emin^Emax E f(E) dE,
+        in closed form. The closed forms available are given in a registry 
+        per model. When the model is not in the registry, or if the closed 
+        form cannot be evaluated, None is returned and the integral should 
+        be computed numerically.
+        
+        Parameters
+        ----------
+        - Emin (quantity) : the minimal energy in units homogeneous to GeV
+        - Emax (quantity) : the maximal energy in units homogeneous to GeV
+        - model (dict): dictionary containing the model parameters
+        
+        Outputs
+        ----------
+        - integral (quantity): the integral in GeV^2, or None
+
+        """
+
+        e1 = Emin.to_value('GeV')
+        e2 = Emax.to_value('GeV')
+
+        def integral_powerlaw(m):
+            return cluster_spectra.get_integral_energy_powerlaw_model(e1, e2, 1.0, m["Index"])
+        def integral_ecpl(m):
+            return cluster_spectra.get_integral_energy_exponentialcutoffpowerlaw_model(e1, e2, 1.0, m["Index"],
+                                                                                       m["CutoffEnergy"].to_value('GeV'))
+
+        def integral_user(m):
+            return self._get_compiled_spectrum_model(m).energy_integral(e1, e2)
+
+        registry = {'PowerLaw'                 : integral_powerlaw,
+                    'ExponentialCutoffPowerLaw': integral_ecpl,
+                    'User'                     : integral_user}
+
+        if not model['name'] in registry:
+            return None
+
+        if e2 <= e1:
+            return 0*u.GeV**2
+        
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            integral = registry[model['name']](model)
+
+        if not np.isfinite(integral):
+            return None
+
+        return integral*u.GeV**2
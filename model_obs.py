@@ -14,6 +14,7 @@ import astropy.units as u
 from astropy.wcs import WCS
 from astropy import constants as const
 import scipy.interpolate as interpolate
+import healpy
 
 from ClusterModel              import model_tools
 from ClusterModel.ClusterTools import cluster_global 
@@ -21,12 +22,14 @@ from ClusterModel.ClusterTools import cluster_profile
 from ClusterModel.ClusterTools import cluster_spectra 
 from ClusterModel.ClusterTools import cluster_xspec
 from ClusterModel.ClusterTools import map_tools
+from ClusterModel.ClusterTools import cluster_timing
 
 
 #==================================================
 # Observable class
 #==================================================
 
+@cluster_timing.timed_methods
 class Observables(object):
     """ Observable class
     This class serves as a parser to the main Cluster class, to 
@@ -125,7 +128,7 @@ class Observables(object):
             
         # Compute the integral
         if type_integral == 'spherical':
-            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
             dN_dEdVdt = self.get_rate_gamma(energy_rf, rad)
             dN_dEdt = model_tools.spherical_integration(dN_dEdVdt, rad)
             
@@ -133,9 +136,9 @@ class Observables(object):
         if type_integral == 'cylindrical':
             Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)
             Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
-            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('gamma', 'los'), unit=True)
+            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
             dN_dEdVdt = self.get_rate_gamma(energy_rf, r3d)
             dN_dEdt = model_tools.cylindrical_integration(dN_dEdVdt, energy, r3d, r2d, los, Rtrunc=self._R_truncation)
         
@@ -192,7 +195,7 @@ class Observables(object):
         Rmax = np.amax(radius.to_value('kpc'))*u.kpc
 
         # Define energy and K correction
-        eng = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+        eng = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('gamma', 'energy'), unit=True)
         if Cframe:
             eng_rf = eng*1.0
         else:
@@ -201,8 +204,8 @@ class Observables(object):
         # Define array for integration
         Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)        
         Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
+        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('gamma', 'los'), unit=True)
         dN_dEdVdt = self.get_rate_gamma(eng_rf, r3d)
 
         # Apply EBL absorbtion
@@ -296,7 +299,7 @@ class Observables(object):
         #----- Case of scalar quantities
         if type(Emin.value) == float and type(Rmax.value) == float:
             # Get a spectrum
-            energy = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            energy = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('gamma', 'energy'), unit=True)
             energy, dN_dEdSdt = self.get_gamma_spectrum(energy, Rmin=Rmin, Rmax=Rmax,
                                                         type_integral=type_integral, Rmin_los=Rmin_los, NR500_los=NR500_los, Cframe=Cframe)
 
@@ -306,7 +309,7 @@ class Observables(object):
         #----- Case of energy array
         if type(Emin.value) == np.ndarray:
             # Get a spectrum
-            energy = model_tools.sampling_array(np.amin(Emin.value)*Emin.unit, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            energy = model_tools.sampling_array(np.amin(Emin.value)*Emin.unit, Emax, NptPd=self._get_npt_per_decade('gamma', 'energy'), unit=True)
             energy, dN_dEdSdt = self.get_gamma_spectrum(energy, Rmin=Rmin, Rmax=Rmax,
                                                         type_integral=type_integral, Rmin_los=Rmin_los, NR500_los=NR500_los, Cframe=Cframe)
 
@@ -319,7 +322,7 @@ class Observables(object):
             itpl = interpolate.interp1d(energy.value, dN_dEdSdt.value, kind='linear')
                 
             for i in range(len(Emin)):
-                eng_i = model_tools.sampling_array(Emin[i], Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+                eng_i = model_tools.sampling_array(Emin[i], Emax, NptPd=self._get_npt_per_decade('gamma', 'energy'), unit=True)
                 dN_dEdSdt_i = itpl(eng_i.value)*dN_dEdSdt.unit
                 
                 flux[i] = model_tools.energy_integration(dN_dEdSdt_i, eng_i, Energy_density=Energy_density)
@@ -327,7 +330,7 @@ class Observables(object):
         #----- Case of radius array (need to use dN/dVdEdt and not get_profile because spherical flux)
         if type(Rmax.value) == np.ndarray:
             # Get energy integration
-            eng = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            eng = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('gamma', 'energy'), unit=True)
             if Cframe:
                 eng_rf = eng*1.0
             else:
@@ -339,8 +342,8 @@ class Observables(object):
             if type_integral == 'cylindrical':
                 Rmax3d = np.sqrt((NR500_los*self._R500)**2 + (np.amax(Rmax.value)*Rmax.unit)**2)*1.1        
                 Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)*0.9
-            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('gamma', 'los'), unit=True)
             dN_dEdVdt = self.get_rate_gamma(eng_rf, r3d)
 
             # Apply EBL absorbtion
@@ -361,7 +364,7 @@ class Observables(object):
             if type_integral == 'spherical':
                itpl = interpolate.interp1d(r3d.to_value('kpc'), dN_dVdt.value, kind='linear')
                for i in range(len(Rmax)):
-                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
                    dN_dVdt_i = itpl(rad_i.to_value('kpc'))*dN_dVdt.unit
                    lum_i = model_tools.spherical_integration(dN_dVdt_i, rad_i)
                    flux[i] =  lum_i / (4*np.pi * self._D_lum**2)
@@ -369,7 +372,7 @@ class Observables(object):
             # Case of cylindrical integral
             if type_integral == 'cylindrical':
                 # Compute integral over l.o.s.
-                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._Npt_per_decade_integ, unit=True)
+                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
                 dN_dVdt_proj = model_tools.los_integration_1dfunc(dN_dVdt, r3d, radius, los)
                 dN_dVdt_proj[radius > self._R_truncation] = 0
 
@@ -378,7 +381,7 @@ class Observables(object):
                 itpl = interpolate.interp1d(radius.to_value('kpc'), dN_dSdVdt_proj.value, kind='linear')
                 
                 for i in range(len(Rmax)):
-                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
                     dN_dSdVdt_proj_i = itpl(rad_i.value)*dN_dSdVdt_proj.unit
                     flux[i] = model_tools.trapz_loglog(2*np.pi*rad_i*dN_dSdVdt_proj_i, rad_i)
         
@@ -427,14 +430,8 @@ class Observables(object):
 
         """
 
-        # Get the header
-        header = self.get_map_header()
-
-        # Get a R.A-Dec. map
-        ra_map, dec_map = map_tools.get_radec_map(header)
-
-        # Get a cluster distance map (in deg)
-        dist_map = map_tools.greatcircle(ra_map, dec_map, self._coord.icrs.ra.to_value('deg'), self._coord.icrs.dec.to_value('deg'))
+        # Get the header, the R.A-Dec. map and the cluster distance map (in deg)
+        header, ra_map, dec_map, dist_map = self._get_map_geometry()
         
         # Define the radius used fo computing the profile
         theta_max = np.amax(dist_map) # maximum angle from the cluster
@@ -443,7 +440,7 @@ class Observables(object):
             print('!!!!! WARNING: the cluster location is very much offset from the field of view')
         rmax = theta_max*np.pi/180 * self._D_ang
         rmin = theta_min*np.pi/180 * self._D_ang
-        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade('gamma', 'radius'), unit=True)
         
         # Project the integrand
         r_proj, profile = self.get_gamma_profile(radius, Emin=Emin, Emax=Emax, Energy_density=Energy_density,
@@ -451,7 +448,7 @@ class Observables(object):
 
         # Convert to angle and interpolate onto a map
         theta_proj = (r_proj/self._D_ang).to_value('')*180.0/np.pi   # degrees
-        gamma_map = map_tools.profile2map(profile.value, theta_proj, dist_map)*profile.unit
+        gamma_map = self._profile2map(profile.value, theta_proj, dist_map)*profile.unit
         
         # Avoid numerical residual ringing from interpolation
         gamma_map[dist_map > self._theta_truncation.to_value('deg')] = 0
@@ -538,7 +535,7 @@ class Observables(object):
             
         # Compute the integral
         if type_integral == 'spherical':
-            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
             dN_dEdVdt = self.get_rate_neutrino(energy_rf, rad, flavor=flavor)
             dN_dEdt = model_tools.spherical_integration(dN_dEdVdt, rad)
             
@@ -546,9 +543,9 @@ class Observables(object):
         if type_integral == 'cylindrical':
             Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)
             Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
-            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('neutrino', 'los'), unit=True)
+            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
             dN_dEdVdt = self.get_rate_neutrino(energy_rf, r3d, flavor=flavor)
             dN_dEdt = model_tools.cylindrical_integration(dN_dEdVdt, energy, r3d, r2d, los, Rtrunc=self._R_truncation)
         
@@ -602,7 +599,7 @@ class Observables(object):
         Rmax = np.amax(radius.to_value('kpc'))*u.kpc
 
         # Define energy and K correction
-        eng = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+        eng = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('neutrino', 'energy'), unit=True)
         if Cframe:
             eng_rf = eng*1.0
         else:
@@ -611,8 +608,8 @@ class Observables(object):
         # Define array for integration
         Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)        
         Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
+        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('neutrino', 'los'), unit=True)
         dN_dEdVdt = self.get_rate_neutrino(eng_rf, r3d, flavor=flavor)
 
         # Compute energy integal
@@ -702,7 +699,7 @@ class Observables(object):
         #----- Case of scalar quantities
         if type(Emin.value) == float and type(Rmax.value) == float:
             # Get a spectrum
-            energy = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            energy = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('neutrino', 'energy'), unit=True)
             energy, dN_dEdSdt = self.get_neutrino_spectrum(energy, Rmin=Rmin, Rmax=Rmax,
                                                            type_integral=type_integral, Rmin_los=Rmin_los, NR500_los=NR500_los,
                                                            flavor=flavor, Cframe=Cframe)
@@ -713,7 +710,7 @@ class Observables(object):
         #----- Case of energy array
         if type(Emin.value) == np.ndarray:
             # Get a spectrum
-            energy = model_tools.sampling_array(np.amin(Emin.value)*Emin.unit, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            energy = model_tools.sampling_array(np.amin(Emin.value)*Emin.unit, Emax, NptPd=self._get_npt_per_decade('neutrino', 'energy'), unit=True)
             energy, dN_dEdSdt = self.get_neutrino_spectrum(energy, Rmin=Rmin, Rmax=Rmax,
                                                            type_integral=type_integral, Rmin_los=Rmin_los, NR500_los=NR500_los,
                                                            flavor=flavor, Cframe=Cframe)
@@ -727,14 +724,14 @@ class Observables(object):
             itpl = interpolate.interp1d(energy.value, dN_dEdSdt.value, kind='linear')
                 
             for i in range(len(Emin)):
-                eng_i = model_tools.sampling_array(Emin[i], Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+                eng_i = model_tools.sampling_array(Emin[i], Emax, NptPd=self._get_npt_per_decade('neutrino', 'energy'), unit=True)
                 dN_dEdSdt_i = itpl(eng_i.value)*dN_dEdSdt.unit
                 flux[i] = model_tools.energy_integration(dN_dEdSdt_i, eng_i, Energy_density=Energy_density)
 
         #----- Case of radius array (need to use dN/dVdEdt and not get_profile because spherical flux)
         if type(Rmax.value) == np.ndarray:
             # Get energy integration
-            eng = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            eng = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('neutrino', 'energy'), unit=True)
             if Cframe:
                 eng_rf = eng*1.0
             else:
@@ -746,8 +743,8 @@ class Observables(object):
             if type_integral == 'cylindrical':
                 Rmax3d = np.sqrt((NR500_los*self._R500)**2 + (np.amax(Rmax.value)*Rmax.unit)**2)*1.1        
                 Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)*0.9
-            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('neutrino', 'los'), unit=True)
             dN_dEdVdt = self.get_rate_neutrino(eng_rf, r3d)
 
             # Compute energy integal
@@ -763,7 +760,7 @@ class Observables(object):
             if type_integral == 'spherical':
                itpl = interpolate.interp1d(r3d.to_value('kpc'), dN_dVdt.value, kind='linear')
                for i in range(len(Rmax)):
-                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
                    dN_dVdt_i = itpl(rad_i.to_value('kpc'))*dN_dVdt.unit
                    lum_i = model_tools.spherical_integration(dN_dVdt_i, rad_i)
                    flux[i] =  lum_i / (4*np.pi * self._D_lum**2)
@@ -771,7 +768,7 @@ class Observables(object):
             # Case of cylindrical integral
             if type_integral == 'cylindrical':
                 # Compute integral over l.o.s.
-                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._Npt_per_decade_integ, unit=True)
+                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
                 dN_dVdt_proj = model_tools.los_integration_1dfunc(dN_dVdt, r3d, radius, los)
                 dN_dVdt_proj[radius > self._R_truncation] = 0
 
@@ -780,7 +777,7 @@ class Observables(object):
                 itpl = interpolate.interp1d(radius.to_value('kpc'), dN_dSdVdt_proj.value, kind='linear')
                 
                 for i in range(len(Rmax)):
-                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
                     dN_dSdVdt_proj_i = itpl(rad_i.value)*dN_dSdVdt_proj.unit
                     flux[i] = model_tools.trapz_loglog(2*np.pi*rad_i*dN_dSdVdt_proj_i, rad_i)
         
@@ -831,14 +828,8 @@ class Observables(object):
 
         """
 
-        # Get the header
-        header = self.get_map_header()
-
-        # Get a R.A-Dec. map
-        ra_map, dec_map = map_tools.get_radec_map(header)
-
-        # Get a cluster distance map (in deg)
-        dist_map = map_tools.greatcircle(ra_map, dec_map, self._coord.icrs.ra.to_value('deg'), self._coord.icrs.dec.to_value('deg'))
+        # Get the header, the R.A-Dec. map and the cluster distance map (in deg)
+        header, ra_map, dec_map, dist_map = self._get_map_geometry()
         
         # Define the radius used fo computing the profile
         theta_max = np.amax(dist_map) # maximum angle from the cluster
@@ -847,7 +838,7 @@ class Observables(object):
             print('!!!!! WARNING: the cluster location is very much offset from the field of view')
         rmax = theta_max*np.pi/180 * self._D_ang
         rmin = theta_min*np.pi/180 * self._D_ang
-        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade('neutrino', 'radius'), unit=True)
         
         # Project the integrand
         r_proj, profile = self.get_neutrino_profile(radius, Emin=Emin, Emax=Emax, Energy_density=Energy_density,
@@ -855,7 +846,7 @@ class Observables(object):
 
         # Convert to angle and interpolate onto a map
         theta_proj = (r_proj/self._D_ang).to_value('')*180.0/np.pi   # degrees
-        nu_map = map_tools.profile2map(profile.value, theta_proj, dist_map)*profile.unit
+        nu_map = self._profile2map(profile.value, theta_proj, dist_map)*profile.unit
         
         # Avoid numerical residual ringing from interpolation
         nu_map[dist_map > self._theta_truncation.to_value('deg')] = 0
@@ -947,7 +938,7 @@ class Observables(object):
             
         # Compute the integral
         if type_integral == 'spherical':
-            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
             dN_dEdVdt = self.get_rate_ic(energy_rf, rad)
             dN_dEdt = model_tools.spherical_integration(dN_dEdVdt, rad)
             
@@ -955,9 +946,9 @@ class Observables(object):
         if type_integral == 'cylindrical':
             Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)
             Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
-            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('ic', 'los'), unit=True)
+            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
             dN_dEdVdt = self.get_rate_ic(energy_rf, r3d)
             dN_dEdt = model_tools.cylindrical_integration(dN_dEdVdt, energy, r3d, r2d, los, Rtrunc=self._R_truncation)
         
@@ -1014,7 +1005,7 @@ class Observables(object):
         Rmax = np.amax(radius.to_value('kpc'))*u.kpc
 
         # Define energy and K correction
-        eng = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+        eng = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('ic', 'energy'), unit=True)
         if Cframe:
             eng_rf = eng*1.0
         else:
@@ -1023,8 +1014,8 @@ class Observables(object):
         # Define array for integration
         Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)        
         Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
+        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('ic', 'los'), unit=True)
         dN_dEdVdt = self.get_rate_ic(eng_rf, r3d)
 
         # Apply EBL absorbtion
@@ -1117,7 +1108,7 @@ class Observables(object):
         #----- Case of scalar quantities
         if type(Emin.value) == float and type(Rmax.value) == float:
             # Get a spectrum
-            energy = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            energy = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('ic', 'energy'), unit=True)
             energy, dN_dEdSdt = self.get_ic_spectrum(energy, Rmin=Rmin, Rmax=Rmax,
                                                      type_integral=type_integral, Rmin_los=Rmin_los, NR500_los=NR500_los, Cframe=Cframe)
 
@@ -1127,7 +1118,7 @@ class Observables(object):
         #----- Case of energy array
         if type(Emin.value) == np.ndarray:
             # Get a spectrum
-            energy = model_tools.sampling_array(np.amin(Emin.value)*Emin.unit, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            energy = model_tools.sampling_array(np.amin(Emin.value)*Emin.unit, Emax, NptPd=self._get_npt_per_decade('ic', 'energy'), unit=True)
             energy, dN_dEdSdt = self.get_ic_spectrum(energy, Rmin=Rmin, Rmax=Rmax,
                                                      type_integral=type_integral, Rmin_los=Rmin_los, NR500_los=NR500_los, Cframe=Cframe)
 
@@ -1140,14 +1131,14 @@ class Observables(object):
             itpl = interpolate.interp1d(energy.value, dN_dEdSdt.value, kind='linear')
                 
             for i in range(len(Emin)):
-                eng_i = model_tools.sampling_array(Emin[i], Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+                eng_i = model_tools.sampling_array(Emin[i], Emax, NptPd=self._get_npt_per_decade('ic', 'energy'), unit=True)
                 dN_dEdSdt_i = itpl(eng_i.value)*dN_dEdSdt.unit
                 flux[i] = model_tools.energy_integration(dN_dEdSdt_i, eng_i, Energy_density=Energy_density)
 
         #----- Case of radius array (need to use dN/dVdEdt and not get_profile because spherical flux)
         if type(Rmax.value) == np.ndarray:
             # Get energy integration
-            eng = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+            eng = model_tools.sampling_array(Emin, Emax, NptPd=self._get_npt_per_decade('ic', 'energy'), unit=True)
             if Cframe:
                 eng_rf = eng*1.0
             else:
@@ -1159,8 +1150,8 @@ class Observables(object):
             if type_integral == 'cylindrical':
                 Rmax3d = np.sqrt((NR500_los*self._R500)**2 + (np.amax(Rmax.value)*Rmax.unit)**2)*1.1        
                 Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)*0.9
-            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('ic', 'los'), unit=True)
             dN_dEdVdt = self.get_rate_ic(eng_rf, r3d)
 
             # Apply EBL absorbtion
@@ -1181,7 +1172,7 @@ class Observables(object):
             if type_integral == 'spherical':
                itpl = interpolate.interp1d(r3d.to_value('kpc'), dN_dVdt.value, kind='linear')
                for i in range(len(Rmax)):
-                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
                    dN_dVdt_i = itpl(rad_i.to_value('kpc'))*dN_dVdt.unit
                    lum_i = model_tools.spherical_integration(dN_dVdt_i, rad_i)
                    flux[i] =  lum_i / (4*np.pi * self._D_lum**2)
@@ -1189,7 +1180,7 @@ class Observables(object):
             # Case of cylindrical integral
             if type_integral == 'cylindrical':
                 # Compute integral over l.o.s.
-                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._Npt_per_decade_integ, unit=True)
+                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
                 dN_dVdt_proj = model_tools.los_integration_1dfunc(dN_dVdt, r3d, radius, los)
                 dN_dVdt_proj[radius > self._R_truncation] = 0
 
@@ -1198,7 +1189,7 @@ class Observables(object):
                 itpl = interpolate.interp1d(radius.to_value('kpc'), dN_dSdVdt_proj.value, kind='linear')
                 
                 for i in range(len(Rmax)):
-                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
                     dN_dSdVdt_proj_i = itpl(rad_i.value)*dN_dSdVdt_proj.unit
                     flux[i] = model_tools.trapz_loglog(2*np.pi*rad_i*dN_dSdVdt_proj_i, rad_i)
         
@@ -1245,14 +1236,8 @@ class Observables(object):
 
         """
 
-        # Get the header
-        header = self.get_map_header()
-
-        # Get a R.A-Dec. map
-        ra_map, dec_map = map_tools.get_radec_map(header)
-
-        # Get a cluster distance map (in deg)
-        dist_map = map_tools.greatcircle(ra_map, dec_map, self._coord.icrs.ra.to_value('deg'), self._coord.icrs.dec.to_value('deg'))
+        # Get the header, the R.A-Dec. map and the cluster distance map (in deg)
+        header, ra_map, dec_map, dist_map = self._get_map_geometry()
         
         # Define the radius used fo computing the profile
         theta_max = np.amax(dist_map) # maximum angle from the cluster
@@ -1261,7 +1246,7 @@ class Observables(object):
             print('!!!!! WARNING: the cluster location is very much offset from the field of view')
         rmax = theta_max*np.pi/180 * self._D_ang
         rmin = theta_min*np.pi/180 * self._D_ang
-        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade('ic', 'radius'), unit=True)
         
         # Project the integrand
         r_proj, profile = self.get_ic_profile(radius, Emin=Emin, Emax=Emax, Energy_density=Energy_density,
@@ -1269,7 +1254,7 @@ class Observables(object):
 
         # Convert to angle and interpolate onto a map
         theta_proj = (r_proj/self._D_ang).to_value('')*180.0/np.pi   # degrees
-        ic_map = map_tools.profile2map(profile.value, theta_proj, dist_map)*profile.unit
+        ic_map = self._profile2map(profile.value, theta_proj, dist_map)*profile.unit
         
         # Avoid numerical residual ringing from interpolation
         ic_map[dist_map > self._theta_truncation.to_value('deg')] = 0
@@ -1293,10 +1278,217 @@ class Observables(object):
                 ic_map = ic_map.to('GeV cm-2 s-1 sr-1')
             else :
                 ic_map = ic_map.to('cm-2 s-1 sr-1')
-                
+
         return ic_map
 
 
+    #==================================================
+    # Compute gamma map cube
+    #==================================================
+    def get_gamma_map_cube(self, energy_edges=np.logspace(-1,5,31)*u.GeV,
+                           Rmin_los=None, NR500_los=5.0,
+                           Energy_density=False, Cframe=False):
+        """
+        Compute the gamma ray map cube, integrated within energy bins. The rate
+        is computed only once on a fine energy grid and the bins are obtained
+        from its cumulative integral.
+
+        Parameters
+        ----------
+        - energy_edges (quantity): the edges of the energy bins (Nbin+1)
+        - Rmin_los (Quantity): the radius at which line of sight integration starts
+        - NR500_los (float): the integration will stop at NR500_los x R500
+        - Energy_density (bool): if True, then the energy density is computed. Otherwise,
+        the number density is computed.
+        - Cframe (bool): computation assumes that we are in the cluster frame (no redshift effect)
+
+        Outputs
+        ----------
+        gamma_cube (np.ndarray) : the map cube (Nbin x Ny x Nx) in units of brightness
+
+        """
+
+        def rate(eng_rf, r3d): return self.get_rate_gamma(eng_rf, r3d)
+
+        gamma_cube = self._get_energy_binned_map_cube(rate, energy_edges,
+                                                      Rmin_los=Rmin_los, NR500_los=NR500_los,
+                                                      Energy_density=Energy_density,
+                                                      EBL_absorb=True, Cframe=Cframe, product='gamma')
+
+        return gamma_cube
+
+
+    #==================================================
+    # Compute neutrino map cube
+    #==================================================
+    def get_neutrino_map_cube(self, energy_edges=np.logspace(-1,5,31)*u.GeV,
+                              Rmin_los=None, NR500_los=5.0,
+                              Energy_density=False, flavor='all', Cframe=False):
+        """
+        Compute the neutrino map cube, integrated within energy bins. The rate
+        is computed only once on a fine energy grid and the bins are obtained
+        from its cumulative integral.
+
+        Parameters
+        ----------
+        - energy_edges (quantity): the edges of the energy bins (Nbin+1)
+        - Rmin_los (Quantity): the radius at which line of sight integration starts
+        - NR500_los (float): the integration will stop at NR500_los x R500
+        - Energy_density (bool): if True, then the energy density is computed. Otherwise,
+        the number density is computed.
+        - flavor (str): either 'all', 'numu' or 'nue'
+        - Cframe (bool): computation assumes that we are in the cluster frame (no redshift effect)
+
+        Outputs
+        ----------
+        neutrino_cube (np.ndarray) : the map cube (Nbin x Ny x Nx) in units of brightness
+
+        """
+
+        def rate(eng_rf, r3d): return self.get_rate_neutrino(eng_rf, r3d, flavor=flavor)
+
+        neutrino_cube = self._get_energy_binned_map_cube(rate, energy_edges,
+                                                         Rmin_los=Rmin_los, NR500_los=NR500_los,
+                                                         Energy_density=Energy_density,
+                                                         EBL_absorb=False, Cframe=Cframe, product='neutrino')
+
+        return neutrino_cube
+
+
+    #==================================================
+    # Compute IC map cube
+    #==================================================
+    def get_ic_map_cube(self, energy_edges=np.logspace(-1,5,31)*u.GeV,
+                        Rmin_los=None, NR500_los=5.0,
+                        Energy_density=False, Cframe=False):
+        """
+        Compute the inverse Compton map cube, integrated within energy bins. The
+        rate is computed only once on a fine energy grid and the bins are obtained
+        from its cumulative integral.
+
+        Parameters
+        ----------
+        - energy_edges (quantity): the edges of the energy bins (Nbin+1)
+        - Rmin_los (Quantity): the radius at which line of sight integration starts
+        - NR500_los (float): the integration will stop at NR500_los x R500
+        - Energy_density (bool): if True, then the energy density is computed. Otherwise,
+        the number density is computed.
+        - Cframe (bool): computation assumes that we are in the cluster frame (no redshift effect)
+
+        Outputs
+        ----------
+        ic_cube (np.ndarray) : the map cube (Nbin x Ny x Nx) in units of brightness
+
+        """
+
+        def rate(eng_rf, r3d): return self.get_rate_ic(eng_rf, r3d)
+
+        ic_cube = self._get_energy_binned_map_cube(rate, energy_edges,
+                                                   Rmin_los=Rmin_los, NR500_los=NR500_los,
+                                                   Energy_density=Energy_density,
+                                                   EBL_absorb=True, Cframe=Cframe, product='ic')
+
+        return ic_cube
+
+
+    #==================================================
+    # Compute energy binned map cube from a rate
+    #==================================================
+    def _get_energy_binned_map_cube(self, rate, energy_edges,
+                                    Rmin_los=None, NR500_los=5.0,
+                                    Energy_density=False, EBL_absorb=True,
+                                    Cframe=False, product=None):
+        """
+        Compute a map cube integrated within energy bins, given a production
+        rate function. The rate is evaluated once on a fine energy grid
+        including the bin edges, and the header, the distance map and the
+        l.o.s. integration grids are shared by all the bins.
+
+        Parameters
+        ----------
+        - rate (function): the rate function, as rate(energy, radius), that
+        returns dN/dEdVdt as a Neng x Nr quantity
+        - energy_edges (quantity): the edges of the energy bins (Nbin+1)
+        - Rmin_los (Quantity): the radius at which line of sight integration starts
+        - NR500_los (float): the integration will stop at NR500_los x R500
+        - Energy_density (bool): if True, then the energy density is computed. Otherwise,
+        the number density is computed.
+        - EBL_absorb (bool): apply the EBL absorbtion
+        - Cframe (bool): computation assumes that we are in the cluster frame (no redshift effect)
+        - product (str): the product name, used to get its sampling (see sampling_profile)
+
+        Outputs
+        ----------
+        cube (np.ndarray) : the map cube (Nbin x Ny x Nx) in units of brightness
+
+        """
+
+        # In case the input is not an array
+        energy_edges = model_tools.check_qarray(energy_edges, unit='GeV')
+        if len(energy_edges) < 2:
+            raise ValueError("At least two energy bin edges are needed")
+        if np.any(np.diff(energy_edges.to_value('GeV')) <= 0):
+            raise ValueError("The energy bin edges should be strictly increasing")
+
+        # Get the header, the R.A-Dec. map and the cluster distance map (in deg)
+        header, ra_map, dec_map, dist_map = self._get_map_geometry()
+
+        # Define the radius used fo computing the profile
+        theta_max = np.amax(dist_map) # maximum angle from the cluster
+        theta_min = np.amin(dist_map) # minimum angle from the cluster (~0 if cluster within FoV)
+        if theta_min > 10 and theta_max > 10:
+            print('!!!!! WARNING: the cluster location is very much offset from the field of view')
+        rmax = theta_max*np.pi/180 * self._D_ang
+        rmin = theta_min*np.pi/180 * self._D_ang
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade(product, 'radius'), unit=True)
+
+        # Define the fine energy grid including the bin edges, and K correction
+        eng = model_tools.sampling_array(energy_edges[0], energy_edges[-1], NptPd=self._get_npt_per_decade(product, 'energy'), unit=True)
+        eng = np.unique(np.append(eng.to_value('GeV'), energy_edges.to_value('GeV')))*u.GeV
+        if Cframe:
+            eng_rf = eng*1.0
+        else:
+            eng_rf = eng*(1+self._redshift)
+
+        # Define array for integration
+        if Rmin_los is None:
+            Rmin_los = self._Rmin
+        Rmax3d = np.sqrt((NR500_los*self._R500)**2 + rmax**2)
+        Rmin3d = np.sqrt(Rmin_los**2 + rmin**2)
+        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade(product, 'radius'), unit=True)
+        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade(product, 'los'), unit=True)
+        dN_dEdVdt = rate(eng_rf, r3d)
+
+        # Apply EBL absorbtion
+        if EBL_absorb and self._EBL_model != 'none' and not Cframe:
+            absorb = cluster_spectra.get_ebl_absorb(eng.to_value('GeV'), self._redshift, self._EBL_model)
+            dN_dEdVdt = dN_dEdVdt * model_tools.replicate_array(absorb, len(r3d), T=True)
+
+        # Compute energy integal in all bins at once: Nbin x Nr3d
+        dN_dVdt = model_tools.energy_bin_integration(dN_dEdVdt, eng, energy_edges, Energy_density=Energy_density)
+
+        # Define the output unit
+        if Energy_density:
+            out_unit = 'GeV cm-2 s-1 sr-1'
+        else:
+            out_unit = 'cm-2 s-1 sr-1'
+
+        # Project each bin and interpolate it onto the common distance map
+        theta_proj = (radius/self._D_ang).to_value('')*180.0/np.pi   # degrees
+        profile = np.zeros((len(energy_edges)-1, len(radius)))
+        for ibin in range(len(energy_edges)-1):
+            dN_dVdt_proj = model_tools.los_integration_1dfunc(dN_dVdt[ibin,:], r3d, radius, los)
+            dN_dVdt_proj[radius > self._R_truncation] = 0
+            dN_dSdtdO = dN_dVdt_proj * self._D_ang**2 * u.Unit('sr-1') / (4*np.pi * self._D_lum**2)
+            profile[ibin,:] = dN_dSdtdO.to_value(out_unit)
+        cube = self._profile2map(profile, theta_proj, dist_map)*u.Unit(out_unit)
+
+        # Avoid numerical residual ringing from interpolation
+        cube[:, dist_map > self._theta_truncation.to_value('deg')] = 0
+
+        return cube
+
+
     #==================================================
     # Compute synchrotron spectrum
     #==================================================
@@ -1355,7 +1547,7 @@ class Observables(object):
             
         # Compute the integral
         if type_integral == 'spherical':
-            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
             dN_dEdVdt = self.get_rate_synchrotron(energy_rf, rad)
             dN_dEdt = model_tools.spherical_integration(dN_dEdVdt, rad)
             
@@ -1363,9 +1555,9 @@ class Observables(object):
         if type_integral == 'cylindrical':
             Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)
             Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
-            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('synchrotron', 'los'), unit=True)
+            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
             dN_dEdVdt = self.get_rate_synchrotron(energy_rf, r3d)
             dN_dEdt = model_tools.cylindrical_integration(dN_dEdVdt, energy, r3d, r2d, los, Rtrunc=self._R_truncation)
             
@@ -1419,8 +1611,8 @@ class Observables(object):
         # Define array for integration
         Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)        
         Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
+        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('synchrotron', 'los'), unit=True)
         dN_dVdt_E = self.get_rate_synchrotron(eng0_rf, r3d).flatten()
         
         # Compute integral over l.o.s.
@@ -1506,8 +1698,8 @@ class Observables(object):
             if type_integral == 'cylindrical':
                 Rmax3d = np.sqrt((NR500_los*self._R500)**2 + (np.amax(Rmax.value)*Rmax.unit)**2)*1.1        
                 Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)*0.9
-            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('synchrotron', 'los'), unit=True)
             dN_dVdt_E = self.get_rate_synchrotron(eng0_rf, r3d).flatten()
 
             # Define output
@@ -1517,7 +1709,7 @@ class Observables(object):
             itpl = interpolate.interp1d(r3d.to_value('kpc'), dN_dVdt_E.value, kind='linear')
             if type_integral == 'spherical':
                for i in range(len(Rmax)):
-                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
                    dN_dVdt_E_i = itpl(rad_i.to_value('kpc'))*dN_dVdt_E.unit
                    lum_i = model_tools.spherical_integration(dN_dVdt_E_i, rad_i) * eng0**2/freq0
                    flux[i] =  lum_i / (4*np.pi * self._D_lum**2)
@@ -1525,7 +1717,7 @@ class Observables(object):
             # Case of cylindrical integral
             if type_integral == 'cylindrical':
                 # Compute integral over l.o.s.
-                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._Npt_per_decade_integ, unit=True)
+                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
                 dN_dVdt_E_proj = model_tools.los_integration_1dfunc(dN_dVdt_E, r3d, radius, los)
                 dN_dVdt_E_proj[radius > self._R_truncation] = 0
 
@@ -1534,7 +1726,7 @@ class Observables(object):
                 itpl = interpolate.interp1d(radius.to_value('kpc'), dN_dSdVdt_E_proj.value, kind='linear')
                 
                 for i in range(len(Rmax)):
-                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
                     dN_dSdVdt_E_proj_i = itpl(rad_i.value)*dN_dSdVdt_E_proj.unit
                     flux[i] = model_tools.trapz_loglog(2*np.pi*rad_i*dN_dSdVdt_E_proj_i, rad_i) * eng0**2/freq0
         
@@ -1571,14 +1763,8 @@ class Observables(object):
 
         """
 
-        # Get the header
-        header = self.get_map_header()
-
-        # Get a R.A-Dec. map
-        ra_map, dec_map = map_tools.get_radec_map(header)
-
-        # Get a cluster distance map (in deg)
-        dist_map = map_tools.greatcircle(ra_map, dec_map, self._coord.icrs.ra.to_value('deg'), self._coord.icrs.dec.to_value('deg'))
+        # Get the header, the R.A-Dec. map and the cluster distance map (in deg)
+        header, ra_map, dec_map, dist_map = self._get_map_geometry()
         
         # Define the radius used fo computing the profile
         theta_max = np.amax(dist_map) # maximum angle from the cluster
@@ -1587,7 +1773,7 @@ class Observables(object):
             print('!!!!! WARNING: the cluster location is very much offset from the field of view')
         rmax = theta_max*np.pi/180 * self._D_ang
         rmin = theta_min*np.pi/180 * self._D_ang
-        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade('synchrotron', 'radius'), unit=True)
         
         # Project the integrand
         r_proj, profile = self.get_synchrotron_profile(radius, freq0=freq0, 
@@ -1595,7 +1781,7 @@ class Observables(object):
 
         # Convert to angle and interpolate onto a map
         theta_proj = (r_proj/self._D_ang).to_value('')*180.0/np.pi   # degrees
-        synchrotron_map = map_tools.profile2map(profile.value, theta_proj, dist_map)*profile.unit
+        synchrotron_map = self._profile2map(profile.value, theta_proj, dist_map)*profile.unit
         
         # Avoid numerical residual ringing from interpolation
         synchrotron_map[dist_map > self._theta_truncation.to_value('deg')] = 0
@@ -1668,7 +1854,7 @@ class Observables(object):
             
         # Compute the integral
         if type_integral == 'spherical':
-            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
             dE_dtdVdfdO_f = self.get_rate_sz(frequency, rad, Compton_only=Compton_only)
             dE_dtdfdO_f = model_tools.spherical_integration(dE_dtdVdfdO_f, rad)
             
@@ -1676,9 +1862,9 @@ class Observables(object):
         if type_integral == 'cylindrical':
             Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)
             Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
-            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('sz', 'los'), unit=True)
+            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
             dE_dtdVdfdO_f = self.get_rate_sz(frequency, r3d, Compton_only=Compton_only)
             dE_dtdfdO_f = model_tools.cylindrical_integration(dE_dtdVdfdO_f, frequency, r3d, r2d, los, Rtrunc=self._R_truncation)
         
@@ -1692,6 +1878,66 @@ class Observables(object):
         return frequency, output
 
     
+    #==================================================
+    # Compute the Compton profile from the gNFW table
+    #==================================================
+
+    @cluster_timing.timed('sz_gnfw_projection')
+    def _get_sz_compton_profile_gNFW(self, radius, Rmin_los, NR500_los):
+        """
+        Get the Compton parameter profile for a GNFW pressure model, using the 
+        tabulated dimensionless projection of the gNFW model. The table only 
+        depends on the slopes of the model and is kept in memory (and on disk if
+        cluster_profile.set_table_cache_dir was used).
+        
+        Parameters
+        ----------
+        - radius (quantity): the physical 2d radius in units homogeneous to kpc, as a 1d array
+        - Rmin_los (Quantity): the radius at which line of sight integration starts
+        - NR500_los (float): the line-of-sight integration will stop at NR500_los x R500. 
+
+        Outputs
+        ----------
+        - y (np.ndarray): the Compton parameter profile, or None if the pressure 
+        model is not GNFW or if the table does not cover the requested radii
+
+        """
+
+        model = self._pressure_gas_model
+        if model['name'] != 'GNFW':
+            return None
+
+        key = (model['a'], model['b'], model['c'])
+        if self._sz_projection is None or self._sz_projection['key'] != key:
+            self._sz_projection = {'key'  : key,
+                                   'model': cluster_profile.gNFWProjectionTable(slope_a=model['a'],
+                                                                                slope_b=model['b'],
+                                                                                slope_c=model['c'])}
+        table = self._sz_projection['model']
+
+        # Line-of-sight range in units of r_p, the pressure being 0 beyond R_truncation.
+        # Radii below the table (e.g. R=0 at the center of maps) are negligible compared
+        # to the line-of-sight starting point
+        r_p = model['r_p'].to_value('kpc')
+        R_kpc = radius.to_value('kpc')
+        Rt_kpc = self._R_truncation.to_value('kpc')
+        x = np.maximum(R_kpc / r_p, table.x_range[0])
+        l1 = np.zeros(len(R_kpc)) + Rmin_los.to_value('kpc') / r_p
+        with np.errstate(invalid='ignore'):
+            l_trunc = np.sqrt(np.maximum(Rt_kpc**2 - R_kpc**2, 0)) / r_p
+        l2 = np.maximum(np.minimum((NR500_los*self._R500).to_value('kpc') / r_p, l_trunc), l1)
+
+        if not table.covers(x, np.append(l1, l2)):
+            return None
+
+        # Compton parameter
+        y_norm = (const.sigma_T/(const.m_e*const.c**2) * model['P_0'] * model['r_p']).to_value('')
+        y = 2 * y_norm * table.project(x, l1, l2)
+        y[R_kpc > Rt_kpc] = 0
+        
+        return y
+    
+    
     #==================================================
     # Compute SZ profile
     #==================================================
@@ -1732,11 +1978,17 @@ class Observables(object):
         Rmin = np.amin(radius.to_value('kpc'))*u.kpc
         Rmax = np.amax(radius.to_value('kpc'))*u.kpc
 
+        # Tabulated projection for the Compton parameter of the GNFW model
+        if Compton_only:
+            y_r = self._get_sz_compton_profile_gNFW(radius, Rmin_los, NR500_los)
+            if y_r is not None:
+                return radius, y_r*u.adu
+
         # Define array for integration
         Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)        
         Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
+        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('sz', 'los'), unit=True)
         dE_dtdVdfdO_f = self.get_rate_sz(freq0, r3d, Compton_only=Compton_only).flatten() 
 
         # Compute integral over l.o.s.
@@ -1814,8 +2066,8 @@ class Observables(object):
             if type_integral == 'cylindrical':
                 Rmax3d = np.sqrt((NR500_los*self._R500)**2 + (np.amax(Rmax.value)*Rmax.unit)**2)*1.1        
                 Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)*0.9
-            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('sz', 'los'), unit=True)
 
             # Increase numerical precision by adding a point at R_truncation
             if np.amax(r3d) > self._R_truncation:
@@ -1838,7 +2090,7 @@ class Observables(object):
             if type_integral == 'spherical':
                 for i in range(len(Rmax)):
                     Rmax_i = np.amin([Rmax[i].to_value('kpc'), self._R_truncation.to_value('kpc')])*u.kpc # Avoid ringing from integration
-                    rad_i = model_tools.sampling_array(Rmin, Rmax_i, NptPd=self._Npt_per_decade_integ, unit=True)
+                    rad_i = model_tools.sampling_array(Rmin, Rmax_i, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
                     dE_dtdVdfdO_f_i = itpl(rad_i.to_value('kpc'))*dE_dtdVdfdO_f.unit
                     if Compton_only:
                         flux[i] = model_tools.spherical_integration(dE_dtdVdfdO_f_i, rad_i)
@@ -1848,15 +2100,21 @@ class Observables(object):
             # Case of cylindrical integral
             if type_integral == 'cylindrical':
                 # Compute integral over l.o.s.
-                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._Npt_per_decade_integ, unit=True)
-                dE_dtdVdfdO_f_proj = model_tools.los_integration_1dfunc(dE_dtdVdfdO_f, r3d, radius, los)
-                dE_dtdVdfdO_f_proj[radius > self._R_truncation] = 0
+                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
+                y_r = None
+                if Compton_only:
+                    y_r = self._get_sz_compton_profile_gNFW(radius, Rmin_los, NR500_los)
+                if y_r is not None:
+                    dE_dtdVdfdO_f_proj = y_r*u.Unit('')
+                else:
+                    dE_dtdVdfdO_f_proj = model_tools.los_integration_1dfunc(dE_dtdVdfdO_f, r3d, radius, los)
+                    dE_dtdVdfdO_f_proj[radius > self._R_truncation] = 0
                 
                 itpl = interpolate.interp1d(radius.to_value('kpc'), dE_dtdVdfdO_f_proj.value, kind='linear')
                 
                 for i in range(len(Rmax)):
                     Rmax_i = np.amin([Rmax[i].to_value('kpc'), self._R_truncation.to_value('kpc')])*u.kpc # Avoid ringing from integration
-                    rad_i = model_tools.sampling_array(Rmin, Rmax_i, NptPd=self._Npt_per_decade_integ, unit=True)
+                    rad_i = model_tools.sampling_array(Rmin, Rmax_i, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
                     dE_dtdVdfdO_f_proj_i = itpl(rad_i.value)*dE_dtdVdfdO_f_proj.unit
                     if Compton_only:
                         flux[i] = model_tools.trapz_loglog(2*np.pi*rad_i*dE_dtdVdfdO_f_proj_i, rad_i)
@@ -1903,14 +2161,8 @@ class Observables(object):
 
         """
 
-        # Get the header
-        header = self.get_map_header()
-
-        # Get a R.A-Dec. map
-        ra_map, dec_map = map_tools.get_radec_map(header)
-
-        # Get a cluster distance map (in deg)
-        dist_map = map_tools.greatcircle(ra_map, dec_map, self._coord.icrs.ra.to_value('deg'), self._coord.icrs.dec.to_value('deg'))
+        # Get the header, the R.A-Dec. map and the cluster distance map (in deg)
+        header, ra_map, dec_map, dist_map = self._get_map_geometry()
         
         # Define the radius used fo computing the profile
         theta_max = np.amax(dist_map) # maximum angle from the cluster
@@ -1919,7 +2171,7 @@ class Observables(object):
             print('!!!!! WARNING: the cluster location is very much offset from the field of view')
         rmax = theta_max*np.pi/180 * self._D_ang
         rmin = theta_min*np.pi/180 * self._D_ang
-        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
         
         # Project the integrand
         r_proj, profile = self.get_sz_profile(radius, freq0=freq0, Compton_only=Compton_only,
@@ -1927,7 +2179,7 @@ class Observables(object):
 
         # Convert to angle and interpolate onto a map
         theta_proj = (r_proj/self._D_ang).to_value('')*180.0/np.pi   # degrees
-        sz_map = map_tools.profile2map(profile.value, theta_proj, dist_map)*profile.unit
+        sz_map = self._profile2map(profile.value, theta_proj, dist_map)*profile.unit
         
         # Avoid numerical residual ringing from interpolation
         sz_map[dist_map > self._theta_truncation.to_value('deg')] = 0
@@ -1954,10 +2206,101 @@ class Observables(object):
                 sz_map = sz_map.to('adu')
             else:
                 sz_map = sz_map.to('Jy sr-1')
-                
+
         return sz_map
 
-    
+
+    #==================================================
+    # Compute SZ map cube
+    #==================================================
+    def get_sz_map_cube(self, frequency=np.array([30.0, 44.0, 70.0, 100.0, 143.0, 217.0, 353.0, 545.0, 857.0])*u.GHz,
+                        Rmin_los=None, NR500_los=5.0,
+                        Rmin=None, Rmax=None,
+                        Normalize=False):
+        """
+        Compute the SZ map at several frequencies in one pass. The header, the
+        distance map, the integration grids and the relativistic spectrum are
+        computed only once and shared by all the frequency planes.
+
+        Parameters
+        ----------
+        - frequency (quantity): the frequencies at which the maps are computed
+        - Rmin_los (Quantity): the radius at which line of sight integration starts
+        - NR500_los (float): the integration will stop at NR500_los x R500
+        - Rmin, Rmax (quantity): the radius within with the spectrum is computed
+        (default is 1kpc, Rtruncation) for getting the normlization flux.
+        Has no effect if Normalized is False
+        - Normalize (bool): if True, each plane is normalized by the flux at the
+        corresponding frequency to get a template in unit of sr-1
+
+        Outputs
+        ----------
+        sz_cube (np.ndarray) : the map cube (Nfreq x Ny x Nx) in units of sr-1 or brightness
+
+        Note
+        ----------
+        The Compton parameter does not depend on frequency, use get_sz_map with
+        Compton_only=True to get it.
+
+        """
+
+        # In case the input is not an array
+        frequency = model_tools.check_qarray(frequency, unit='GHz')
+
+        # Get the header, the R.A-Dec. map and the cluster distance map (in deg)
+        header, ra_map, dec_map, dist_map = self._get_map_geometry()
+
+        # Define the radius used fo computing the profile
+        theta_max = np.amax(dist_map) # maximum angle from the cluster
+        theta_min = np.amin(dist_map) # minimum angle from the cluster (~0 if cluster within FoV)
+        if theta_min > 10 and theta_max > 10:
+            print('!!!!! WARNING: the cluster location is very much offset from the field of view')
+        rmax = theta_max*np.pi/180 * self._D_ang
+        rmin = theta_min*np.pi/180 * self._D_ang
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
+
+        # Define the arrays for the l.o.s. integration, common to all frequencies
+        if Rmin_los is None:
+            Rmin_los = self._Rmin
+        Rmax3d = np.sqrt((NR500_los*self._R500)**2 + rmax**2)
+        Rmin3d = np.sqrt(Rmin_los**2 + rmin**2)
+        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('sz', 'radius'), unit=True)
+        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('sz', 'los'), unit=True)
+
+        # Get the rate for all frequencies at once: Nfreq x Nr3d
+        dE_dtdVdfdO_f = self.get_rate_sz(frequency, r3d, Compton_only=False)
+
+        # Project each frequency plane and interpolate it onto the common distance map
+        theta_proj = (radius/self._D_ang).to_value('')*180.0/np.pi   # degrees
+        profile = np.zeros((len(frequency), len(radius)))
+        for ifreq in range(len(frequency)):
+            profile_i = model_tools.los_integration_1dfunc(dE_dtdVdfdO_f[ifreq,:], r3d, radius, los)
+            profile_i[radius > self._R_truncation] = 0
+            profile[ifreq,:] = profile_i.to_value('Jy sr-1')
+        sz_cube = self._profile2map(profile, theta_proj, dist_map)*u.Unit('Jy sr-1')
+
+        # Avoid numerical residual ringing from interpolation
+        sz_cube[:, dist_map > self._theta_truncation.to_value('deg')] = 0
+
+        # Compute the normalization: to return a map in sr-1, i.e. by computing the total flux
+        if Normalize:
+            if Rmax is None:
+                if self._R_truncation is not np.inf:
+                    Rmax = self._R_truncation
+                else:
+                    Rmax = NR500_los*self._R500
+            if Rmin is None:
+                Rmin = self._Rmin
+            frequency, flux = self.get_sz_spectrum(frequency, Rmin=Rmin, Rmax=Rmax, type_integral='cylindrical',
+                                                   Rmin_los=Rmin_los, NR500_los=NR500_los)
+            sz_cube = sz_cube / flux[:,np.newaxis,np.newaxis]
+            sz_cube = sz_cube.to('sr-1')
+        else:
+            sz_cube = sz_cube.to('Jy sr-1')
+
+        return sz_cube
+
+
     #==================================================
     # Compute Xray spectrum
     #==================================================
@@ -2023,7 +2366,7 @@ class Observables(object):
         
         # Get a mean temperature
         if type_integral == 'spherical':
-            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            rad = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
             rad, temperature = self.get_temperature_gas_profile(rad)
             rad, n_e = self.get_density_gas_profile(rad)
             Tmean = model_tools.spherical_integration(temperature, rad) / (4.0/3*np.pi*Rmax**3)
@@ -2032,9 +2375,9 @@ class Observables(object):
         if type_integral == 'cylindrical':
             Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)
             Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
-            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('xray', 'los'), unit=True)
+            r2d = model_tools.sampling_array(Rmin, Rmax, NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
             rad, temperature = self.get_temperature_gas_profile(r3d)
             temperature[temperature/temperature != 1] = 0
             rad, n_e = self.get_density_gas_profile(r3d)
@@ -2133,8 +2476,8 @@ class Observables(object):
         # Define array for integration
         Rmax3d = np.sqrt((NR500_los*self._R500)**2 + Rmax**2)        
         Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)
-        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._Npt_per_decade_integ, unit=True)
-        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+        r3d = model_tools.sampling_array(Rmin3d*0.9, Rmax3d*1.1, NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
+        los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('xray', 'los'), unit=True)
         dN_dVdt = self.get_rate_xray(r3d, output_type=output_type, Cframe=Cframe).flatten()
         
         # Compute integral over l.o.s.
@@ -2231,8 +2574,8 @@ class Observables(object):
             if type_integral == 'cylindrical':
                 Rmax3d = np.sqrt((NR500_los*self._R500)**2 + (np.amax(Rmax.value)*Rmax.unit)**2)*1.1        
                 Rmin3d = np.sqrt(Rmin_los**2 + Rmin**2)*0.9
-            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._Npt_per_decade_integ, unit=True)
-            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._Npt_per_decade_integ, unit=True)
+            r3d = model_tools.sampling_array(Rmin3d, Rmax3d, NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
+            los = model_tools.sampling_array(Rmin_los, NR500_los*self._R500, NptPd=self._get_npt_per_decade('xray', 'los'), unit=True)
             dN_dVdt = self.get_rate_xray(r3d, output_type=output_type, Cframe=Cframe).flatten()
             
             # Define output
@@ -2247,7 +2590,7 @@ class Observables(object):
             itpl = interpolate.interp1d(r3d.to_value('kpc'), dN_dVdt.value, kind='linear')
             if type_integral == 'spherical':
                for i in range(len(Rmax)):
-                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                   rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
                    dN_dVdt_i = itpl(rad_i.to_value('kpc'))*dN_dVdt.unit
                    lum_i = model_tools.spherical_integration(dN_dVdt_i, rad_i)
                    flux[i] =  lum_i / (4*np.pi * self._D_lum**2)
@@ -2255,7 +2598,7 @@ class Observables(object):
             # Case of cylindrical integral
             if type_integral == 'cylindrical':
                 # Compute integral over l.o.s.
-                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._Npt_per_decade_integ, unit=True)
+                radius = model_tools.sampling_array(Rmin, np.amax(Rmax.value)*Rmax.unit, NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
                 dN_dVdt_proj = model_tools.los_integration_1dfunc(dN_dVdt, r3d, radius, los)
                 dN_dVdt_proj[radius > self._R_truncation] = 0
 
@@ -2264,7 +2607,7 @@ class Observables(object):
                 itpl = interpolate.interp1d(radius.to_value('kpc'), dN_dSdVdt_proj.value, kind='linear')
                 
                 for i in range(len(Rmax)):
-                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._Npt_per_decade_integ, unit=True)
+                    rad_i = model_tools.sampling_array(Rmin, Rmax[i], NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
                     dN_dSdVdt_proj_i = itpl(rad_i.value)*dN_dSdVdt_proj.unit
                     flux[i] = model_tools.trapz_loglog(2*np.pi*rad_i*dN_dSdVdt_proj_i, rad_i)
 
@@ -2320,14 +2663,8 @@ class Observables(object):
         if output_type not in output_list:
             raise ValueError("Available output_type are S, C and R.")        
 
-        # Get the header
-        header = self.get_map_header()
-
-        # Get a R.A-Dec. map
-        ra_map, dec_map = map_tools.get_radec_map(header)
-
-        # Get a cluster distance map (in deg)
-        dist_map = map_tools.greatcircle(ra_map, dec_map, self._coord.icrs.ra.to_value('deg'), self._coord.icrs.dec.to_value('deg'))
+        # Get the header, the R.A-Dec. map and the cluster distance map (in deg)
+        header, ra_map, dec_map, dist_map = self._get_map_geometry()
         
         # Define the radius used fo computing the profile
         theta_max = np.amax(dist_map) # maximum angle from the cluster
@@ -2336,14 +2673,14 @@ class Observables(object):
             print('!!!!! WARNING: the cluster location is very much offset from the field of view')
         rmax = theta_max*np.pi/180 * self._D_ang
         rmin = theta_min*np.pi/180 * self._D_ang
-        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._Npt_per_decade_integ, unit=True)
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade('xray', 'radius'), unit=True)
         
         # Project the integrand
         r_proj, profile = self.get_xray_profile(radius, Rmin_los=Rmin_los, NR500_los=NR500_los, output_type=output_type, Cframe=Cframe)
 
         # Convert to angle and interpolate onto a map
         theta_proj = (r_proj/self._D_ang).to_value('')*180.0/np.pi   # degrees
-        xray_map = map_tools.profile2map(profile.value, theta_proj, dist_map)*profile.unit
+        xray_map = self._profile2map(profile.value, theta_proj, dist_map)*profile.unit
         
         # Avoid numerical residual ringing from interpolation
         xray_map[dist_map > self._theta_truncation.to_value('deg')] = 0
@@ -2370,3 +2707,118 @@ class Observables(object):
             
         return xray_map
     
+
+
+    #==================================================
+    # Compute Healpix sparse map
+    #==================================================
+    def get_healpix_map(self, product='gamma', nside=2048, nest=False, frame='galactic',
+                        theta_max=None, **kwargs):
+        """
+        Compute the map of a given observable directly on Healpix pixels, within
+        a disc around the cluster. Only the pixels of the disc are returned, so that
+        many clusters can be accumulated in a single full sky map, e.g. as
+        full_map[ipix] += value.
+        
+        Parameters
+        ----------
+        - product (str): the observable, 'gamma', 'neutrino', 'ic', 'synchrotron',
+        'sz' or 'xray'
+        - nside (int): Healpix Nside argument
+        - nest (bool): Healpix NESTED ordering if True, RING otherwise
+        - frame (str): the coordinate frame of the Healpix map, 'galactic' or 'icrs'
+        - theta_max (quantity): the radius of the disc (default is theta_truncation,
+        or 5 theta500 if there is no truncation)
+        - kwargs: the other parameters passed to the corresponding get_*_profile 
+        function (e.g. Emin, Emax, freq0, Compton_only, output_type, NR500_los)
+
+        Outputs
+        ----------
+        - ipix (np.ndarray): the index of the pixels
+        - hp_map (quantity): the value of the map in the pixels, in units of brightness
+
+        """
+
+        # Check the product
+        profile_function = {'gamma':       self.get_gamma_profile,
+                            'neutrino':    self.get_neutrino_profile,
+                            'ic':          self.get_ic_profile,
+                            'synchrotron': self.get_synchrotron_profile,
+                            'sz':          self.get_sz_profile,
+                            'xray':        self.get_xray_profile}
+        if product not in profile_function.keys():
+            raise ValueError("The product should be one of "+str(list(profile_function.keys())))
+
+        # Check the frame
+        if frame == 'galactic':
+            lon = self._coord.galactic.l.to_value('deg')
+            lat = self._coord.galactic.b.to_value('deg')
+        elif frame == 'icrs':
+            lon = self._coord.icrs.ra.to_value('deg')
+            lat = self._coord.icrs.dec.to_value('deg')
+        else:
+            raise ValueError("The frame should be 'galactic' or 'icrs'")
+
+        # Radius of the disc
+        if theta_max is None:
+            if self._R_truncation is not np.inf:
+                theta_max = self._theta_truncation
+            else:
+                theta_max = 5*self._theta500
+
+        # Get the pixels and their distance to the cluster (in deg)
+        ipix, dist = map_tools.get_healpix_disc(nside, lon, lat, theta_max.to_value('deg'), nest=nest)
+        if len(ipix) == 0:
+            raise ValueError("No Healpix pixel within the disc, increase nside or theta_max")
+
+        # Define the radius used fo computing the profile, avoiding the center
+        theta_min = np.amax([np.amin(dist), 1e-3*healpy.nside2resol(nside, arcmin=True)/60.0])
+        dist = np.maximum(dist, theta_min)
+        rmax = np.amax(dist)*np.pi/180 * self._D_ang
+        rmin = theta_min*np.pi/180 * self._D_ang
+        radius = model_tools.sampling_array(rmin, rmax, NptPd=self._get_npt_per_decade(product, 'radius'), unit=True)
+        
+        # Project the integrand
+        r_proj, profile = profile_function[product](radius, **kwargs)
+
+        # Convert to angle and interpolate onto the pixels
+        theta_proj = (r_proj/self._D_ang).to_value('')*180.0/np.pi   # degrees
+        renderer = map_tools.ProfileMapRenderer(theta_proj, dist, symmetric=False, dtype=self._map_dtype)
+        hp_map = renderer.render(profile.value)*profile.unit
+        
+        # Avoid numerical residual ringing from interpolation
+        hp_map[dist > self._theta_truncation.to_value('deg')] = 0
+
+        return ipix, hp_map
+
+    
+    #==================================================
+    # Interpolate a profile onto the map
+    #==================================================
+    @cluster_timing.timed('map_rendering')
+    def _profile2map(self, profile_y, theta_proj, dist_map):
+        """
+        Interpolate a profile onto the map, using a renderer that keeps the
+        pixel to profile mapping as long as the map and the radius grid
+        do not change. Since the maps are azimuthally symmetric around the
+        cluster, pixels at the same distance are evaluated only once.
+        The map is rendered with the precision given by map_dtype.
+
+        Parameters
+        ----------
+        - profile_y (np.ndarray): the profile, or a set of profiles (Nplane x Nr)
+        - theta_proj (np.ndarray): the angle corresponding to the profile, in deg
+        - dist_map (np.ndarray): the distance map, in deg
+
+        Outputs
+        ----------
+        - map_y (np.ndarray): the map (Ny x Nx), or the cube (Nplane x Ny x Nx)
+
+        """
+
+        renderer = self._map_renderer
+        if renderer is None or renderer.dtype != self._map_dtype or not renderer.match(theta_proj, dist_map):
+            renderer = map_tools.ProfileMapRenderer(theta_proj, dist_map, symmetric=True, dtype=self._map_dtype)
+            self._map_renderer = renderer
+
+        return renderer.render(profile_y)
@@ -9,7 +9,6 @@ is dedicated to the computing of the physical properties of clusters.
 #==================================================
 
 import numpy as np
-from scipy.optimize import brentq
 import scipy.interpolate as interpolate
 import scipy.ndimage as ndimage
 import os
@@ -25,12 +24,15 @@ from ClusterModel.ClusterTools import cluster_xspec
 from ClusterModel.ClusterTools import cluster_hadronic_emission_kafexhiu2014 as K14
 from ClusterModel.ClusterTools import cluster_electron_loss
 from ClusterModel.ClusterTools import cluster_electron_emission
+from ClusterModel.ClusterTools import cluster_timing
+from ClusterModel.ClusterTools import cluster_pipeline
     
 
 #==================================================
 # Physics class
 #==================================================
 
+@cluster_timing.timed_methods
 class Physics(object):
     """ 
     Physics class
@@ -91,7 +93,17 @@ class Physics(object):
     compute the CRe production rate dN/dEdVdt versus energy and radius
     - get_rate_neutrino(self, energy=np.logspace(-2,7,100)*u.GeV, radius=np.logspace(0,4,100)*u.kpc, flavor='all'):
     compute the neutrino production rate dN/dEdVdt versus energy and radius
-    
+    - _get_pp_engine(self): get the pp interaction model, kept as long as the composition, the pp
+    interaction model, the proton energy range and the sampling do not change
+    - _get_rate_pp(self, energy, radius, product='gamma'): compute the pp production rate of gamma,
+    electrons or neutrinos, using the separability of the CRp distribution when possible
+    - _get_separable_spectrum_pp(self, energy, product='gamma'): compute the pp spectrum for a separable
+    CRp distribution, shared by the products within a product run
+    - _eval_spectrum_pp(self, Jp, energy, product, radius_input=None, nH=1.0*u.cm**-3): evaluate the
+    pp interaction model for a given CRp distribution
+
+    - _get_electron_loss(self, energy): get the electron energy loss model, kept as long as the energy
+    grid and the redshift do not change
     - get_cre_2d(self, energy=np.logspace(-2,7,100)*u.GeV, radius=np.logspace(0,4,100)*u.kpc):
     compute the CRe population assuming equilibrium dN/dEdV versus energy and radius
     - get_density_cre_profile(self, radius=np.logspace(0,4,100)*u.kpc,Emin=None, Emax=None, Energy_density=False):
@@ -324,10 +336,13 @@ class Physics(object):
     def get_mdelta_from_profile(self, delta=500, Rmin=10*u.kpc, Rmax=1e4*u.kpc):
         """
         Get R_delta and M_delta from the overdensity profile, given HSE equilibrium and HSE bias.
+        The overdensity profile is computed once on a log grid, on which the first crossing of
+        each requested delta is located and interpolated in log-log scale. The solution is then
+        polished with secant iterations, evaluating all the requested deltas at once.
         
         Parameters
         ----------
-        - delta : the overdensity considered, e.g. 2500, 500, 200
+        - delta : the overdensity considered, e.g. 2500, 500, 200, as a scalar or 1d array
         - Rmin (quantity): the minimal range to search for Rdelta
         - Rmax (quantity): the maximal range to search for Rdelta
         
@@ -338,24 +353,63 @@ class Physics(object):
         
         """
 
-        # defines the function where to search for roots
-        def overdensity_delta_difference(rkpc):
-            rod, od = self.get_overdensity_contrast_profile(rkpc*u.kpc)
-            func = od.to_value('adu') - delta
-            func[np.isnan(od)] = -1.0 # Undefined overdensity (e.g. if truncation) should not be the root
-            return func
-
-        # Search the root
-        Rdelta = brentq(overdensity_delta_difference, Rmin.to_value('kpc'), Rmax.to_value('kpc'))
+        delta_arr = np.atleast_1d(np.asarray(delta, dtype=float))
+        rmin = Rmin.to_value('kpc')
+        rmax = Rmax.to_value('kpc')
+        rtrunc = self._R_truncation.to_value('kpc')
 
+        # defines the function where to search for roots, in log scale
+        def log_overdensity(rkpc):
+            rod, od = self.get_overdensity_contrast_profile(rkpc*u.kpc)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.log(od.to_value('adu'))
+        
+        #---------- Overdensity on a grid, including R_truncation after which it is undefined
+        Npt = int(np.amax([self._Npt_per_decade_integ, 100]) * np.log10(rmax/rmin)) + 2
+        rad = np.logspace(np.log10(rmin), np.log10(rmax), Npt)
+        if rmin < rtrunc < rmax:
+            rad = np.sort(np.append(rad, rtrunc))
+        t_grid = np.log(rad)
+        lod = log_overdensity(rad)
+
+        # Undefined overdensity (e.g. if truncation) should not be the root
+        above = lod[np.newaxis,:] > np.log(delta_arr)[:,np.newaxis]
+        above[:, ~np.isfinite(lod)] = False
+        if np.any(~above[:,0]) or np.any(above[:,-1]):
+            raise ValueError("The overdensity - delta should have different signs at Rmin and Rmax")
+
+        #---------- First crossing and log-log interpolation
+        idx = np.argmin(above, axis=1) - 1
+        t1, t2 = t_grid[idx], t_grid[idx+1]
+        l1, l2 = lod[idx], lod[idx+1]
+        undefined = ~np.isfinite(l2)   # the crossing is due to the truncation
+        slope = np.where(undefined, -3.0, (l2 - l1) / (t2 - t1))
+        t = np.clip(t1 + (np.log(delta_arr) - l1)/slope, t1, t2)
+
+        #---------- Secant polish
+        t_prev, f_prev = t1, l1 - np.log(delta_arr)
+        for i in range(5):
+            f = log_overdensity(np.exp(t)) - np.log(delta_arr)
+            ok = np.isfinite(f) & (t != t_prev) & (f != f_prev) & ~undefined
+            if not np.any(ok): break
+            t_new = np.where(ok, t - f*(t - t_prev)/np.where(ok, f - f_prev, 1.0), t)
+            t_prev, f_prev = t, f
+            t = np.clip(t_new, t1, t2)
+            if np.amax(np.abs(t - t_prev)) < 1e-13: break
+        Rdelta = np.exp(t)
+        
         # In case the root is >= R_truncation, Rdelta was not reached
-        if Rdelta >= self._R_truncation.to_value('kpc'):
+        wtrunc = undefined | (Rdelta >= rtrunc)
+        if np.any(wtrunc):
             if not self._silent: print('The truncation was reached before R'+str(delta))
-            Rdelta = np.nan
+            Rdelta[wtrunc] = np.nan
 
         # Get Mdelta as well
-        Mdelta = cluster_global.Rdelta_to_Mdelta(Rdelta, self._redshift, delta=delta, cosmo=self._cosmo)
-    
+        Mdelta = cluster_global.Rdelta_to_Mdelta(Rdelta, self._redshift, delta=delta_arr, cosmo=self._cosmo)
+
+        if np.ndim(delta) == 0:
+            Rdelta, Mdelta = Rdelta[0], Mdelta[0]
+        
         return Rdelta*u.kpc, Mdelta*u.Msun
 
 
@@ -385,16 +439,24 @@ class Physics(object):
                                                                             Z=self._metallicity_sol*self._abundance)
         
         #---------- Integrate the mass
+        rmin = np.amin([self._Rmin.to_value('kpc')*np.ones(len(radius)), radius.to_value('kpc')/10.0], axis=0)*u.kpc # make sure we go well bellow rmax
         I_n_gas_r = np.zeros(len(radius))
+        w_num = []
         for i in range(len(radius)):
-            rmin = np.amin([self._Rmin.to_value('kpc'), radius.to_value('kpc')[i]/10.0])*u.kpc # make sure we go well bellow rmax
-            rad = model_tools.sampling_array(rmin, radius[i], NptPd=self._Npt_per_decade_integ, unit=True)
-            # To avoid ringing at Rtrunc, insert it if we are above
-            if np.amax(rad) > self._R_truncation:
-                rad = rad.insert(0, self._R_truncation)
-                rad.sort()
-            rad, n_r = self.get_density_gas_profile(radius=rad)
-            I_n_gas_r[i] = model_tools.trapz_loglog(4*np.pi*rad**2*n_r, rad)
+            # Closed form (or tabulated) volume integral when available, the density being 0 beyond R_truncation
+            Vol = self._get_generic_profile_volume(rmin[i], np.amin([radius.to_value('kpc')[i],
+                                                                     self._R_truncation.to_value('kpc')])*u.kpc,
+                                                   self._density_gas_model)
+            if Vol is not None:
+                I_n_gas_r[i] = Vol.to_value('')
+            else:
+                w_num.append(i)
+
+        # Otherwise, all the radii are integrated together, refining the sampling where needed (e.g. R_truncation)
+        if len(w_num) > 0:
+            I_n_gas_r[w_num] = model_tools.adaptive_spherical_integration(lambda rad: self.get_density_gas_profile(radius=rad)[1],
+                                                                          rmin[w_num], radius[w_num],
+                                                                          breakpoints=self._R_truncation).to_value('')
         
         Mgas_r = mu_e*const.m_p * I_n_gas_r
 
@@ -456,17 +518,11 @@ class Physics(object):
         mu_gas, mu_e, mu_p, mu_alpha = cluster_global.mean_molecular_weight(Y=self._helium_mass_fraction,
                                                                             Z=self._metallicity_sol*self._abundance)
 
-        #---------- Integrate the pressure in 3d
-        Uth_r = np.zeros(len(radius))*u.erg
-        for i in range(len(radius)):
-            rmin = np.amin([self._Rmin.to_value('kpc'), radius.to_value('kpc')[i]/10.0])*u.kpc # make sure we go well bellow rmax
-            rad = model_tools.sampling_array(rmin, radius[i], NptPd=self._Npt_per_decade_integ, unit=True)
-            # To avoid ringing at Rtrunc, insert it if we are above
-            if np.amax(rad) > self._R_truncation:
-                rad = rad.insert(0, self._R_truncation)
-                rad.sort()
-            rad, p_r = self.get_pressure_gas_profile(radius=rad)
-            Uth_r[i] = model_tools.trapz_loglog((3.0/2.0)*(mu_e/mu_gas) * 4*np.pi*rad**2 * p_r, rad)
+        #---------- Integrate the pressure in 3d, refining the sampling where needed (e.g. R_truncation)
+        def u_th(rad): return (3.0/2.0)*(mu_e/mu_gas) * self.get_pressure_gas_profile(radius=rad)[1]
+        
+        rmin = np.amin([self._Rmin.to_value('kpc')*np.ones(len(radius)), radius.to_value('kpc')/10.0], axis=0)*u.kpc # make sure we go well bellow rmax
+        Uth_r = model_tools.adaptive_spherical_integration(u_th, rmin, radius, breakpoints=self._R_truncation)
                     
         return radius, Uth_r.to('erg')
 
@@ -563,6 +619,8 @@ class Physics(object):
     # Get the CR proton normalization
     #==================================================
 
+    @cluster_pipeline.shared('crp_normalization')
+    @cluster_timing.timed('crp_normalization')
     def _get_crp_normalization(self):
         """
         Compute the normalization of the cosmic ray proton distribution:
@@ -584,21 +642,49 @@ class Physics(object):
         # Get the thermal energy
         rad_uth, U_th = self.get_thermal_energy_profile(Rcut)
         
-        # Get the spatial form volume for CRp
-        rad = model_tools.sampling_array(self._Rmin, Rcut, NptPd=self._Npt_per_decade_integ, unit=True)
-        rad, f_cr_r = self.get_normed_density_crp_profile(rad)
-        Vcr = model_tools.trapz_loglog(4*np.pi*rad**2 * f_cr_r.to_value('adu'), rad)
+        # Get the spatial form volume for CRp, analytically if possible (the profile is truncated)
+        Rmax = np.amin([Rcut.to_value('kpc'), self._R_truncation.to_value('kpc')])*u.kpc
+        Vcr = self._get_generic_profile_volume(self._Rmin, Rmax, self._density_crp_model)
+        if Vcr is not None:
+            Vcr = Vcr.to_value('kpc3 adu')*u.kpc**3
+        else:
+            Vcr = model_tools.adaptive_spherical_integration(lambda rad: self.get_normed_density_crp_profile(rad)[1].to_value('adu'),
+                                                             self._Rmin, Rcut, breakpoints=self._R_truncation)
         
-        # Get the energy enclosed in the spectrum
-        eng = model_tools.sampling_array(self._Epmin, self._Epmax, NptPd=self._Npt_per_decade_integ, unit=True)
-        eng, f_cr_E = self.get_normed_crp_spectrum(eng)
-        Ienergy = model_tools.trapz_loglog(eng * f_cr_E.to_value('adu'), eng)
+        # Get the energy enclosed in the spectrum, analytically if possible
+        Ienergy = self._get_generic_spectrum_energy_integral(self._Epmin, self._Epmax, self._spectrum_crp_model)
+        if Ienergy is None:
+            Ienergy = model_tools.adaptive_energy_integration(lambda eng: self.get_normed_crp_spectrum(eng)[1].to_value('adu'),
+                                                              self._Epmin, self._Epmax, Energy_density=True)
         
         # Compute the normalization
         Norm = self._X_cr_E['X'] * U_th / Vcr / Ienergy
 
         return Norm.to('GeV-1 cm-3')
     
+    #==================================================
+    # Check the CR proton separability
+    #==================================================
+
+    def _crp_is_separable(self):
+        """
+        Check if the cosmic ray proton distribution is separable, i.e.
+        dN/dE/dV = Norm f(E) f(r), as defined in get_crp_2d. This is not the 
+        case if get_crp_2d is redefined (e.g. in a subclass), in which case
+        the full 2d distribution should be used.
+        
+        Parameters
+        ----------
+
+        Outputs
+        ----------
+        - separable (bool): True if the distribution is separable
+
+        """
+
+        return type(self).get_crp_2d is Physics.get_crp_2d
+
+    
     #==================================================
     # Get the CR proton 2d distribution
     #==================================================
@@ -674,6 +760,22 @@ class Physics(object):
             
         # Integrate over the spectrum
         eng = model_tools.sampling_array(Emin, Emax, NptPd=self._Npt_per_decade_integ, unit=True)
+
+        # Separable case: the energy integral is computed once and scaled by f(r)
+        if self._crp_is_separable():
+            norm = self._get_crp_normalization()
+            eng, f_E = self.get_normed_crp_spectrum(eng)
+            rad, f_r = self.get_normed_density_crp_profile(radius)
+            if Energy_density:
+                I_E = model_tools.trapz_loglog(eng * f_E.to_value('adu'), eng)
+                profile = (norm * I_E * f_r.to_value('adu')).to('GeV cm-3')
+            else:
+                I_E = model_tools.trapz_loglog(f_E.to_value('adu'), eng)
+                profile = (norm * I_E * f_r.to_value('adu')).to('cm-3')
+            
+            return radius, profile
+
+        # General case
         dN_dEdV = self.get_crp_2d(eng, radius)
 
         if Energy_density:
@@ -714,18 +816,26 @@ class Physics(object):
                 
         # Define the radius for integration
         rmin = np.amin([self._Rmin.to_value('kpc'), Rmax.to_value('kpc')/10])*u.kpc #In case of small Rmax, make sure we go low enough
-        rad = model_tools.sampling_array(rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
 
-        # To improve precision around R_truncation in integration
-        if np.amax(rad) > self._R_truncation:
-            rad = rad.insert(0, self._R_truncation)
-            rad.sort()
+        # Separable case: the volume integral is computed once and scaled by f(E)
+        if self._crp_is_separable():
+            norm = self._get_crp_normalization()
+            energy, f_E = self.get_normed_crp_spectrum(energy)
+            V_r = self._get_generic_profile_volume(rmin, np.amin([Rmax.to_value('kpc'),
+                                                                  self._R_truncation.to_value('kpc')])*u.kpc,
+                                                   self._density_crp_model)
+            if V_r is not None:
+                V_r = V_r.to_value('kpc3 adu')*u.kpc**3
+            else:
+                V_r = model_tools.adaptive_spherical_integration(lambda rad: self.get_normed_density_crp_profile(rad)[1].to_value('adu'),
+                                                                 rmin, Rmax, breakpoints=self._R_truncation)
+            spectrum = norm * V_r * f_E.to_value('adu')
+            
+            return energy, spectrum.to('GeV-1')
 
-        # Get the differential spectrum/profile
-        dN_dEdV = self.get_crp_2d(energy, rad)
-        
-        # Integrate
-        spectrum = model_tools.trapz_loglog(4*np.pi*rad**2 * dN_dEdV, rad)
+        # Integrate the differential spectrum/profile, refining the sampling where needed (e.g. R_truncation)
+        spectrum = model_tools.adaptive_spherical_integration(lambda rad: self.get_crp_2d(energy, rad),
+                                                              rmin, Rmax, breakpoints=self._R_truncation)
 
         return energy, spectrum.to('GeV-1')
     
@@ -765,16 +875,10 @@ class Physics(object):
         r_uth, Uth_r = self.get_thermal_energy_profile(radius)
 
         # Integrate CR energy density profile
-        Ucr_r = np.zeros(len(radius))*u.GeV
-        for i in range(len(radius)):
-            rmin = np.amin([self._Rmin.to_value('kpc'), radius.to_value('kpc')[i]/10.0])*u.kpc # make sure we go well bellow rmax
-            rad = model_tools.sampling_array(rmin, radius[i], NptPd=self._Npt_per_decade_integ, unit=True)
-            # To avoid ringing at Rtrunc, insert it if we are above
-            if np.amax(rad) > self._R_truncation:
-                rad = rad.insert(0, self._R_truncation)
-                rad.sort()
-            rad, e_cr = self.get_density_crp_profile(rad, Emin=Emin, Emax=Emax, Energy_density=True)
-            Ucr_r[i] = model_tools.trapz_loglog(4*np.pi*rad**2 * e_cr, rad)
+        def e_cr(rad): return self.get_density_crp_profile(rad, Emin=Emin, Emax=Emax, Energy_density=True)[1]
+        
+        rmin = np.amin([self._Rmin.to_value('kpc')*np.ones(len(radius)), radius.to_value('kpc')/10.0], axis=0)*u.kpc # make sure we go well bellow rmax
+        Ucr_r = model_tools.adaptive_spherical_integration(e_cr, rmin, radius, breakpoints=self._R_truncation)
 
         # X(<R)
         x_r = Ucr_r.to_value('GeV') / Uth_r.to_value('GeV')
@@ -804,28 +908,9 @@ class Physics(object):
         # In case the input is not an array
         energy = model_tools.check_qarray(energy, unit='GeV')
         radius = model_tools.check_qarray(radius, unit='kpc')
-        
-        # Get the thermal proton density profile
-        mu_gas, mu_e, mu_p, mu_alpha = cluster_global.mean_molecular_weight(Y=self._helium_mass_fraction,
-                                                                            Z=self._metallicity_sol*self._abundance)
-        rad, n_e  = self.get_density_gas_profile(radius)
-        n_H = n_e * mu_e/mu_p
 
-        # Parse the CRp distribution: returns call function[rad, energy] amd returns f[rad, energy]
-        def Jp(rad, eng): return self.get_crp_2d(eng*u.GeV, rad*u.kpc).value.T
-
-        # Define the model
-        model = K14.PPmodel(Jp,
-                            Y0=self._helium_mass_fraction,
-                            Z0=self._metallicity_sol,
-                            abundance=self._abundance,
-                            hiEmodel=self._pp_interaction_model,
-                            Epmin=self._Epmin,
-                            Epmax=self._Epmax,
-                            NptEpPd=self._Npt_per_decade_integ)
-        
         # Extract the spectrum
-        dN_dEdVdt = model.gamma_spectrum(energy, radius, n_H).T
+        dN_dEdVdt = self._get_rate_pp(energy, radius, product='gamma')
 
         return dN_dEdVdt.to('GeV-1 cm-3 s-1')
 
@@ -857,28 +942,9 @@ class Physics(object):
         # In case the input is not an array
         energy = model_tools.check_qarray(energy, unit='GeV')
         radius = model_tools.check_qarray(radius, unit='kpc')
-        
-        # Get the thermal proton density profile
-        mu_gas, mu_e, mu_p, mu_alpha = cluster_global.mean_molecular_weight(Y=self._helium_mass_fraction,
-                                                                            Z=self._metallicity_sol*self._abundance)
-        rad, n_e  = self.get_density_gas_profile(radius)
-        n_H = n_e * mu_e/mu_p
 
-        # Parse the CRp distribution: returns call function[rad, energy] amd returns f[rad, energy]
-        def Jp(rad, eng): return self.get_crp_2d(eng*u.GeV, rad*u.kpc).value.T
-
-        # Define the model
-        model = K14.PPmodel(Jp,
-                            Y0=self._helium_mass_fraction,
-                            Z0=self._metallicity_sol,
-                            abundance=self._abundance,
-                            hiEmodel=self._pp_interaction_model,
-                            Epmin=self._Epmin,
-                            Epmax=self._Epmax,
-                            NptEpPd=self._Npt_per_decade_integ)
-        
         # Extract the spectrum
-        dN_dEdVdt = model.electron_spectrum(energy, radius, n_H).T
+        dN_dEdVdt = self._get_rate_pp(energy, radius, product='electron')
 
         return dN_dEdVdt.to('GeV-1 cm-3 s-1')
 
@@ -911,18 +977,57 @@ class Physics(object):
         # In case the input is not an array
         energy = model_tools.check_qarray(energy, unit='GeV')
         radius = model_tools.check_qarray(radius, unit='kpc')
+
+        # Extract the spectrum
+        if flavor == 'all':
+            dN_dEdVdt1 = self._get_rate_pp(energy, radius, product='numu')
+            dN_dEdVdt2 = self._get_rate_pp(energy, radius, product='nue')
+            dN_dEdVdt = dN_dEdVdt1 + dN_dEdVdt2
+            
+        elif flavor == 'numu':
+            dN_dEdVdt = self._get_rate_pp(energy, radius, product='numu')
+            
+        elif flavor == 'nue':
+            dN_dEdVdt = self._get_rate_pp(energy, radius, product='nue')
+            
+        else :
+            raise ValueError('Only all, numu and nue flavor are available.')    
+
+        return dN_dEdVdt.to('GeV-1 cm-3 s-1')
+
+
+    #==================================================
+    # Get the pp interaction model
+    #==================================================
+    
+    def _get_pp_engine(self):
+        """
+        Get the hadronic interaction model used to compute the pp production
+        rates. It is built once and kept as long as the ICM composition, the 
+        pp interaction model, the proton energy range and the sampling do 
+        not change, so that the model tables and the cross section terms 
+        computed on its proton energy grid are reused. The proton 
+        distribution, Jp, should be set before computing spectra, and removed
+        after (see _eval_spectrum_pp).
         
-        # Get the thermal proton density profile
-        mu_gas, mu_e, mu_p, mu_alpha = cluster_global.mean_molecular_weight(Y=self._helium_mass_fraction,
-                                                                            Z=self._metallicity_sol*self._abundance)
-        rad, n_e  = self.get_density_gas_profile(radius)
-        n_H = n_e * mu_e/mu_p
+        Parameters
+        ----------
 
-        # Parse the CRp distribution: returns call function[rad, energy] amd returns f[rad, energy]
-        def Jp(rad, eng): return self.get_crp_2d(eng*u.GeV, rad*u.kpc).to_value('GeV-1 cm-3').T
+        Outputs
+        ----------
+        - model (K14.PPmodel): the pp interaction model
 
-        # Define the model
-        model = K14.PPmodel(Jp,
+        """
+
+        key = (self._helium_mass_fraction, self._metallicity_sol, self._abundance,
+               self._pp_interaction_model, self._Epmin.to_value('GeV'), self._Epmax.to_value('GeV'),
+               self._Npt_per_decade_integ)
+
+        engine = self._pp_engine
+        if engine is not None and engine['key'] == key:
+            return engine['model']
+
+        model = K14.PPmodel(None,
                             Y0=self._helium_mass_fraction,
                             Z0=self._metallicity_sol,
                             abundance=self._abundance,
@@ -930,29 +1035,176 @@ class Physics(object):
                             Epmin=self._Epmin,
                             Epmax=self._Epmax,
                             NptEpPd=self._Npt_per_decade_integ)
+        self._pp_engine = {'key':key, 'model':model}
+        
+        return model
+
     
+    #==================================================
+    # Get the pp interaction production rate
+    #==================================================
+    
+    def _get_rate_pp(self, energy, radius, product='gamma'):
+        """
+        Compute the production rate of secondary particles from pp interactions 
+        as dN/dEdVdt = f(E, r). When the CRp distribution is separable, 
+        dN/dEdV = Norm f(E) f(r), the rate is also separable, because the gas 
+        enters only via n_H(r). The spectrum is then computed only once and 
+        multiplied by n_H(r) f(r). Otherwise, the full 2d distribution is used.
+        
+        Parameters
+        ----------
+        - energy (quantity) : the physical energy of the secondary particles
+        - radius (quantity): the physical 3d radius in units homogeneous to kpc, as a 1d array
+        - product (str): 'gamma', 'electron', 'numu' or 'nue'
+
+        Outputs
+        ----------
+        - dN_dEdVdt (np.ndarray): the differntial production rate, as [i_energy, i_radius]
+
+        """
+
+        # Get the thermal proton density profile
+        mu_gas, mu_e, mu_p, mu_alpha = cluster_global.mean_molecular_weight(Y=self._helium_mass_fraction,
+                                                                            Z=self._metallicity_sol*self._abundance)
+        rad, n_e  = self.get_density_gas_profile(radius)
+        n_H = n_e * mu_e/mu_p
+
         # Extract the spectrum
-        if flavor == 'all':
-            dN_dEdVdt1 = model.neutrino_spectrum(energy, radius, n_H, flavor='numu').T
-            dN_dEdVdt2 = model.neutrino_spectrum(energy, radius, n_H, flavor='nue').T
-            dN_dEdVdt = dN_dEdVdt1 + dN_dEdVdt2
-            
-        elif flavor == 'numu':
-            dN_dEdVdt = model.neutrino_spectrum(energy, radius, n_H, flavor='numu').T
-            
-        elif flavor == 'nue':
-            dN_dEdVdt = model.neutrino_spectrum(energy, radius, n_H, flavor='nue').T
+        if self._crp_is_separable():
+            dN_dEdt = self._get_separable_spectrum_pp(energy, product=product)
+            rad, f_r = self.get_normed_density_crp_profile(radius)
+            spatial = n_H.to_value('cm-3') * f_r.to_value('adu')
+            dN_dEdVdt = np.outer(dN_dEdt, spatial) * u.Unit('GeV-1 cm-3 s-1')
+        else:
+            # Returns call function[rad, energy] amd returns f[rad, energy]
+            def Jp(rad, eng): return self.get_crp_2d(eng*u.GeV, rad*u.kpc).to_value('GeV-1 cm-3').T
+            dN_dEdVdt = self._eval_spectrum_pp(Jp, energy, product, radius_input=radius, nH=n_H).T
             
-        else :
-            raise ValueError('Only all, numu and nue flavor are available.')    
-
         return dN_dEdVdt.to('GeV-1 cm-3 s-1')
+    
 
+    #==================================================
+    # Get the separable pp interaction spectrum
+    #==================================================
+    
+    @cluster_pipeline.shared('pp_spectrum')
+    def _get_separable_spectrum_pp(self, energy, product='gamma'):
+        """
+        Compute the spectrum of secondary particles from pp interactions for
+        a separable CRp distribution and n_H = 1 cm-3, i.e. the energy part
+        of the production rate. Within a product run, it is computed once per
+        energy grid and shared by all the products (e.g. the gamma ray 
+        profile, flux and map).
+        
+        Parameters
+        ----------
+        - energy (quantity) : the physical energy of the secondary particles
+        - product (str): 'gamma', 'electron', 'numu' or 'nue'
+
+        Outputs
+        ----------
+        - dN_dEdt (np.ndarray): the spectrum in unit of GeV-1 cm-3 s-1
+
+        """
 
+        # Energy part only: returns f[energy]
+        norm = self._get_crp_normalization().to_value('GeV-1 cm-3')
+        def Jp(eng): return norm * self.get_normed_crp_spectrum(eng*u.GeV)[1].to_value('adu')
+
+        return self._eval_spectrum_pp(Jp, energy, product).to_value('GeV-1 cm-3 s-1')
+
+
+    #==================================================
+    # Evaluate the pp interaction model
+    #==================================================
+    
+    def _eval_spectrum_pp(self, Jp, energy, product, radius_input=None, nH=1.0*u.cm**-3):
+        """
+        Evaluate the pp interaction model for a given CRp distribution. The 
+        model is shared and its state depends on the CRp distribution, so
+        it is used by one thread at a time when products are computed 
+        concurrently.
+        
+        Parameters
+        ----------
+        - Jp (function): the CRp distribution, Jp(energy) or Jp(radius, energy)
+        - energy (quantity) : the physical energy of the secondary particles
+        - product (str): 'gamma', 'electron', 'numu' or 'nue'
+        - radius_input (quantity): the radius, in case Jp is 2D
+        - nH (quantity): the hydrogen density, matching radius_input
+
+        Outputs
+        ----------
+        - spectrum (quantity): the spectrum, as [i_radius, i_energy] if Jp is 2D
+
+        """
+
+        with cluster_pipeline.shared_lock(self, 'pp_engine'):
+            # Get the model
+            model = self._get_pp_engine()
+
+            # Get the spectrum function
+            if product == 'gamma':
+                spectrum = model.gamma_spectrum
+            elif product == 'electron':
+                spectrum = model.electron_spectrum
+            elif product in ['numu', 'nue']:
+                def spectrum(eng, radius_input=None, nH=1.0*u.cm**-3):
+                    return model.neutrino_spectrum(eng, radius_input=radius_input, nH=nH, flavor=product)
+            else:
+                raise ValueError("Only 'gamma', 'electron', 'numu' or 'nue' are available")
+
+            # The kept model should not hold the CRp distribution, which is a local
+            # function of the calling method (e.g. the cluster could not be pickled)
+            try:
+                model.Jp = Jp
+                return spectrum(energy, radius_input=radius_input, nH=nH)
+            finally:
+                model.Jp = None
+                model._K06.Jp = None
+                model._K06._Jp_grid = None
+
+    
+    #==================================================
+    # Get the electron loss model
+    #==================================================
+    
+    @cluster_timing.timed('electron_loss')
+    def _get_electron_loss(self, energy):
+        """
+        Get the electron energy loss model, in which the energy dependent 
+        terms are precomputed. It is kept as long as the energy grid and 
+        the redshift do not change.
+        
+        Parameters
+        ----------
+        - energy (quantity) : the physical energy of electrons
+
+        Outputs
+        ----------
+        - loss (cluster_electron_loss.ElectronLoss): the energy loss model
+
+        """
+
+        key = (energy.to_value('GeV').tobytes(), self._redshift)
+
+        loss = self._electron_loss
+        if loss is not None and loss['key'] == key:
+            return loss['model']
+
+        model = cluster_electron_loss.ElectronLoss(energy, redshift=self._redshift)
+        self._electron_loss = {'key':key, 'model':model}
+        
+        return model
+
+    
     #==================================================
     # Get the electron spectrum
     #==================================================
     
+    @cluster_pipeline.shared('cre_2d')
+    @cluster_timing.timed('cre_steady_state')
     def get_cre_2d(self, energy=np.logspace(-2,7,100)*u.GeV, radius=np.logspace(0,4,100)*u.kpc):
         """
         Compute the electron spectrum as dN/dEdV = f(E, r)
@@ -979,7 +1231,7 @@ class Physics(object):
         radius, B   = self.get_magfield_profile(radius)
 
         # Compute the losses
-        dEdt = cluster_electron_loss.dEdt_tot(energy, radius=radius, n_e=n_e, B=B, redshift=self._redshift)
+        dEdt = self._get_electron_loss(energy).dEdt_tot(n_e=n_e, B=B) * u.GeV/u.s
 
         # Get the injection rate between the and max possible, i.e. Epmax
         emin = np.amax([(const.m_e*const.c**2).to_value('GeV'),
@@ -1083,20 +1335,13 @@ class Physics(object):
         if Rmax is None:
             Rmax = self._R500
                 
-        # Integrate over the considered volume
+        # Integrate over the considered volume, refining the sampling where needed (e.g. R_truncation).
+        # Each call to get_cre_2d is expensive and its precision is limited by the energy sampling
+        # of the loss equation, so start from the usual grid with a looser tolerance
         rmin = np.amin([self._Rmin.to_value('kpc'), Rmax.to_value('kpc')/10])*u.kpc #In case of small Rmax, make sure we go low enough
-        rad = model_tools.sampling_array(rmin, Rmax, NptPd=self._Npt_per_decade_integ, unit=True)
-
-        # To improve precision around R_truncation in integration
-        if np.amax(rad) > self._R_truncation:
-            rad = rad.insert(0, self._R_truncation)
-            rad.sort()
-
-        # Get the differential spectrum/profile
-        dN_dEdV = self.get_cre_2d(energy, rad)
-
-        # Integrate
-        spectrum = model_tools.trapz_loglog(4*np.pi*rad**2 * dN_dEdV, rad)
+        spectrum = model_tools.adaptive_spherical_integration(lambda rad: self.get_cre_2d(energy, rad),
+                                                              rmin, Rmax, breakpoints=self._R_truncation,
+                                                              NptPd=self._Npt_per_decade_integ, rtol=1e-2)
 
         return energy, spectrum.to('GeV-1')
     
@@ -1134,7 +1379,7 @@ class Physics(object):
         model = cluster_electron_emission.ClusterElectronEmission(Je,
                                                                   Eemin=(const.m_e*const.c**2).to('GeV'),
                                                                   Eemax=self._Epmax,
-                                                                  NptEePd=self._Npt_per_decade_integ)
+                                                                  NptEePd=self._get_npt_per_decade('synchrotron', 'electron'))
         
         # Extract the spectrum: what is long is evaluating Je inside the code
         dN_dEdVdt = model.synchrotron(energy, radius_input=radius, B=B).T
@@ -1178,7 +1423,7 @@ class Physics(object):
         model = cluster_electron_emission.ClusterElectronEmission(Je,
                                                                   Eemin=(const.m_e*const.c**2).to('GeV'),
                                                                   Eemax=self._Epmax,
-                                                                  NptEePd=self._Npt_per_decade_integ)
+                                                                  NptEePd=self._get_npt_per_decade('ic', 'electron'))
         
         # Extract the spectrum: what is long is evaluating Je inside the code
         dN_dEdVdt = model.inverse_compton(energy, radius_input=radius, redshift=self._redshift).T
@@ -1331,6 +1576,7 @@ class Physics(object):
     # Read and interpolate xspec tables
     #==================================================
     
+    @cluster_timing.timed('xspec_interpolation')
     def _itpl_xspec_table(self, xspecfile, Tinput):
         """
         Read an Xspec table and interpolate values at a given temperature
@@ -1349,25 +1595,13 @@ class Physics(object):
         
         file_start = 3
         
-        # Read the temperature
-        with open(xspecfile) as f: 
-            col = zip(*[line.split() for line in f])[0]
-            Txspec = np.array(col[file_start:]).astype(np.float)
-
-        # Read Xspec counts
-        with open(xspecfile) as f: 
-            col = zip(*[line.split() for line in f])[1]
-            Cxspec = np.array(col[file_start:]).astype(np.float)
-
-        # Read Xspec surface brightness
-        with open(xspecfile) as f: 
-            col = zip(*[line.split() for line in f])[2]
-            Sxspec = np.array(col[file_start:]).astype(np.float)
-
-        # Read Xspec rate
+        # Read the temperature, counts, surface brightness and rate
         with open(xspecfile) as f: 
-            col = zip(*[line.split() for line in f])[3]
-            Rxspec = np.array(col[file_start:]).astype(np.float)
+            col = list(zip(*[line.split() for line in f]))
+        Txspec = np.array(col[0][file_start:]).astype(float)
+        Cxspec = np.array(col[1][file_start:]).astype(float)
+        Sxspec = np.array(col[2][file_start:]).astype(float)
+        Rxspec = np.array(col[3][file_start:]).astype(float)
         
         # Define interpolation and set unit
         Citpl = interpolate.interp1d(Txspec, Cxspec, kind='cubic', fill_value='extrapolate')
@@ -241,7 +241,8 @@ class Plots(object):
     ----------  
     - plot(self, list_prod=['all'],radius=np.logspace(0,4,1000)*u.kpc, 
     energy=np.logspace(-2,6,1000)*u.GeV, NR500max=5.0, Npt_los=100, Rmax=None,
-    Epmin=None, Epmax=None, Egmin=10.0*u.MeV, Egmax=1.0*u.PeV): 
+    Epmin=None, Epmax=None, Egmin=10.0*u.MeV, Egmax=1.0*u.PeV, products=None, Nthread=1): 
+    plot the products, computed with get_products or given
 
     """
 
@@ -258,7 +259,9 @@ class Plots(object):
              Eemin=None, Eemax=None,
              freq0=1*u.GHz,
              Rmax=None,
-             Egmin=None, Egmax=None):
+             Egmin=None, Egmax=None,
+             products=None,
+             Nthread=1):
         
         """
         Main function of the sub-module of the cluster class dedicated to plots.
@@ -278,24 +281,22 @@ class Plots(object):
         - Egmax (quantity): the upper bound for energy gamma integration
         - Rmax (quantity): the radius within with the spectrum is computed 
         (default is R500)
+        - products (dict): the products computed with get_products, to plot them
+        without computing them again (e.g. after saving them). The sampling and
+        integration parameters are then not used.
+        - Nthread (int): the number of threads used to compute independent products
         
         """
 
-        # Default keyword
-        if Epmin is None:
-            Epmin = self._Epmin
-        if Epmax is None:
-            Epmax = self._Epmax
-        if Eemin is None:
-            Eemin = (const.m_e*const.c**2).to('GeV')
-        if Eemax is None:
-            Eemax = self._Epmax
-        if Rmax  is None:
-            Rmax = self._R500
-        if Egmin is None:
-            Egmin = self._Epmin/10.0
-        if Egmax is None:
-            Egmax = self._Epmax
+        # Compute the products, unless they are given
+        groups = [g for g in ['profile', 'spectra', 'map'] if 'all' in prod_list or g in prod_list]
+        if products is None or not all([g in products for g in groups]):
+            products = self.get_products(groups, radius=radius, energy=energy, energyX=energyX, frequency=frequency,
+                                         Epmin=Epmin, Epmax=Epmax, Eemin=Eemin, Eemax=Eemax, freq0=freq0,
+                                         Rmax=Rmax, Egmin=Egmin, Egmax=Egmax, Nthread=Nthread)
+        Egmin = products['param']['Egmin']
+        Egmax = products['param']['Egmax']
+        freq0 = products['param']['freq0']
 
         # Create directory
         if not os.path.exists(self._output_dir): os.mkdir(self._output_dir)
@@ -310,157 +311,158 @@ class Plots(object):
 
         #---------- Profiles
         if 'all' in prod_list or 'profile' in prod_list:
+            radius = products['profile']['radius']
             angle = (radius.to_value('kpc')/self._D_ang.to_value('kpc')*180.0/np.pi)*u.deg
 
             # Pressure
-            rad, prof = self.get_pressure_gas_profile(radius)
+            prof = products['profile']['p_e']
             profile(radius, angle, prof.to('keV cm-3'), self._output_dir+'/PLOT_PROF_gas_pressure.pdf',
                     label='Electron pressure (keV cm$^{-3}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: gas pressure')
 
             # Density
-            rad, prof = self.get_density_gas_profile(radius)
+            prof = products['profile']['n_e']
             profile(radius, angle, prof.to('cm-3'), self._output_dir+'/PLOT_PROF_gas_density.pdf',
                     label='Electron density (cm$^{-3}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: gas density')
 
             # temperature
-            rad, prof = self.get_temperature_gas_profile(radius)
+            prof = products['profile']['t_gas']
             profile(radius, angle, prof.to('keV'), self._output_dir+'/PLOT_PROF_gas_temperature.pdf',
                     label='Gas temperature (keV)', R500=self._R500)
             if not self._silent: print('----- Plot done: gas temperature')
 
             # Entropy
-            rad, prof = self.get_entropy_gas_profile(radius)
+            prof = products['profile']['k_gas']
             profile(radius, angle, prof.to('keV cm2'), self._output_dir+'/PLOT_PROF_gas_entropy.pdf',
                     label='Gas entropy (keV cm$^2$)', R500=self._R500)
             if not self._silent: print('----- Plot done: gas entropy')
 
             # Masse HSE
-            rad, prof = self.get_hse_mass_profile(radius)
+            prof = products['profile']['m_hse']
             profile(radius, angle, prof.to('Msun'), self._output_dir+'/PLOT_PROF_hse_mass.pdf',
                     label='HSE mass (M$_{\\odot}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: HSE mass')
 
             # Overdensity
-            rad, prof = self.get_overdensity_contrast_profile(radius)
+            prof = products['profile']['overdensity']
             profile(radius, angle, prof.to('adu'), self._output_dir+'/PLOT_PROF_overdensity.pdf',
                     label='Overdensity $\\rho / \\rho_{c}$', R500=self._R500)
             if not self._silent: print('----- Plot done: density contrast')
 
             # Gas mass
-            rad, prof = self.get_gas_mass_profile(radius)
+            prof = products['profile']['m_gas']
             profile(radius, angle, prof.to('Msun'), self._output_dir+'/PLOT_PROF_gas_mass.pdf',
                     label='Gas mass (M$_{\\odot}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: gas mass')
 
             # fgas profile
-            rad, prof = self.get_fgas_profile(radius)
+            prof = products['profile']['f_gas']
             profile(radius, angle, prof.to('adu'), self._output_dir+'/PLOT_PROF_gas_fraction.pdf',
                     label='Gas fraction', R500=self._R500)
             if not self._silent: print('----- Plot done: gas fraction')
 
             # Thermal energy
-            rad, prof = self.get_thermal_energy_profile(radius)
+            prof = products['profile']['u_th']
             profile(radius, angle, prof.to('erg'), self._output_dir+'/PLOT_PROF_gas_thermal_energy.pdf',
                     label='Thermal energy (erg)', R500=self._R500)
             if not self._silent: print('----- Plot done: thermal energy')
 
             # Magfield
-            rad, prof = self.get_magfield_profile(radius)
+            prof = products['profile']['B']
             profile(radius, angle, prof.to('uG'), self._output_dir+'/PLOT_PROF_magnetic_field.pdf',
                     label='Magnetic field ($\\mu$G)', R500=self._R500)
             if not self._silent: print('----- Plot done: magnetic field')
             
             # Cosmic ray proton
-            rad, prof = self.get_density_crp_profile(radius, Emin=Epmin, Emax=Epmax, Energy_density=False)
+            prof = products['profile']['n_crp']
             profile(radius, angle, prof.to('cm-3'), self._output_dir+'/PLOT_PROF_crp_density.pdf',
                     label='CRp density (cm$^{-3}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: CRp density')
                         
             # Cosmic ray to thermal energy
-            rad, prof = self.get_crp_to_thermal_energy_profile(radius, Emin=Epmin, Emax=Epmax)
+            prof = products['profile']['x_crp']
             profile(radius, angle, prof.to('adu'), self._output_dir+'/PLOT_PROF_crp_fraction.pdf',
                     label='CRp to thermal energy $X_{CR}$', R500=self._R500)
             if not self._silent: print('----- Plot done: CRp/thermal energy')
 
             # Cosmic ray electrons
-            rad, prof = self.get_density_cre_profile(radius, Emin=Eemin, Emax=Eemax, Energy_density=False)
+            prof = products['profile']['n_cre']
             profile(radius, angle, prof.to('cm-3'), self._output_dir+'/PLOT_PROF_cre_density.pdf',
                     label='CRe density (cm$^{-3}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: CRe density')
                         
             # Gamma ray profile
-            rad, prof = self.get_gamma_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False)
+            prof = products['profile']['Sg']
             profile(radius, angle, prof.to('cm-2 s-1 sr-1'), self._output_dir+'/PLOT_PROF_gamma.pdf',
                     label='$\\gamma$-ray, '+Egstrlim+' (cm$^{-2}$ s$^{-1}$ sr$^{-1}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: gamma surface brightness profile')
 
             # Gamma ray integrated flux profile
-            prof = self.get_gamma_flux(Emin=Egmin, Emax=Egmax, Rmax=radius, Energy_density=False, type_integral='spherical')
+            prof = products['profile']['Fg']
             profile(radius, angle, prof.to('cm-2 s-1'), self._output_dir+'/PLOT_PROF_gammaF.pdf',
                     label='$\\gamma$-ray flux (<R, sph), '+Egstrlim+' (cm$^{-2}$ s$^{-1}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: gamma integrated (R) flux')
 
             # neutrino profile
-            rad, prof = self.get_neutrino_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False, flavor='all')
+            prof = products['profile']['Snu']
             profile(radius, angle, prof.to('cm-2 s-1 sr-1'), self._output_dir+'/PLOT_PROF_neutrino.pdf',
                     label='$\\nu$, '+Egstrlim+' (cm$^{-2}$ s$^{-1}$ sr$^{-1}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: neutrino surface brightness profile')
 
             # neutrino integrated flux profile
-            prof = self.get_neutrino_flux(Emin=Egmin, Emax=Egmax, Rmax=radius, Energy_density=False, type_integral='spherical', flavor='all')
+            prof = products['profile']['Fnu']
             profile(radius, angle, prof.to('cm-2 s-1'), self._output_dir+'/PLOT_PROF_neutrinoF.pdf',
                     label='$\\nu$ flux (<R, sph), '+Egstrlim+' (cm$^{-2}$ s$^{-1}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: neutrino integrated (R) flux')
 
             # IC profile
-            rad, prof = self.get_ic_profile(radius, Emin=Egmin, Emax=Egmax, Energy_density=False)
+            prof = products['profile']['Sic']
             profile(radius, angle, prof.to('cm-2 s-1 sr-1'), self._output_dir+'/PLOT_PROF_InverseCompton.pdf',
                     label='IC, '+Egstrlim+' (cm$^{-2}$ s$^{-1}$ sr$^{-1}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: IC surface brightness profile')
 
             # IC integrated flux profile
-            prof = self.get_ic_flux(Emin=Egmin, Emax=Egmax, Rmax=radius, Energy_density=False, type_integral='spherical')
+            prof = products['profile']['Fic']
             profile(radius, angle, prof.to('cm-2 s-1'), self._output_dir+'/PLOT_PROF_InverseComptonF.pdf',
                     label='IC flux (<R, sph), '+Egstrlim+' (cm$^{-2}$ s$^{-1}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: IC integrated (R) flux')
 
             # Synchrotron profile
-            rad, prof = self.get_synchrotron_profile(radius, freq0=freq0)
+            prof = products['profile']['Ssynch']
             profile(radius, angle, prof.to('Jy sr-1'), self._output_dir+'/PLOT_PROF_synchrotron.pdf',
                     label='Synchrotron, '+str(freq0)+' (Jy sr$^{-1}$)', R500=self._R500)
             if not self._silent: print('----- Plot done: Synchrotron surface brightness profile')
 
             # Synchrotron integrated flux profile
-            prof = self.get_synchrotron_flux(freq0=freq0, Rmax=radius, type_integral='spherical')
+            prof = products['profile']['Fsynch']
             profile(radius, angle, prof.to('Jy'), self._output_dir+'/PLOT_PROF_synchrotronF.pdf',
                     label='Synchrotron flux (<R, sph), '+str(freq0)+' (Jy)', R500=self._R500)
             if not self._silent: print('----- Plot done: Synchrotron integrated (R) flux')
 
             # Compton parameter
-            rad, prof = self.get_sz_profile(radius, Compton_only=True)
+            prof = products['profile']['Ssz']
             profile(radius, angle, prof.to('adu'), self._output_dir+'/PLOT_PROF_SZ.pdf',
                     label='y Compton', R500=self._R500)
             if not self._silent: print('----- Plot done: SZ Compton')
             
             # Spherically integrated Compton
-            prof = self.get_sz_flux(Rmax=radius, Compton_only=True, type_integral='spherical')
+            prof = products['profile']['Fsz']
             profile(radius, angle, prof.to('kpc2'), self._output_dir+'/PLOT_PROF_SZF.pdf',
                     label='Y spherical (kpc$^2$)', R500=self._R500)
             if not self._silent: print('----- Plot done: SZ integrated Compton (spherical)')
 
 
-            if os.path.exists(self._output_dir+'/XSPEC_table.txt'):
+            if 'Sx' in products['profile']:
 
                 # Sx profile
-                rad, prof = self.get_xray_profile(radius, output_type='C')
+                prof = products['profile']['Sx']
                 profile(radius, angle, prof.to('s-1 cm-2 sr-1'), self._output_dir+'/PLOT_PROF_X.pdf',
                         label='X-ray (s$^{-1}$ cm$^{-2}$ sr$^{-1}$)', R500=self._R500)
                 if not self._silent: print('----- Plot done: Xray surface brightness')
 
                 # Spherically integrated Xray flux
-                prof = self.get_xray_flux(Rmax=radius, type_integral='spherical', output_type='C')
+                prof = products['profile']['Fx']
                 profile(radius, angle, prof.to('s-1 cm-2'), self._output_dir+'/PLOT_PROF_XF.pdf',
                         label='$F_X$ spherical (s$^{-1}$ cm$^{-2}$)', R500=self._R500)
                 if not self._silent: print('----- Plot done: Xray integrated flux (spherical)')
@@ -470,71 +472,73 @@ class Plots(object):
                 
         #---------- Spectra
         if 'all' in prod_list or 'spectra' in prod_list:
+            energy    = products['spectra']['energy']
+            frequency = products['spectra']['frequency']
+
             # CR protons
-            eng, spec = self.get_crp_spectrum(energy, Rmax=Rmax)
+            spec = products['spectra']['CRp']
             spectra(energy, (energy/const.h).to('GHz'), spec.to('GeV-1'),
                     self._output_dir+'/PLOT_SPEC_CRproton.pdf', label='Volume integrated CRp (GeV$^{-1}$)')
             if not self._silent: print('----- Plot done: CRp spectrum')
 
             # CR electrons
-            eng, spec = self.get_cre_spectrum(energy, Rmax=Rmax)
+            spec = products['spectra']['CRe']
             spectra(energy, (energy/const.h).to('GHz'), spec.to('GeV-1'),
                     self._output_dir+'/PLOT_SPEC_CRelectron.pdf', label='Volume integrated CRe (GeV$^{-1}$)')
             if not self._silent: print('----- Plot done: CRe spectrum')
 
             # gamma
-            eng, spec = self.get_gamma_spectrum(energy, Rmax=Rmax, type_integral='spherical')
+            spec = products['spectra']['gamma']
             spectra(energy, (energy/const.h).to('GHz'), (energy**2*spec).to('GeV cm-2 s-1'),
                     self._output_dir+'/PLOT_SPEC_gamma.pdf',
                     label='$F_{\\gamma}$(<R, sph) (GeV cm$^{-2}$ s$^{-1}$)')
             if not self._silent: print('----- Plot done: gamma spectrum')
 
             # Gamma integrated flux spectrum
-            spec = self.get_gamma_flux(Emin=energy, Emax=Egmax, Rmax=Rmax, Energy_density=False, type_integral='spherical')
+            spec = products['spectra']['gammaF']
             spectra(energy, (energy/const.h).to('GHz'), spec.to('cm-2 s-1'),
                     self._output_dir+'/PLOT_SPEC_gammaF.pdf', label='$\\gamma$-ray flux (>E, sph) (cm$^{-2}$ s$^{-1}$)')
             if not self._silent: print('----- Plot done: gamma integrated flux (E)')
 
             # neutrino
-            eng, spec = self.get_neutrino_spectrum(energy, Rmax=Rmax, type_integral='spherical', flavor='all')
+            spec = products['spectra']['nu']
             spectra(energy, (energy/const.h).to('GHz'), (energy**2*spec).to('GeV cm-2 s-1'),
                     self._output_dir+'/PLOT_SPEC_neutrino.pdf', label='$F_{\\nu}$(<R, sph) (GeV cm$^{-2}$ s$^{-1}$)')
             if not self._silent: print('----- Plot done: neutrino spectrum')
             
             # neutrino integrated flux spectrum
-            spec = self.get_neutrino_flux(Emin=energy, Emax=Egmax, Rmax=Rmax, Energy_density=False, type_integral='spherical',
-                                          flavor='all')
+            spec = products['spectra']['nuF']
             spectra(energy, (energy/const.h).to('GHz'), spec.to('cm-2 s-1'),
                     self._output_dir+'/PLOT_SPEC_neutrinoF.pdf',label='$\\nu$ flux (>E, sph) (cm$^{-2}$ s$^{-1}$)')
             if not self._silent: print('----- Plot done: neutrino integrated flux (E)')
 
             # IC
-            eng, spec = self.get_ic_spectrum(energy, Rmax=Rmax, type_integral='spherical')
+            spec = products['spectra']['IC']
             spectra(energy, (energy/const.h).to('GHz'), (energy**2*spec).to('GeV cm-2 s-1'),
                     self._output_dir+'/PLOT_SPEC_InverseCompton.pdf',label='$F_{IC}$(<R, sph) (GeV cm$^{-2}$ s$^{-1}$)')
             if not self._silent: print('----- Plot done: IC spectrum')
 
             # IC integrated flux spectrum
-            spec = self.get_ic_flux(Emin=energy, Emax=Egmax, Rmax=Rmax, Energy_density=False, type_integral='spherical')
+            spec = products['spectra']['ICF']
             spectra(energy, (energy/const.h).to('GHz'), spec.to('cm-2 s-1'), self._output_dir+'/PLOT_SPEC_InverseComptonF.pdf',
                     label='IC flux (>E, sph) (cm$^{-2}$ s$^{-1}$)')
             if not self._silent: print('----- Plot done: IC integrated flux (E)')
 
             # Synchrotron
-            freq, spec = self.get_synchrotron_spectrum(frequency, Rmax=Rmax, type_integral='spherical')
+            freq, spec = frequency, products['spectra']['synch']
             spectra((freq*const.h).to('eV'), freq, spec.to('Jy'), self._output_dir+'/PLOT_SPEC_Synchrotron.pdf',
                     label='$F_{synch}$(<R, sph) (Jy)')
             if not self._silent: print('----- Plot done: Synchrotron spectrum')
             
             # SZ
-            freq, spec = self.get_sz_spectrum(frequency, Rmax=Rmax, type_integral='spherical', Compton_only=False)
+            freq, spec = frequency, products['spectra']['SZ']
             spectra((freq*const.h).to('eV'), freq, np.abs(spec.to('Jy')), self._output_dir+'/PLOT_SPEC_SZ.pdf',
                     label='$|F_{SZ}|$(<R, sph) (Jy)')
             if not self._silent: print('----- Plot done: SZ spectrum')
 
             # Xray
-            if os.path.exists(self._output_dir+'/XSPEC_table.txt'):
-                engX, spec = self.get_xray_spectrum(energyX, Rmax=Rmax, type_integral='spherical', output_type='C')
+            if 'Xray' in products['spectra']:
+                engX, spec = products['spectra']['energyX_center'], products['spectra']['Xray']
                 spectra(engX.to('keV'), (engX/const.h).to('GHz'), spec.to('cm-2 s-1 keV-1'), self._output_dir+'/PLOT_SPEC_X.pdf',
                         label='$S_{X}$(<R, sph) (cm$^{-2}$ s$^{-1}$ keV${-1}$)')
                 if not self._silent: print('----- Plot done: Xray spectrum')
@@ -543,43 +547,43 @@ class Plots(object):
                 
         #---------- Map
         if 'all' in prod_list or 'map' in prod_list:
-            header = self.get_map_header()
+            header = products['map']['header']
 
             # gamma    
-            image = self.get_gamma_map(Emin=Egmin, Emax=Egmax, Energy_density=False, Normalize=False).to_value('cm-2 s-1 sr-1')
+            image = products['map']['gamma'].to_value('cm-2 s-1 sr-1')
             maps(image, header, self._output_dir+'/PLOT_MAP_gamma.pdf', label='$\\gamma$-ray, '+Egstrlim+' (cm$^{-2}$ s$^{-1}$ sr$^{-1}$)',
                  coord=self._coord, theta_500=self._theta500, theta_trunc=self._theta_truncation, logscale=True)
             if not self._silent: print('----- Plot done: gamma map')
 
             # neutrino    
-            image = self.get_neutrino_map(Emin=Egmin, Emax=Egmax, Energy_density=False, Normalize=False, flavor='all').to_value('cm-2 s-1 sr-1')
+            image = products['map']['neutrino'].to_value('cm-2 s-1 sr-1')
             maps(image, header, self._output_dir+'/PLOT_MAP_neutrino.pdf', label='$\\nu$, '+Egstrlim+' (cm$^{-2}$ s$^{-1}$ sr$^{-1}$)',
                  coord=self._coord, theta_500=self._theta500, theta_trunc=self._theta_truncation, logscale=True)
             if not self._silent: print('----- Plot done: neutrino map')
 
             # IC    
-            image = self.get_ic_map(Emin=Egmin, Emax=Egmax, Energy_density=False, Normalize=False).to_value('cm-2 s-1 sr-1')
+            image = products['map']['ic'].to_value('cm-2 s-1 sr-1')
             maps(image, header, self._output_dir+'/PLOT_MAP_inverseCompton.pdf', label='IC, '+Egstrlim+' (cm$^{-2}$ s$^{-1}$ sr$^{-1}$)',
                  coord=self._coord, theta_500=self._theta500, theta_trunc=self._theta_truncation, logscale=True)
             if not self._silent: print('----- Plot done: IC map')
 
             # Synchrotron
-            image = self.get_synchrotron_map(freq0=freq0, Normalize=False).to_value('Jy sr-1')
+            image = products['map']['synchrotron'].to_value('Jy sr-1')
             maps(image, header, self._output_dir+'/PLOT_MAP_synchrotron.pdf', label='Synchrotron, '+str(freq0)+' (Jy sr$^{-1}$)',
                  coord=self._coord, theta_500=self._theta500, theta_trunc=self._theta_truncation, logscale=True)
             if not self._silent: print('----- Plot done: Synchrotron map')
 
             # SZ ymap
-            image = self.get_sz_map(Compton_only=True, Normalize=False).to_value('adu')
+            image = products['map']['sz'].to_value('adu')
             maps(image*1e6, header, self._output_dir+'/PLOT_MAP_SZy.pdf',
                  label='Compton parameter $\\times 10^{6}$', coord=self._coord, theta_500=self._theta500,
                  theta_trunc=self._theta_truncation, logscale=True)
             if not self._silent: print('----- Plot done: SZ ymap')
 
             # Xray
-            if os.path.exists(self._output_dir+'/XSPEC_table.txt'):
+            if 'xray' in products['map']:
                 
-                image = self.get_xray_map(output_type='C').to_value('s-1 cm-2 sr-1')
+                image = products['map']['xray'].to_value('s-1 cm-2 sr-1')
                 maps(image, header, self._output_dir+'/PLOT_MAP_X.pdf', label='X-ray (s$^{-1}$ cm$^{-2}$ sr$^{-1}$)',
                      coord=self._coord, theta_500=self._theta500, theta_trunc=self._theta_truncation, logscale=True)
                 if not self._silent: print('----- Plot done: Xray map')
@@ -6,6 +6,9 @@ import astropy.units as u
 import numpy as np
 import scipy.interpolate as interpolate
 
+from ClusterModel.ClusterTools import cluster_profile
+from ClusterModel.ClusterTools import cluster_timing
+
 
 #==================================================
 # Check radius
@@ -26,7 +29,7 @@ def check_qarray(qarr, unit=None):
     """
 
     if unit is None:
-        if type(qarr) == float:
+        if isinstance(qarr, float):
             qarr = np.array([qarr])
             
     else:
@@ -35,7 +38,8 @@ def check_qarray(qarr, unit=None):
         except:
             raise TypeError("Unvalid unit for qarr")
 
-        if type(qarr.to_value()) == float:
+        # Scalars (the value can be a numpy float, depending on astropy version)
+        if np.ndim(qarr) == 0:
             qarr = np.array([qarr.to_value()]) * qarr.unit
 
     return qarr
@@ -221,6 +225,58 @@ def energy_integration(func, energy, Energy_density=False):
     return I_func
 
 
+#==================================================
+# Compute spectrum integration within energy bins
+#==================================================
+
+def energy_bin_integration(func, energy, energy_edges, Energy_density=False):
+    """
+    Integrate over the energy within consecutive bins using the cumulative
+    integral computed once on a common energy grid:
+    \int_Ei^Ei+1 (E) dN_dEdVdt(E,r) dE
+    The bin edges should be part of the energy grid.
+
+    Parameters
+    ----------
+    - dN_dEdVdt (2d or 1d array): Input array to integrate, as Neng x Nr or Neng.
+    - energy (array): energy variable to integrate over.
+    - energy_edges (array): the bin edges, which should belong to energy
+    - Energy_density (bool): if True, compute the energy density integral
+
+    Returns
+    -------
+    - dN_dVdt (array): integrated quantity, as Nbin x Nr or Nbin
+
+    """
+
+    # Find the location of the edges in the energy grid
+    index = np.searchsorted(energy.to_value(energy.unit), energy_edges.to_value(energy.unit))
+    index[index > len(energy)-1] = len(energy)-1
+    if not np.allclose(energy[index].to_value(energy.unit), energy_edges.to_value(energy.unit), rtol=1e-10, atol=0):
+        raise ValueError("The energy bin edges should be part of the energy array")
+
+    # Integrand
+    if Energy_density:
+        if func.ndim == 1:
+            integrand = energy*func
+        elif func.ndim == 2:
+            integrand = np.vstack(energy.value)*energy.unit*func
+    else:
+        integrand = func
+
+    # Cumulative integral, starting with 0 at the first energy
+    dI = trapz_loglog(integrand, energy, axis=0, intervals=True)
+    I_unit = dI.unit
+    dI = dI.to_value(I_unit)
+    I_cum = np.zeros((len(energy),)+dI.shape[1:])
+    I_cum[1:] = np.cumsum(dI, axis=0)
+
+    # Difference between consecutive edges
+    I_func = (I_cum[index[1:]] - I_cum[index[:-1]])*I_unit
+
+    return I_func
+
+
 #==================================================
 # Compute spherical integration
 #==================================================
@@ -248,10 +304,115 @@ def spherical_integration(func, radius):
     return I
 
 
+#==================================================
+# Adaptive energy integration
+#==================================================
+
+def adaptive_energy_integration(func, Emin, Emax, Energy_density=False, rtol=1e-3, breakpoints=None, NptPd=4):
+    """
+    Integrate a function over the energy, with a log-log grid refined 
+    until the requested tolerance is reached (see 
+    cluster_profile.adaptive_loglog_integral):
+    \int_Emin^Emax (E) dN_dEdVdt(E,r) dE
+    
+    Parameters
+    ----------
+    - func (function): function of the energy (quantity) returning dN_dEdVdt 
+    as a Neng or Neng x Nr quantity (or array)
+    - Emin, Emax (quantity): the integration bounds
+    - Energy_density (bool): if True, compute the energy density integral
+    - rtol (float): the requested relative tolerance
+    - breakpoints (quantity): energies at which the function may break
+    - NptPd (int): the number of points per decade of the starting grid
+    
+    Returns
+    -------
+    - dN_dVdt (quantity): integrated quantity
+
+    """
+
+    eunit = Emin.unit
+    funit = []
+    
+    def integrand(eng):
+        f = u.Quantity(func(eng*eunit))
+        if Energy_density:
+            f = np.vstack(eng)*eunit * f if f.ndim == 2 else eng*eunit * f
+        funit.append(f.unit)
+        return f.value
+
+    if breakpoints is not None:
+        breakpoints = np.atleast_1d(breakpoints.to_value(eunit))
+    I_func, eng = cluster_profile.adaptive_loglog_integral(integrand, Emin.to_value(eunit), Emax.to_value(eunit),
+                                                          rtol=rtol, breakpoints=breakpoints, NptPd=NptPd, axis=0)
+
+    return I_func * funit[0] * eunit
+
+
+#==================================================
+# Adaptive spherical integration
+#==================================================
+
+def adaptive_spherical_integration(func, Rmin, Rmax, rtol=1e-3, breakpoints=None, NptPd=4):
+    """
+    Integrate a function over the spherical volume, with a log-log grid 
+    refined until the requested tolerance is reached (see 
+    cluster_profile.adaptive_loglog_integral), e.g. around the truncation 
+    radius given as a breakpoint:
+    \int_Rmin^Rmax 4 pi r^2 dN_dEdVdt(E,r) dr
+    If Rmax is an array (enclosed profile), the cumulative integral is 
+    computed once up to the largest Rmax, within the tolerance at each bound, 
+    and taken at each Rmin and Rmax.
+    
+    Parameters
+    ----------
+    - func (function): function of the radius (quantity) returning dN_dEdVdt 
+    as a Nr or Neng x Nr quantity (or array). Only Nr is allowed if Rmax is 
+    an array.
+    - Rmin, Rmax (quantity): the integration bounds, scalars or arrays
+    - rtol (float): the requested relative tolerance
+    - breakpoints (quantity): radii at which the function may break
+    - NptPd (int): the number of points per decade of the starting grid, to 
+    be increased when each call of func is expensive
+    
+    Returns
+    -------
+    - dN_dEdt (quantity): integrated quantity
+
+    """
+
+    runit = Rmax.unit
+    funit = []
+    if breakpoints is not None:
+        breakpoints = np.atleast_1d(breakpoints.to_value(runit))
+
+    def integrand(rad):
+        f = 4*np.pi*(rad*runit)**2 * func(rad*runit)
+        funit.append(f.unit)
+        return f.value
+    
+    #---------- Single integral
+    if Rmax.isscalar:
+        I, rad = cluster_profile.adaptive_loglog_integral(integrand, Rmin.to_value(runit), Rmax.to_value(runit),
+                                                         rtol=rtol, breakpoints=breakpoints, NptPd=NptPd, axis=-1)
+        return I * funit[0] * runit
+
+    #---------- Enclosed profile: the integral is computed once up to the largest Rmax, 
+    # and its cumulative is taken at each bound
+    rmin = Rmin.to_value(runit) * np.ones(len(Rmax))
+    rmax = Rmax.to_value(runit)
+    I, rad = cluster_profile.adaptive_loglog_integral(integrand, np.amin(rmin), np.amax(rmax),
+                                                     rtol=rtol, breakpoints=breakpoints, NptPd=NptPd, axis=-1,
+                                                     xout=np.append(rmin, rmax))
+    
+    return (I[len(rmax):] - I[:len(rmax)]) * funit[0] * runit
+
+
 #==================================================
 # Compute cylindrical integration
 #==================================================
 
+@cluster_timing.timed('projection')
 def cylindrical_integration(dN_dEdVdt, eng, r3d, r2d, los, Rtrunc=None):
     """
     Integrate over the spherical cylindrical volume to get the spectrum:
@@ -313,6 +474,7 @@ def cylindrical_integration(dN_dEdVdt, eng, r3d, r2d, los, Rtrunc=None):
 # Compute l.o.s. integral for a 2d function
 #==================================================
 
+@cluster_timing.timed('projection')
 def los_integration_2dfunc(f_E_r, eng, r3d, r2d, los):
     """
     Compute the line of sight integral in the case of a 
@@ -357,22 +519,28 @@ def los_integration_2dfunc(f_E_r, eng, r3d, r2d, los):
 
     # Interpolated the function at the new position    
     itpl = interpolate.interp2d(r3d, eng, f_E_r, kind='cubic')
-    f_E_r_g2_flat_sort = itpl(r3d_g2_flat_sort, eng)
 
-    # Reshaping to make it as expected: unsorted and Neng x Nr2d x Nlos
-    f_E_r_g2_flat = f_E_r_g2_flat_sort[:,index]
-    f_E_r_g3 = np.reshape(f_E_r_g2_flat, (Neng, Nr2d, Nlos))
+    # Energies are independent: process them by chunks within the memory budget
+    # (about 8 temporary Nr2d x Nlos arrays per energy)
+    I_los = []
+    for sl in cluster_timing.chunk_slices(Neng, 8*8*Nr2d*Nlos):
+        f_E_r_g2_flat_sort = np.atleast_2d(itpl(r3d_g2_flat_sort, eng[sl]))
+
+        # Reshaping to make it as expected: unsorted and Neng x Nr2d x Nlos
+        f_E_r_g2_flat = f_E_r_g2_flat_sort[:,index]
+        f_E_r_g3 = np.reshape(f_E_r_g2_flat, (len(f_E_r_g2_flat), Nr2d, Nlos))
     
-    # compute integral
-    I_los = trapz_loglog(2*f_E_r_g3*fEr_unit, los, axis=2, intervals=False)
+        # compute integral
+        I_los.append(trapz_loglog(2*f_E_r_g3*fEr_unit, los, axis=2, intervals=False))
     
-    return I_los
+    return np.concatenate(I_los, axis=0)
 
 
 #==================================================
 # Compute l.o.s. integral for a 2d function
 #==================================================
 
+@cluster_timing.timed('projection')
 def los_integration_1dfunc(f_r, r3d, r2d, los):
     """
     Compute the line of sight integral in the case of a 
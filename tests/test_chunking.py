@@ -0,0 +1,43 @@
+"""
+The engines processed by chunks within the memory budget give the same
+results as without budget.
+"""
+
+import numpy as np
+import astropy.units as u
+import pytest
+
+from ClusterModel import model
+from ClusterModel.ClusterTools import cluster_szspec
+from ClusterModel.ClusterTools import cluster_timing
+
+
+@pytest.fixture
+def tiny_budget():
+    """ Budget of 1 byte, i.e. the smallest chunks, reset after the test """
+
+    cluster_timing.set_memory_budget(1)
+    try:
+        yield
+    finally:
+        cluster_timing.set_memory_budget(None)
+
+
+def compute(cluster):
+    """ Products going through the chunked engines """
+
+    freq = np.logspace(1, 3, 10)*u.GHz
+    return [cluster_szspec.tsz_spec_relativistic(freq, np.linspace(1, 15, 7)*u.keV),
+            cluster.get_gamma_profile(np.logspace(1, 3, 10)*u.kpc)[1].value,
+            cluster.get_synchrotron_spectrum(np.logspace(-2, 1, 6)*u.GHz)[1].value]
+
+
+def test_chunked_identical(tiny_budget):
+    cluster = model.Cluster(silent=True)
+    chunked = compute(cluster)
+
+    cluster_timing.set_memory_budget(None)
+    reference = compute(model.Cluster(silent=True))
+
+    for test, ref in zip(chunked, reference):
+        assert np.array_equal(test, ref, equal_nan=True)
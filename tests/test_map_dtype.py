@@ -0,0 +1,39 @@
+"""
+Accuracy of the float32 map dtype policy (map_dtype), compared to the
+default float64 maps.
+"""
+
+import numpy as np
+import astropy.units as u
+import pytest
+
+from ClusterModel import model
+
+
+@pytest.fixture(scope='module')
+def maps():
+    """ SZ and gamma ray maps computed in float64 and float32 """
+
+    cluster = model.Cluster(silent=True)
+    cluster.map_reso = 0.05*u.deg
+    cluster.map_fov = 1.0*u.deg
+
+    res = {}
+    for dtype in ['float64', 'float32']:
+        cluster.map_dtype = dtype
+        res[dtype] = {'sz': cluster.get_sz_map(Compton_only=True),
+                      'gamma': cluster.get_gamma_map()}
+    return res
+
+
+@pytest.mark.parametrize('product', ['sz', 'gamma'])
+def test_float32_map_accuracy(maps, product):
+    ref = maps['float64'][product]
+    test = maps['float32'][product]
+
+    assert test.shape == ref.shape
+    assert test.unit == ref.unit
+    assert np.all(np.isfinite(test))
+
+    diff = np.amax(np.abs((test - ref).to_value(ref.unit))) / np.amax(np.abs(ref.to_value(ref.unit)))
+    assert diff < 1e-4
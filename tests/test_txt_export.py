@@ -0,0 +1,50 @@
+"""
+The text export keeps the column layout of the original writer.
+"""
+
+import numpy as np
+import pytest
+
+from ClusterModel import model
+
+
+def legacy_txt_file(filename, col1, col2, col1_name, col2_name, ndec=20):
+    """ Original row by row writer, used as reference """
+
+    ncar = ndec + 6
+    col1_name = ('{:>'+str(ncar-1)+'}').format(('{:.'+str(ncar-1)+'}').format(col1_name))
+    col2_name = ('{:>'+str(ncar)+'}').format(('{:.'+str(ncar)+'}').format(col2_name))
+
+    with open(filename, 'w') as sfile:
+        sfile.writelines(['#'+col1_name, ('{:>'+str(ncar)+'}').format(''), col2_name+'\n'])
+        for il in range(len(col1)):
+            sfile.writelines([('{:.'+str(ndec)+'e}').format(col1[il]),
+                              ('{:>'+str(ncar)+'}').format(''),
+                              ('{:.'+str(ndec)+'e}').format(col2[il])+'\n'])
+
+
+@pytest.mark.parametrize('Npt, ndec', [(0, 20), (1, 20), (200, 20), (50, 5)])
+def test_txt_layout(tmp_path, Npt, ndec):
+    rng = np.random.default_rng(0)
+    col1 = rng.lognormal(0, 20, Npt)
+    col2 = -rng.lognormal(0, 20, Npt)
+    if Npt > 3:
+        col2[:4] = [np.nan, np.inf, -np.inf, 0.0]
+        col1 = col1.astype(np.float32)
+
+    cluster = model.Cluster(silent=True)
+    cluster._save_txt_file(str(tmp_path/'new.txt'), col1, col2, 'radius (kpc)', 'a rather long column name', ndec=ndec)
+    legacy_txt_file(str(tmp_path/'ref.txt'), col1, col2, 'radius (kpc)', 'a rather long column name', ndec=ndec)
+
+    assert (tmp_path/'new.txt').read_text() == (tmp_path/'ref.txt').read_text()
+
+
+def test_txt_files_threads(tmp_path):
+    x = np.logspace(0, 4, 100)
+    files = [(str(tmp_path/('f'+str(i)+'.txt')), x, x**i, 'x', 'y') for i in range(6)]
+
+    cluster = model.Cluster(silent=True)
+    cluster._save_txt_files(files, Nthread=3)
+    for filename, col1, col2, name1, name2 in files:
+        legacy_txt_file(filename+'.ref', col1, col2, name1, name2)
+        assert open(filename).read() == open(filename+'.ref').read()